@@ -0,0 +1,47 @@
+"""列表与日志查询的复合索引
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+
+基础表由 app.db.init_db.create_tables 创建，本迁移只补充索引。
+PostgreSQL 上使用 CREATE INDEX CONCURRENTLY 在线创建，不阻塞写入；
+CONCURRENTLY 不能在事务中执行，因此放在 autocommit_block 中。
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_job_logs_job_id_timestamp", "job_logs", ["job_id", "timestamp"]),
+    ("ix_scraped_items_tenant_id_created_at_id", "scraped_items", ["tenant_id", "created_at", "id"]),
+    ("ix_scraped_items_tenant_id_job_id_created_at", "scraped_items", ["tenant_id", "job_id", "created_at"]),
+    ("ix_jobs_tenant_id_created_at_id", "jobs", ["tenant_id", "created_at", "id"]),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                if_not_exists=True,
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in INDEXES:
+            op.drop_index(
+                name,
+                table_name=table,
+                if_exists=True,
+                postgresql_concurrently=True,
+            )
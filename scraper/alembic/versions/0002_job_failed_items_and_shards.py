@@ -0,0 +1,31 @@
+"""任务失败计数与分片进度
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+
+items_failed 记录写入失败的数据项数；shards_total / shards_completed 记录分片任务的
+进度，未分片的任务 shards_total 为0。
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+COLUMNS = ["items_failed", "shards_total", "shards_completed"]
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("jobs") as batch_op:
+        for name in COLUMNS:
+            batch_op.add_column(sa.Column(name, sa.Integer(), nullable=True, server_default="0"))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("jobs") as batch_op:
+        for name in reversed(COLUMNS):
+            batch_op.drop_column(name)
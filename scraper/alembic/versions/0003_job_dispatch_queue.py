@@ -0,0 +1,31 @@
+"""任务调度队列
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+
+queue 记录任务类型（browser/http），queued_at 记录进入调度队列的时间；
+调度器按 (status, queue, tenant_id) 统计各租户占用的并发名额。
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("jobs") as batch_op:
+        batch_op.add_column(sa.Column("queue", sa.String(), nullable=True))
+        batch_op.add_column(sa.Column("queued_at", sa.DateTime(timezone=True), nullable=True))
+        batch_op.create_index("ix_jobs_status_queue_tenant_id", ["status", "queue", "tenant_id"])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("jobs") as batch_op:
+        batch_op.drop_index("ix_jobs_status_queue_tenant_id")
+        batch_op.drop_column("queued_at")
+        batch_op.drop_column("queue")
@@ -0,0 +1,54 @@
+"""周期任务的下一次运行时间
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+
+next_run_at 由 app.services.schedule 维护，调度任务按该列的范围查询取出到期任务。
+升级时为已有的周期任务计算初始值。
+"""
+from datetime import datetime
+
+import sqlalchemy as sa
+from alembic import op
+
+from app.services.schedule import next_run_time
+
+# revision identifiers, used by Alembic.
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("jobs") as batch_op:
+        batch_op.add_column(sa.Column("next_run_at", sa.DateTime(timezone=True), nullable=True))
+        batch_op.create_index("ix_jobs_next_run_at", ["next_run_at"])
+
+    jobs = sa.table(
+        "jobs",
+        sa.column("id", sa.Integer),
+        sa.column("schedule_type", sa.String),
+        sa.column("cron_expression", sa.String),
+        sa.column("next_run_at", sa.DateTime(timezone=True)),
+    )
+    connection = op.get_bind()
+    now = datetime.now()
+    rows = connection.execute(
+        sa.select(jobs.c.id, jobs.c.schedule_type, jobs.c.cron_expression)
+        .where(jobs.c.schedule_type.isnot(None), jobs.c.schedule_type != "once")
+    ).all()
+    for job_id, schedule_type, cron_expression in rows:
+        try:
+            next_run_at = next_run_time(job_id, schedule_type, cron_expression, now)
+        except ValueError:
+            # 无效的周期配置保持为空，任务不会被自动运行
+            continue
+        connection.execute(jobs.update().where(jobs.c.id == job_id).values(next_run_at=next_run_at))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("jobs") as batch_op:
+        batch_op.drop_index("ix_jobs_next_run_at")
+        batch_op.drop_column("next_run_at")
@@ -0,0 +1,26 @@
+"""任务心跳超时次数
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+
+stall_count 记录任务心跳超时后自动重新排队的次数，超过 HEARTBEAT_MAX_REQUEUES 后任务失败。
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("jobs") as batch_op:
+        batch_op.add_column(sa.Column("stall_count", sa.Integer(), nullable=True, server_default="0"))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("jobs") as batch_op:
+        batch_op.drop_column("stall_count")
@@ -0,0 +1,49 @@
+"""爬取报告
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+
+crawl_reports 保存每次爬取运行结束时的Scrapy统计，用于与同一站点之前的运行比较。
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "crawl_reports",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("job_id", sa.Integer(), sa.ForeignKey("jobs.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("site_config_id", sa.Integer(), nullable=False),
+        sa.Column("tenant_id", sa.String(), nullable=False),
+        sa.Column("finish_reason", sa.String(), nullable=True),
+        sa.Column("resumed", sa.Boolean(), nullable=True),
+        sa.Column("elapsed_seconds", sa.Float(), nullable=True),
+        sa.Column("requests", sa.Integer(), nullable=True),
+        sa.Column("responses", sa.Integer(), nullable=True),
+        sa.Column("response_bytes", sa.Integer(), nullable=True),
+        sa.Column("errors", sa.Integer(), nullable=True),
+        sa.Column("retries", sa.Integer(), nullable=True),
+        sa.Column("items_scraped", sa.Integer(), nullable=True),
+        sa.Column("items_dropped", sa.Integer(), nullable=True),
+        sa.Column("items_saved", sa.Integer(), nullable=True),
+        sa.Column("items_failed", sa.Integer(), nullable=True),
+        sa.Column("stats", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+    op.create_index("ix_crawl_reports_id", "crawl_reports", ["id"])
+    op.create_index("ix_crawl_reports_job_id", "crawl_reports", ["job_id"])
+    op.create_index(
+        "ix_crawl_reports_site_config_id_tenant_id_id", "crawl_reports", ["site_config_id", "tenant_id", "id"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("crawl_reports")
@@ -0,0 +1,26 @@
+"""任务链路追踪上下文
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19
+
+trace_context 保存启动任务的API请求的W3C traceparent，调度和爬取的span挂在同一条链路上。
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("jobs") as batch_op:
+        batch_op.add_column(sa.Column("trace_context", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("jobs") as batch_op:
+        batch_op.drop_column("trace_context")
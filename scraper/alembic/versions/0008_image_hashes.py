@@ -0,0 +1,42 @@
+"""图片感知哈希
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19
+
+image_hashes 保存数据项中图片的pHash和dHash，用于跨站点查找同一作品，cluster_id 由批量聚类任务写入。
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "image_hashes",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column(
+            "scraped_item_id", sa.Integer(), sa.ForeignKey("scraped_items.id", ondelete="CASCADE"), nullable=False
+        ),
+        sa.Column("site_config_id", sa.Integer(), nullable=True),
+        sa.Column("tenant_id", sa.String(), nullable=False),
+        sa.Column("image_url", sa.String(), nullable=True),
+        sa.Column("sha256", sa.String(64), nullable=True),
+        sa.Column("phash", sa.String(16), nullable=False),
+        sa.Column("dhash", sa.String(16), nullable=True),
+        sa.Column("cluster_id", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+    op.create_index("ix_image_hashes_id", "image_hashes", ["id"])
+    op.create_index("ix_image_hashes_scraped_item_id", "image_hashes", ["scraped_item_id"])
+    op.create_index("ix_image_hashes_tenant_id_id", "image_hashes", ["tenant_id", "id"])
+    op.create_index("ix_image_hashes_tenant_id_cluster_id", "image_hashes", ["tenant_id", "cluster_id"])
+
+
+def downgrade() -> None:
+    op.drop_table("image_hashes")
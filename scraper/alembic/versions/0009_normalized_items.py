@@ -0,0 +1,47 @@
+"""数据项规范化字段
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19
+
+normalized_items 保存从数据项原始字符串解析出的年份、日期范围、尺寸、价格和纯文本描述，由爬取结束后的规范化任务批量写入。
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "normalized_items",
+        sa.Column(
+            "scraped_item_id", sa.Integer(), sa.ForeignKey("scraped_items.id", ondelete="CASCADE"), primary_key=True
+        ),
+        sa.Column("tenant_id", sa.String(), nullable=False),
+        sa.Column("birth_year", sa.Integer(), nullable=True),
+        sa.Column("death_year", sa.Integer(), nullable=True),
+        sa.Column("year_start", sa.Integer(), nullable=True),
+        sa.Column("year_end", sa.Integer(), nullable=True),
+        sa.Column("date_start", sa.Date(), nullable=True),
+        sa.Column("date_end", sa.Date(), nullable=True),
+        sa.Column("height_cm", sa.Float(), nullable=True),
+        sa.Column("width_cm", sa.Float(), nullable=True),
+        sa.Column("depth_cm", sa.Float(), nullable=True),
+        sa.Column("price_amount", sa.Numeric(14, 2), nullable=True),
+        sa.Column("price_currency", sa.String(3), nullable=True),
+        sa.Column("text", sa.Text(), nullable=True),
+        sa.Column("source_updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("normalized_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_normalized_items_tenant_id", "normalized_items", ["tenant_id"])
+    op.create_index("ix_normalized_items_year_start", "normalized_items", ["year_start"])
+    op.create_index("ix_normalized_items_date_start", "normalized_items", ["date_start"])
+
+
+def downgrade() -> None:
+    op.drop_table("normalized_items")
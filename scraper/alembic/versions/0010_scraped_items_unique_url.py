@@ -0,0 +1,51 @@
+"""数据项 (tenant_id, url) 唯一索引
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19
+
+create_or_update 改为按 (tenant_id, url) 执行 INSERT ... ON CONFLICT DO UPDATE。
+并发写入此前可能产生的重复行先合并：同一租户同一URL只保留ID最大（最近写入）的一行，
+其余行的图片哈希和规范化字段一并删除。PostgreSQL 上索引使用 CREATE INDEX CONCURRENTLY 在线创建。
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+DUPLICATES = """
+    SELECT id FROM scraped_items AS s
+    WHERE url IS NOT NULL AND EXISTS (
+        SELECT 1 FROM scraped_items AS newer
+        WHERE newer.tenant_id = s.tenant_id AND newer.url = s.url AND newer.id > s.id
+    )
+"""
+
+
+def upgrade() -> None:
+    # SQLite 默认不执行外键级联，依赖表显式删除
+    op.execute(f"DELETE FROM image_hashes WHERE scraped_item_id IN ({DUPLICATES})")
+    op.execute(f"DELETE FROM normalized_items WHERE scraped_item_id IN ({DUPLICATES})")
+    op.execute(f"DELETE FROM scraped_items WHERE id IN ({DUPLICATES})")
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "uq_scraped_items_tenant_id_url",
+            "scraped_items",
+            ["tenant_id", "url"],
+            unique=True,
+            if_not_exists=True,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "uq_scraped_items_tenant_id_url",
+            table_name="scraped_items",
+            if_exists=True,
+            postgresql_concurrently=True,
+        )
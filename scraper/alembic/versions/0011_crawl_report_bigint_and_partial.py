@@ -0,0 +1,33 @@
+"""爬取报告响应字节数改为64位整数，标记不完整的报告
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-19
+
+response_bytes 为整次爬取下载的字节数，大型站点超过 2^31 字节时32位整数列溢出。
+partial 标记只含主worker统计的分布式爬取报告，不参与与之前运行的比较。
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0011"
+down_revision = "0010"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("crawl_reports") as batch_op:
+        batch_op.alter_column(
+            "response_bytes", type_=sa.BigInteger(), existing_type=sa.Integer(), existing_nullable=True
+        )
+        batch_op.add_column(sa.Column("partial", sa.Boolean(), nullable=True, server_default=sa.false()))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("crawl_reports") as batch_op:
+        batch_op.drop_column("partial")
+        batch_op.alter_column(
+            "response_bytes", type_=sa.Integer(), existing_type=sa.BigInteger(), existing_nullable=True
+        )
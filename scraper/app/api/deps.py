@@ -1,12 +1,12 @@
 """
 API依赖函数
 """
-from typing import Generator, Optional
+from typing import Callable, Generator, Optional, Set, Type
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
-from pydantic import ValidationError
+from pydantic import BaseModel, ValidationError
 from sqlalchemy.orm import Session
 
 from app import models, schemas
@@ -108,4 +108,36 @@ def get_tenant_id_from_user(
     Returns:
         str: 租户ID
     """
-    return current_user.tenant_id 
\ No newline at end of file
+    return current_user.tenant_id 
+
+
+def sparse_fields(schema: Type[BaseModel]) -> Callable[..., Optional[Set[str]]]:
+    """
+    创建解析 ?fields= 稀疏字段参数的依赖
+    
+    Args:
+        schema: 允许投影的响应模式，字段名必须属于该模式
+        
+    Returns:
+        Callable[..., Optional[Set[str]]]: 依赖函数，未指定fields时返回None
+    """
+    allowed = set(schema.model_fields)
+
+    def dependency(
+        fields: Optional[str] = Query(
+            None, description="逗号分隔的返回字段，例如 id,name,status；不指定则返回全部字段"
+        ),
+    ) -> Optional[Set[str]]:
+        if not fields:
+            return None
+        requested = {field.strip() for field in fields.split(",") if field.strip()}
+        unknown = requested - allowed
+        if unknown:
+            raise HTTPException(
+                status_code=400, detail=f"未知字段: {', '.join(sorted(unknown))}"
+            )
+        # id 始终返回，便于前端跳转详情
+        requested.add("id")
+        return requested
+
+    return dependency
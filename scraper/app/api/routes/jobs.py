@@ -1,16 +1,23 @@
 """
 爬虫任务相关的API路由
 """
-from typing import Any, List, Optional
+import logging
+from typing import Any, List, Optional, Set
 import uuid
 
 from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 from sqlalchemy.orm import Session
 
 from app import models, schemas, services
 from app.api import deps
+from app.core.celery_app import celery_app
 from app.db.database import get_db
 from app.core.websocket_manager import manager
+from app.scrapers import profiling
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -20,16 +27,33 @@ def read_jobs(
     db: Session = Depends(get_db),
     skip: int = 0,
     limit: int = 100,
+    fields: Optional[Set[str]] = Depends(deps.sparse_fields(schemas.Job)),
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     获取任务列表
+    
+    指定 fields 时只返回所选字段；未选择 site_config 时不加载站点配置
     """
+    with_site_config = fields is None or "site_config" in fields
+    
     # 获取当前用户所属租户的任务
     jobs = services.job.get_multi(
-        db, skip=skip, limit=limit, tenant_id=current_user.tenant_id
+        db,
+        skip=skip,
+        limit=limit,
+        tenant_id=current_user.tenant_id,
+        with_site_config=with_site_config,
     )
-    return jobs
+    if fields is None:
+        return jobs
+    
+    # 按字段投影；JobInDB 不含 site_config，序列化时不会触发懒加载
+    schema = schemas.Job if with_site_config else schemas.JobInDB
+    return JSONResponse(jsonable_encoder([
+        schema.model_validate(job, from_attributes=True).model_dump(include=fields)
+        for job in jobs
+    ]))
 
 
 @router.post("/jobs", response_model=schemas.Job)
@@ -59,7 +83,10 @@ def create_job(
     job_in.tenant_id = current_user.tenant_id
     
     # 创建任务
-    job = services.job.create(db, obj_in=job_in, user_id=current_user.id)
+    try:
+        job = services.job.create(db, obj_in=job_in, user_id=current_user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     # 在后台启动爬虫任务
     # 注意：实际实现需要通过Celery Worker执行
@@ -135,11 +162,9 @@ def delete_job(
     if not current_user.is_superuser and current_user.role != "admin":
         raise HTTPException(status_code=403, detail="没有删除权限")
     
-    # 如果任务正在运行，先取消任务
-    if job.status == "running" and job.celery_task_id:
-        # 实际实现需要通过Celery取消任务
-        # celery_app.control.revoke(job.celery_task_id, terminate=True)
-        pass
+    # 如果任务尚未结束，先终止Celery任务；爬取子进程随之退出
+    if job.status in services.dispatch.ACTIVE_STATUSES and job.celery_task_id:
+        _revoke(job.celery_task_id, terminate=True)
     
     # 删除任务
     job = services.job.delete(db, job_id=job_id)
@@ -175,6 +200,88 @@ def read_job_logs(
     return logs
 
 
+@router.get("/jobs/{job_id}/profile")
+def read_job_profile(
+    *,
+    db: Session = Depends(get_db),
+    job_id: int,
+    format: str = Query(
+        "summary", pattern="^(summary|pstats|collapsed|memory)$", description="summary, pstats, collapsed 或 memory"
+    ),
+    limit: int = Query(30, ge=1, le=500, description="summary 中返回的函数数量"),
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    获取任务最近一次运行的性能分析结果
+
+    任务配置 profile 开启时才会生成。summary 返回耗时最多的函数；pstats 返回可用
+    pstats/snakeviz 打开的文件；collapsed 返回可生成火焰图的折叠调用栈；memory 返回
+    MemoryWatch 在内存增长越过阈值时记录的快照对比
+    """
+    job = services.job.get(db, job_id=job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    
+    # 检查租户权限
+    if job.tenant_id != current_user.tenant_id:
+        raise HTTPException(status_code=403, detail="没有访问权限")
+    
+    if format == "pstats":
+        stats = profiling.load_pstats(job_id)
+        if stats is None:
+            raise HTTPException(status_code=404, detail="任务没有cProfile分析结果")
+        return Response(
+            profiling.dump_pstats(stats),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="job_{job_id}.pstats"'},
+        )
+    if format == "collapsed":
+        collapsed = profiling.load_collapsed(job_id)
+        if collapsed is None:
+            raise HTTPException(status_code=404, detail="任务没有采样分析结果")
+        return PlainTextResponse(collapsed)
+    
+    if format == "memory":
+        records = profiling.load_memory_records(job_id)
+        if records is None:
+            raise HTTPException(status_code=404, detail="任务没有内存快照")
+        return records
+    
+    summary = profiling.summarize(job_id, limit=limit)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="任务没有性能分析结果")
+    return summary
+
+
+@router.get("/jobs/{job_id}/report", response_model=schemas.CrawlReportComparison)
+def read_job_report(
+    *,
+    db: Session = Depends(get_db),
+    job_id: int,
+    runs: int = Query(10, ge=1, le=100, description="参与比较的同一站点之前运行数"),
+    include_stats: bool = Query(False, description="是否返回完整的Scrapy统计"),
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    获取任务最近一次运行的爬取报告，并与同一站点配置之前的运行比较吞吐量、错误率和每条数据字节数
+    """
+    job = services.job.get(db, job_id=job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    
+    # 检查租户权限
+    if job.tenant_id != current_user.tenant_id:
+        raise HTTPException(status_code=403, detail="没有访问权限")
+    
+    report = services.crawl_report.get_latest(db, job_id=job_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="任务没有爬取报告")
+    comparison = services.crawl_report.compare(db, report=report, limit=runs)
+    if include_stats:
+        comparison["stats"] = report.stats
+    return comparison
+
+
 @router.websocket("/ws/jobs/{job_id}/logs")
 async def websocket_job_logs(
     websocket: WebSocket,
@@ -237,8 +344,12 @@ def start_job(
     if job.status not in ["pending", "failed", "cancelled"]:
         raise HTTPException(status_code=400, detail=f"任务状态为 {job.status}，无法启动")
     
-    # 启动任务
+    # 放入调度队列，并立即触发一次调度；触发失败时由定时调度投递
     job = services.job.start_job(db, job_id=job_id)
+    try:
+        celery_app.send_task("app.tasks.scraper_tasks.dispatch_jobs")
+    except Exception as e:
+        logger.warning(f"触发任务调度失败: {e}")
     return job
 
 
@@ -261,9 +372,22 @@ def cancel_job(
         raise HTTPException(status_code=403, detail="没有访问权限")
     
     # 检查任务状态
-    if job.status not in ["pending", "running"]:
+    if job.status not in ["pending", "queued", "dispatched", "running", "retrying"]:
         raise HTTPException(status_code=400, detail=f"任务状态为 {job.status}，无法取消")
     
-    # 取消任务
+    # 取消任务：尚未开始的Celery任务直接撤销，运行中的爬取检测到状态变化后自行停止
+    celery_task_id = job.celery_task_id
     job = services.job.cancel_job(db, job_id=job_id)
-    return job 
\ No newline at end of file
+    if celery_task_id:
+        _revoke(celery_task_id)
+    return job
+
+
+def _revoke(celery_task_id: str, terminate: bool = False) -> None:
+    """
+    撤销Celery任务，Broker不可用时记录警告后忽略
+    """
+    try:
+        celery_app.control.revoke(celery_task_id, terminate=terminate)
+    except Exception as e:
+        logger.warning(f"撤销Celery任务 {celery_task_id} 失败: {e}") 
\ No newline at end of file
@@ -1,9 +1,11 @@
 """
 Scraped items API routes
 """
-from typing import Any, List
+from typing import Any, List, Optional, Set
 
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 
 from app import models, schemas, services
@@ -13,17 +15,21 @@ from app.db.database import get_db
 router = APIRouter()
 
 
-@router.get("/scraped-items", response_model=List[schemas.ScrapedItem])
+@router.get("/scraped-items", response_model=List[schemas.ScrapedItemSummary])
 def read_scraped_items(
     db: Session = Depends(get_db),
     skip: int = 0,
     limit: int = 100,
     job_id: int = Query(None, description="Filter by job ID"),
     item_type: str = Query(None, description="Filter by item type"),
+    fields: Optional[Set[str]] = Depends(deps.sparse_fields(schemas.ScrapedItem)),
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     Retrieve scraped items.
+
+    Only summary columns are loaded by default; `content` and `data` are
+    returned when requested explicitly through `fields`.
     """
     # Get scraped items for the current user's tenant
     items = services.scraped_item.get_multi(
@@ -32,9 +38,15 @@ def read_scraped_items(
         limit=limit, 
         tenant_id=current_user.tenant_id,
         job_id=job_id,
-        item_type=item_type
+        page_type=item_type,
+        fields=fields or services.scraped_item.SUMMARY_FIELDS,
     )
-    return items
+    if fields is None:
+        return items
+    
+    return JSONResponse(jsonable_encoder([
+        {field: getattr(item, field) for field in fields} for item in items
+    ]))
 
 
 @router.get("/scraped-items/{item_id}", response_model=schemas.ScrapedItem)
@@ -45,9 +57,9 @@ def read_scraped_item(
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
-    Get specific scraped item by ID.
+    Get specific scraped item by ID, including the full payload.
     """
-    item = services.scraped_item.get(db, id=item_id)
+    item = services.scraped_item.get(db, item_id=item_id)
     if not item:
         raise HTTPException(status_code=404, detail="Scraped item not found")
     
@@ -58,6 +70,50 @@ def read_scraped_item(
     return item
 
 
+@router.get("/scraped-items/{item_id}/matches", response_model=schemas.ArtworkMatches)
+def read_matching_artworks(
+    *,
+    db: Session = Depends(get_db),
+    item_id: int,
+    max_distance: Optional[int] = Query(
+        None, ge=0, le=32, description="Maximum pHash Hamming distance, defaults to IMAGE_MATCH_MAX_DISTANCE"
+    ),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Find items from any site of the tenant whose images are near-identical
+    to this item's images, e.g. the same artwork listed on several sites.
+    """
+    item = services.scraped_item.get(db, item_id=item_id)
+    if not item:
+        raise HTTPException(status_code=404, detail="Scraped item not found")
+    
+    # Check if the item belongs to the user's tenant
+    if item.tenant_id != current_user.tenant_id:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    
+    matches = services.image_match.find_matches(db, item=item, max_distance=max_distance, limit=limit)
+    cluster_ids = [h.cluster_id for h in item.image_hashes if h.cluster_id is not None]
+    return {"item_id": item.id, "cluster_id": min(cluster_ids, default=None), "matches": matches}
+
+
+@router.get("/scraped-items/clusters/{cluster_id}", response_model=List[schemas.ScrapedItemSummary])
+def read_artwork_cluster(
+    *,
+    db: Session = Depends(get_db),
+    cluster_id: int,
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Get the items grouped into one cluster by the image clustering job.
+    """
+    items = services.image_match.get_cluster(db, tenant_id=current_user.tenant_id, cluster_id=cluster_id)
+    if not items:
+        raise HTTPException(status_code=404, detail="Cluster not found")
+    return items
+
+
 @router.delete("/scraped-items/{item_id}", response_model=schemas.ScrapedItem)
 def delete_scraped_item(
     *,
@@ -68,9 +124,9 @@ def delete_scraped_item(
     """
     Delete a scraped item.
     """
-    item = services.scraped_item.get(db, id=item_id)
+    item = services.scraped_item.get(db, item_id=item_id)
     if not item:
         raise HTTPException(status_code=404, detail="Scraped item not found")
     
-    item = services.scraped_item.remove(db, id=item_id)
-    return item 
\ No newline at end of file
+    item = services.scraped_item.delete(db, item_id=item_id)
+    return item
@@ -2,6 +2,8 @@
 Celery应用配置
 """
 from celery import Celery
+from celery.signals import worker_init
+from kombu import Queue
 
 from app.core.config import settings
 
@@ -10,6 +12,7 @@ celery_app = Celery(
     "worker",
     broker=f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/{settings.REDIS_DB}",
     backend=f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/{settings.REDIS_DB}",
+    include=["app.tasks.scraper_tasks", "app.tasks.maintenance_tasks"],
 )
 
 # 配置Celery
@@ -30,6 +33,16 @@ celery_app.conf.update(
     task_reject_on_worker_lost=True,  # worker异常终止时拒绝任务，让其重新分配
     worker_prefetch_multiplier=1,  # 每个worker一次只预取一个任务，避免任务堆积
     
+    # 队列：浏览器爬取、HTTP爬取和维护任务由各自的worker池处理，互不阻塞
+    task_queues=(Queue("crawl.browser"), Queue("crawl.http"), Queue("maintenance")),
+    task_default_queue="maintenance",
+    task_routes={
+        # 调度任务投递时按任务类型指定队列，这里只是直接调用时的默认队列
+        "app.tasks.scraper_tasks.run_spider_task": {"queue": "crawl.http"},
+        "app.tasks.scraper_tasks.join_crawl_task": {"queue": "crawl.http"},
+        "app.tasks.scraper_tasks.run_shard_task": {"queue": "crawl.http"},
+    },
+    
     # 重试策略
     task_default_retry_delay=60,  # 默认重试延迟（秒）
     task_max_retries=3,  # 最大重试次数
@@ -44,4 +57,25 @@ celery_app.conf.update(
 )
 
 # 包含任务模块
-celery_app.autodiscover_tasks(["app.tasks"]) 
\ No newline at end of file
+celery_app.autodiscover_tasks(["app.tasks"])
+
+
+@worker_init.connect
+def start_metrics_server(**kwargs) -> None:
+    """
+    worker启动时提供 /metrics；在创建子进程之前运行，子进程和爬取进程继承多进程指标目录
+    """
+    if settings.METRICS_ENABLED:
+        from app.core import metrics
+
+        metrics.start_server()
+
+
+@worker_init.connect
+def setup_tracing(**kwargs) -> None:
+    """
+    worker启动时设置链路追踪；BatchSpanProcessor在fork出的子进程中重新启动导出线程
+    """
+    from app.core import tracing
+
+    tracing.setup("aida-worker")
@@ -4,14 +4,39 @@ Celery Beat定时任务配置
 from celery.schedules import crontab
 
 from app.core.celery_app import celery_app
+from app.core.config import settings
 from app.tasks.scraper_tasks import cleanup_stalled_jobs
 
 # 定义定时任务
 celery_app.conf.beat_schedule = {
-    # 每10分钟清理一次卡住的任务
-    'cleanup-stalled-jobs-every-10-minutes': {
+    # 定时投递排队中的任务；任务启动和结束时也会立即触发一次
+    'dispatch-jobs': {
+        'task': 'app.tasks.scraper_tasks.dispatch_jobs',
+        'schedule': settings.DISPATCH_INTERVAL,
+    },
+    
+    # 把到期的周期任务放入调度队列
+    'schedule-due-jobs': {
+        'task': 'app.tasks.scraper_tasks.schedule_due_jobs',
+        'schedule': settings.SCHEDULER_INTERVAL,
+    },
+    
+    # 检查任务心跳，重新排队已停止的任务
+    'cleanup-stalled-jobs': {
         'task': 'app.tasks.scraper_tasks.cleanup_stalled_jobs',
-        'schedule': 600.0,  # 10分钟
+        'schedule': settings.STALL_CHECK_INTERVAL,
+    },
+    
+    # 规范化爬取结束时未处理的数据项（任务结束时会立即触发一次）
+    'normalize-scraped-items': {
+        'task': 'app.tasks.maintenance_tasks.normalize_scraped_items',
+        'schedule': crontab(minute=30),
+    },
+    
+    # 每天凌晨4点按图片感知哈希聚类各站点的同一作品
+    'cluster-artwork-images': {
+        'task': 'app.tasks.maintenance_tasks.cluster_artwork_images',
+        'schedule': crontab(hour=4, minute=0),
     },
     
     # 每天凌晨3点执行的任务示例
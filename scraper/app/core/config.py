@@ -36,6 +36,15 @@ class Settings(BaseSettings):
     DATABASE_URL: Optional[str] = None
     USE_SQLITE: bool = True  # 默认使用SQLite
 
+    # SQLite并发配置：WAL允许读写并发，写操作由单独的写线程串行批量提交
+    SQLITE_WAL: bool = True
+    SQLITE_BUSY_TIMEOUT_MS: int = 30000  # 等待写锁的时间（毫秒）
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # WAL模式下NORMAL即可保证一致性
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024  # 内存映射读取大小（字节）
+    SQLITE_SINGLE_WRITER: bool = True  # 爬虫写入经由单写线程队列
+    DB_WRITER_BATCH_SIZE: int = 200  # 单个事务最多合并的写操作数
+    DB_WRITER_BATCH_DELAY: float = 0.05  # 合并写操作的最长等待时间（秒）
+
     @model_validator(mode="after")
     def assemble_db_connection(self) -> "Settings":
         """构建数据库连接字符串"""
@@ -59,10 +68,66 @@ class Settings(BaseSettings):
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0
 
+    # 任务调度：浏览器/HTTP任务分队列运行，租户之间按权重公平分配并发
+    CRAWL_BROWSER_CONCURRENCY: int = 2  # crawl.browser 队列同时运行的任务数，应与该队列worker并发数一致
+    CRAWL_HTTP_CONCURRENCY: int = 8  # crawl.http 队列同时运行的任务数
+    TENANT_MAX_CONCURRENT_JOBS: int = 4  # 每个租户默认最多同时运行的任务数
+    TENANT_JOB_LIMITS: Dict[str, int] = {}  # 按租户覆盖并发上限
+    TENANT_WEIGHTS: Dict[str, float] = {}  # 租户权重，默认1
+    DISPATCH_INTERVAL: float = 5.0  # 定时调度间隔（秒）
+
+    # 任务心跳：爬取进程定期写入心跳，超时未更新的任务重新排队
+    HEARTBEAT_INTERVAL: float = 5.0  # 写入心跳的间隔（秒）
+    HEARTBEAT_TIMEOUT: float = 30.0  # 超过该时间（秒）没有心跳视为已停止
+    HEARTBEAT_MAX_REQUEUES: int = 2  # 心跳超时后最多自动重新排队的次数，超过后任务失败
+    # 分片任务的分片可能在队列中等待，没有心跳也没有分片结束超过该时间（秒）才视为已停止
+    SHARD_STALL_TIMEOUT: float = 1800.0
+    # 已投递或等待重试的任务（重试前等待60秒）超过该时间（秒）没有开始运行、也没有心跳时视为丢失，
+    # 例如Celery消息丢失或worker在开始运行前退出
+    DISPATCH_STALL_TIMEOUT: float = 300.0
+    STALL_CHECK_INTERVAL: float = 15.0  # 检查心跳超时的间隔（秒）
+    CRAWL_CANCEL_GRACE: float = 10.0  # 任务取消后等待爬取进程自行退出的时间（秒），超时后强制结束
+    # 爬取检查点目录，重试的任务可能在其他worker上运行，多台机器部署时应使用共享存储
+    CRAWL_CHECKPOINT_DIR: str = os.path.abspath(os.path.join(os.path.dirname(__file__), "../..", "checkpoints"))
+    # 任务配置 profile 开启时的性能分析结果目录，API需能读取，多台机器部署时同样应使用共享存储
+    CRAWL_PROFILE_DIR: str = os.path.abspath(os.path.join(os.path.dirname(__file__), "../..", "profiles"))
+    PROFILE_SAMPLE_INTERVAL: float = 0.005  # 采样调用栈的间隔（秒）
+
+    # 爬取报告：与同一站点之前的运行比较，吞吐量下降或错误率上升超过该比例时标记为退化
+    CRAWL_REPORT_REGRESSION_THRESHOLD: float = 0.2
+
+    # Prometheus指标：爬取进程写入多进程指标文件，Celery worker在 METRICS_PORT 上提供 /metrics
+    METRICS_ENABLED: bool = False
+    METRICS_PORT: int = 9410
+    # 同一台机器上的多个worker需使用不同的目录，worker启动时清空
+    METRICS_DIR: str = os.path.abspath(os.path.join(os.path.dirname(__file__), "../..", "metrics"))
+
+    # 链路追踪：API、Celery任务和爬取进程的span以JSON Lines写入 TRACING_FILE，见 app.core.tracing
+    TRACING_ENABLED: bool = False
+    TRACING_FILE: str = os.path.abspath(os.path.join(os.path.dirname(__file__), "../..", "traces", "spans.jsonl"))
+    TRACING_REQUEST_SAMPLE_RATE: float = 0.01  # 为单个请求创建span的比例
+
+    # 周期任务
+    SCHEDULER_INTERVAL: float = 30.0  # 检查到期任务的间隔（秒）
+    SCHEDULER_BATCH_SIZE: int = 1000  # 每次最多取出的到期任务数，其余留到下一次
+    SCHEDULER_JITTER_WINDOW: int = 3600  # 同一时刻到期的任务在该时间（秒）内错开启动
+
     # Elasticsearch配置
     ELASTICSEARCH_HOST: str = "localhost"
     ELASTICSEARCH_PORT: int = 9200
 
+    # 图片存储：本地目录或 s3://<bucket>/<prefix>（使用下面的MinIO配置），见 app.scrapers.images
+    IMAGES_STORE: str = os.path.abspath(os.path.join(os.path.dirname(__file__), "../..", "images"))
+
+    # 图片匹配：pHash汉明距离不超过该值视为同一作品；索引把64位哈希分成的段数
+    IMAGE_MATCH_MAX_DISTANCE: int = 8
+    IMAGE_MATCH_INDEX_CHUNKS: int = 4
+    # 进程内缓存的索引重建间隔（秒），丢弃已删除或已替换的哈希记录
+    IMAGE_MATCH_INDEX_REBUILD_INTERVAL: float = 3600.0
+
+    # 爬取结束后规范化数据项字段的每批数据项数
+    NORMALIZE_BATCH_SIZE: int = 1000
+
     # MinIO配置
     MINIO_ENDPOINT: str = "localhost:9000"
     MINIO_ACCESS_KEY: str = "minioadmin"
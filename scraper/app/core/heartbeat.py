@@ -0,0 +1,80 @@
+"""
+任务心跳
+
+爬取进程每隔 HEARTBEAT_INTERVAL 秒把任务的最后心跳时间写入Redis有序集合
+（成员为任务ID，分数为时间戳），清理任务据此在心跳超时后几十秒内发现已停止的爬取。
+任务结束时移除对应成员，因此集合大小与运行中的任务数相当。
+"""
+import logging
+import time
+from typing import Dict, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_KEY = "aida:job_heartbeats"
+
+_client = None
+
+
+def get_client():
+    """
+    获取写入心跳使用的Redis客户端
+
+    Returns:
+        redis.Redis: Redis客户端
+    """
+    global _client
+    if _client is None:
+        import redis
+
+        _client = redis.Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_DB,
+            socket_timeout=2,
+            socket_connect_timeout=2,
+        )
+    return _client
+
+
+def beat(job_id: int, client=None, now: Optional[float] = None) -> None:
+    """
+    记录任务心跳
+
+    Args:
+        job_id: 任务ID
+        client: Redis客户端，默认使用 get_client()
+        now: 心跳时间戳，默认取当前时间
+    """
+    client = client or get_client()
+    client.zadd(HEARTBEAT_KEY, {str(job_id): now or time.time()})
+
+
+def clear(job_id: int, client=None) -> None:
+    """
+    任务结束后移除心跳，失败时只记录日志
+
+    Args:
+        job_id: 任务ID
+        client: Redis客户端，默认使用 get_client()
+    """
+    try:
+        (client or get_client()).zrem(HEARTBEAT_KEY, str(job_id))
+    except Exception as e:
+        logger.warning(f"移除任务 {job_id} 的心跳失败: {e}")
+
+
+def get_all(client=None) -> Dict[int, float]:
+    """
+    获取所有任务的最后心跳时间
+
+    Args:
+        client: Redis客户端，默认使用 get_client()
+
+    Returns:
+        Dict[int, float]: 任务ID到最后心跳时间戳的映射
+    """
+    client = client or get_client()
+    return {int(member): score for member, score in client.zrange(HEARTBEAT_KEY, 0, -1, withscores=True)}
@@ -0,0 +1,94 @@
+"""
+Prometheus指标
+
+爬取进程中的 CrawlMetrics 扩展按任务和域名记录请求、响应、下载耗时、数据项、
+Pipeline耗时和调度队列长度；Celery worker在 METRICS_PORT 上以Prometheus文本格式
+提供 /metrics，汇总本机所有爬取进程的指标。
+
+每次爬取在独立的子进程中运行，因此指标使用prometheus_client的多进程模式：各进程把
+数值写入 METRICS_DIR 下的文件，worker在收到抓取请求时合并。该目录在worker启动时
+清空，同一台机器上的多个worker需使用不同的 METRICS_DIR 和 METRICS_PORT。
+"""
+import glob
+import logging
+import os
+from typing import Optional
+
+from app.core.config import settings
+
+if settings.METRICS_ENABLED:
+    # 多进程模式需在导入prometheus_client之前设置，爬取子进程继承该环境变量
+    os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", settings.METRICS_DIR)
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, multiprocess, start_http_server
+
+logger = logging.getLogger(__name__)
+
+# HTTP下载耗时的分桶（秒）
+DOWNLOAD_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60)
+# 浏览器渲染通常比HTTP下载慢一个数量级
+RENDER_BUCKETS = (0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+PIPELINE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+
+REQUESTS = Counter(
+    "aida_crawl_requests_total", "发送到下载器的请求数", ["job_id", "domain"]
+)
+RESPONSES = Counter(
+    "aida_crawl_responses_total", "收到的响应数", ["job_id", "domain", "status"]
+)
+RESPONSE_BYTES = Counter(
+    "aida_crawl_response_bytes_total", "收到的响应体字节数", ["job_id", "domain"]
+)
+DOWNLOAD_LATENCY = Histogram(
+    "aida_crawl_download_latency_seconds", "HTTP下载耗时", ["job_id", "domain"], buckets=DOWNLOAD_BUCKETS
+)
+PLAYWRIGHT_RENDER = Histogram(
+    "aida_crawl_playwright_render_seconds",
+    "Playwright页面渲染耗时（导航、页面操作和读取内容）",
+    ["job_id", "domain"],
+    buckets=RENDER_BUCKETS,
+)
+ITEMS = Counter(
+    "aida_crawl_items_total", "数据项数，outcome为scraped、dropped或error", ["job_id", "page_type", "outcome"]
+)
+PIPELINE_LATENCY = Histogram(
+    "aida_crawl_pipeline_latency_seconds",
+    "数据项在Pipeline中的耗时",
+    ["job_id", "pipeline"],
+    buckets=PIPELINE_BUCKETS,
+)
+# 只汇总仍在运行的爬取进程
+QUEUE_DEPTH = Gauge(
+    "aida_crawl_scheduler_queue_depth", "调度器中等待的请求数", ["job_id"], multiprocess_mode="livesum"
+)
+IN_PROGRESS = Gauge(
+    "aida_crawl_requests_in_progress", "正在下载或处理的请求数", ["job_id"], multiprocess_mode="livesum"
+)
+
+
+def start_server(port: Optional[int] = None) -> None:
+    """
+    清空指标目录并在后台线程中启动 /metrics 服务
+
+    Args:
+        port: 监听端口，默认 METRICS_PORT
+    """
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    # 上次运行遗留的文件会让计数器从旧值继续累加
+    for name in glob.glob(os.path.join(path, "*.db")):
+        os.remove(name)
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=path)
+    start_http_server(port or settings.METRICS_PORT, registry=registry)
+    logger.info(f"指标服务已启动，端口 {port or settings.METRICS_PORT}")
+
+
+def process_exited(pid: int) -> None:
+    """
+    爬取子进程退出后移除其仪表值；计数器和直方图保留，累计值不会倒退
+
+    Args:
+        pid: 子进程ID
+    """
+    multiprocess.mark_process_dead(pid)
@@ -0,0 +1,195 @@
+"""
+链路追踪
+
+设置 TRACING_ENABLED=true 后，一次任务运行的各阶段记录在同一条OpenTelemetry链路中::
+
+    POST /jobs/{id}/start          API请求，由FastAPI内置的OpenTelemetry支持创建
+      job.dispatch_wait            在调度队列中等待投递（queued_at 到投递）
+      celery.queue_wait            在Celery队列中等待worker（投递到任务开始）
+      job.run                      run_spider_task（分片为 job.shard，协助者为 job.join）
+        crawl.process              爬取子进程
+          spider.create            选择爬虫类，创建Crawler、爬虫实例和引擎组件
+          spider.crawl             爬虫打开到关闭
+          playwright.launch_browser
+          http.request             按 TRACING_REQUEST_SAMPLE_RATE 采样的单个请求的下载
+          db.write                 数据库Pipeline的一次写入和提交
+
+链路上下文以W3C traceparent的形式传递：API请求头（可选，调用方的链路）-> jobs.trace_context 列
+-> Celery消息头 -> 爬取子进程的 TRACEPARENT 环境变量。span以JSON Lines写入 TRACING_FILE，每行一个span，
+字段与OTLP JSON相同（trace_id、span_id、parent_span_id、开始和结束时间等），
+可用 jq 查看或转换后导入Jaeger等工具。多个进程追加写入同一个文件。
+
+未启用时不设置TracerProvider，所有span都是opentelemetry-api的空实现。
+"""
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, Optional, Sequence
+
+from opentelemetry import trace
+from opentelemetry.context import Context
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+from opentelemetry.trace.propagation.tracecontext import TraceContextTextMapPropagator
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 传给爬取子进程的环境变量
+TRACEPARENT_ENV = "TRACEPARENT"
+
+_propagator = TraceContextTextMapPropagator()
+_provider: Optional[TracerProvider] = None
+
+
+class FileSpanExporter(SpanExporter):
+    """
+    以JSON Lines格式追加写入span，代替OTLP收集器
+    """
+
+    def __init__(self, path: str):
+        """
+        初始化导出器
+
+        Args:
+            path: 输出文件
+        """
+        self.path = path
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        """
+        写入一批span；一批只调用一次write，多个进程同时追加时行不会交错
+        """
+        data = "".join(json.dumps(span_record(span), ensure_ascii=False, default=str) + "\n" for span in spans)
+        try:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data.encode("utf-8"))
+            finally:
+                os.close(fd)
+        except OSError as e:
+            logger.warning(f"写入链路追踪文件失败: {e}")
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        """
+        无需释放资源
+        """
+
+
+def span_record(span: ReadableSpan) -> Dict[str, Any]:
+    """
+    把span转换为写入文件的字典
+
+    Args:
+        span: 已结束的span
+
+    Returns:
+        Dict[str, Any]: OTLP JSON字段
+    """
+    context = span.get_span_context()
+    return {
+        "trace_id": format(context.trace_id, "032x"),
+        "span_id": format(context.span_id, "016x"),
+        "parent_span_id": format(span.parent.span_id, "016x") if span.parent else None,
+        "name": span.name,
+        "kind": span.kind.name,
+        "service": span.resource.attributes.get("service.name"),
+        "start_time_unix_nano": span.start_time,
+        "end_time_unix_nano": span.end_time,
+        "duration_ms": round((span.end_time - span.start_time) / 1e6, 3),
+        "status": span.status.status_code.name,
+        "attributes": dict(span.attributes or {}),
+        "events": [
+            {"name": event.name, "time_unix_nano": event.timestamp, "attributes": dict(event.attributes or {})}
+            for event in span.events
+        ],
+    }
+
+
+def setup(service_name: str) -> None:
+    """
+    启用时设置全局TracerProvider，同一进程中只设置一次
+
+    Args:
+        service_name: 服务名，例如 aida-api、aida-worker、aida-crawl
+    """
+    global _provider
+    if not settings.TRACING_ENABLED or _provider is not None:
+        return
+    os.makedirs(os.path.dirname(settings.TRACING_FILE) or ".", exist_ok=True)
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    provider.add_span_processor(BatchSpanProcessor(FileSpanExporter(settings.TRACING_FILE)))
+    trace.set_tracer_provider(provider)
+    _provider = provider
+
+
+def flush() -> None:
+    """
+    写出尚未导出的span，爬取子进程退出前调用
+    """
+    if _provider is not None:
+        _provider.force_flush()
+
+
+def get_tracer() -> trace.Tracer:
+    """
+    获取应用的Tracer
+
+    Returns:
+        trace.Tracer: 未启用时为空实现
+    """
+    return trace.get_tracer("aida")
+
+
+def current_traceparent() -> Optional[str]:
+    """
+    当前span的traceparent
+
+    Returns:
+        Optional[str]: 没有正在记录的span时返回None
+    """
+    carrier: Dict[str, str] = {}
+    _propagator.inject(carrier)
+    return carrier.get("traceparent")
+
+
+def message_headers() -> Dict[str, str]:
+    """
+    投递Celery任务时附带的消息头，任务中通过 self.request.get("traceparent") 读取
+
+    Returns:
+        Dict[str, str]: 没有正在记录的span时为空
+    """
+    traceparent = current_traceparent()
+    return {"traceparent": traceparent} if traceparent else {}
+
+
+def extract(traceparent: Optional[str]) -> Context:
+    """
+    从traceparent恢复链路上下文
+
+    Args:
+        traceparent: W3C traceparent
+
+    Returns:
+        Context: 作为父span的上下文；traceparent为空或无效时为空上下文
+    """
+    return _propagator.extract({"traceparent": traceparent} if traceparent else {})
+
+
+def to_ns(value: Optional[datetime]) -> Optional[int]:
+    """
+    把数据库中的时间转换为span使用的纳秒时间戳
+
+    Args:
+        value: 时间，不带时区时按本地时间处理（与 datetime.now() 写入的一致）
+
+    Returns:
+        Optional[int]: 纳秒时间戳
+    """
+    return int(value.timestamp() * 1e9) if value is not None else None
@@ -8,5 +8,8 @@ from app.db.base_class import Base
 from app.models.user import User
 from app.models.site import SiteConfig
 from app.models.job import Job
+from app.models.crawl_report import CrawlReport
 from app.models.job_log import JobLog
-from app.models.scraped_item import ScrapedItem 
\ No newline at end of file
+from app.models.scraped_item import ScrapedItem
+from app.models.image_hash import ImageHash
+from app.models.normalized_item import NormalizedItem 
\ No newline at end of file
@@ -4,34 +4,55 @@
 import logging
 from typing import Generator
 
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
+# 模型统一继承 base_class.Base，这里重新导出以兼容旧的导入路径
+from app.db.base_class import Base
 
 # 设置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """
+    为每个新的SQLite连接设置并发相关的PRAGMA
+
+    WAL模式下读连接不会被写事务阻塞；busy_timeout让写锁冲突时等待而不是立即报
+    database is locked
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        if settings.SQLITE_WAL:
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+    finally:
+        cursor.close()
+
+
 # 创建SQLAlchemy引擎
 # 如果是SQLite，需要添加connect_args={"check_same_thread": False}
 database_url = str(settings.DATABASE_URL)
 if database_url.startswith("sqlite"):
     engine = create_engine(
         database_url, 
-        connect_args={"check_same_thread": False},
+        connect_args={
+            "check_same_thread": False,
+            "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000,
+        },
         pool_pre_ping=True
     )
+    event.listen(engine, "connect", _set_sqlite_pragmas)
 else:
     engine = create_engine(database_url, pool_pre_ping=True)
 
 # 创建会话工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-# 创建基类
-Base = declarative_base()
-
 
 def get_db() -> Generator:
     """
@@ -0,0 +1,252 @@
+"""
+单写线程批量写入模块
+
+SQLite同一时刻只允许一个写事务。多个爬虫和API同时写入时，各自的短事务会互相
+争抢写锁，频繁出现 database is locked。这里把写操作放进队列，由一个专用线程
+按批合并到同一事务中提交；读操作仍使用连接池中的独立连接，在WAL模式下不受影响。
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional
+
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import settings
+from app.db.database import SessionLocal, engine
+
+logger = logging.getLogger(__name__)
+
+# 写操作：接收写线程的会话，只做增删改和flush，不要自行commit
+WriteOperation = Callable[[Session], Any]
+
+_STOP = object()
+
+
+class _PendingWrite:
+    """
+    队列中等待执行的写操作
+    """
+    __slots__ = ("operation", "future")
+
+    def __init__(self, operation: WriteOperation):
+        self.operation = operation
+        self.future: Future = Future()
+
+
+class BatchWriter:
+    """
+    单写线程批量写入队列
+
+    写线程取出第一个操作后，在 max_batch_delay 内继续收集最多 max_batch_size 个
+    操作，全部执行后只提交一次。批次中某个操作失败时回滚整批，再逐个单独提交，
+    只让失败的操作返回异常。
+    """
+
+    def __init__(
+        self,
+        session_factory: sessionmaker = SessionLocal,
+        max_batch_size: int = 200,
+        max_batch_delay: float = 0.05,
+    ):
+        """
+        初始化写入队列
+
+        Args:
+            session_factory: 会话工厂
+            max_batch_size: 单个事务最多合并的写操作数
+            max_batch_delay: 合并写操作的最长等待时间（秒）
+        """
+        self.session_factory = session_factory
+        self.max_batch_size = max_batch_size
+        self.max_batch_delay = max_batch_delay
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.operations = 0
+        self.commits = 0
+        self.failures = 0
+
+    def start(self) -> None:
+        """
+        启动写线程（重复调用无副作用）
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, operation: WriteOperation) -> Future:
+        """
+        提交写操作
+
+        Args:
+            operation: 写操作，接收写线程的数据库会话
+
+        Returns:
+            Future: 事务提交后得到操作的返回值；提交失败时得到异常
+        """
+        self.start()
+        pending = _PendingWrite(operation)
+        self._queue.put(pending)
+        return pending.future
+
+    def run(self, operation: WriteOperation, timeout: Optional[float] = None) -> Any:
+        """
+        提交写操作并等待其提交完成
+
+        Args:
+            operation: 写操作
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            Any: 写操作的返回值
+        """
+        return self.submit(operation).result(timeout=timeout)
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """
+        处理完队列中剩余的写操作后停止写线程
+
+        Args:
+            timeout: 最长等待时间（秒）
+        """
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def _run(self) -> None:
+        """
+        写线程主循环
+        """
+        session = self.session_factory(expire_on_commit=False)
+        try:
+            while True:
+                first = self._queue.get()
+                if first is _STOP:
+                    return
+                batch, stop = self._collect(first)
+                self._execute(session, batch)
+                if stop:
+                    return
+        finally:
+            session.close()
+
+    def _collect(self, first: _PendingWrite):
+        """
+        在等待窗口内收集一批写操作
+
+        Args:
+            first: 批次的第一个写操作
+
+        Returns:
+            Tuple[List[_PendingWrite], bool]: 写操作列表，以及是否收到停止信号
+        """
+        batch = [first]
+        deadline = time.monotonic() + self.max_batch_delay
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                pending = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if pending is _STOP:
+                return batch, True
+            batch.append(pending)
+        return batch, False
+
+    def _execute(self, session: Session, batch: List[_PendingWrite]) -> None:
+        """
+        在一个事务中执行一批写操作
+
+        Args:
+            session: 写线程的数据库会话
+            batch: 写操作列表
+        """
+        batch = [pending for pending in batch if pending.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        results = []
+        try:
+            for pending in batch:
+                results.append(pending.operation(session))
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            if len(batch) == 1:
+                self.failures += 1
+                batch[0].future.set_exception(e)
+                return
+            # 整批回滚后逐个重试，把失败限制在出错的操作上
+            logger.warning(f"批量写入失败，逐条重试 {len(batch)} 个操作: {e}")
+            for pending in batch:
+                self._execute_single(session, pending)
+            return
+
+        self.operations += len(batch)
+        self.commits += 1
+        for pending, result in zip(batch, results):
+            pending.future.set_result(result)
+
+    def _execute_single(self, session: Session, pending: _PendingWrite) -> None:
+        """
+        单独执行并提交一个写操作（future已处于运行状态）
+
+        Args:
+            session: 写线程的数据库会话
+            pending: 写操作
+        """
+        try:
+            result = pending.operation(session)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            self.failures += 1
+            pending.future.set_exception(e)
+            return
+        self.operations += 1
+        self.commits += 1
+        pending.future.set_result(result)
+
+
+_writer: Optional[BatchWriter] = None
+_writer_lock = threading.Lock()
+
+
+def use_single_writer() -> bool:
+    """
+    当前数据库是否启用单写线程模式
+
+    Returns:
+        bool: SQLite且开启 SQLITE_SINGLE_WRITER 时为True
+    """
+    return settings.SQLITE_SINGLE_WRITER and engine.dialect.name == "sqlite"
+
+
+def get_writer() -> BatchWriter:
+    """
+    获取进程内共享的写入队列
+
+    Returns:
+        BatchWriter: 写入队列
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = BatchWriter(
+                max_batch_size=settings.DB_WRITER_BATCH_SIZE,
+                max_batch_delay=settings.DB_WRITER_BATCH_DELAY,
+            )
+            atexit.register(_writer.close)
+        return _writer
@@ -8,6 +8,7 @@ from fastapi.responses import JSONResponse
 from starlette.middleware.cors import CORSMiddleware
 
 from app.api.api import api_router
+from app.core import tracing
 from app.core.config import settings
 
 # Configure logging
@@ -21,6 +22,10 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# FastAPI records a span per request once a tracer provider is set; the context
+# is carried into Celery and the crawl process (see app.core.tracing)
+tracing.setup("aida-api")
+
 # Create FastAPI app
 app = FastAPI(
     title=settings.PROJECT_NAME,
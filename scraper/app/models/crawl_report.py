@@ -0,0 +1,47 @@
+"""
+爬取报告模型
+"""
+from sqlalchemy import BigInteger, Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, JSON, String
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+
+from app.db.base_class import Base
+
+
+class CrawlReport(Base):
+    """
+    一次爬取运行结束时保存的Scrapy统计
+
+    用于比较的计数单独成列，完整统计保存在 stats 中；周期任务每次运行各一条
+    """
+    __tablename__ = "crawl_reports"
+    __table_args__ = (
+        # services.crawl_report.get_previous: WHERE site_config_id = ? AND tenant_id = ? ORDER BY id DESC
+        Index("ix_crawl_reports_site_config_id_tenant_id_id", "site_config_id", "tenant_id", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("jobs.id", ondelete="CASCADE"), nullable=False, index=True)
+    site_config_id = Column(Integer, nullable=False)  # 站点配置删除后报告仍保留
+    tenant_id = Column(String, nullable=False)
+    finish_reason = Column(String, nullable=True)
+    resumed = Column(Boolean, default=False)  # 从检查点恢复，计数跨进程累计而耗时只含最后一个进程
+    partial = Column(Boolean, default=False)  # 分布式爬取只含主worker的统计，协助者的统计不在其中
+    elapsed_seconds = Column(Float, default=0)
+    requests = Column(Integer, default=0)
+    responses = Column(Integer, default=0)
+    response_bytes = Column(BigInteger, default=0)  # 大型站点一次爬取可超过 2^31 字节
+    errors = Column(Integer, default=0)  # 状态码4xx/5xx的响应和下载异常
+    retries = Column(Integer, default=0)
+    items_scraped = Column(Integer, default=0)
+    items_dropped = Column(Integer, default=0)
+    items_saved = Column(Integer, default=0)
+    items_failed = Column(Integer, default=0)
+    stats = Column(JSON, default=dict)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # 关系
+    job = relationship("Job", back_populates="crawl_reports")
+
+    def __repr__(self):
+        return f"<CrawlReport(id={self.id}, job_id={self.job_id})>"
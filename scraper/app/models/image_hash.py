@@ -0,0 +1,42 @@
+"""
+图片感知哈希模型
+"""
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+
+from app.db.base_class import Base
+
+
+class ImageHash(Base):
+    """
+    数据项中一张图片的感知哈希
+
+    由图片Pipeline计算、数据库Pipeline随数据项写入，用于跨站点查找同一作品；
+    cluster_id 由批量聚类任务写入，为同一簇中最小的数据项ID
+    """
+    __tablename__ = "image_hashes"
+    __table_args__ = (
+        # services.image_match 按租户加载索引: WHERE tenant_id = ? AND id > ? ORDER BY id
+        Index("ix_image_hashes_tenant_id_id", "tenant_id", "id"),
+        Index("ix_image_hashes_tenant_id_cluster_id", "tenant_id", "cluster_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    scraped_item_id = Column(
+        Integer, ForeignKey("scraped_items.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    site_config_id = Column(Integer, nullable=True)
+    tenant_id = Column(String, nullable=False)
+    image_url = Column(String, nullable=True)
+    sha256 = Column(String(64), nullable=True)
+    phash = Column(String(16), nullable=False)  # 64位哈希的十六进制，见 app.utils.imagehash
+    dhash = Column(String(16), nullable=True)
+    cluster_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # 关系
+    scraped_item = relationship("ScrapedItem", back_populates="image_hashes")
+
+    def __repr__(self):
+        return f"<ImageHash(scraped_item_id={self.scraped_item_id}, phash={self.phash})>"
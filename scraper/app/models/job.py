@@ -1,7 +1,7 @@
 """
 爬虫任务模型
 """
-from sqlalchemy import Boolean, Column, Integer, String, DateTime, JSON, ForeignKey, Text
+from sqlalchemy import Boolean, Column, Integer, String, DateTime, JSON, ForeignKey, Text, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
@@ -11,19 +11,33 @@ from app.db.base_class import Base
 class Job(Base):
     """爬虫任务模型"""
     __tablename__ = "jobs"
+    __table_args__ = (
+        # services.job.get_multi: WHERE tenant_id = ? ORDER BY created_at DESC, id DESC
+        Index("ix_jobs_tenant_id_created_at_id", "tenant_id", "created_at", "id"),
+        # services.dispatch: WHERE status IN (...) GROUP BY tenant_id, queue
+        Index("ix_jobs_status_queue_tenant_id", "status", "queue", "tenant_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
     site_config_id = Column(Integer, ForeignKey("site_configs.id"))
-    status = Column(String, default="pending")  # pending, running, completed, failed, cancelled
+    status = Column(String, default="pending")  # pending, queued, dispatched, running, completed, failed, cancelled
+    queue = Column(String, nullable=True)  # 任务类型：browser, http，决定投递的Celery队列
+    queued_at = Column(DateTime(timezone=True), nullable=True)  # 进入调度队列的时间
     progress = Column(Integer, default=0)  # 0-100
     error_message = Column(Text, nullable=True)
     config = Column(JSON, default=dict)
     celery_task_id = Column(String, nullable=True)
     items_scraped = Column(Integer, default=0)
     items_saved = Column(Integer, default=0)
+    items_failed = Column(Integer, default=0)
+    shards_total = Column(Integer, default=0)  # 分片数，0表示未分片
+    shards_completed = Column(Integer, default=0)
+    stall_count = Column(Integer, default=0)  # 心跳超时后自动重新排队的次数
+    trace_context = Column(String, nullable=True)  # 启动任务的API请求的traceparent，见 app.core.tracing
     schedule_type = Column(String, default="once")  # once, daily, weekly, monthly, cron
     cron_expression = Column(String, nullable=True)
+    next_run_at = Column(DateTime(timezone=True), nullable=True, index=True)  # 周期任务的下一次运行时间
     tenant_id = Column(String, nullable=False, index=True)
     created_by_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -35,6 +49,7 @@ class Job(Base):
     site_config = relationship("SiteConfig", backref="jobs")
     created_by = relationship("User", backref="jobs")
     logs = relationship("JobLog", back_populates="job", cascade="all, delete-orphan")
+    crawl_reports = relationship("CrawlReport", back_populates="job", cascade="all, delete-orphan")
 
     def __repr__(self):
         return f"<Job {self.name} ({self.status})>" 
\ No newline at end of file
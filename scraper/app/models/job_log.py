@@ -4,7 +4,7 @@
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 from app.db.base_class import Base
@@ -15,6 +15,10 @@ class JobLog(Base):
     爬虫任务日志模型
     """
     __tablename__ = "job_logs"
+    __table_args__ = (
+        # services.job_log.get_multi: WHERE job_id = ? ORDER BY timestamp DESC
+        Index("ix_job_logs_job_id_timestamp", "job_id", "timestamp"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     job_id = Column(Integer, ForeignKey("jobs.id", ondelete="CASCADE"), nullable=False)
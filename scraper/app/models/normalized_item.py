@@ -0,0 +1,40 @@
+"""
+规范化字段模型
+"""
+from sqlalchemy import Column, Date, DateTime, Float, ForeignKey, Integer, Numeric, String, Text
+from sqlalchemy.orm import relationship
+
+from app.db.base_class import Base
+
+
+class NormalizedItem(Base):
+    """
+    数据项中原始字符串解析出的类型化字段，每个数据项一行
+
+    由爬取结束后的规范化任务批量写入，见 app.services.normalization；
+    source_updated_at 记录解析时数据项的更新时间，数据项再次更新后重新解析
+    """
+    __tablename__ = "normalized_items"
+
+    scraped_item_id = Column(Integer, ForeignKey("scraped_items.id", ondelete="CASCADE"), primary_key=True)
+    tenant_id = Column(String, nullable=False, index=True)
+    birth_year = Column(Integer, nullable=True)
+    death_year = Column(Integer, nullable=True)
+    year_start = Column(Integer, nullable=True, index=True)  # 作品创作年份，年份范围时为起止年份
+    year_end = Column(Integer, nullable=True)
+    date_start = Column(Date, nullable=True, index=True)  # 展览起止日期
+    date_end = Column(Date, nullable=True)
+    height_cm = Column(Float, nullable=True)
+    width_cm = Column(Float, nullable=True)
+    depth_cm = Column(Float, nullable=True)
+    price_amount = Column(Numeric(14, 2, asdecimal=False), nullable=True)
+    price_currency = Column(String(3), nullable=True)
+    text = Column(Text, nullable=True)  # 去除HTML后的描述或简介
+    source_updated_at = Column(DateTime(timezone=True), nullable=True)
+    normalized_at = Column(DateTime(timezone=True), nullable=True)
+
+    # 关系
+    scraped_item = relationship("ScrapedItem", back_populates="normalized")
+
+    def __repr__(self):
+        return f"<NormalizedItem(scraped_item_id={self.scraped_item_id})>"
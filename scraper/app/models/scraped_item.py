@@ -1,7 +1,7 @@
 """
 爬取的数据项模型
 """
-from sqlalchemy import Column, Integer, String, DateTime, JSON, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, JSON, ForeignKey, Text, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
@@ -11,6 +11,14 @@ from app.db.base_class import Base
 class ScrapedItem(Base):
     """爬取的数据项模型"""
     __tablename__ = "scraped_items"
+    __table_args__ = (
+        # services.scraped_item.get_multi: WHERE tenant_id = ? ORDER BY created_at DESC, id DESC
+        Index("ix_scraped_items_tenant_id_created_at_id", "tenant_id", "created_at", "id"),
+        # 同上，按任务过滤: WHERE tenant_id = ? AND job_id = ? ORDER BY created_at DESC
+        Index("ix_scraped_items_tenant_id_job_id_created_at", "tenant_id", "job_id", "created_at"),
+        # services.scraped_item.create_or_update 按 (tenant_id, url) upsert，并发写入同一URL时不产生重复行
+        Index("uq_scraped_items_tenant_id_url", "tenant_id", "url", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     url = Column(String, index=True)
@@ -27,6 +35,10 @@ class ScrapedItem(Base):
     # 关系
     job = relationship("Job", backref="scraped_items")
     site_config = relationship("SiteConfig", backref="scraped_items")
+    image_hashes = relationship("ImageHash", back_populates="scraped_item", cascade="all, delete-orphan")
+    normalized = relationship(
+        "NormalizedItem", back_populates="scraped_item", uselist=False, cascade="all, delete-orphan"
+    )
 
     def __repr__(self):
         return f"<ScrapedItem {self.page_type}: {self.title}>" 
\ No newline at end of file
@@ -4,4 +4,6 @@ Pydantic模式
 from app.schemas.user import User, UserCreate, UserUpdate, UserInDB, Token, TokenPayload
 from app.schemas.site import SiteConfig, SiteConfigCreate, SiteConfigUpdate, SiteConfigInDB
 from app.schemas.job import Job, JobCreate, JobUpdate, JobInDB, JobStatusUpdate
-from app.schemas.job_log import JobLog, JobLogCreate, JobLogUpdate 
\ No newline at end of file
+from app.schemas.job_log import JobLog, JobLogCreate, JobLogUpdate
+from app.schemas.crawl_report import CrawlReport, CrawlReportComparison
+from app.schemas.scraped_item import ScrapedItem, ScrapedItemSummary, ArtworkMatch, ArtworkMatches
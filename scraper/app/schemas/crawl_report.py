@@ -0,0 +1,42 @@
+"""
+爬取报告的Pydantic模式
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+
+
+class CrawlReport(BaseModel):
+    """爬取报告，附带由计数计算出的指标"""
+    id: int
+    job_id: int
+    site_config_id: int
+    finish_reason: Optional[str] = None
+    resumed: bool = False
+    partial: bool = False
+    elapsed_seconds: float
+    requests: int
+    responses: int
+    response_bytes: int
+    errors: int
+    retries: int
+    items_scraped: int
+    items_dropped: int
+    items_saved: int
+    items_failed: int
+    created_at: Optional[datetime] = None
+    metrics: Dict[str, Optional[float]]
+
+    class Config:
+        from_attributes = True
+
+
+class CrawlReportComparison(BaseModel):
+    """与同一站点之前运行的比较"""
+    report: CrawlReport
+    baseline: Dict[str, Optional[float]]  # 之前运行各指标的中位数
+    change: Dict[str, Optional[float]]  # 相对基线的变化比例
+    regressions: List[str]
+    previous: List[CrawlReport]
+    stats: Optional[Dict[str, Any]] = None
@@ -29,10 +29,15 @@ class JobUpdate(JobBase):
     """更新任务的请求模式"""
     celery_task_id: Optional[str] = None
     status: Optional[str] = None
+    queue: Optional[str] = None
+    queued_at: Optional[datetime] = None
     progress: Optional[int] = None
     error_message: Optional[str] = None
     items_scraped: Optional[int] = None
     items_saved: Optional[int] = None
+    items_failed: Optional[int] = None
+    shards_total: Optional[int] = None
+    shards_completed: Optional[int] = None
     started_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
 
@@ -44,6 +49,7 @@ class JobStatusUpdate(BaseModel):
     error_message: Optional[str] = None
     items_scraped: Optional[int] = None
     items_saved: Optional[int] = None
+    items_failed: Optional[int] = None
     started_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
 
@@ -52,12 +58,19 @@ class JobInDBBase(JobBase):
     """数据库中的任务模式基类"""
     id: int
     status: str
+    queue: Optional[str] = None
+    queued_at: Optional[datetime] = None
     progress: int
     error_message: Optional[str] = None
     config: Dict[str, Any]
     celery_task_id: Optional[str] = None
     items_scraped: int
     items_saved: int
+    items_failed: int = 0
+    shards_total: int = 0
+    shards_completed: int = 0
+    stall_count: int = 0
+    next_run_at: Optional[datetime] = None
     tenant_id: str
     created_by_id: Optional[int] = None
     created_at: datetime
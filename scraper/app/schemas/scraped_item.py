@@ -0,0 +1,45 @@
+"""
+爬取数据项相关的Pydantic模式
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+
+
+class ScrapedItemSummary(BaseModel):
+    """列表视图中的数据项模式，不包含 content 和 data 大字段"""
+    id: int
+    url: Optional[str] = None
+    title: Optional[str] = None
+    page_type: Optional[str] = None
+    job_id: Optional[int] = None
+    site_config_id: Optional[int] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class ScrapedItem(ScrapedItemSummary):
+    """详情视图中的数据项模式，包含完整内容"""
+    tenant_id: str
+    content: Optional[str] = None
+    data: Optional[Dict[str, Any]] = None
+
+
+class ArtworkMatch(BaseModel):
+    """图片近似的数据项"""
+    item: ScrapedItemSummary
+    distance: int  # pHash汉明距离
+    dhash_distance: Optional[int] = None
+    image_url: Optional[str] = None  # 查询数据项中匹配的图片
+    matched_image_url: Optional[str] = None
+
+
+class ArtworkMatches(BaseModel):
+    """数据项的图片匹配结果"""
+    item_id: int
+    cluster_id: Optional[int] = None  # 最近一次批量聚类得到的簇
+    matches: List[ArtworkMatch]
@@ -95,12 +95,17 @@ class BaseSpider(CrawlSpider):
                     callback='parse_item',
                     follow=False
                 ),
-                # Extract next page links and follow
-                Rule(
-                    LinkExtractor(restrict_xpaths=self.next_page_xpath),
-                    follow=True
-                ),
             )
+            # Extract next page links and follow (an empty XPath would follow every link)
+            if self.next_page_xpath:
+                self.rules += (
+                    Rule(
+                        LinkExtractor(restrict_xpaths=self.next_page_xpath),
+                        follow=True
+                    ),
+                )
+            # CrawlSpider compiles rules in __init__, before they are set here
+            self._compile_rules()
     
     def start_requests(self):
         """
@@ -0,0 +1,342 @@
+"""
+爬取检查点模块
+
+任务的爬取状态保存在按任务划分的Scrapy JOBDIR中：磁盘请求队列、去重指纹
+（requests.seen）和 spider.state。爬取期间 CrawlCheckpoint 扩展定期把JOBDIR保存为
+快照，同时记录累计的统计计数和正在下载的请求；爬虫关闭时再保存一次。
+
+去重指纹和FIFO磁盘队列的数据块只追加、不改写，快照中以硬链接保存并记录当时的大小，
+恢复时只复制该长度；其余小文件直接复制。reactor线程中只需刷新文件和创建链接，
+替换旧快照在线程池中完成，快照耗时与请求数无关。
+
+爬取开始时先用快照覆盖JOBDIR：Celery重试或worker重启后从最近的快照继续爬取，
+不再从起始地址重新抓取。快照之后才处理的请求会重新下载一次，数据写入是幂等的。
+任务结束（完成、失败或取消）后检查点被删除，任务下一次运行重新开始。
+"""
+import json
+import logging
+import os
+import pickle
+import re
+import shutil
+from typing import Any, Dict, List, Optional, Tuple
+
+from scrapy.core.scheduler import Scheduler
+from scrapy.utils.misc import build_from_crawler
+from scrapy.utils.job import job_dir
+
+from app.core.config import settings as app_settings
+
+logger = logging.getLogger(__name__)
+
+# 快照中记录统计计数和正在下载的请求的文件
+STATS_FILE = "checkpoint_stats.json"
+INFLIGHT_FILE = "checkpoint_inflight.pickle"
+# 快照中硬链接文件的有效长度
+MANIFEST_FILE = "checkpoint_manifest.json"
+# 只追加不改写的文件：去重指纹和FIFO磁盘队列的数据块
+APPEND_ONLY_FILE = re.compile(r"^(requests\.seen|q\d{5})$")
+# 恢复时累加回统计中的计数，数据库Pipeline的计数据此恢复
+CUMULATIVE_STATS = (
+    "item_scraped_count",
+    "item_dropped_count",
+    "response_received_count",
+    "downloader/request_count",
+    "downloader/response_count",
+    "downloader/response_bytes",
+    "downloader/exception_count",
+    "retry/count",
+    "database/items_saved",
+    "database/items_failed",
+)
+
+
+def checkpoint_dir(job_id: int) -> str:
+    """
+    获取任务的检查点目录
+
+    Args:
+        job_id: 任务ID
+
+    Returns:
+        str: 检查点目录
+    """
+    return os.path.join(app_settings.CRAWL_CHECKPOINT_DIR, f"job_{job_id}")
+
+
+def checkpoint_settings(job_id: int, shard_index: Optional[int] = None) -> Dict[str, object]:
+    """
+    启用检查点的Scrapy设置
+
+    Args:
+        job_id: 任务ID
+        shard_index: 分片序号，分片任务的每个分片使用单独的检查点
+
+    Returns:
+        Dict[str, object]: Scrapy设置
+    """
+    base = checkpoint_dir(job_id)
+    if shard_index is not None:
+        base = os.path.join(base, f"shard_{shard_index}")
+    return {
+        "JOBDIR": os.path.join(base, "live"),
+        "SCHEDULER": "app.scrapers.checkpoint.CheckpointScheduler",
+        # FIFO磁盘队列只追加数据块，快照可以硬链接；LIFO队列出队时截断文件，只能整体复制
+        "SCHEDULER_DISK_QUEUE": "scrapy.squeues.PickleFifoDiskQueue",
+        "CHECKPOINT_ENABLED": True,
+    }
+
+
+def _snapshot_path(jobdir: str) -> str:
+    """
+    获取JOBDIR对应的快照目录
+    """
+    return os.path.join(os.path.dirname(jobdir), "snapshot")
+
+
+def prepare_snapshot(jobdir: str) -> None:
+    """
+    把JOBDIR的当前状态写入临时快照目录
+
+    需在JOBDIR不变时调用（reactor线程中，调度器刷新之后）。只追加的文件创建硬链接并记录
+    当前大小，之后的追加不影响快照；其余文件复制
+
+    Args:
+        jobdir: Scrapy JOBDIR
+    """
+    tmp = f"{_snapshot_path(jobdir)}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    sizes = {}
+    for root, _, files in os.walk(jobdir):
+        target_dir = os.path.join(tmp, os.path.relpath(root, jobdir))
+        os.makedirs(target_dir, exist_ok=True)
+        for name in files:
+            source = os.path.join(root, name)
+            target = os.path.join(target_dir, name)
+            if APPEND_ONLY_FILE.match(name):
+                try:
+                    os.link(source, target)
+                    sizes[os.path.relpath(source, jobdir)] = os.path.getsize(source)
+                    continue
+                except OSError:
+                    # 文件系统不支持硬链接
+                    pass
+            shutil.copy2(source, target)
+    with open(os.path.join(tmp, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(sizes, f)
+
+
+def commit_snapshot(jobdir: str) -> None:
+    """
+    用临时快照替换旧快照，不访问JOBDIR，可以在线程池中执行
+
+    替换过程中进程退出时旧快照仍然可用
+
+    Args:
+        jobdir: Scrapy JOBDIR
+    """
+    snapshot = _snapshot_path(jobdir)
+    old = f"{snapshot}.old"
+    if os.path.exists(snapshot):
+        shutil.rmtree(old, ignore_errors=True)
+        os.rename(snapshot, old)
+    os.rename(f"{snapshot}.tmp", snapshot)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def save_snapshot(jobdir: str) -> None:
+    """
+    同步保存快照
+
+    Args:
+        jobdir: Scrapy JOBDIR
+    """
+    prepare_snapshot(jobdir)
+    commit_snapshot(jobdir)
+
+
+def _copy_prefix(source: str, target: str, size: int) -> None:
+    """
+    复制文件的前 size 个字节
+    """
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        while size > 0:
+            chunk = src.read(min(size, 1 << 20))
+            if not chunk:
+                break
+            dst.write(chunk)
+            size -= len(chunk)
+
+
+def restore_snapshot(jobdir: str) -> bool:
+    """
+    用快照覆盖JOBDIR；没有快照时清空JOBDIR，上次运行在第一次保存快照前中断时重新开始
+
+    Args:
+        jobdir: Scrapy JOBDIR
+
+    Returns:
+        bool: 是否从快照恢复
+    """
+    snapshot = _snapshot_path(jobdir)
+    if not os.path.exists(snapshot) and os.path.exists(f"{snapshot}.old"):
+        # 替换快照的过程中进程退出
+        os.rename(f"{snapshot}.old", snapshot)
+    shutil.rmtree(jobdir, ignore_errors=True)
+    if not os.path.exists(snapshot):
+        os.makedirs(jobdir, exist_ok=True)
+        return False
+
+    try:
+        with open(os.path.join(snapshot, MANIFEST_FILE), encoding="utf-8") as f:
+            sizes = json.load(f)
+    except (OSError, ValueError):
+        sizes = {}
+    for root, _, files in os.walk(snapshot):
+        relative_dir = os.path.relpath(root, snapshot)
+        os.makedirs(os.path.join(jobdir, relative_dir), exist_ok=True)
+        for name in files:
+            relative = os.path.normpath(os.path.join(relative_dir, name))
+            if relative == MANIFEST_FILE:
+                continue
+            source, target = os.path.join(root, name), os.path.join(jobdir, relative)
+            if relative in sizes:
+                # 硬链接的文件在快照之后可能还被追加过
+                _copy_prefix(source, target, sizes[relative])
+            else:
+                shutil.copy2(source, target)
+    return True
+
+
+def load_stats(job_id: int) -> Dict[str, int]:
+    """
+    读取任务检查点中累计的统计计数
+
+    Args:
+        job_id: 任务ID
+
+    Returns:
+        Dict[str, int]: 统计计数，没有检查点时返回空字典
+    """
+    path = os.path.join(checkpoint_dir(job_id), "snapshot", STATS_FILE)
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def remove_checkpoint(job_id: int) -> None:
+    """
+    删除任务的检查点
+
+    Args:
+        job_id: 任务ID
+    """
+    shutil.rmtree(checkpoint_dir(job_id), ignore_errors=True)
+
+
+def list_checkpoints() -> List[int]:
+    """
+    列出存在检查点的任务ID
+
+    Returns:
+        List[int]: 任务ID列表
+    """
+    if not os.path.isdir(app_settings.CRAWL_CHECKPOINT_DIR):
+        return []
+    job_ids = []
+    for name in os.listdir(app_settings.CRAWL_CHECKPOINT_DIR):
+        prefix, _, job_id = name.partition("_")
+        if prefix == "job" and job_id.isdigit():
+            job_ids.append(int(job_id))
+    return job_ids
+
+
+def write_state(jobdir: str, spider, stats: Dict[str, Any], inflight: List[Dict[str, Any]]) -> None:
+    """
+    把 spider.state、累计统计和正在下载的请求写入JOBDIR
+
+    Args:
+        jobdir: Scrapy JOBDIR
+        spider: 爬虫
+        stats: Scrapy统计信息
+        inflight: 正在下载的请求（Request.to_dict 的结果）
+    """
+    if hasattr(spider, "state"):
+        # 与 scrapy.extensions.spiderstate.SpiderState 的格式相同
+        with open(os.path.join(jobdir, "spider.state"), "wb") as f:
+            pickle.dump(spider.state, f, protocol=4)
+    with open(os.path.join(jobdir, STATS_FILE), "w", encoding="utf-8") as f:
+        json.dump({key: stats[key] for key in CUMULATIVE_STATS if key in stats}, f)
+    with open(os.path.join(jobdir, INFLIGHT_FILE), "wb") as f:
+        pickle.dump(inflight, f, protocol=4)
+
+
+def read_state(jobdir: str) -> Tuple[Dict[str, int], List[Dict[str, Any]]]:
+    """
+    读取JOBDIR中的累计统计和正在下载的请求
+
+    Args:
+        jobdir: Scrapy JOBDIR
+
+    Returns:
+        Tuple[Dict[str, int], List[Dict[str, Any]]]: 统计计数和请求列表
+    """
+    stats, inflight = {}, []
+    try:
+        with open(os.path.join(jobdir, STATS_FILE), encoding="utf-8") as f:
+            stats = json.load(f)
+        with open(os.path.join(jobdir, INFLIGHT_FILE), "rb") as f:
+            inflight = pickle.load(f)
+    except (OSError, ValueError, pickle.UnpicklingError):
+        pass
+    return stats, inflight
+
+
+class CheckpointScheduler(Scheduler):
+    """
+    支持检查点的Scrapy调度器
+
+    通过 checkpoint_settings() 启用。打开前用快照覆盖JOBDIR；checkpoint() 把磁盘队列
+    和去重指纹完整写入JOBDIR后继续使用，供 CrawlCheckpoint 扩展复制快照。
+    """
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """
+        从爬虫创建调度器；去重器创建时即读取指纹文件，需先恢复快照
+
+        Args:
+            crawler: 爬虫
+
+        Returns:
+            CheckpointScheduler: 调度器实例
+        """
+        jobdir = job_dir(crawler.settings)
+        if jobdir and restore_snapshot(jobdir):
+            logger.info(f"从检查点恢复爬取: {jobdir}")
+            crawler.stats.set_value("checkpoint/resumed", True)
+        return super().from_crawler(crawler)
+
+    def checkpoint(self) -> None:
+        """
+        把磁盘队列和去重指纹写入JOBDIR
+
+        关闭磁盘队列会写入队列的索引信息，之后按相同参数重新打开；整个过程在reactor
+        线程中同步完成，期间不会有请求进出队列
+        """
+        if self.dqs is not None:
+            state = self.dqs.close()
+            self._write_dqs_state(self.dqdir, state)
+            self.dqs = build_from_crawler(
+                self.pqclass,
+                self.crawler,
+                downstream_queue_cls=self.dqclass,
+                key=self.dqdir,
+                startprios=state,
+                start_queue_cls=self._sdqclass,
+            )
+        file = getattr(self.df, "file", None)
+        if file is not None:
+            file.flush()
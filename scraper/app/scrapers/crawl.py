@@ -0,0 +1,250 @@
+"""
+爬取运行模块
+
+Celery任务通过这里启动爬取：加载 app.scrapers.settings 中的项目设置，按站点配置
+选择爬虫类，运行到结束后返回Scrapy统计信息。
+
+Twisted reactor在一个进程中只能启动一次，而Celery worker进程会连续执行多个任务，
+因此任务通过 run_crawl_process 在独立的子进程中运行每次爬取。
+
+任务取消时子进程中的 JobCancellation 扩展会主动关闭爬虫；子进程超过
+CRAWL_CANCEL_GRACE 秒仍未退出时由父进程强制结束。
+"""
+import argparse
+import ctypes
+import json
+import logging
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, Optional
+
+from scrapy.crawler import CrawlerProcess
+from scrapy.settings import Settings
+
+from app.core import tracing
+from app.core.config import settings as app_settings
+from app.models.site import SiteConfig
+from app.scrapers.spider_factory import SpiderFactory
+from app.utils.logger import get_job_logger
+
+logger = logging.getLogger(__name__)
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+# 父进程检查任务是否取消的间隔（秒）
+CANCEL_POLL_INTERVAL = 2.0
+
+
+class CrawlCancelled(Exception):
+    """
+    爬取因任务取消而结束
+    """
+
+
+def _die_with_parent() -> None:
+    """
+    子进程在父进程退出时收到SIGKILL，Celery任务被强制终止后不会遗留爬取进程（仅Linux）
+    """
+    try:
+        ctypes.CDLL("libc.so.6", use_errno=True).prctl(1, signal.SIGKILL)  # PR_SET_PDEATHSIG
+    except (OSError, AttributeError):
+        pass
+
+
+def get_crawl_settings(overrides: Optional[Dict[str, Any]] = None) -> Settings:
+    """
+    获取爬取使用的Scrapy设置
+
+    Args:
+        overrides: 覆盖项目设置的值
+
+    Returns:
+        Settings: Scrapy设置
+    """
+    settings = Settings()
+    settings.setmodule("app.scrapers.settings", priority="project")
+    if overrides:
+        settings.update(overrides, priority="cmdline")
+    return settings
+
+
+def run_crawl(
+    site_config: SiteConfig,
+    job_id: int,
+    settings_overrides: Optional[Dict[str, Any]] = None,
+    spider_kwargs: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    在当前进程中运行一次爬取，阻塞到爬取结束
+
+    Args:
+        site_config: 站点配置
+        job_id: 任务ID
+        settings_overrides: 覆盖项目设置的值
+        spider_kwargs: 额外的爬虫参数，例如分片的 start_urls
+
+    Returns:
+        Dict[str, Any]: Scrapy统计信息
+    """
+    # 不设为当前span：process.crawl 中创建的reactor任务会继承当前上下文，爬取期间的span应挂在 crawl.process 下
+    span = tracing.get_tracer().start_span("spider.create")
+    try:
+        spider_class = SpiderFactory._get_spider_class(site_config, job_id)
+        span.set_attribute("spider.class", spider_class.__name__)
+        process = CrawlerProcess(get_crawl_settings(settings_overrides))
+        crawler = process.create_crawler(spider_class)
+        # 爬虫实例和引擎组件在这里同步创建
+        process.crawl(
+            crawler,
+            site_config=site_config,
+            job_id=job_id,
+            _job_logger=get_job_logger(job_id),
+            **(spider_kwargs or {}),
+        )
+    finally:
+        span.end()
+    process.start()
+    return crawler.stats.get_stats()
+
+
+def run_crawl_process(
+    job_id: int,
+    settings_overrides: Optional[Dict[str, Any]] = None,
+    spider_kwargs: Optional[Dict[str, Any]] = None,
+    should_cancel: Optional[Callable[[], bool]] = None,
+) -> Dict[str, Any]:
+    """
+    在子进程中运行任务的一次爬取，阻塞到爬取结束
+
+    Args:
+        job_id: 任务ID
+        settings_overrides: 覆盖项目设置的值，需可JSON序列化
+        spider_kwargs: 额外的爬虫参数，需可JSON序列化
+        should_cancel: 返回任务是否已取消的函数，每 CANCEL_POLL_INTERVAL 秒调用一次
+
+    Returns:
+        Dict[str, Any]: Scrapy统计信息（时间类型的值为字符串）
+
+    Raises:
+        CrawlCancelled: 任务已取消
+        RuntimeError: 子进程异常退出或被中断
+    """
+    fd, stats_file = tempfile.mkstemp(prefix=f"crawl_{job_id}_", suffix=".json")
+    os.close(fd)
+    command = [
+        sys.executable, "-m", "app.scrapers.crawl",
+        "--job-id", str(job_id),
+        "--settings", json.dumps(settings_overrides or {}),
+        "--spider-kwargs", json.dumps(spider_kwargs or {}),
+        "--stats-file", stats_file,
+    ]
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [PROJECT_DIR, env.get("PYTHONPATH")]))
+    env.pop(tracing.TRACEPARENT_ENV, None)
+    traceparent = tracing.current_traceparent()
+    if traceparent:
+        env[tracing.TRACEPARENT_ENV] = traceparent
+    try:
+        # 子进程的日志直接输出到worker的标准输出/错误
+        process = subprocess.Popen(
+            command,
+            env=env,
+            preexec_fn=_die_with_parent if sys.platform.startswith("linux") else None,
+        )
+        cancelled_at = None
+        while True:
+            try:
+                returncode = process.wait(timeout=CANCEL_POLL_INTERVAL)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+            if cancelled_at is None:
+                if should_cancel is not None and should_cancel():
+                    cancelled_at = time.monotonic()
+            elif time.monotonic() - cancelled_at > app_settings.CRAWL_CANCEL_GRACE:
+                logger.warning(f"任务 {job_id} 已取消，爬取进程未及时退出，强制结束")
+                process.kill()
+
+        if app_settings.METRICS_ENABLED:
+            from app.core import metrics
+
+            metrics.process_exited(process.pid)
+        if cancelled_at is not None:
+            raise CrawlCancelled(f"任务 {job_id} 已取消")
+        if returncode != 0:
+            raise RuntimeError(f"爬取进程异常退出，退出码 {returncode}")
+        with open(stats_file, encoding="utf-8") as f:
+            stats = json.load(f)
+        if stats.get("finish_reason") == "cancelled":
+            raise CrawlCancelled(f"任务 {job_id} 已取消")
+        if stats.get("finish_reason") == "shutdown":
+            # 爬取进程收到终止信号后正常退出，爬取并未完成，由任务重试从检查点继续
+            raise RuntimeError("爬取进程被中断")
+        if stats.get("finish_reason") == "memory_limit":
+            # MemoryWatch 在内存超过上限时关闭爬虫，重试时在新进程中从检查点继续
+            raise RuntimeError("爬取进程内存超过上限")
+        return stats
+    finally:
+        os.remove(stats_file)
+
+
+def main(argv=None) -> None:
+    """
+    子进程入口：按任务ID加载站点配置并运行爬取，统计信息写入文件
+    """
+    parser = argparse.ArgumentParser(description="运行任务的一次爬取")
+    parser.add_argument("--job-id", type=int, required=True, help="任务ID")
+    parser.add_argument("--settings", default="{}", help="覆盖项目设置的JSON")
+    parser.add_argument("--spider-kwargs", default="{}", help="额外爬虫参数的JSON")
+    parser.add_argument("--stats-file", required=True, help="统计信息输出文件")
+    args = parser.parse_args(argv)
+
+    from app import services
+    from app.db.database import SessionLocal
+    from app.scrapers import profiling
+
+    # 站点配置随任务一起加载，关闭会话后仍可读取，爬取期间不占用数据库连接
+    db = SessionLocal()
+    try:
+        job = services.job.get(db, job_id=args.job_id)
+        site_config = job.site_config if job else None
+        config = (job.config or {}) if job else {}
+    finally:
+        db.close()
+    if site_config is None:
+        raise SystemExit(f"任务或站点配置不存在: {args.job_id}")
+
+    settings_overrides = json.loads(args.settings)
+    if config.get("tracemalloc"):
+        settings_overrides["MEMWATCH_TRACEMALLOC"] = True
+    if config.get("images"):
+        settings_overrides["IMAGES_ENABLED"] = True
+
+    def crawl():
+        return run_crawl(
+            site_config,
+            args.job_id,
+            settings_overrides,
+            json.loads(args.spider_kwargs),
+        )
+
+    tracing.setup("aida-crawl")
+    modes = profiling.profile_modes(config.get("profile"))
+    with tracing.get_tracer().start_as_current_span(
+        "crawl.process",
+        context=tracing.extract(os.environ.get(tracing.TRACEPARENT_ENV)),
+        attributes={"job.id": args.job_id, "process.pid": os.getpid()},
+    ) as span:
+        stats = profiling.run_profiled(args.job_id, modes, crawl) if modes else crawl()
+        span.set_attribute("crawl.finish_reason", str(stats.get("finish_reason")))
+    tracing.flush()
+
+    with open(args.stats_file, "w", encoding="utf-8") as f:
+        json.dump(stats, f, default=str)
+
+
+if __name__ == "__main__":
+    main()
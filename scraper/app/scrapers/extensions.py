@@ -0,0 +1,905 @@
+"""
+Scrapy扩展
+"""
+import linecache
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+from collections import deque
+
+from opentelemetry.trace import StatusCode
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.defer import deferred_from_coro, maybe_deferred_to_future
+from scrapy.utils.httpobj import urlparse_cached
+from scrapy.utils.job import job_dir
+from scrapy.utils.request import request_from_dict
+from twisted.internet.task import LoopingCall
+from twisted.internet.threads import deferToThread
+
+from app import services
+from app.core import heartbeat, tracing
+from app.scrapers import checkpoint, profiling
+from app.scrapers.handlers import PlaywrightDownloadHandler
+from app.core.config import settings as app_settings
+from app.db.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class JobHeartbeat:
+    """
+    爬取期间定期写入任务心跳
+
+    心跳由reactor定时触发、在线程中写入Redis：reactor被阻塞或进程退出时心跳随之停止，
+    清理任务据此发现已停止的爬取。
+    """
+
+    def __init__(self, crawler, client, interval: float):
+        """
+        初始化扩展
+
+        Args:
+            crawler: 爬虫
+            client: Redis客户端
+            interval: 写入心跳的间隔（秒）
+        """
+        self.crawler = crawler
+        self.client = client
+        self.interval = interval
+        self.job_id = None
+        self.task = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """
+        从爬虫创建扩展
+
+        Args:
+            crawler: 爬虫
+
+        Returns:
+            JobHeartbeat: 扩展实例
+        """
+        if not crawler.settings.getbool("JOB_HEARTBEAT_ENABLED"):
+            raise NotConfigured
+        try:
+            client = heartbeat.get_client()
+            client.ping()
+        except Exception as e:
+            logger.warning(f"无法连接Redis，不写入任务心跳: {e}")
+            raise NotConfigured
+        extension = cls(crawler, client, app_settings.HEARTBEAT_INTERVAL)
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def spider_opened(self, spider):
+        """
+        爬虫开始时启动心跳
+
+        Args:
+            spider: 爬虫
+        """
+        self.job_id = getattr(spider, "job_id", None)
+        if self.job_id is None:
+            return
+        self.task = LoopingCall(self.beat)
+        self.task.start(self.interval, now=True)
+
+    def beat(self):
+        """
+        写入一次心跳
+        """
+        d = deferToThread(heartbeat.beat, self.job_id, self.client)
+        d.addErrback(lambda failure: logger.warning(f"写入任务心跳失败: {failure.value}"))
+        return d
+
+    def spider_closed(self, spider):
+        """
+        爬虫结束时停止心跳；心跳记录由任务结束时移除，同一任务的其他worker可能仍在运行
+
+        Args:
+            spider: 爬虫
+        """
+        if self.task and self.task.running:
+            self.task.stop()
+
+
+class JobCancellation:
+    """
+    定期检查任务是否已取消，取消后关闭浏览器上下文并关闭爬虫
+
+    任务状态在线程中查询，不阻塞reactor；任务被删除时同样视为取消。
+    """
+
+    def __init__(self, crawler, interval: float):
+        """
+        初始化扩展
+
+        Args:
+            crawler: 爬虫
+            interval: 检查间隔（秒）
+        """
+        self.crawler = crawler
+        self.interval = interval
+        self.job_id = None
+        self.task = None
+        self.cancelled = False
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """
+        从爬虫创建扩展
+
+        Args:
+            crawler: 爬虫
+
+        Returns:
+            JobCancellation: 扩展实例
+        """
+        if not crawler.settings.getbool("JOB_CANCEL_ENABLED"):
+            raise NotConfigured
+        extension = cls(crawler, crawler.settings.getfloat("JOB_CANCEL_POLL_INTERVAL", 2.0))
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def spider_opened(self, spider):
+        """
+        爬虫开始时启动检查
+
+        Args:
+            spider: 爬虫
+        """
+        self.job_id = getattr(spider, "job_id", None)
+        if self.job_id is None:
+            return
+        self.task = LoopingCall(self.check)
+        self.task.start(self.interval, now=False)
+
+    def check(self):
+        """
+        检查一次任务状态
+        """
+        d = deferToThread(self._is_cancelled)
+        d.addCallback(self._on_checked)
+        d.addErrback(lambda failure: logger.warning(f"检查任务状态失败: {failure.value}"))
+        return d
+
+    def _is_cancelled(self) -> bool:
+        """
+        查询任务是否已取消或已删除
+
+        Returns:
+            bool: 是否已取消
+        """
+        db = SessionLocal()
+        try:
+            return services.job.get_status(db, job_id=self.job_id) in (None, "cancelled")
+        finally:
+            db.close()
+
+    def _on_checked(self, cancelled: bool):
+        """
+        任务已取消时停止检查并关闭爬虫
+
+        Args:
+            cancelled: 是否已取消
+        """
+        if not cancelled or self.cancelled:
+            return None
+        self.cancelled = True
+        if self.task.running:
+            self.task.stop()
+        logger.info(f"任务 {self.job_id} 已取消，正在关闭爬虫")
+        self.crawler.stats.set_value("job/cancelled", True)
+        return deferred_from_coro(self._close())
+
+    async def _close(self):
+        """
+        关闭浏览器上下文后关闭爬虫：进行中的页面请求随上下文关闭立即失败，
+        爬虫无需等待页面加载完成
+        """
+        handler = PlaywrightDownloadHandler.for_crawler(self.crawler)
+        if handler is not None:
+            try:
+                await handler.close_contexts()
+            except Exception as e:
+                # scrapy-playwright内部结构变化时不影响关闭爬虫，页面请求会在超时后结束
+                logger.warning(f"关闭浏览器上下文失败: {e}")
+        await self.crawler.engine.close_spider_async(reason="cancelled")
+
+    def spider_closed(self, spider):
+        """
+        爬虫结束时停止检查
+
+        Args:
+            spider: 爬虫
+        """
+        if self.task and self.task.running:
+            self.task.stop()
+
+
+class CrawlCheckpoint:
+    """
+    定期保存爬取检查点，恢复爬取时补回统计计数和上次正在下载的请求
+
+    通过 app.scrapers.checkpoint.checkpoint_settings() 启用，需配合 CheckpointScheduler。
+    reactor线程中只刷新调度器、写入状态文件并为只追加的文件创建硬链接，此时调度器和去重器的
+    状态不会变化；替换旧快照在线程池中完成，上一次快照尚未完成时跳过本次保存。
+    """
+
+    def __init__(self, crawler, jobdir: str, interval: float):
+        """
+        初始化扩展
+
+        Args:
+            crawler: 爬虫
+            jobdir: Scrapy JOBDIR
+            interval: 保存快照的间隔（秒）
+        """
+        self.crawler = crawler
+        self.jobdir = jobdir
+        self.interval = interval
+        self.task = None
+        # 正在线程池中替换快照
+        self.pending = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """
+        从爬虫创建扩展
+
+        Args:
+            crawler: 爬虫
+
+        Returns:
+            CrawlCheckpoint: 扩展实例
+        """
+        jobdir = job_dir(crawler.settings)
+        if not crawler.settings.getbool("CHECKPOINT_ENABLED") or not jobdir:
+            raise NotConfigured
+        extension = cls(crawler, jobdir, crawler.settings.getfloat("CHECKPOINT_INTERVAL", 60))
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def spider_opened(self, spider):
+        """
+        爬虫开始时恢复统计计数、重新调度上次正在下载的请求，并开始定期保存快照
+
+        Args:
+            spider: 爬虫
+        """
+        stats, inflight = checkpoint.read_state(self.jobdir)
+        for key, value in stats.items():
+            self.crawler.stats.inc_value(key, value)
+        for data in inflight:
+            # 这些请求的指纹已记录在去重文件中
+            request = request_from_dict(data, spider=spider).replace(dont_filter=True)
+            self.crawler.engine.crawl(request)
+        if inflight:
+            logger.info(f"重新调度上次中断时正在下载的 {len(inflight)} 个请求")
+
+        self.task = LoopingCall(self.save)
+        self.task.start(self.interval, now=False)
+
+    def save(self):
+        """
+        保存一次快照
+        """
+        if self.pending is not None:
+            self.crawler.stats.inc_value("checkpoint/skipped")
+            return
+        slot = getattr(self.crawler.engine, "_slot", None)
+        if slot is None or not hasattr(slot.scheduler, "checkpoint"):
+            return
+        try:
+            slot.scheduler.checkpoint()
+            inflight = []
+            for request in slot.inprogress:
+                try:
+                    inflight.append(request.to_dict(spider=self.crawler.spider))
+                except ValueError:
+                    # 回调不是爬虫方法的请求无法序列化，与Scrapy磁盘队列的处理相同
+                    self.crawler.stats.inc_value("checkpoint/unserializable")
+            checkpoint.write_state(self.jobdir, self.crawler.spider, self.crawler.stats.get_stats(), inflight)
+            checkpoint.prepare_snapshot(self.jobdir)
+        except Exception as e:
+            logger.warning(f"保存爬取检查点失败: {e}")
+            return
+        self.pending = deferToThread(checkpoint.commit_snapshot, self.jobdir)
+        self.pending.addCallbacks(self._saved, self._save_failed)
+
+    def _saved(self, result):
+        """
+        快照替换完成
+        """
+        self.pending = None
+        self.crawler.stats.inc_value("checkpoint/saved")
+
+    def _save_failed(self, failure):
+        """
+        快照替换失败，下一次继续保存
+        """
+        self.pending = None
+        logger.warning(f"保存爬取检查点失败: {failure.value}")
+
+    async def spider_closed(self, spider, reason):
+        """
+        爬虫结束时保存最终快照：调度器已把剩余请求写入JOBDIR，SpiderState已写入 spider.state
+
+        Args:
+            spider: 爬虫
+            reason: 关闭原因
+        """
+        if self.task and self.task.running:
+            self.task.stop()
+        if self.pending is not None:
+            # 等待上一次快照替换完成，避免两次替换同时进行
+            await maybe_deferred_to_future(self.pending)
+        try:
+            checkpoint.write_state(self.jobdir, spider, self.crawler.stats.get_stats(), [])
+            checkpoint.save_snapshot(self.jobdir)
+        except Exception as e:
+            logger.warning(f"保存爬取检查点失败: {e}")
+
+
+class CrawlMetrics:
+    """
+    把爬取过程记录为Prometheus指标，由worker的 /metrics 汇总导出
+
+    应用配置 METRICS_ENABLED 关闭时不加载，爬取没有任何额外开销。指标定义见
+    app.core.metrics，按任务ID和域名区分。
+    """
+
+    def __init__(self, crawler, metrics, interval: float):
+        """
+        初始化扩展
+
+        Args:
+            crawler: 爬虫
+            metrics: app.core.metrics 模块
+            interval: 采样调度队列长度的间隔（秒）
+        """
+        self.crawler = crawler
+        self.metrics = metrics
+        self.interval = interval
+        self.job_id = ""
+        self.task = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """
+        从爬虫创建扩展
+
+        Args:
+            crawler: 爬虫
+
+        Returns:
+            CrawlMetrics: 扩展实例
+        """
+        if not app_settings.METRICS_ENABLED:
+            raise NotConfigured
+        from app.core import metrics
+
+        extension = cls(crawler, metrics, crawler.settings.getfloat("METRICS_QUEUE_INTERVAL", 5.0))
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(extension.request_reached_downloader, signal=signals.request_reached_downloader)
+        crawler.signals.connect(extension.response_received, signal=signals.response_received)
+        crawler.signals.connect(extension.item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(extension.item_dropped, signal=signals.item_dropped)
+        crawler.signals.connect(extension.item_error, signal=signals.item_error)
+        return extension
+
+    def spider_opened(self, spider):
+        """
+        爬虫开始时开始采样调度队列长度
+
+        Args:
+            spider: 爬虫
+        """
+        self.job_id = str(getattr(spider, "job_id", None) or "")
+        self.task = LoopingCall(self.sample_queue)
+        self.task.start(self.interval, now=True)
+
+    def sample_queue(self):
+        """
+        记录调度器中等待的请求数和正在处理的请求数
+        """
+        slot = getattr(self.crawler.engine, "_slot", None)
+        if slot is None:
+            return
+        try:
+            self.metrics.QUEUE_DEPTH.labels(self.job_id).set(len(slot.scheduler))
+        except Exception as e:
+            logger.debug(f"读取调度队列长度失败: {e}")
+        self.metrics.IN_PROGRESS.labels(self.job_id).set(len(slot.inprogress))
+
+    def request_reached_downloader(self, request, spider):
+        """
+        记录发送的请求
+        """
+        self.metrics.REQUESTS.labels(self.job_id, urlparse_cached(request).netloc).inc()
+
+    def response_received(self, response, request, spider):
+        """
+        记录响应状态、字节数和下载耗时；Playwright渲染的页面单独记录渲染耗时
+        """
+        domain = urlparse_cached(request).netloc
+        self.metrics.RESPONSES.labels(self.job_id, domain, str(response.status)).inc()
+        self.metrics.RESPONSE_BYTES.labels(self.job_id, domain).inc(len(response.body))
+        latency = request.meta.get("download_latency")
+        if latency is None:
+            # 来自HTTP缓存的响应
+            return
+        if request.meta.get("playwright"):
+            self.metrics.PLAYWRIGHT_RENDER.labels(self.job_id, domain).observe(latency)
+        else:
+            self.metrics.DOWNLOAD_LATENCY.labels(self.job_id, domain).observe(latency)
+
+    def _count_item(self, item, outcome: str) -> None:
+        """
+        按页面类型记录数据项
+        """
+        page_type = item.get("page_type", "") if hasattr(item, "get") else ""
+        self.metrics.ITEMS.labels(self.job_id, page_type or "unknown", outcome).inc()
+
+    def item_scraped(self, item, response, spider):
+        """
+        记录通过全部Pipeline的数据项
+        """
+        self._count_item(item, "scraped")
+
+    def item_dropped(self, item, response, exception, spider):
+        """
+        记录被Pipeline丢弃的数据项
+        """
+        self._count_item(item, "dropped")
+
+    def item_error(self, item, response, spider, failure):
+        """
+        记录Pipeline处理出错的数据项
+        """
+        self._count_item(item, "error")
+
+    def spider_closed(self, spider):
+        """
+        爬虫结束时停止采样并把队列长度归零
+
+        Args:
+            spider: 爬虫
+        """
+        if self.task and self.task.running:
+            self.task.stop()
+        self.metrics.QUEUE_DEPTH.labels(self.job_id).set(0)
+        self.metrics.IN_PROGRESS.labels(self.job_id).set(0)
+
+
+class ReactorLagMonitor:
+    """
+    持续测量reactor（Scrapy默认的asyncio事件循环）的延迟
+
+    每 REACTOR_LAG_INTERVAL 秒安排一次回调，实际执行时间与预定时间之差即为这段时间内
+    reactor被阻塞的时长；延迟分位数写入统计 reactor/lag_*。另有一个看门狗线程在reactor
+    超过 REACTOR_LAG_THRESHOLD 秒没有响应时记录reactor线程当前的调用栈，即正在阻塞
+    reactor的回调，每次阻塞只记录一次。
+    """
+
+    def __init__(self, crawler, interval: float, threshold: float):
+        """
+        初始化扩展
+
+        Args:
+            crawler: 爬虫
+            interval: 测量间隔（秒）
+            threshold: 记录调用栈的阻塞时长（秒）
+        """
+        self.crawler = crawler
+        self.interval = interval
+        self.threshold = threshold
+        self.lags = deque(maxlen=10000)
+        self.expected = None
+        self.call = None
+        self.ticks = 0
+        self.reactor_thread = None
+        self.reported = None
+        self.stopped = threading.Event()
+        self.watchdog = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """
+        从爬虫创建扩展
+
+        Args:
+            crawler: 爬虫
+
+        Returns:
+            ReactorLagMonitor: 扩展实例
+        """
+        if not crawler.settings.getbool("REACTOR_LAG_ENABLED"):
+            raise NotConfigured
+        extension = cls(
+            crawler,
+            crawler.settings.getfloat("REACTOR_LAG_INTERVAL", 0.1),
+            crawler.settings.getfloat("REACTOR_LAG_THRESHOLD", 0.5),
+        )
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def spider_opened(self, spider):
+        """
+        爬虫开始时开始测量并启动看门狗线程
+
+        Args:
+            spider: 爬虫
+        """
+        from twisted.internet import reactor
+
+        self.reactor_thread = threading.get_ident()
+        self.expected = time.monotonic() + self.interval
+        self.call = reactor.callLater(self.interval, self.tick)
+        self.watchdog = threading.Thread(target=self.watch, name="reactor-lag-watchdog", daemon=True)
+        self.watchdog.start()
+
+    def tick(self):
+        """
+        记录一次延迟并安排下一次测量
+        """
+        from twisted.internet import reactor
+
+        now = time.monotonic()
+        lag = max(0.0, now - self.expected)
+        self.lags.append(lag)
+        stats = self.crawler.stats
+        stats.max_value("reactor/lag_max_ms", round(lag * 1000, 3))
+        if lag >= self.threshold:
+            stats.inc_value("reactor/stalls")
+        self.ticks += 1
+        if self.ticks % 100 == 0:
+            self._record_stats()
+        self.expected = now + self.interval
+        self.call = reactor.callLater(self.interval, self.tick)
+
+    def watch(self):
+        """
+        看门狗线程：reactor阻塞超过阈值时记录其调用栈
+        """
+        while not self.stopped.wait(self.threshold / 2):
+            expected = self.expected
+            if expected is None or time.monotonic() - expected < self.threshold or self.reported == expected:
+                continue
+            frame = sys._current_frames().get(self.reactor_thread)
+            if frame is None:
+                continue
+            self.reported = expected
+            stack = "".join(traceback.format_stack(frame))
+            logger.warning(f"reactor已被阻塞超过 {self.threshold} 秒，当前调用栈:\n{stack}")
+
+    def _record_stats(self):
+        """
+        把最近的延迟分位数写入统计
+        """
+        if not self.lags:
+            return
+        lags = sorted(self.lags)
+        for name, quantile in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+            index = min(len(lags) - 1, int(len(lags) * quantile))
+            self.crawler.stats.set_value(f"reactor/lag_{name}_ms", round(lags[index] * 1000, 3))
+
+    def spider_closed(self, spider):
+        """
+        爬虫结束时停止测量，写入最终的延迟分位数
+
+        Args:
+            spider: 爬虫
+        """
+        if self.call is not None and self.call.active():
+            self.call.cancel()
+        self.stopped.set()
+        if self.watchdog is not None:
+            self.watchdog.join()
+        self._record_stats()
+
+
+class MemoryWatch:
+    """
+    监控爬取进程的内存增长
+
+    每 MEMWATCH_INTERVAL 秒采样一次常驻内存（RSS）。相对爬虫开始时的增长每越过
+    MEMWATCH_GROWTH_THRESHOLDS_MB 中的一个阈值记录一次：启用 MEMWATCH_TRACEMALLOC 时
+    附带与上一次快照相比增长最多的 MEMWATCH_TOP_N 处内存分配（含调用栈），写入任务的
+    分析结果目录（见 app.scrapers.profiling）。RSS超过 MEMWATCH_HARD_LIMIT_MB 时以
+    memory_limit 为原因关闭爬虫，任务随后从检查点在新进程中继续。
+
+    tracemalloc本身有明显的内存和CPU开销，默认关闭，可通过任务配置 {"tracemalloc": true}
+    按任务开启。
+    """
+
+    def __init__(self, crawler, interval: float, thresholds, top_n: int, hard_limit_mb: float, trace_frames: int):
+        """
+        初始化扩展
+
+        Args:
+            crawler: 爬虫
+            interval: 采样间隔（秒）
+            thresholds: 记录快照的增长阈值（MB），从小到大
+            top_n: 快照对比中记录的分配位置数
+            hard_limit_mb: 关闭爬虫的RSS上限（MB），0表示不限制
+            trace_frames: tracemalloc记录的调用栈深度，0表示不启用tracemalloc
+        """
+        self.crawler = crawler
+        self.interval = interval
+        self.thresholds = sorted(thresholds)
+        self.top_n = top_n
+        self.hard_limit = hard_limit_mb * 1024 * 1024
+        self.trace_frames = trace_frames
+        self.job_id = None
+        self.baseline = None
+        self.snapshot = None
+        self.crossed = 0
+        self.closing = False
+        self.task = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """
+        从爬虫创建扩展
+
+        Args:
+            crawler: 爬虫
+
+        Returns:
+            MemoryWatch: 扩展实例
+        """
+        settings = crawler.settings
+        if not settings.getbool("MEMWATCH_ENABLED") or profiling.current_rss_bytes() is None:
+            raise NotConfigured
+        extension = cls(
+            crawler,
+            settings.getfloat("MEMWATCH_INTERVAL", 10),
+            [float(value) for value in settings.getlist("MEMWATCH_GROWTH_THRESHOLDS_MB")],
+            settings.getint("MEMWATCH_TOP_N", 25),
+            settings.getfloat("MEMWATCH_HARD_LIMIT_MB", 0),
+            settings.getint("MEMWATCH_TRACEMALLOC_FRAMES", 10) if settings.getbool("MEMWATCH_TRACEMALLOC") else 0,
+        )
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def spider_opened(self, spider):
+        """
+        爬虫开始时记录基线并开始采样
+
+        Args:
+            spider: 爬虫
+        """
+        self.job_id = getattr(spider, "job_id", None)
+        self.baseline = profiling.current_rss_bytes()
+        self.crawler.stats.set_value("memory/rss_start_mb", round(self.baseline / 1048576, 1))
+        if self.trace_frames:
+            tracemalloc.start(self.trace_frames)
+            self.snapshot = self._take_snapshot()
+        self.task = LoopingCall(self.check)
+        self.task.start(self.interval, now=False)
+
+    def _take_snapshot(self):
+        """
+        获取tracemalloc快照，排除tracemalloc、导入系统以及格式化调用栈时linecache的分配
+        """
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, linecache.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ))
+
+    def check(self):
+        """
+        采样一次RSS，越过阈值时记录快照，超过上限时关闭爬虫
+        """
+        rss = profiling.current_rss_bytes()
+        if rss is None:
+            return None
+        stats = self.crawler.stats
+        stats.max_value("memory/rss_max_mb", round(rss / 1048576, 1))
+        growth_mb = (rss - self.baseline) / 1048576
+        crossed = sum(1 for threshold in self.thresholds if growth_mb >= threshold)
+        if self.hard_limit and rss >= self.hard_limit:
+            if self.closing:
+                return None
+            self.closing = True
+            self.crossed = crossed
+            self._record(rss, growth_mb, reason="hard_limit")
+            logger.warning(f"爬取进程内存 {rss / 1048576:.0f}MB 超过上限，正在关闭爬虫")
+            return deferred_from_coro(self.crawler.engine.close_spider_async(reason="memory_limit"))
+        if crossed > self.crossed:
+            self.crossed = crossed
+            self._record(rss, growth_mb)
+        return None
+
+    def _record(self, rss: int, growth_mb: float, reason: str = "threshold") -> None:
+        """
+        记录一次内存快照对比
+
+        Args:
+            rss: 当前RSS（字节）
+            growth_mb: 相对开始时的增长（MB）
+            reason: threshold 或 hard_limit
+        """
+        self.crawler.stats.inc_value("memory/snapshots")
+        record = {
+            "timestamp": time.time(),
+            "pid": os.getpid(),
+            "reason": reason,
+            "rss_mb": round(rss / 1048576, 1),
+            "growth_mb": round(growth_mb, 1),
+            "scheduler_pending": self._pending_requests(),
+        }
+        if self.snapshot is not None:
+            snapshot = self._take_snapshot()
+            record["traced_mb"] = round(tracemalloc.get_traced_memory()[0] / 1048576, 1)
+            record["top"] = [
+                {
+                    "size_diff_kb": round(stat.size_diff / 1024, 1),
+                    "size_kb": round(stat.size / 1024, 1),
+                    "count_diff": stat.count_diff,
+                    "traceback": stat.traceback.format(most_recent_first=True),
+                }
+                for stat in snapshot.compare_to(self.snapshot, "traceback")[:self.top_n]
+            ]
+            self.snapshot = snapshot
+        logger.warning(
+            f"爬取进程内存增长 {growth_mb:.0f}MB（RSS {record['rss_mb']}MB）"
+            + (f"，增长最多的分配: {record['top'][0]['traceback'][0].strip()}" if record.get("top") else "")
+        )
+        if self.job_id is not None:
+            try:
+                profiling.append_memory_record(self.job_id, record)
+            except OSError as e:
+                logger.warning(f"保存内存快照失败: {e}")
+
+    def _pending_requests(self):
+        """
+        调度器中等待的请求数，用于区分队列增长和其他内存增长
+        """
+        slot = getattr(self.crawler.engine, "_slot", None)
+        try:
+            return len(slot.scheduler) if slot is not None else None
+        except Exception:
+            return None
+
+    def spider_closed(self, spider):
+        """
+        爬虫结束时停止采样和tracemalloc
+
+        Args:
+            spider: 爬虫
+        """
+        if self.task and self.task.running:
+            self.task.stop()
+        if self.trace_frames and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+class CrawlTracing:
+    """
+    为爬取记录链路追踪span，见 app.core.tracing
+
+    spider.crawl 覆盖爬虫打开到关闭；按 TRACING_REQUEST_SAMPLE_RATE 采样的请求各记录一个
+    http.request span，覆盖请求进入下载器到离开下载器（含Playwright渲染）。span的父上下文是
+    爬取进程的 crawl.process。
+    """
+
+    def __init__(self, crawler, sample_rate: float):
+        """
+        初始化扩展
+
+        Args:
+            crawler: 爬虫
+            sample_rate: 为请求创建span的比例
+        """
+        self.crawler = crawler
+        self.sample_rate = sample_rate
+        self.tracer = tracing.get_tracer()
+        self.span = None
+        # 以请求对象为键，值为 [span, 响应状态码]，请求离开下载器时取出；状态码记在这里而不是从span
+        # 读取，未采样时得到的NonRecordingSpan没有attributes
+        self.requests = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """
+        从爬虫创建扩展
+
+        Args:
+            crawler: 爬虫
+
+        Returns:
+            CrawlTracing: 扩展实例
+        """
+        if not app_settings.TRACING_ENABLED:
+            raise NotConfigured
+        extension = cls(crawler, app_settings.TRACING_REQUEST_SAMPLE_RATE)
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        if extension.sample_rate > 0:
+            crawler.signals.connect(extension.request_reached_downloader, signal=signals.request_reached_downloader)
+            crawler.signals.connect(extension.response_downloaded, signal=signals.response_downloaded)
+            crawler.signals.connect(extension.request_left_downloader, signal=signals.request_left_downloader)
+        return extension
+
+    def spider_opened(self, spider):
+        """
+        爬虫打开时开始 spider.crawl
+
+        Args:
+            spider: 爬虫
+        """
+        self.span = self.tracer.start_span("spider.crawl", attributes={"spider.name": spider.name})
+
+    def request_reached_downloader(self, request, spider):
+        """
+        按比例为进入下载器的请求创建span
+        """
+        if random.random() >= self.sample_rate:
+            return
+        span = self.tracer.start_span(
+            "http.request",
+            attributes={
+                "http.request.method": request.method,
+                "url.full": request.url,
+                "playwright": bool(request.meta.get("playwright")),
+            },
+        )
+        self.requests[request] = [span, None]
+
+    def response_downloaded(self, response, request, spider):
+        """
+        记录响应状态和大小
+        """
+        entry = self.requests.get(request)
+        if entry is not None:
+            span = entry[0]
+            entry[1] = response.status
+            span.set_attribute("http.response.status_code", response.status)
+            span.set_attribute("http.response.body.size", len(response.body))
+
+    def request_left_downloader(self, request, spider):
+        """
+        请求离开下载器时结束span；没有收到响应的请求（下载异常、超时）标记为错误
+        """
+        entry = self.requests.pop(request, None)
+        if entry is None:
+            return
+        span, status = entry
+        if status is None:
+            span.set_status(StatusCode.ERROR)
+        span.end()
+
+    def spider_closed(self, spider, reason):
+        """
+        爬虫关闭时结束所有span
+
+        Args:
+            spider: 爬虫
+            reason: 关闭原因
+        """
+        for span, _ in self.requests.values():
+            span.end()
+        self.requests.clear()
+        if self.span is not None:
+            stats = self.crawler.stats
+            self.span.set_attribute("crawl.finish_reason", reason)
+            self.span.set_attribute("crawl.requests", stats.get_value("downloader/request_count", 0))
+            self.span.set_attribute("crawl.items", stats.get_value("item_scraped_count", 0))
+            self.span.end()
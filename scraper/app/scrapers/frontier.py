@@ -0,0 +1,876 @@
+"""
+分布式爬取队列模块
+
+同一个任务的多个worker共享一个请求队列和一个请求指纹集合：任一worker解析出的
+请求进入共享队列，由空闲的worker取走下载，已见过的请求只会被调度一次。队列保存
+在Redis中，Redis不可用时退回到进程内实现（只能在同一进程的多个爬虫之间共享）。
+
+worker取出的请求不会直接从共享存储中删除，而是记入该worker的租约，处理完成后
+确认删除。worker异常退出后，其他worker在它的存活心跳超过 FRONTIER_LEASE_TIMEOUT
+秒后把租约中的请求放回队列，请求至少会被处理一次。
+
+调度器不在reactor线程中访问Redis：放入的请求、确认和取出都先缓存在本地，每
+FRONTIER_SYNC_INTERVAL 秒（或有新请求时）在线程池中批量同步一次。
+
+每个worker在忙碌时定期写入心跳。worker空闲时只有在队列为空、且其他worker都已
+空闲超过 FRONTIER_IDLE_TIMEOUT 秒并且没有未确认的租约后才会结束，避免在其他
+worker还可能产生新请求时提前退出。
+"""
+import heapq
+import itertools
+import logging
+import pickle
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from scrapy import signals
+from scrapy.core.scheduler import BaseScheduler
+from scrapy.exceptions import DontCloseSpider
+from scrapy.utils.request import request_from_dict
+from twisted.internet import defer
+from twisted.internet.task import LoopingCall
+from twisted.internet.threads import deferToThread
+
+from app.core.config import settings as app_settings
+
+logger = logging.getLogger(__name__)
+
+# 放入共享队列的请求：(指纹, 序列化后的请求, 优先级)，不去重的请求指纹为None
+FrontierEntry = Tuple[Optional[str], bytes, int]
+
+
+def frontier_settings(join: bool = False, reset: bool = False) -> Dict[str, object]:
+    """
+    启用共享队列的Scrapy设置
+
+    Args:
+        join: 是否作为协助者加入已有任务（不发出起始请求）
+        reset: 是否在开始前清空任务的共享队列（任务首次运行时；重试时保留以继续爬取）
+
+    Returns:
+        Dict[str, object]: Scrapy设置
+    """
+    return {
+        "SCHEDULER": "app.scrapers.frontier.FrontierScheduler",
+        "FRONTIER_JOIN": join,
+        "FRONTIER_RESET": reset and not join,
+    }
+
+
+class MemoryFrontier:
+    """
+    进程内共享队列
+    """
+
+    def __init__(self):
+        self._queue = []
+        self._counter = itertools.count()
+        self._seen = set()
+        self._workers: Dict[str, float] = {}
+        self._alive: Dict[str, float] = {}
+        self._leases: Dict[str, Dict[bytes, int]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def push(self, entries: Sequence[FrontierEntry]) -> int:
+        """
+        去重后放入序列化后的请求，优先级高的先取出，相同优先级先进先出
+
+        Args:
+            entries: 待放入的请求
+
+        Returns:
+            int: 因指纹已存在而被过滤的请求数
+        """
+        filtered = 0
+        with self._lock:
+            for fingerprint, data, priority in entries:
+                if fingerprint is not None:
+                    if fingerprint in self._seen:
+                        filtered += 1
+                        continue
+                    self._seen.add(fingerprint)
+                heapq.heappush(self._queue, (-priority, next(self._counter), data))
+        return filtered
+
+    def pop(self, worker_id: str, count: int = 1) -> List[bytes]:
+        """
+        取出请求并记入worker的租约
+
+        Args:
+            worker_id: worker ID
+            count: 最多取出的请求数
+
+        Returns:
+            List[bytes]: 序列化后的请求
+        """
+        datas = []
+        with self._lock:
+            leases = self._leases.setdefault(worker_id, {})
+            while self._queue and len(datas) < count:
+                priority, _, data = heapq.heappop(self._queue)
+                leases[data] = -priority
+                datas.append(data)
+        return datas
+
+    def ack(self, worker_id: str, datas: Sequence[bytes]) -> None:
+        """
+        确认请求已处理完成，从租约中删除
+
+        Args:
+            worker_id: worker ID
+            datas: 序列化后的请求
+        """
+        with self._lock:
+            leases = self._leases.get(worker_id, {})
+            for data in datas:
+                leases.pop(data, None)
+
+    def release(self, worker_id: str, datas: Optional[Sequence[bytes]] = None) -> int:
+        """
+        把租约中的请求放回队列
+
+        Args:
+            worker_id: worker ID
+            datas: 要放回的请求，为None时放回全部
+
+        Returns:
+            int: 放回的请求数
+        """
+        with self._lock:
+            return self._release(worker_id, datas)
+
+    def _release(self, worker_id: str, datas: Optional[Sequence[bytes]] = None) -> int:
+        leases = self._leases.get(worker_id, {})
+        if datas is None:
+            datas = list(leases)
+        released = 0
+        for data in datas:
+            if data in leases:
+                heapq.heappush(self._queue, (-leases.pop(data), next(self._counter), data))
+                released += 1
+        return released
+
+    def heartbeat(self, worker_id: str, busy: bool = True) -> None:
+        """
+        记录worker仍然存活，busy为True时同时记录其仍在忙碌
+
+        Args:
+            worker_id: worker ID
+            busy: 是否正在下载或解析
+        """
+        now = time.time()
+        with self._lock:
+            self._alive[worker_id] = now
+            if busy:
+                self._workers[worker_id] = now
+
+    def active_workers(self, timeout: float, exclude: Optional[str] = None) -> int:
+        """
+        统计最近仍在忙碌或持有未确认租约的worker数
+
+        Args:
+            timeout: 心跳有效期（秒）
+            exclude: 不计入统计的worker ID
+
+        Returns:
+            int: worker数
+        """
+        cutoff = time.time() - timeout
+        with self._lock:
+            busy = {worker_id for worker_id, ts in self._workers.items() if ts >= cutoff}
+            busy.update(worker_id for worker_id, leases in self._leases.items() if leases)
+            busy.discard(exclude)
+            return len(busy)
+
+    def requeue_expired(self, timeout: float, exclude: Optional[str] = None) -> int:
+        """
+        把存活心跳已过期的worker的租约放回队列，并注销这些worker
+
+        Args:
+            timeout: 存活心跳有效期（秒）
+            exclude: 不检查的worker ID
+
+        Returns:
+            int: 放回的请求数
+        """
+        cutoff = time.time() - timeout
+        requeued = 0
+        with self._lock:
+            for worker_id, ts in list(self._alive.items()):
+                if worker_id == exclude or ts >= cutoff:
+                    continue
+                requeued += self._release(worker_id)
+                self._leases.pop(worker_id, None)
+                self._alive.pop(worker_id, None)
+                self._workers.pop(worker_id, None)
+        return requeued
+
+    def leave(self, worker_id: str) -> None:
+        """
+        注销worker并删除其租约
+
+        Args:
+            worker_id: worker ID
+        """
+        with self._lock:
+            self._workers.pop(worker_id, None)
+            self._alive.pop(worker_id, None)
+            self._leases.pop(worker_id, None)
+
+    def clear(self) -> None:
+        """
+        清空队列、指纹、租约和worker记录
+        """
+        with self._lock:
+            self._queue.clear()
+            self._seen.clear()
+            self._workers.clear()
+            self._alive.clear()
+            self._leases.clear()
+
+
+class RedisFrontier:
+    """
+    Redis共享队列
+
+    队列为有序集合（分数为负的优先级），指纹为集合，每个worker的租约为一个hash
+    （请求 -> 分数），忙碌心跳和存活心跳各为一个hash。多步操作在Lua脚本中原子完成。
+    """
+
+    PUSH_SCRIPT = """
+    local filtered = 0
+    for i = 2, #ARGV, 3 do
+        if ARGV[i] == '' or redis.call('SADD', KEYS[1], ARGV[i]) == 1 then
+            redis.call('ZADD', KEYS[2], ARGV[i + 2], ARGV[i + 1])
+        else
+            filtered = filtered + 1
+        end
+    end
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+    redis.call('EXPIRE', KEYS[2], ARGV[1])
+    return filtered
+    """
+
+    POP_SCRIPT = """
+    local popped = redis.call('ZPOPMIN', KEYS[1], ARGV[1])
+    local datas = {}
+    for i = 1, #popped, 2 do
+        redis.call('HSET', KEYS[2], popped[i], popped[i + 1])
+        datas[#datas + 1] = popped[i]
+    end
+    if #datas > 0 then
+        redis.call('EXPIRE', KEYS[2], ARGV[2])
+    end
+    return datas
+    """
+
+    RELEASE_SCRIPT = """
+    local released = 0
+    if #ARGV > 1 then
+        for i = 2, #ARGV do
+            local score = redis.call('HGET', KEYS[1], ARGV[i])
+            if score then
+                redis.call('ZADD', KEYS[2], score, ARGV[i])
+                redis.call('HDEL', KEYS[1], ARGV[i])
+                released = released + 1
+            end
+        end
+    else
+        local leased = redis.call('HGETALL', KEYS[1])
+        for i = 1, #leased, 2 do
+            redis.call('ZADD', KEYS[2], leased[i + 1], leased[i])
+        end
+        redis.call('DEL', KEYS[1])
+        released = #leased / 2
+    end
+    if released > 0 then
+        redis.call('EXPIRE', KEYS[2], ARGV[1])
+    end
+    return released
+    """
+
+    REQUEUE_SCRIPT = """
+    local alive = redis.call('HGETALL', KEYS[1])
+    local requeued = 0
+    for i = 1, #alive, 2 do
+        local worker = alive[i]
+        if worker ~= ARGV[4] and tonumber(alive[i + 1]) < tonumber(ARGV[1]) then
+            local lease_key = ARGV[2] .. worker
+            local leased = redis.call('HGETALL', lease_key)
+            for j = 1, #leased, 2 do
+                redis.call('ZADD', KEYS[3], leased[j + 1], leased[j])
+            end
+            requeued = requeued + #leased / 2
+            redis.call('DEL', lease_key)
+            redis.call('HDEL', KEYS[1], worker)
+            redis.call('HDEL', KEYS[2], worker)
+        end
+    end
+    if requeued > 0 then
+        redis.call('EXPIRE', KEYS[3], ARGV[3])
+    end
+    return requeued
+    """
+
+    def __init__(self, client, key: str, ttl: int = 7 * 86400):
+        """
+        初始化共享队列
+
+        Args:
+            client: redis.Redis客户端
+            key: 键前缀，每个任务一个
+            ttl: 键的过期时间（秒），防止异常退出的任务残留数据
+        """
+        self.client = client
+        self.key = key
+        self.queue_key = f"{key}:queue"
+        self.seen_key = f"{key}:seen"
+        self.workers_key = f"{key}:workers"
+        self.alive_key = f"{key}:alive"
+        self.lease_prefix = f"{key}:leases:"
+        self.ttl = ttl
+        self._push = client.register_script(self.PUSH_SCRIPT)
+        self._pop = client.register_script(self.POP_SCRIPT)
+        self._release = client.register_script(self.RELEASE_SCRIPT)
+        self._requeue = client.register_script(self.REQUEUE_SCRIPT)
+
+    def __len__(self) -> int:
+        return self.client.zcard(self.queue_key)
+
+    def push(self, entries: Sequence[FrontierEntry]) -> int:
+        """
+        去重后放入序列化后的请求，优先级高的先取出
+
+        Args:
+            entries: 待放入的请求
+
+        Returns:
+            int: 因指纹已存在而被过滤的请求数
+        """
+        args = [self.ttl]
+        for fingerprint, data, priority in entries:
+            args.extend([fingerprint or "", data, -priority])
+        return int(self._push(keys=[self.seen_key, self.queue_key], args=args))
+
+    def pop(self, worker_id: str, count: int = 1) -> List[bytes]:
+        """
+        取出请求并记入worker的租约
+
+        Args:
+            worker_id: worker ID
+            count: 最多取出的请求数
+
+        Returns:
+            List[bytes]: 序列化后的请求
+        """
+        return self._pop(keys=[self.queue_key, self.lease_prefix + worker_id], args=[count, self.ttl])
+
+    def ack(self, worker_id: str, datas: Sequence[bytes]) -> None:
+        """
+        确认请求已处理完成，从租约中删除
+
+        Args:
+            worker_id: worker ID
+            datas: 序列化后的请求
+        """
+        if datas:
+            self.client.hdel(self.lease_prefix + worker_id, *datas)
+
+    def release(self, worker_id: str, datas: Optional[Sequence[bytes]] = None) -> int:
+        """
+        把租约中的请求放回队列
+
+        Args:
+            worker_id: worker ID
+            datas: 要放回的请求，为None时放回全部
+
+        Returns:
+            int: 放回的请求数
+        """
+        if datas is not None and not datas:
+            return 0
+        return int(self._release(
+            keys=[self.lease_prefix + worker_id, self.queue_key],
+            args=[self.ttl, *(datas or [])],
+        ))
+
+    def heartbeat(self, worker_id: str, busy: bool = True) -> None:
+        """
+        记录worker仍然存活，busy为True时同时记录其仍在忙碌
+
+        Args:
+            worker_id: worker ID
+            busy: 是否正在下载或解析
+        """
+        now = time.time()
+        pipe = self.client.pipeline()
+        pipe.hset(self.alive_key, worker_id, now)
+        pipe.expire(self.alive_key, self.ttl)
+        if busy:
+            pipe.hset(self.workers_key, worker_id, now)
+            pipe.expire(self.workers_key, self.ttl)
+        pipe.execute()
+
+    def active_workers(self, timeout: float, exclude: Optional[str] = None) -> int:
+        """
+        统计最近仍在忙碌或持有未确认租约的worker数
+
+        Args:
+            timeout: 心跳有效期（秒）
+            exclude: 不计入统计的worker ID
+
+        Returns:
+            int: worker数
+        """
+        cutoff = time.time() - timeout
+        busy = {
+            worker_id.decode() for worker_id, ts in self.client.hgetall(self.workers_key).items()
+            if float(ts) >= cutoff
+        }
+        alive = [worker_id.decode() for worker_id in self.client.hkeys(self.alive_key)]
+        pipe = self.client.pipeline()
+        for worker_id in alive:
+            pipe.hlen(self.lease_prefix + worker_id)
+        busy.update(worker_id for worker_id, leased in zip(alive, pipe.execute()) if leased)
+        busy.discard(exclude)
+        return len(busy)
+
+    def requeue_expired(self, timeout: float, exclude: Optional[str] = None) -> int:
+        """
+        把存活心跳已过期的worker的租约放回队列，并注销这些worker
+
+        Args:
+            timeout: 存活心跳有效期（秒）
+            exclude: 不检查的worker ID
+
+        Returns:
+            int: 放回的请求数
+        """
+        return int(self._requeue(
+            keys=[self.alive_key, self.workers_key, self.queue_key],
+            args=[time.time() - timeout, self.lease_prefix, self.ttl, exclude or ""],
+        ))
+
+    def leave(self, worker_id: str) -> None:
+        """
+        注销worker并删除其租约
+
+        Args:
+            worker_id: worker ID
+        """
+        pipe = self.client.pipeline()
+        pipe.hdel(self.workers_key, worker_id)
+        pipe.hdel(self.alive_key, worker_id)
+        pipe.delete(self.lease_prefix + worker_id)
+        pipe.execute()
+
+    def clear(self) -> None:
+        """
+        清空队列、指纹、租约和worker记录
+        """
+        lease_keys = list(self.client.scan_iter(match=f"{self.lease_prefix}*"))
+        self.client.delete(self.queue_key, self.seen_key, self.workers_key, self.alive_key, *lease_keys)
+
+
+_memory_frontiers: Dict[str, MemoryFrontier] = {}
+_memory_lock = threading.Lock()
+
+
+def get_memory_frontier(key: str) -> MemoryFrontier:
+    """
+    获取进程内共享队列，同一个键返回同一个实例
+
+    Args:
+        key: 队列键
+
+    Returns:
+        MemoryFrontier: 共享队列
+    """
+    with _memory_lock:
+        if key not in _memory_frontiers:
+            _memory_frontiers[key] = MemoryFrontier()
+        return _memory_frontiers[key]
+
+
+def create_frontier(settings, key: str):
+    """
+    根据设置创建共享队列，Redis连接失败时退回到进程内队列
+
+    Args:
+        settings: Scrapy设置
+        key: 队列键
+
+    Returns:
+        MemoryFrontier | RedisFrontier: 共享队列
+    """
+    if settings.get("FRONTIER_BACKEND", "redis") != "redis":
+        return get_memory_frontier(key)
+
+    redis_url = settings.get("FRONTIER_REDIS_URL") or (
+        f"redis://{app_settings.REDIS_HOST}:{app_settings.REDIS_PORT}/{app_settings.REDIS_DB}"
+    )
+    try:
+        import redis
+
+        client = redis.Redis.from_url(redis_url, socket_timeout=5, socket_connect_timeout=2)
+        client.ping()
+    except Exception as e:
+        logger.warning(f"无法连接Redis（{redis_url}），爬取队列只在本进程内共享: {e}")
+        return get_memory_frontier(key)
+    return RedisFrontier(client, f"aida:frontier:{key}")
+
+
+def clear_job_frontier(settings, job_id: int) -> None:
+    """
+    清空任务的共享队列，用于任务取消或最终失败而爬取进程没有自行清空的情况
+
+    Args:
+        settings: Scrapy设置
+        job_id: 任务ID
+    """
+    create_frontier(settings, f"job:{job_id}").clear()
+
+
+class FrontierScheduler(BaseScheduler):
+    """
+    使用共享队列的Scrapy调度器
+
+    通过 frontier_settings() 启用。FRONTIER_JOIN 为True的worker不调度起始请求，
+    只处理其他worker放入队列的请求。FRONTIER_RESET 为True时打开前清空上次运行
+    残留的队列和指纹。
+
+    交给引擎的请求在 meta["frontier_lease"] 中带有租约标识，离开下载器或收到响应时
+    确认；没有经过下载器的请求（例如被中间件忽略）在爬虫空闲时一并确认。
+    """
+
+    def __init__(self, crawler):
+        """
+        初始化调度器
+
+        Args:
+            crawler: 爬虫
+        """
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.join = crawler.settings.getbool("FRONTIER_JOIN")
+        self.reset = crawler.settings.getbool("FRONTIER_RESET")
+        self.idle_timeout = crawler.settings.getfloat("FRONTIER_IDLE_TIMEOUT", 15)
+        self.heartbeat_interval = crawler.settings.getfloat("FRONTIER_HEARTBEAT_INTERVAL", 5)
+        self.sync_interval = crawler.settings.getfloat("FRONTIER_SYNC_INTERVAL", 0.5)
+        self.lease_timeout = crawler.settings.getfloat("FRONTIER_LEASE_TIMEOUT", 60)
+        batch_size = crawler.settings.get("FRONTIER_BATCH_SIZE") or crawler.settings.getint("CONCURRENT_REQUESTS", 16)
+        self.batch_size = max(int(batch_size), 1)
+        self.worker_id = uuid.uuid4().hex
+        self.spider = None
+        self.frontier = None
+        self.opened_at = None
+        self._sync_loop = None
+        # 已从共享队列租用、还没交给引擎的请求
+        self._inbox = deque()
+        # 等待放入共享队列的请求和等待确认的请求
+        self._outbox: List[FrontierEntry] = []
+        self._acks: List[bytes] = []
+        # 已交给引擎、还没确认的请求（租约标识 -> 序列化后的请求）
+        self._leased: Dict[str, bytes] = {}
+        self._lease_ids = itertools.count()
+        # 本worker已放入的请求指纹，重复的请求不必再访问共享存储
+        self._seen = set()
+        self._syncing = None
+        self._sync_failed = False
+        self._closing = False
+        self._busy = True
+        self._last_heartbeat = float("-inf")
+        self._remote_pending = 0
+        self._remote_active = 0
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """
+        从爬虫创建调度器
+
+        Args:
+            crawler: 爬虫
+
+        Returns:
+            FrontierScheduler: 调度器实例
+        """
+        scheduler = cls(crawler)
+        crawler.signals.connect(scheduler.spider_idle, signal=signals.spider_idle)
+        crawler.signals.connect(scheduler.request_done, signal=signals.request_left_downloader)
+        crawler.signals.connect(scheduler.request_done, signal=signals.response_received)
+        return scheduler
+
+    def open(self, spider):
+        """
+        打开调度器，连接任务的共享队列并开始定期同步
+
+        Args:
+            spider: 爬虫
+        """
+        self.spider = spider
+        job_id = getattr(spider, "job_id", None)
+        key = f"job:{job_id}" if job_id else f"spider:{spider.name}"
+        self.frontier = create_frontier(self.crawler.settings, key)
+        self.opened_at = time.monotonic()
+        if self.reset:
+            # 上次运行被强制结束时没有清空，残留的指纹会把起始请求当作重复过滤掉
+            self.frontier.clear()
+
+        self.frontier.heartbeat(self.worker_id)
+        self._sync_loop = LoopingCall(self._tick)
+        self._sync_loop.start(self.sync_interval, now=False)
+        spider.logger.info(
+            f"使用共享爬取队列 {key}，worker: {self.worker_id}"
+            + ("（协助者）" if self.join else "")
+        )
+
+    def close(self, reason: str):
+        """
+        关闭调度器；任务完成或取消时清空共享队列，其他原因（中断、内存超限）把本worker
+        租用的请求放回队列，保留以便重试或其他worker继续
+
+        Args:
+            reason: 关闭原因
+
+        Returns:
+            Optional[Deferred]: 写入共享队列完成后触发
+        """
+        if self._sync_loop is not None and self._sync_loop.running:
+            self._sync_loop.stop()
+        if self.frontier is None:
+            return None
+        self._closing = True
+        if reason == "finished":
+            # 爬虫正常结束时交给引擎的请求都已处理完
+            self._ack_all()
+        d = self._syncing if self._syncing is not None else defer.succeed(None)
+        d.addCallback(lambda _: self._call(self._close_frontier, reason, self._outbox, self._acks))
+        d.addErrback(lambda failure: logger.warning(f"关闭爬取队列失败: {failure.getErrorMessage()}"))
+        return d
+
+    def _close_frontier(self, reason: str, outbox: List[FrontierEntry], acks: List[bytes]) -> None:
+        """
+        写入剩余的请求和确认，并注销本worker（在线程池中运行）
+
+        Args:
+            reason: 关闭原因
+            outbox: 待放入的请求
+            acks: 待确认的请求
+        """
+        if not self.join and reason in ("finished", "cancelled"):
+            self.frontier.clear()
+            return
+        if outbox:
+            self.frontier.push(outbox)
+        if acks:
+            self.frontier.ack(self.worker_id, acks)
+        if reason not in ("finished", "cancelled"):
+            self.frontier.release(self.worker_id)
+        self.frontier.leave(self.worker_id)
+
+    def has_pending_requests(self) -> bool:
+        """
+        本地缓存或共享队列中是否还有请求
+
+        Returns:
+            bool: 是否有待处理的请求
+        """
+        return bool(self._inbox or self._outbox or self._remote_pending)
+
+    def enqueue_request(self, request) -> bool:
+        """
+        去重后放入待写入共享队列的缓存
+
+        Args:
+            request: 请求
+
+        Returns:
+            bool: 是否已放入队列
+        """
+        if self.join and request.meta.get("is_start_request"):
+            return False
+        # 重试和重定向的请求复制了原请求的meta，原请求的租约已在离开下载器时确认
+        request.meta.pop("frontier_lease", None)
+        fingerprint = None
+        if not request.dont_filter:
+            fingerprint = self.crawler.request_fingerprinter.fingerprint(request).hex()
+            if fingerprint in self._seen:
+                self.stats.inc_value("dupefilter/filtered")
+                return False
+            self._seen.add(fingerprint)
+        data = pickle.dumps(request.to_dict(spider=self.spider), protocol=4)
+        self._outbox.append((fingerprint, data, request.priority))
+        self._sync()
+        return True
+
+    def next_request(self):
+        """
+        从本地缓存取出一个请求，缓存不足时从共享队列补充
+
+        Returns:
+            Optional[Request]: 请求，缓存为空时为None
+        """
+        if len(self._inbox) * 2 <= self.batch_size and (self._outbox or self._remote_pending):
+            self._sync()
+        if not self._inbox:
+            return None
+        data = self._inbox.popleft()
+        request = request_from_dict(pickle.loads(data), spider=self.spider)
+        lease = str(next(self._lease_ids))
+        self._leased[lease] = data
+        request.meta["frontier_lease"] = lease
+        self.stats.inc_value("scheduler/dequeued")
+        self.stats.inc_value("scheduler/dequeued/frontier")
+        return request
+
+    def request_done(self, request, **kwargs) -> None:
+        """
+        请求离开下载器或收到响应时确认其租约
+
+        Args:
+            request: 请求
+        """
+        data = self._leased.pop(request.meta.get("frontier_lease"), None)
+        if data is not None:
+            self._acks.append(data)
+
+    def __len__(self) -> int:
+        return len(self._inbox) + len(self._outbox) + self._remote_pending
+
+    def spider_idle(self, spider):
+        """
+        本worker空闲时，在共享队列还有请求或其他worker仍在忙碌时保持爬虫运行
+
+        Args:
+            spider: 爬虫
+        """
+        # 引擎空闲说明交给它的请求都已处理完，包括没有经过下载器的请求
+        self._ack_all()
+        if self._acks:
+            self._sync()
+        if self._inbox or self._outbox or self._syncing is not None or self._remote_pending:
+            raise DontCloseSpider
+        # 刚启动时其他worker可能还没有放入请求
+        if time.monotonic() - self.opened_at < self.idle_timeout:
+            raise DontCloseSpider
+        if self._remote_active:
+            raise DontCloseSpider
+
+    def _ack_all(self) -> None:
+        self._acks.extend(self._leased.values())
+        self._leased.clear()
+
+    def _call(self, method, *args):
+        """
+        调用共享队列的方法：进程内队列直接调用，Redis队列在线程池中调用，不阻塞reactor
+
+        Args:
+            method: 要调用的方法
+
+        Returns:
+            Deferred: 方法的返回值
+        """
+        if isinstance(self.frontier, MemoryFrontier):
+            return defer.maybeDeferred(method, *args)
+        return deferToThread(method, *args)
+
+    def _tick(self) -> None:
+        """
+        定期记录本worker是否忙碌并同步共享队列
+        """
+        try:
+            engine = self.crawler.engine
+            self._busy = bool(engine.downloader.active) or not engine.scraper.slot.is_idle()
+        except Exception:
+            self._busy = True
+        self._sync()
+
+    def _sync(self) -> None:
+        """
+        在后台把缓存的请求和确认写入共享队列，写入心跳、回收失联worker的租约，并补充本地缓存
+        """
+        if self._syncing is not None or self._closing or self.frontier is None:
+            return
+        outbox, self._outbox = self._outbox, []
+        acks, self._acks = self._acks, []
+        want = max(self.batch_size - len(self._inbox), 0)
+        busy = None
+        now = time.monotonic()
+        if now - self._last_heartbeat >= self.heartbeat_interval:
+            busy = self._busy
+            self._last_heartbeat = now
+        d = self._syncing = self._call(self._sync_frontier, outbox, acks, want, busy)
+        d.addCallbacks(self._synced, self._sync_error, callbackArgs=(len(outbox),), errbackArgs=(outbox, acks))
+        d.addBoth(self._sync_done)
+
+    def _sync_frontier(
+        self, outbox: List[FrontierEntry], acks: List[bytes], want: int, busy: Optional[bool]
+    ) -> Tuple[int, int, int, int, List[bytes]]:
+        """
+        与共享队列同步一次（在线程池中运行）
+
+        Args:
+            outbox: 待放入的请求
+            acks: 待确认的请求
+            want: 要取出的请求数
+            busy: 本worker是否忙碌，为None时不写入心跳
+
+        Returns:
+            Tuple[int, int, int, int, List[bytes]]: 过滤的请求数、回收的请求数、共享队列长度、
+            其他活跃worker数、取出的请求
+        """
+        filtered = self.frontier.push(outbox) if outbox else 0
+        if acks:
+            self.frontier.ack(self.worker_id, acks)
+        requeued = 0
+        if busy is not None:
+            self.frontier.heartbeat(self.worker_id, busy)
+            requeued = self.frontier.requeue_expired(self.lease_timeout, exclude=self.worker_id)
+        pending = len(self.frontier)
+        active = self.frontier.active_workers(self.idle_timeout, exclude=self.worker_id)
+        datas = self.frontier.pop(self.worker_id, want) if want and pending else []
+        return filtered, requeued, pending - len(datas), active, datas
+
+    def _synced(self, result, pushed: int) -> None:
+        filtered, requeued, pending, active, datas = result
+        if self._sync_failed:
+            logger.info("爬取队列已恢复同步")
+            self._sync_failed = False
+        if filtered:
+            self.stats.inc_value("dupefilter/filtered", filtered)
+        if pushed - filtered:
+            self.stats.inc_value("scheduler/enqueued", pushed - filtered)
+            self.stats.inc_value("scheduler/enqueued/frontier", pushed - filtered)
+        if requeued:
+            self.stats.inc_value("frontier/requeued", requeued)
+            logger.warning(f"已把失联worker租用的 {requeued} 个请求放回爬取队列")
+        self._remote_pending = pending
+        self._remote_active = active
+        if datas:
+            self._inbox.extend(datas)
+            # 引擎在没有下载完成时每5秒才检查一次调度器，取到的请求需要主动唤醒；
+            # Scrapy没有公开的唤醒接口，私有属性不存在时退回到引擎自身的轮询
+            nextcall = getattr(getattr(self.crawler.engine, "_slot", None), "nextcall", None)
+            if nextcall is not None:
+                nextcall.schedule()
+
+    def _sync_error(self, failure, outbox: List[FrontierEntry], acks: List[bytes]) -> None:
+        # 放回缓存，下次同步时重试
+        self._outbox[:0] = outbox
+        self._acks[:0] = acks
+        if not self._sync_failed:
+            logger.warning(f"同步爬取队列失败: {failure.getErrorMessage()}")
+            self._sync_failed = True
+
+    def _sync_done(self, _) -> None:
+        self._syncing = None
+        if (self._outbox or self._acks) and not self._closing and not self._sync_failed:
+            from twisted.internet import reactor
+
+            reactor.callLater(0, self._sync)
@@ -0,0 +1,57 @@
+"""
+Scrapy下载处理器
+"""
+import asyncio
+import weakref
+from typing import Optional
+
+from scrapy_playwright.handler import ScrapyPlaywrightDownloadHandler
+
+from app.core import tracing
+
+# 每个爬虫的下载处理器，供扩展在不访问Scrapy私有属性的情况下找到它
+_handlers = weakref.WeakKeyDictionary()
+
+
+class PlaywrightDownloadHandler(ScrapyPlaywrightDownloadHandler):
+    """
+    scrapy-playwright的下载处理器，浏览器启动时记录 playwright.launch_browser span
+
+    浏览器在第一个Playwright请求时才启动，启动耗时会计入该请求；单独的span可以把它和页面下载区分开
+    """
+
+    def __init__(self, crawler):
+        super().__init__(crawler)
+        _handlers[crawler] = self
+
+    @classmethod
+    def for_crawler(cls, crawler) -> Optional["PlaywrightDownloadHandler"]:
+        """
+        获取爬虫使用的下载处理器
+
+        Args:
+            crawler: 爬虫
+
+        Returns:
+            Optional[PlaywrightDownloadHandler]: 下载处理器，没有配置或尚未创建时为None
+        """
+        return _handlers.get(crawler)
+
+    async def _maybe_launch_browser(self) -> None:
+        if hasattr(self, "browser"):
+            return
+        with tracing.get_tracer().start_as_current_span("playwright.launch_browser") as span:
+            span.set_attribute("playwright.browser_type", self.config.browser_type_name)
+            await super()._maybe_launch_browser()
+
+    async def close_contexts(self) -> None:
+        """
+        关闭所有浏览器上下文，进行中的页面请求随之立即失败；已关闭的上下文忽略
+        """
+        contexts = [wrapper.context for wrapper in self.context_wrappers.values()]
+        if not contexts:
+            return
+        # 浏览器可能在单独的事件循环线程中运行
+        await self._maybe_future_from_coro(
+            asyncio.gather(*(context.close() for context in contexts), return_exceptions=True)
+        )
@@ -0,0 +1,272 @@
+"""
+图片存储和缩略图
+
+图片按内容的SHA-256寻址，键的布局在本地目录和S3兼容存储（MinIO）中相同::
+
+    full/<h[:2]>/<h[2:4]>/<h>.<ext>              原图
+    thumbs/<name>/<h[:2]>/<h[2:4]>/<h>.jpg        缩略图，尺寸见 IMAGES_THUMBS
+    meta/<h[:2]>/<h[2:4]>/<h>.json                格式、宽高、感知哈希和以上文件的键
+
+meta 最后写入，存在时说明原图和缩略图都已写入，同一张图片再次出现时直接使用。
+本地目录可以作为MinIO的替身：把目录中的文件原样上传到存储桶即可切换存储。
+"""
+import io
+import json
+import os
+import tempfile
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+from app.core.config import settings
+from app.utils import imagehash
+
+# Pillow图片格式对应的扩展名，未列出的使用格式名的小写
+EXTENSIONS = {"JPEG": "jpg", "TIFF": "tif"}
+
+
+def content_key(kind: str, checksum: str, ext: str) -> str:
+    """
+    内容哈希对应的存储键
+
+    Args:
+        kind: full、meta 或 thumbs/<name>
+        checksum: SHA-256十六进制摘要
+        ext: 扩展名
+
+    Returns:
+        str: 存储键
+    """
+    return f"{kind}/{checksum[:2]}/{checksum[2:4]}/{checksum}.{ext}"
+
+
+def process_image(data: bytes, thumbs: Dict[str, int]) -> Dict[str, Any]:
+    """
+    读取图片信息、计算感知哈希并生成缩略图，在进程池中执行
+
+    Args:
+        data: 图片内容
+        thumbs: 缩略图名称到最长边像素数的映射
+
+    Returns:
+        Dict[str, Any]: format、content_type、width、height、phash、dhash（十六进制），
+            thumbnails 为名称到JPEG内容的映射
+
+    Raises:
+        PIL.UnidentifiedImageError: 不是可识别的图片
+        OSError: 图片内容不完整
+    """
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+        result = {
+            "format": image.format,
+            "content_type": Image.MIME.get(image.format, "application/octet-stream"),
+            "width": image.width,
+            "height": image.height,
+            "phash": imagehash.to_hex(imagehash.phash(image)),
+            "dhash": imagehash.to_hex(imagehash.dhash(image)),
+            "thumbnails": {},
+        }
+        rgb = image.convert("RGB") if image.mode != "RGB" else image
+        for name, size in thumbs.items():
+            thumb = rgb.copy()
+            thumb.thumbnail((size, size))
+            buffer = io.BytesIO()
+            thumb.save(buffer, "JPEG", quality=85)
+            result["thumbnails"][name] = buffer.getvalue()
+    return result
+
+
+class LocalImageStore:
+    """
+    本地目录存储，键为相对路径
+    """
+
+    def __init__(self, root: str):
+        """
+        初始化存储
+
+        Args:
+            root: 根目录
+        """
+        self.root = root
+
+    def prepare(self) -> None:
+        """
+        创建根目录
+        """
+        os.makedirs(self.root, exist_ok=True)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        读取文件
+
+        Args:
+            key: 存储键
+
+        Returns:
+            Optional[bytes]: 文件内容，不存在时返回None
+        """
+        try:
+            with open(os.path.join(self.root, key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, data: bytes, content_type: str) -> None:
+        """
+        写入文件；先写临时文件再改名，多个爬取进程同时写入同一个键时不会读到不完整的文件
+
+        Args:
+            key: 存储键
+            data: 文件内容
+            content_type: 内容类型，本地存储不使用
+        """
+        path = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+class S3ImageStore:
+    """
+    S3兼容存储，使用 MINIO_* 配置连接
+    """
+
+    def __init__(self, bucket: str, prefix: str = ""):
+        """
+        初始化存储
+
+        Args:
+            bucket: 存储桶
+            prefix: 键前缀
+        """
+        from minio import Minio
+
+        self.client = Minio(
+            settings.MINIO_ENDPOINT,
+            access_key=settings.MINIO_ACCESS_KEY,
+            secret_key=settings.MINIO_SECRET_KEY,
+            secure=settings.MINIO_SECURE,
+        )
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+
+    def prepare(self) -> None:
+        """
+        存储桶不存在时创建
+        """
+        if not self.client.bucket_exists(self.bucket):
+            self.client.make_bucket(self.bucket)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        读取对象
+
+        Args:
+            key: 存储键
+
+        Returns:
+            Optional[bytes]: 对象内容，不存在时返回None
+        """
+        from minio.error import S3Error
+
+        try:
+            response = self.client.get_object(self.bucket, self.prefix + key)
+        except S3Error as e:
+            if e.code == "NoSuchKey":
+                return None
+            raise
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+    def put(self, key: str, data: bytes, content_type: str) -> None:
+        """
+        写入对象
+
+        Args:
+            key: 存储键
+            data: 对象内容
+            content_type: 内容类型
+        """
+        self.client.put_object(
+            self.bucket, self.prefix + key, io.BytesIO(data), len(data), content_type=content_type
+        )
+
+
+def get_store(uri: Optional[str] = None):
+    """
+    根据URI创建图片存储
+
+    Args:
+        uri: 本地路径、file:// URI 或 s3://<bucket>/<prefix>，默认使用 IMAGES_STORE
+
+    Returns:
+        LocalImageStore 或 S3ImageStore
+    """
+    uri = uri or settings.IMAGES_STORE
+    parsed = urlparse(uri)
+    if parsed.scheme == "s3":
+        return S3ImageStore(parsed.netloc, parsed.path)
+    if parsed.scheme == "file":
+        return LocalImageStore(parsed.path)
+    return LocalImageStore(uri)
+
+
+def load_manifest(store, checksum: str) -> Optional[Dict[str, Any]]:
+    """
+    读取已存储图片的信息
+
+    Args:
+        store: 图片存储
+        checksum: SHA-256十六进制摘要
+
+    Returns:
+        Optional[Dict[str, Any]]: 图片信息，未存储时返回None
+    """
+    data = store.get(content_key("meta", checksum, "json"))
+    return json.loads(data) if data is not None else None
+
+
+def save_image(store, checksum: str, data: bytes, processed: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    写入原图、缩略图和图片信息
+
+    Args:
+        store: 图片存储
+        checksum: SHA-256十六进制摘要
+        data: 原图内容
+        processed: process_image 的结果
+
+    Returns:
+        Dict[str, Any]: 写入 meta 的图片信息
+    """
+    thumbnails = {}
+    for name, thumb in processed["thumbnails"].items():
+        thumbnails[name] = content_key(f"thumbs/{name}", checksum, "jpg")
+        store.put(thumbnails[name], thumb, "image/jpeg")
+    ext = EXTENSIONS.get(processed["format"], processed["format"].lower())
+    manifest = {
+        "sha256": checksum,
+        "path": content_key("full", checksum, ext),
+        "format": processed["format"],
+        "width": processed["width"],
+        "height": processed["height"],
+        "phash": processed["phash"],
+        "dhash": processed["dhash"],
+        "bytes": len(data),
+        "thumbnails": thumbnails,
+    }
+    store.put(manifest["path"], data, processed["content_type"])
+    store.put(content_key("meta", checksum, "json"), json.dumps(manifest).encode("utf-8"), "application/json")
+    return manifest
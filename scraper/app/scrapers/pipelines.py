@@ -1,15 +1,34 @@
 """
 Scrapy Pipeline模块
 """
+import asyncio
+import hashlib
 import json
 import logging
+import multiprocessing
 import os
-from typing import Dict, Any
+import random
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List
+from urllib.parse import urljoin, urlparse
 
-from sqlalchemy.orm import Session
+from opentelemetry.trace import StatusCode
+from scrapy import Request
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.defer import deferred_from_coro, maybe_deferred_to_future
+from scrapy.utils.httpobj import urlparse_cached
+from twisted.internet.defer import Deferred, DeferredSemaphore, gatherResults
+from twisted.python.failure import Failure
+from twisted.internet.threads import deferToThread
 
+from app.core import tracing
+from app.core.config import settings as app_settings
 from app.db.database import SessionLocal
+from app.db.writer import WriteOperation, get_writer, use_single_writer
 from app import services
+from app.scrapers import images
 from app.utils.logger import get_job_logger
 
 
@@ -101,21 +120,247 @@ class JsonWriterPipeline:
             self.logger.info(f"爬取完成，共写入 {len(self.items)} 条数据到 {output_file}")
 
 
+class ImagePipeline:
+    """
+    下载数据项中的图片，按内容哈希存储并生成缩略图的Pipeline
+
+    图片请求经过引擎下载，与页面请求一样经过限速等下载中间件，每个域名同时下载的图片数
+    另受 IMAGES_MAX_PER_DOMAIN 限制。不同站点或多次爬取得到的同一张图片只存储一次，
+    已存储的图片不再生成缩略图。缩略图在进程池中生成，存储读写在线程中执行，都不阻塞reactor。
+    结果写入数据项的 images 字段，存储键的布局见 app.scrapers.images。
+    """
+    
+    def __init__(
+        self,
+        crawler,
+        store,
+        url_fields: List[str],
+        thumbs: Dict[str, int],
+        max_per_domain: int = 4,
+        max_size: int = 0,
+        workers: int = 2,
+    ):
+        """
+        初始化Pipeline
+        
+        Args:
+            crawler: 爬虫的Crawler，用于通过引擎下载图片
+            store: 图片存储，见 app.scrapers.images.get_store
+            url_fields: 数据项中图片URL的字段，值为URL或URL列表
+            thumbs: 缩略图名称到最长边像素数的映射
+            max_per_domain: 每个域名同时下载的图片数
+            max_size: 单张图片的最大字节数，0表示不限制
+            workers: 生成缩略图的进程数
+        """
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.store = store
+        self.url_fields = url_fields
+        self.thumbs = thumbs
+        self.max_per_domain = max_per_domain
+        self.max_size = max_size
+        self.workers = workers
+        self.pool = None
+        self.domains: Dict[str, DeferredSemaphore] = {}
+        # 正在存储的图片，值为得到图片信息的任务；同时下载到的相同图片共用一个任务，
+        # 任务结束后移除，之后再下载到的相同图片从存储中读取已有的信息
+        self.in_flight: Dict[str, asyncio.Future] = {}
+        self.logger = logging.getLogger(__name__)
+        self.job_logger = None
+    
+    @classmethod
+    def from_crawler(cls, crawler):
+        """
+        从爬虫创建Pipeline，IMAGES_ENABLED 关闭时不加载
+        
+        Args:
+            crawler: 爬虫
+            
+        Returns:
+            ImagePipeline: Pipeline实例
+        """
+        settings = crawler.settings
+        if not settings.getbool("IMAGES_ENABLED"):
+            raise NotConfigured
+        return cls(
+            crawler,
+            store=images.get_store(settings.get("IMAGES_STORE") or app_settings.IMAGES_STORE),
+            url_fields=settings.getlist("IMAGES_URL_FIELDS", ["image_url", "image_urls"]),
+            thumbs=settings.getdict("IMAGES_THUMBS", {"small": 128, "medium": 512}),
+            max_per_domain=settings.getint("IMAGES_MAX_PER_DOMAIN", 4),
+            max_size=settings.getint("IMAGES_MAX_SIZE", 0),
+            workers=settings.getint("IMAGES_THUMBNAIL_WORKERS", 2),
+        )
+    
+    async def open_spider(self, spider):
+        """
+        爬虫开始时调用，准备存储并启动进程池
+        
+        Args:
+            spider: 爬虫
+        """
+        job_id = getattr(spider, "job_id", None)
+        if job_id:
+            self.job_logger = get_job_logger(job_id)
+        await maybe_deferred_to_future(deferToThread(self.store.prepare))
+        # reactor所在进程有多个线程，使用spawn避免fork后子进程中的锁处于不确定状态
+        self.pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+    
+    async def process_item(self, item: Dict[str, Any], spider):
+        """
+        处理爬取的数据项
+        
+        Args:
+            item: 数据项
+            spider: 爬虫
+            
+        Returns:
+            Dict[str, Any]: 处理后的数据项，有图片时增加 images 字段
+        """
+        urls = self._image_urls(item)
+        if urls:
+            item["images"] = await maybe_deferred_to_future(
+                gatherResults([deferred_from_coro(self._fetch(url)) for url in urls])
+            )
+        return item
+    
+    async def close_spider(self, spider):
+        """
+        爬虫结束时调用，关闭进程池
+        
+        Args:
+            spider: 爬虫
+        """
+        if self.pool is not None:
+            await maybe_deferred_to_future(deferToThread(self.pool.shutdown))
+            self.pool = None
+    
+    def _image_urls(self, item: Dict[str, Any]) -> List[str]:
+        """
+        数据项中的图片URL，相对URL按数据项的 url 解析，去除重复
+        """
+        urls = []
+        for field in self.url_fields:
+            values = item.get(field)
+            for value in values if isinstance(values, (list, tuple)) else [values]:
+                if not value or not isinstance(value, str):
+                    continue
+                url = urljoin(item.get("url") or "", value.strip())
+                if urlparse(url).scheme in ("http", "https") and url not in urls:
+                    urls.append(url)
+        return urls
+    
+    async def _fetch(self, url: str) -> Dict[str, Any]:
+        """
+        下载并存储一张图片
+        
+        Args:
+            url: 图片URL
+            
+        Returns:
+            Dict[str, Any]: 图片信息和来源URL；失败时只有 url 和 error
+        """
+        request = Request(url, meta={"dont_cache": True, "download_maxsize": self.max_size})
+        semaphore = self.domains.setdefault(
+            urlparse_cached(request).netloc, DeferredSemaphore(self.max_per_domain)
+        )
+        try:
+            await maybe_deferred_to_future(semaphore.acquire())
+            try:
+                response = await self.crawler.engine.download_async(request)
+            finally:
+                semaphore.release()
+            if response.status != 200:
+                raise ValueError(f"HTTP {response.status}")
+            self.stats.inc_value("images/downloaded")
+            manifest = await self._store(response.body)
+        except Exception as e:
+            self.stats.inc_value("images/failed")
+            message = f"图片处理失败 {url}: {e}"
+            if self.job_logger:
+                self.job_logger.warning(message)
+            else:
+                self.logger.warning(message)
+            return {"url": url, "error": str(e)}
+        return {"url": url, **manifest}
+    
+    async def _store(self, data: bytes) -> Dict[str, Any]:
+        """
+        按内容哈希存储图片，已存储时返回已有的信息
+        
+        Args:
+            data: 图片内容
+            
+        Returns:
+            Dict[str, Any]: 图片信息
+        """
+        checksum = hashlib.sha256(data).hexdigest()
+        task = self.in_flight.get(checksum)
+        if task is None:
+            task = self.in_flight[checksum] = asyncio.ensure_future(self._save(checksum, data))
+            task.add_done_callback(lambda _: self.in_flight.pop(checksum, None))
+        else:
+            self.stats.inc_value("images/duplicate")
+        return await asyncio.shield(task)
+    
+    async def _save(self, checksum: str, data: bytes) -> Dict[str, Any]:
+        """
+        图片未存储时生成缩略图并写入存储
+        
+        Args:
+            checksum: SHA-256十六进制摘要
+            data: 图片内容
+            
+        Returns:
+            Dict[str, Any]: 图片信息
+        """
+        manifest = await maybe_deferred_to_future(deferToThread(images.load_manifest, self.store, checksum))
+        if manifest is not None:
+            self.stats.inc_value("images/duplicate")
+            return manifest
+        processed = await asyncio.wrap_future(self.pool.submit(images.process_image, data, self.thumbs))
+        manifest = await maybe_deferred_to_future(
+            deferToThread(images.save_image, self.store, checksum, data, processed)
+        )
+        self.stats.inc_value("images/stored")
+        self.stats.inc_value("images/stored_bytes", len(data))
+        return manifest
+
+
 class DatabasePipeline:
     """
     将爬取的数据写入数据库的Pipeline
+
+    数据库写操作在线程中执行，不阻塞Twisted reactor；同时进行中的写操作数受
+    DB_PIPELINE_MAX_IN_FLIGHT 限制，写入变慢时process_item等待时间变长，
+    Scrapy随之减缓从调度器取请求，而不是在内存中堆积数据项。
     """
     
-    def __init__(self):
+    def __init__(self, stats=None, max_in_flight: int = 32, metrics=None, trace_sample_rate: float = 0.0):
         """
         初始化Pipeline
+        
+        Args:
+            stats: Scrapy统计收集器
+            max_in_flight: 同时进行中的写操作上限
+            metrics: app.core.metrics 模块，启用Prometheus指标时记录写入耗时
+            trace_sample_rate: 为写操作创建 db.write span的比例，0表示不创建
         """
-        self.db = None
+        self.writer = None
+        self.stats = stats
+        self.metrics = metrics
+        self.trace_sample_rate = trace_sample_rate
+        self.window = DeferredSemaphore(max_in_flight)
+        self.in_flight = 0
+        self.latencies = deque(maxlen=10000)
+        self.progress = None
         self.job_id = None
         self.site_config_id = None
         self.tenant_id = None
         self.items_count = 0
         self.items_failed = 0
+        self.items_reported = 0
+        self.failed_reported = 0
         self.logger = logging.getLogger(__name__)
         self.job_logger = None
     
@@ -130,7 +375,14 @@ class DatabasePipeline:
         Returns:
             DatabasePipeline: Pipeline实例
         """
-        return cls()
+        max_in_flight = crawler.settings.getint("DB_PIPELINE_MAX_IN_FLIGHT", 32)
+        metrics = None
+        if app_settings.METRICS_ENABLED:
+            from app.core import metrics
+        trace_sample_rate = app_settings.TRACING_REQUEST_SAMPLE_RATE if app_settings.TRACING_ENABLED else 0.0
+        return cls(
+            stats=crawler.stats, max_in_flight=max_in_flight, metrics=metrics, trace_sample_rate=trace_sample_rate
+        )
     
     def open_spider(self, spider):
         """
@@ -139,8 +391,9 @@ class DatabasePipeline:
         Args:
             spider: 爬虫
         """
-        # 获取数据库会话
-        self.db = SessionLocal()
+        # SQLite下写操作交给进程内共享的单写线程
+        if use_single_writer():
+            self.writer = get_writer()
         
         # 获取爬虫的任务ID和站点配置ID
         self.job_id = getattr(spider, "job_id", None)
@@ -163,7 +416,7 @@ class DatabasePipeline:
         else:
             self.logger.info(f"DatabasePipeline启动，任务ID: {self.job_id}, 站点配置ID: {self.site_config_id}")
     
-    def process_item(self, item: Dict[str, Any], spider):
+    async def process_item(self, item: Dict[str, Any], spider):
         """
         处理爬取的数据项
         
@@ -174,98 +427,269 @@ class DatabasePipeline:
         Returns:
             Dict[str, Any]: 处理后的数据项
         """
-        if not self.db or not self.job_id or not self.site_config_id or not self.tenant_id:
+        if not self.job_id or not self.site_config_id or not self.tenant_id:
             return item
         
+        started = time.monotonic()
+        await maybe_deferred_to_future(self.window.acquire())
+        self.in_flight += 1
+        if self.stats:
+            self.stats.max_value("database/in_flight_max", self.in_flight)
         try:
-            # 提取必要字段
-            url = item.get("url")
-            page_type = item.get("page_type", "unknown")
-            title = item.get("title") or item.get("name")
+            await maybe_deferred_to_future(self._write(self._item_operation(item)))
+        except Exception as e:
+            self.items_failed += 1
+            if self.stats:
+                self.stats.inc_value("database/items_failed")
+            
+            error_msg = f"写入数据库失败: {e}"
+            if self.job_logger:
+                self.job_logger.error(error_msg)
+            else:
+                self.logger.exception(error_msg)
+            
+            return item
+        finally:
+            self.in_flight -= 1
+            self.window.release()
+            self._record_latency(time.monotonic() - started)
+        
+        self.items_count += 1
+        if self.stats:
+            self.stats.inc_value("database/items_saved")
+        
+        # 更新任务进度，上一次更新尚未完成时跳过
+        if self.items_count % 10 == 0 and self.progress is None:  # 每10条更新一次
+            self.progress = self._report_progress()
+            self.progress.addErrback(self._log_progress_failure)
+            self.progress.addBoth(self._clear_progress)
             
-            # 提取内容
-            content = None
-            if "description" in item:
-                content = item["description"]
-            elif "biography" in item:
-                content = item["biography"]
+            if self.job_logger:
+                self.job_logger.info(f"进度更新: 已处理 {self.items_count} 条数据，失败 {self.items_failed} 条")
+        
+        return item
+    
+    async def close_spider(self, spider):
+        """
+        爬虫结束时调用
+        
+        Args:
+            spider: 爬虫
+        """
+        self._record_latency_stats()
+        if not self.job_id:
+            return
+        
+        try:
+            # 等待进行中的进度更新，再写入最终计数
+            if self.progress is not None:
+                await maybe_deferred_to_future(self.progress)
+            await maybe_deferred_to_future(self._report_progress())
             
-            # 记录处理日志
+            completion_msg = f"爬取完成，共写入 {self.items_count} 条数据到数据库，失败 {self.items_failed} 条"
+            if self.job_logger:
+                self.job_logger.info(completion_msg)
+            else:
+                self.logger.info(completion_msg)
+        except Exception as e:
+            error_msg = f"更新任务状态失败: {e}"
             if self.job_logger:
-                self.job_logger.debug(f"处理数据项: {title or url}, 类型: {page_type}")
+                self.job_logger.error(error_msg)
+            else:
+                self.logger.exception(error_msg)
+    
+    def _item_operation(self, item: Dict[str, Any]) -> WriteOperation:
+        """
+        生成保存数据项的写操作
+        
+        Args:
+            item: 数据项
             
-            # 创建或更新数据项
-            db_item = services.scraped_item.create_or_update(
-                db=self.db,
+        Returns:
+            WriteOperation: 写操作
+        """
+        # 提取必要字段
+        url = item.get("url")
+        page_type = item.get("page_type", "unknown")
+        title = item.get("title") or item.get("name")
+        
+        # 提取内容
+        content = None
+        if "description" in item:
+            content = item["description"]
+        elif "biography" in item:
+            content = item["biography"]
+        
+        # 记录处理日志
+        if self.job_logger:
+            self.job_logger.debug(f"处理数据项: {title or url}, 类型: {page_type}")
+        
+        # 创建或更新数据项，图片Pipeline计算了感知哈希时一并保存
+        data = dict(item)
+        images = [image for image in data.get("images") or () if image.get("phash")]
+        
+        def operation(db):
+            db_obj = services.scraped_item.create_or_update(
+                db=db,
                 url=url,
                 page_type=page_type,
                 title=title,
                 content=content,
-                data=dict(item),
+                data=data,
                 job_id=self.job_id,
                 site_config_id=self.site_config_id,
-                tenant_id=self.tenant_id
+                tenant_id=self.tenant_id,
+                commit=False
             )
+            if images:
+                services.image_match.set_item_hashes(db, item=db_obj, images=images, commit=False)
+            return db_obj
+        
+        return operation
+    
+    def _report_progress(self) -> Deferred:
+        """
+        把上次上报之后新增的数据项数累加到任务计数上
+        
+        同一任务的多个worker或分片各自累加，不会互相覆盖
+        
+        Returns:
+            Deferred: 写入完成后触发
+        """
+        saved = self.items_count - self.items_reported
+        failed = self.items_failed - self.failed_reported
+        d = self._write(lambda db: services.job.increment_counters(
+            db,
+            job_id=self.job_id,
+            items_scraped=saved + failed,
+            items_saved=saved,
+            items_failed=failed,
+            commit=False,
+        ))
+        d.addCallback(self._progress_reported, saved, failed)
+        return d
+    
+    def _progress_reported(self, result: Any, saved: int, failed: int) -> Any:
+        """
+        记录已上报的数据项数
+        """
+        self.items_reported += saved
+        self.failed_reported += failed
+        return result
+    
+    def _write(self, operation: WriteOperation) -> Deferred:
+        """
+        在reactor线程之外执行写操作并提交
+        
+        Args:
+            operation: 写操作，只flush不提交
             
-            self.items_count += 1
+        Returns:
+            Deferred: 提交后得到写操作的返回值
+        """
+        span = None
+        if self.trace_sample_rate and random.random() < self.trace_sample_rate:
+            span = tracing.get_tracer().start_span(
+                "db.write", attributes={"db.writer": "thread" if self.writer is None else "single"}
+            )
+        
+        if self.writer is None:
+            d = deferToThread(self._write_in_thread, operation)
+        else:
+            from twisted.internet import reactor
             
-            # 更新任务进度
-            if self.items_count % 10 == 0:  # 每10条更新一次
-                services.job.update_status(
-                    db=self.db,
-                    job_id=self.job_id,
-                    status_update={
-                        "items_scraped": self.items_count,
-                        "items_saved": self.items_count,
-                        "items_failed": self.items_failed
-                    }
-                )
-                
-                if self.job_logger:
-                    self.job_logger.info(f"进度更新: 已处理 {self.items_count} 条数据，失败 {self.items_failed} 条")
+            d = Deferred()
             
-            return item
-        except Exception as e:
-            self.items_failed += 1
+            def done(future):
+                error = future.exception()
+                if error is None:
+                    d.callback(future.result())
+                else:
+                    d.errback(error)
             
-            error_msg = f"写入数据库失败: {e}"
-            if self.job_logger:
-                self.job_logger.error(error_msg)
-            else:
-                self.logger.exception(error_msg)
+            self.writer.submit(operation).add_done_callback(
+                lambda future: reactor.callFromThread(done, future)
+            )
+        if span is not None:
+            d.addBoth(self._end_span, span)
+        return d
+    
+    @staticmethod
+    def _end_span(result: Any, span) -> Any:
+        """
+        写操作完成后结束span，失败时记录异常
+        """
+        if isinstance(result, Failure):
+            span.record_exception(result.value)
+            span.set_status(StatusCode.ERROR)
+        span.end()
+        return result
+    
+    @staticmethod
+    def _write_in_thread(operation: WriteOperation) -> Any:
+        """
+        在线程池中使用独立会话执行写操作并提交
+        
+        Args:
+            operation: 写操作
             
-            return item
+        Returns:
+            Any: 写操作的返回值
+        """
+        db = SessionLocal(expire_on_commit=False)
+        try:
+            result = operation(db)
+            db.commit()
+            return result
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
     
-    def close_spider(self, spider):
+    def _record_latency(self, seconds: float) -> None:
         """
-        爬虫结束时调用
+        记录单个数据项从进入Pipeline到写入完成的耗时
         
         Args:
-            spider: 爬虫
+            seconds: 耗时（秒）
         """
-        if self.db and self.job_id:
-            try:
-                # 更新任务状态
-                services.job.update_status(
-                    db=self.db,
-                    job_id=self.job_id,
-                    status_update={
-                        "items_scraped": self.items_count,
-                        "items_saved": self.items_count,
-                        "items_failed": self.items_failed
-                    }
-                )
-                
-                completion_msg = f"爬取完成，共写入 {self.items_count} 条数据到数据库，失败 {self.items_failed} 条"
-                if self.job_logger:
-                    self.job_logger.info(completion_msg)
-                else:
-                    self.logger.info(completion_msg)
-            except Exception as e:
-                error_msg = f"更新任务状态失败: {e}"
-                if self.job_logger:
-                    self.job_logger.error(error_msg)
-                else:
-                    self.logger.exception(error_msg)
-            finally:
-                self.db.close() 
\ No newline at end of file
+        self.latencies.append(seconds)
+        if self.stats:
+            self.stats.max_value("database/write_latency_max_ms", round(seconds * 1000, 3))
+        if self.metrics is not None:
+            self.metrics.PIPELINE_LATENCY.labels(str(self.job_id), "database").observe(seconds)
+    
+    def _record_latency_stats(self) -> None:
+        """
+        将最近数据项的写入耗时分位数写入统计
+        """
+        if not self.stats or not self.latencies:
+            return
+        latencies = sorted(self.latencies)
+        for name, quantile in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+            index = min(len(latencies) - 1, int(len(latencies) * quantile))
+            self.stats.set_value(f"database/write_latency_{name}_ms", round(latencies[index] * 1000, 3))
+        self.stats.set_value(
+            "database/write_latency_avg_ms", round(sum(latencies) / len(latencies) * 1000, 3)
+        )
+    
+    def _log_progress_failure(self, failure) -> None:
+        """
+        记录进度更新失败
+        
+        Args:
+            failure: 失败信息
+        """
+        error_msg = f"更新任务进度失败: {failure.getErrorMessage()}"
+        if self.job_logger:
+            self.job_logger.error(error_msg)
+        else:
+            self.logger.error(error_msg)
+    
+    def _clear_progress(self, result: Any) -> Any:
+        """
+        进度更新完成后清除标记
+        """
+        self.progress = None
+        return result
@@ -6,6 +6,7 @@ from typing import Dict, List, Optional, Any, Union
 
 import scrapy
 from scrapy.http import Request, Response
+from scrapy.utils.misc import arg_to_iter
 from scrapy_playwright.page import PageMethod
 
 from app.models.site import SiteConfig
@@ -164,7 +165,8 @@ class PlaywrightSpider(BaseSpider):
             # Use base class parsing method
             self.logger.info("Starting to parse page content")
             items_count = 0
-            for item in self.parse_item(new_response):
+            # parse_item returns a single item dict
+            for item in arg_to_iter(self.parse_item(new_response)):
                 items_count += 1
                 yield item
             
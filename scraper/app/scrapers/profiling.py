@@ -0,0 +1,370 @@
+"""
+爬取CPU性能分析
+
+任务配置 {"profile": true} 时，爬取进程在分析器下运行，结果保存在
+CRAWL_PROFILE_DIR/job_<id> 中，通过 GET /jobs/{id}/profile 查看::
+
+    cprofile   确定性分析（cProfile），只覆盖reactor所在的主线程：<pid>.pstats
+    sampling   每 PROFILE_SAMPLE_INTERVAL 秒采样一次所有线程的调用栈：<pid>.collapsed，
+               每行为 "线程;外层帧;...;内层帧 次数"，可直接交给 flamegraph.pl 或 speedscope
+
+true 同时运行两种分析器；只需要其中一种时写模式名，例如 {"profile": "sampling"}，
+采样的开销远小于cProfile。未配置时爬取不经过这里，没有任何额外开销。
+
+MemoryWatch 扩展记录的内存快照对比（<pid>.memory.jsonl）也保存在同一目录中，
+通过 GET /jobs/{id}/profile?format=memory 查看。
+
+分片或多worker的任务每个爬取进程各写一组文件，读取时合并；任务重新开始（不是从检查点
+恢复）时删除上一次运行的结果。
+"""
+import cProfile
+import io
+import json
+import logging
+import marshal
+import os
+import pstats
+import shutil
+import sys
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings as app_settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ("cprofile", "sampling")
+PSTATS_SUFFIX = ".pstats"
+COLLAPSED_SUFFIX = ".collapsed"
+MEMORY_SUFFIX = ".memory.jsonl"
+# 叶子帧为这些函数的线程处于空闲等待，不计入采样
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("epollreactor.py", "doPoll"),
+    ("unix_events.py", "_do_waitpid"),
+}
+
+
+def profile_modes(value: Any) -> Tuple[str, ...]:
+    """
+    解析任务配置中的 profile 选项
+
+    Args:
+        value: 配置值：true、模式名或模式名列表
+
+    Returns:
+        Tuple[str, ...]: 启用的分析模式，未启用时为空
+
+    Raises:
+        ValueError: 选项类型不是布尔值、字符串或字符串列表，或包含未知的分析模式
+    """
+    if value is None or value is False:
+        return ()
+    if value is True:
+        return PROFILE_MODES
+    if isinstance(value, str):
+        modes = (value,) if value else ()
+    elif isinstance(value, list) and all(isinstance(mode, str) for mode in value):
+        modes = tuple(value)
+    else:
+        raise ValueError(f"profile 应为布尔值、模式名或模式名列表，实际为 {type(value).__name__}")
+    unknown = set(modes) - set(PROFILE_MODES)
+    if unknown:
+        raise ValueError(f"未知的分析模式: {', '.join(sorted(unknown))}")
+    return modes
+
+
+def profile_dir(job_id: int) -> str:
+    """
+    获取任务的分析结果目录
+
+    Args:
+        job_id: 任务ID
+
+    Returns:
+        str: 目录
+    """
+    return os.path.join(app_settings.CRAWL_PROFILE_DIR, f"job_{job_id}")
+
+
+def remove_profile(job_id: int) -> None:
+    """
+    删除任务的分析结果
+
+    Args:
+        job_id: 任务ID
+    """
+    shutil.rmtree(profile_dir(job_id), ignore_errors=True)
+
+
+def _frame_label(frame) -> str:
+    """
+    调用栈中一帧的名称：文件名:函数名
+    """
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class StackSampler:
+    """
+    定期采样所有线程的调用栈，按折叠后的调用栈计数
+
+    在单独的线程中运行，采样时只读取 sys._current_frames()，被分析的代码不需要任何改动。
+    """
+
+    def __init__(self, interval: float):
+        """
+        初始化采样器
+
+        Args:
+            interval: 采样间隔（秒）
+        """
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self) -> None:
+        """
+        开始采样
+        """
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        停止采样并等待采样线程结束
+        """
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        """
+        采样循环
+        """
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                labels.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(labels))] += 1
+
+    def collapsed(self) -> str:
+        """
+        以折叠调用栈格式输出
+
+        Returns:
+            str: 每行 "调用栈 次数"
+        """
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def run_profiled(job_id: int, modes: Tuple[str, ...], func: Callable[[], Any]) -> Any:
+    """
+    在分析器下运行函数，结果写入任务的分析结果目录
+
+    Args:
+        job_id: 任务ID
+        modes: 分析模式，见 profile_modes()
+        func: 要运行的函数
+
+    Returns:
+        Any: 函数的返回值
+    """
+    profiler = cProfile.Profile() if "cprofile" in modes else None
+    sampler = StackSampler(app_settings.PROFILE_SAMPLE_INTERVAL) if "sampling" in modes else None
+    if sampler:
+        sampler.start()
+    if profiler:
+        profiler.enable()
+    try:
+        return func()
+    finally:
+        if profiler:
+            profiler.disable()
+        if sampler:
+            sampler.stop()
+        path = profile_dir(job_id)
+        os.makedirs(path, exist_ok=True)
+        prefix = os.path.join(path, str(os.getpid()))
+        if profiler:
+            profiler.dump_stats(prefix + PSTATS_SUFFIX)
+        if sampler:
+            with open(prefix + COLLAPSED_SUFFIX, "w", encoding="utf-8") as f:
+                f.write(sampler.collapsed())
+        logger.info(f"任务 {job_id} 的性能分析结果已保存到 {path}")
+
+
+def _files(job_id: int, suffix: str) -> List[str]:
+    """
+    列出任务分析结果目录中指定类型的文件
+    """
+    path = profile_dir(job_id)
+    if not os.path.isdir(path):
+        return []
+    return sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith(suffix))
+
+
+def load_pstats(job_id: int) -> Optional[pstats.Stats]:
+    """
+    读取并合并任务各爬取进程的cProfile结果
+
+    Args:
+        job_id: 任务ID
+
+    Returns:
+        Optional[pstats.Stats]: 合并后的统计，没有结果时返回None
+    """
+    files = _files(job_id, PSTATS_SUFFIX)
+    if not files:
+        return None
+    return pstats.Stats(*files, stream=io.StringIO())
+
+
+def dump_pstats(stats: pstats.Stats) -> bytes:
+    """
+    把统计序列化为pstats文件格式，可用 pstats.Stats 或 snakeviz 打开
+
+    Args:
+        stats: 统计
+
+    Returns:
+        bytes: 文件内容
+    """
+    return marshal.dumps(stats.stats)
+
+
+def load_collapsed(job_id: int) -> Optional[str]:
+    """
+    读取并合并任务各爬取进程的采样结果
+
+    Args:
+        job_id: 任务ID
+
+    Returns:
+        Optional[str]: 折叠调用栈文本，没有结果时返回None
+    """
+    files = _files(job_id, COLLAPSED_SUFFIX)
+    if not files:
+        return None
+    stacks: Counter = Counter()
+    for name in files:
+        with open(name, encoding="utf-8") as f:
+            for line in f:
+                stack, _, count = line.rstrip("\n").rpartition(" ")
+                if stack and count.isdigit():
+                    stacks[stack] += int(count)
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def summarize(job_id: int, limit: int = 30) -> Optional[Dict[str, Any]]:
+    """
+    汇总任务的分析结果
+
+    Args:
+        job_id: 任务ID
+        limit: 返回的函数数量
+
+    Returns:
+        Optional[Dict[str, Any]]: 按累计耗时排序的函数，以及按自身采样数排序的函数；
+            没有结果时返回None
+    """
+    stats = load_pstats(job_id)
+    collapsed = load_collapsed(job_id)
+    if stats is None and collapsed is None:
+        return None
+
+    summary: Dict[str, Any] = {"job_id": job_id, "modes": []}
+    if stats is not None:
+        summary["modes"].append("cprofile")
+        rows = []
+        for (filename, line, function), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+            rows.append({
+                "function": function,
+                "file": filename,
+                "line": line,
+                "calls": ncalls,
+                "total_seconds": round(tottime, 6),
+                "cumulative_seconds": round(cumtime, 6),
+            })
+        rows.sort(key=lambda row: row["cumulative_seconds"], reverse=True)
+        summary["cprofile"] = {
+            "total_calls": stats.total_calls,
+            "total_seconds": round(stats.total_tt, 6),
+            "functions": rows[:limit],
+        }
+    if collapsed is not None:
+        summary["modes"].append("sampling")
+        own: Counter = Counter()
+        total = 0
+        for line in collapsed.splitlines():
+            stack, _, count = line.rpartition(" ")
+            own[stack.rsplit(";", 1)[-1]] += int(count)
+            total += int(count)
+        summary["sampling"] = {
+            "samples": total,
+            "functions": [
+                {"function": frame, "samples": count, "ratio": round(count / total, 4)}
+                for frame, count in own.most_common(limit)
+            ],
+        }
+    return summary
+
+
+def current_rss_bytes() -> Optional[int]:
+    """
+    获取当前进程的常驻内存（仅Linux）
+
+    Returns:
+        Optional[int]: 字节数，无法读取时返回None
+    """
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def append_memory_record(job_id: int, record: Dict[str, Any]) -> None:
+    """
+    追加一条内存快照记录
+
+    Args:
+        job_id: 任务ID
+        record: 记录，需可JSON序列化
+    """
+    path = profile_dir(job_id)
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, f"{os.getpid()}{MEMORY_SUFFIX}"), "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def load_memory_records(job_id: int) -> Optional[List[Dict[str, Any]]]:
+    """
+    读取任务各爬取进程的内存快照记录，按时间排序
+
+    Args:
+        job_id: 任务ID
+
+    Returns:
+        Optional[List[Dict[str, Any]]]: 记录列表，没有记录时返回None
+    """
+    files = _files(job_id, MEMORY_SUFFIX)
+    if not files:
+        return None
+    records = []
+    for name in files:
+        with open(name, encoding="utf-8") as f:
+            records.extend(json.loads(line) for line in f if line.strip())
+    return sorted(records, key=lambda record: record.get("timestamp", 0))
@@ -12,7 +12,7 @@ NEWSPIDER_MODULE = 'app.scrapers.spiders'
 USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
 ROBOTSTXT_OBEY = False
 CONCURRENT_REQUESTS = 16
-DOWNLOAD_DELAY = 1
+DOWNLOAD_DELAY = 0  # 请求间隔由 DomainThrottleMiddleware 按域名控制
 COOKIES_ENABLED = True
 TELNETCONSOLE_ENABLED = False
 
@@ -20,15 +20,60 @@ TELNETCONSOLE_ENABLED = False
 DOWNLOADER_MIDDLEWARES = {
     'scrapy.downloadermiddlewares.useragent.UserAgentMiddleware': None,
     'scrapy.downloadermiddlewares.retry.RetryMiddleware': 90,
-    'scrapy_playwright.middleware.PlaywrightMiddleware': 100,
+    # 排在HttpCacheMiddleware（900）之后，缓存命中的请求不消耗令牌
+    'app.scrapers.throttle.DomainThrottleMiddleware': 950,
 }
 
+# Playwright下载处理器：meta中带 playwright=True 的请求用浏览器渲染，其余请求照常下载
+DOWNLOAD_HANDLERS = {
+    'http': 'app.scrapers.handlers.PlaywrightDownloadHandler',
+    'https': 'app.scrapers.handlers.PlaywrightDownloadHandler',
+}
+
+# 按域名自适应限速，令牌桶在所有爬取任务之间共享
+# 站点可以在 SiteConfig.config["throttle"] 中覆盖，例如 {"max_rate": 2}
+THROTTLE_ENABLED = True
+THROTTLE_BACKEND = 'redis'  # redis 或 memory（仅本进程内共享）
+THROTTLE_REDIS_URL = None  # 默认使用应用配置中的Redis
+THROTTLE_REDIS_RETRY_INTERVAL = 30  # Redis出错后改用进程内令牌桶的时间（秒）
+THROTTLE_START_RATE = 1.0  # 初始速率（请求/秒）
+THROTTLE_MIN_RATE = 0.1
+THROTTLE_MAX_RATE = 8.0
+THROTTLE_BURST = 2
+THROTTLE_RATE_STEP = 0.1  # 响应正常时每次提高的速率
+THROTTLE_BACKOFF_FACTOR = 0.5  # 收到429/503时速率乘以的系数
+THROTTLE_TARGET_LATENCY = 2.0  # 目标响应延迟（秒）
+THROTTLE_MAX_CONCURRENCY = 8  # 单个域名的最大并发请求数
+THROTTLE_MAX_RETRY_AFTER = 600  # 遵守Retry-After的最长暂停时间（秒）
+
 # 项目管道
 ITEM_PIPELINES = {
+    'app.scrapers.pipelines.ImagePipeline': 250,
     'app.scrapers.pipelines.JsonWriterPipeline': 300,
     'app.scrapers.pipelines.DatabasePipeline': 400,
 }
 
+# 数据库Pipeline同时进行中的写操作上限，写入跟不上时对爬取形成反压
+DB_PIPELINE_MAX_IN_FLIGHT = 32
+
+# 图片Pipeline：下载数据项中的图片，按内容哈希存储到应用配置的 IMAGES_STORE 并生成缩略图
+# 任务配置 {"images": true} 可按任务开启
+IMAGES_ENABLED = False
+IMAGES_URL_FIELDS = ['image_url', 'image_urls']
+IMAGES_THUMBS = {'small': 128, 'medium': 512}  # 缩略图名称和最长边像素数
+IMAGES_MAX_PER_DOMAIN = 4  # 每个域名同时下载的图片数
+IMAGES_MAX_SIZE = 20 * 1024 * 1024  # 单张图片的最大字节数
+IMAGES_THUMBNAIL_WORKERS = 2  # 生成缩略图的进程数
+
+# 分布式爬取队列（任务配置 workers > 1 时启用，见 app.scrapers.frontier）
+FRONTIER_BACKEND = 'redis'  # redis 或 memory（仅本进程内共享）
+FRONTIER_REDIS_URL = None  # 默认使用应用配置中的Redis
+FRONTIER_IDLE_TIMEOUT = 15  # 队列为空且其他worker空闲超过该时间（秒）后结束
+FRONTIER_HEARTBEAT_INTERVAL = 5  # 写入存活和忙碌心跳的间隔（秒）
+FRONTIER_SYNC_INTERVAL = 0.5  # 批量同步本地缓存与共享队列的间隔（秒）
+FRONTIER_BATCH_SIZE = None  # 每次从共享队列取出的请求数，默认等于 CONCURRENT_REQUESTS
+FRONTIER_LEASE_TIMEOUT = 60  # worker失联超过该时间（秒）后，其租用的请求放回队列
+
 # 重试设置
 RETRY_ENABLED = True
 RETRY_TIMES = 3
@@ -54,8 +99,44 @@ LOG_ENCODING = 'utf-8'
 # 扩展设置
 EXTENSIONS = {
     'scrapy.extensions.logstats.LogStats': None,  # 禁用默认的日志统计
+    'app.scrapers.extensions.JobHeartbeat': 500,
+    'app.scrapers.extensions.JobCancellation': 500,
+    'app.scrapers.extensions.CrawlCheckpoint': 500,
+    'app.scrapers.extensions.CrawlMetrics': 500,
+    'app.scrapers.extensions.ReactorLagMonitor': 500,
+    'app.scrapers.extensions.MemoryWatch': 500,
+    'app.scrapers.extensions.CrawlTracing': 500,
 }
 
+# 任务心跳，间隔和超时见应用配置的 HEARTBEAT_*
+JOB_HEARTBEAT_ENABLED = True
+
+# 任务取消：定期检查任务状态，取消后关闭爬虫
+JOB_CANCEL_ENABLED = True
+JOB_CANCEL_POLL_INTERVAL = 2  # 检查间隔（秒）
+
+# 爬取检查点（由 app.scrapers.checkpoint.checkpoint_settings 按任务启用并设置JOBDIR）
+CHECKPOINT_ENABLED = False
+CHECKPOINT_INTERVAL = 60  # 保存快照的间隔（秒）
+
+# reactor延迟监控：延迟分位数写入统计 reactor/lag_*，阻塞超过阈值时记录调用栈
+REACTOR_LAG_ENABLED = True
+REACTOR_LAG_INTERVAL = 0.1  # 测量间隔（秒）
+REACTOR_LAG_THRESHOLD = 0.5  # 记录调用栈的阻塞时长（秒）
+
+# 内存监控：RSS相对开始时的增长越过阈值时记录快照，启用tracemalloc时附带增长最多的分配
+# 任务配置 {"tracemalloc": true} 可按任务开启tracemalloc
+MEMWATCH_ENABLED = True
+MEMWATCH_INTERVAL = 10  # 采样间隔（秒）
+MEMWATCH_GROWTH_THRESHOLDS_MB = [256, 512, 1024, 2048]
+MEMWATCH_TRACEMALLOC = False
+MEMWATCH_TRACEMALLOC_FRAMES = 10  # tracemalloc记录的调用栈深度
+MEMWATCH_TOP_N = 25  # 快照对比中记录的分配位置数
+MEMWATCH_HARD_LIMIT_MB = 0  # 超过该RSS（MB）时关闭爬虫，任务从检查点在新进程中继续；0表示不限制
+
+# Prometheus指标（应用配置 METRICS_ENABLED 开启时由 CrawlMetrics 记录，见 app.core.metrics）
+METRICS_QUEUE_INTERVAL = 5  # 采样调度队列长度的间隔（秒）
+
 # Playwright设置
 PLAYWRIGHT_LAUNCH_OPTIONS = {
     'headless': True,
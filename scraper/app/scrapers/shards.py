@@ -0,0 +1,65 @@
+"""
+任务分片模块
+
+任务配置 shard_by 指定分片方式后，一个任务拆成多个分片并行爬取，每个分片只爬取
+自己的起始URL：
+
+- start_url: 站点配置的每个起始URL一个分片
+- category: 每个分类一个分片，分类取自任务配置或站点配置的 categories，
+  格式为 {"分类名": URL或URL列表}
+- page_range: 按页码范围分片，任务配置提供 page_url（含 {page} 占位符）、
+  first_page（默认1）、last_page 和 pages_per_shard（默认10）；分片内不跟随下一页链接，
+  避免与其他分片重叠
+"""
+from typing import Any, Dict, List
+
+from app.models.site import SiteConfig
+
+SHARD_MODES = ("start_url", "category", "page_range")
+
+
+def plan_shards(site_config: SiteConfig, job_config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    按任务配置把任务拆成分片
+
+    Args:
+        site_config: 站点配置
+        job_config: 任务配置
+
+    Returns:
+        List[Dict[str, Any]]: 分片列表，每个分片包含 index、label 和传给爬虫的 spider_kwargs；
+            未配置分片时为空列表
+    """
+    mode = job_config.get("shard_by")
+    if not mode:
+        return []
+
+    if mode == "start_url":
+        shards = [(url, [url], {}) for url in site_config.start_urls or []]
+    elif mode == "category":
+        categories = job_config.get("categories") or (site_config.config or {}).get("categories") or {}
+        shards = [
+            (name, [urls] if isinstance(urls, str) else list(urls), {})
+            for name, urls in categories.items()
+        ]
+    elif mode == "page_range":
+        page_url = job_config["page_url"]
+        first_page = int(job_config.get("first_page", 1))
+        last_page = int(job_config["last_page"])
+        pages_per_shard = int(job_config.get("pages_per_shard", 10))
+        shards = []
+        for start in range(first_page, last_page + 1, pages_per_shard):
+            end = min(last_page, start + pages_per_shard - 1)
+            urls = [page_url.format(page=page) for page in range(start, end + 1)]
+            shards.append((f"第 {start}-{end} 页", urls, {"next_page_xpath": ""}))
+    else:
+        raise ValueError(f"未知的分片方式: {mode}，可选: {', '.join(SHARD_MODES)}")
+
+    return [
+        {
+            "index": index,
+            "label": label,
+            "spider_kwargs": {"start_urls": start_urls, **extra},
+        }
+        for index, (label, start_urls, extra) in enumerate(shards)
+    ]
@@ -0,0 +1,545 @@
+"""
+按域名的自适应限速模块
+
+同一主机（或集群）上所有爬取任务共享每个域名的令牌桶：请求发出前先取令牌，
+取不到就等待。令牌生成速率根据响应自适应调整：429/503时按比例降低并遵守
+Retry-After，响应延迟超过目标时小幅降低，否则缓慢提高。令牌桶状态保存在Redis
+中供多个进程共享，Redis不可用时退回到进程内实现；Redis调用在线程池中执行，不阻塞reactor，
+爬取中途Redis出错时暂时改用进程内令牌桶，THROTTLE_REDIS_RETRY_INTERVAL 秒后再尝试Redis。
+
+站点可以在 SiteConfig.config["throttle"] 中覆盖默认参数，例如::
+
+    {"throttle": {"start_rate": 0.5, "max_rate": 2, "max_concurrency": 2}}
+"""
+import logging
+import math
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+from redis.exceptions import RedisError
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.defer import maybe_deferred_to_future
+from scrapy.utils.httpobj import urlparse_cached
+from twisted.internet.task import deferLater
+from twisted.internet.threads import deferToThread
+
+from app.core.config import settings as app_settings
+
+logger = logging.getLogger(__name__)
+
+# 返回这些状态码说明站点在限流或过载
+BACKOFF_HTTP_CODES = (429, 503)
+
+
+class ThrottlePolicy:
+    """
+    单个站点的限速参数
+    """
+    # 参数名 -> Scrapy设置名
+    SETTINGS = {
+        "start_rate": "THROTTLE_START_RATE",
+        "min_rate": "THROTTLE_MIN_RATE",
+        "max_rate": "THROTTLE_MAX_RATE",
+        "burst": "THROTTLE_BURST",
+        "rate_step": "THROTTLE_RATE_STEP",
+        "backoff_factor": "THROTTLE_BACKOFF_FACTOR",
+        "target_latency": "THROTTLE_TARGET_LATENCY",
+        "max_concurrency": "THROTTLE_MAX_CONCURRENCY",
+        "max_retry_after": "THROTTLE_MAX_RETRY_AFTER",
+    }
+
+    def __init__(
+        self,
+        start_rate: float = 1.0,
+        min_rate: float = 0.1,
+        max_rate: float = 8.0,
+        burst: float = 2.0,
+        rate_step: float = 0.1,
+        backoff_factor: float = 0.5,
+        target_latency: float = 2.0,
+        max_concurrency: int = 8,
+        max_retry_after: float = 600.0,
+    ):
+        """
+        初始化限速参数
+
+        Args:
+            start_rate: 初始速率（请求/秒）
+            min_rate: 最低速率（请求/秒）
+            max_rate: 最高速率（请求/秒）
+            burst: 令牌桶容量，即允许的突发请求数
+            rate_step: 响应正常时每次提高的速率（请求/秒）
+            backoff_factor: 收到429/503时速率乘以的系数
+            target_latency: 目标响应延迟（秒），超过时降低速率
+            max_concurrency: 单个域名的最大并发请求数
+            max_retry_after: 遵守Retry-After的最长暂停时间（秒）
+        """
+        self.start_rate = float(start_rate)
+        self.min_rate = float(min_rate)
+        self.max_rate = float(max_rate)
+        self.burst = float(burst)
+        self.rate_step = float(rate_step)
+        self.backoff_factor = float(backoff_factor)
+        self.target_latency = float(target_latency)
+        self.max_concurrency = int(max_concurrency)
+        self.max_retry_after = float(max_retry_after)
+
+    @classmethod
+    def from_settings(cls, settings, overrides: Optional[Dict[str, Any]] = None) -> "ThrottlePolicy":
+        """
+        从Scrapy设置和站点覆盖参数创建限速参数
+
+        Args:
+            settings: Scrapy设置
+            overrides: 站点覆盖参数（SiteConfig.config["throttle"]）
+
+        Returns:
+            ThrottlePolicy: 限速参数
+        """
+        defaults = cls()
+        params = {
+            name: settings.getfloat(setting, getattr(defaults, name))
+            for name, setting in cls.SETTINGS.items()
+        }
+        for name, value in (overrides or {}).items():
+            if name not in cls.SETTINGS:
+                logger.warning(f"忽略未知的限速参数: {name}")
+                continue
+            params[name] = value
+        return cls(**params)
+
+
+class MemoryTokenBucket:
+    """
+    进程内令牌桶，Redis不可用时使用
+
+    同一进程内的所有爬虫共享模块级实例 memory_bucket。
+    """
+
+    def __init__(self, clock=time.monotonic):
+        """
+        初始化令牌桶
+
+        Args:
+            clock: 时钟函数，返回秒
+        """
+        self.clock = clock
+        self._buckets: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, key: str, policy: ThrottlePolicy) -> Dict[str, float]:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = {
+                "tokens": policy.burst,
+                "ts": self.clock(),
+                "rate": policy.start_rate,
+                "blocked_until": 0.0,
+            }
+            self._buckets[key] = bucket
+        return bucket
+
+    def acquire(self, key: str, policy: ThrottlePolicy) -> float:
+        """
+        尝试取一个令牌
+
+        Args:
+            key: 域名
+            policy: 限速参数
+
+        Returns:
+            float: 0表示已取得令牌，否则为需要等待的秒数
+        """
+        with self._lock:
+            bucket = self._bucket(key, policy)
+            now = self.clock()
+            if bucket["blocked_until"] > now:
+                return bucket["blocked_until"] - now
+            rate = min(bucket["rate"], policy.max_rate)
+            tokens = min(policy.burst, bucket["tokens"] + (now - bucket["ts"]) * rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            bucket.update(tokens=tokens, ts=now, rate=rate)
+            return wait
+
+    def adjust(self, key: str, policy: ThrottlePolicy, factor: float = 1.0, step: float = 0.0) -> float:
+        """
+        调整令牌生成速率：rate = rate * factor + step，并限制在最低和最高速率之间
+
+        Args:
+            key: 域名
+            policy: 限速参数
+            factor: 乘数
+            step: 增量
+
+        Returns:
+            float: 调整后的速率
+        """
+        with self._lock:
+            bucket = self._bucket(key, policy)
+            rate = bucket["rate"] * factor + step
+            bucket["rate"] = max(policy.min_rate, min(policy.max_rate, rate))
+            return bucket["rate"]
+
+    def block(self, key: str, policy: ThrottlePolicy, seconds: float) -> None:
+        """
+        暂停域名的请求
+
+        Args:
+            key: 域名
+            policy: 限速参数
+            seconds: 暂停时间（秒）
+        """
+        with self._lock:
+            bucket = self._bucket(key, policy)
+            bucket["blocked_until"] = max(bucket["blocked_until"], self.clock() + seconds)
+
+
+class RedisTokenBucket:
+    """
+    Redis令牌桶，在所有使用同一Redis的爬取任务之间共享
+
+    每个域名一个hash，读改写在Lua脚本中原子完成，时间取自Redis服务器，避免各
+    主机时钟不一致。
+    """
+
+    ACQUIRE_SCRIPT = """
+    local t = redis.call('TIME')
+    local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+    local burst = tonumber(ARGV[3])
+    local b = redis.call('HMGET', KEYS[1], 'tokens', 'ts', 'rate', 'blocked_until')
+    local blocked_until = tonumber(b[4]) or 0
+    if blocked_until > now then
+        return tostring(blocked_until - now)
+    end
+    local rate = math.min(tonumber(b[3]) or tonumber(ARGV[1]), tonumber(ARGV[2]))
+    local ts = tonumber(b[2]) or now
+    local tokens = math.min(burst, (tonumber(b[1]) or burst) + (now - ts) * rate)
+    local wait = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        wait = (1 - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now), 'rate', tostring(rate))
+    redis.call('EXPIRE', KEYS[1], ARGV[4])
+    return tostring(wait)
+    """
+
+    ADJUST_SCRIPT = """
+    local rate = tonumber(redis.call('HGET', KEYS[1], 'rate')) or tonumber(ARGV[1])
+    rate = rate * tonumber(ARGV[2]) + tonumber(ARGV[3])
+    rate = math.max(tonumber(ARGV[4]), math.min(tonumber(ARGV[5]), rate))
+    redis.call('HSET', KEYS[1], 'rate', tostring(rate))
+    redis.call('EXPIRE', KEYS[1], ARGV[6])
+    return tostring(rate)
+    """
+
+    BLOCK_SCRIPT = """
+    local t = redis.call('TIME')
+    local blocked_until = tonumber(t[1]) + tonumber(t[2]) / 1000000 + tonumber(ARGV[1])
+    if blocked_until > (tonumber(redis.call('HGET', KEYS[1], 'blocked_until')) or 0) then
+        redis.call('HSET', KEYS[1], 'blocked_until', tostring(blocked_until))
+    end
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+    return 1
+    """
+
+    def __init__(self, client, prefix: str = "aida:throttle", ttl: int = 86400):
+        """
+        初始化令牌桶
+
+        Args:
+            client: redis.Redis客户端
+            prefix: 键前缀
+            ttl: 域名空闲多久后删除状态（秒）
+        """
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+        self._acquire = client.register_script(self.ACQUIRE_SCRIPT)
+        self._adjust = client.register_script(self.ADJUST_SCRIPT)
+        self._block = client.register_script(self.BLOCK_SCRIPT)
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    def acquire(self, key: str, policy: ThrottlePolicy) -> float:
+        """
+        尝试取一个令牌
+
+        Args:
+            key: 域名
+            policy: 限速参数
+
+        Returns:
+            float: 0表示已取得令牌，否则为需要等待的秒数
+        """
+        wait = self._acquire(
+            keys=[self._key(key)],
+            args=[policy.start_rate, policy.max_rate, policy.burst, self.ttl],
+        )
+        return float(wait)
+
+    def adjust(self, key: str, policy: ThrottlePolicy, factor: float = 1.0, step: float = 0.0) -> float:
+        """
+        调整令牌生成速率：rate = rate * factor + step，并限制在最低和最高速率之间
+
+        Args:
+            key: 域名
+            policy: 限速参数
+            factor: 乘数
+            step: 增量
+
+        Returns:
+            float: 调整后的速率
+        """
+        rate = self._adjust(
+            keys=[self._key(key)],
+            args=[policy.start_rate, factor, step, policy.min_rate, policy.max_rate, self.ttl],
+        )
+        return float(rate)
+
+    def block(self, key: str, policy: ThrottlePolicy, seconds: float) -> None:
+        """
+        暂停域名的请求
+
+        Args:
+            key: 域名
+            policy: 限速参数
+            seconds: 暂停时间（秒）
+        """
+        self._block(keys=[self._key(key)], args=[seconds, self.ttl])
+
+
+# 进程内共享的令牌桶
+memory_bucket = MemoryTokenBucket()
+
+
+def create_bucket(settings):
+    """
+    根据设置创建令牌桶，Redis连接失败时退回到进程内令牌桶
+
+    Args:
+        settings: Scrapy设置
+
+    Returns:
+        MemoryTokenBucket | RedisTokenBucket: 令牌桶
+    """
+    if settings.get("THROTTLE_BACKEND", "redis") != "redis":
+        return memory_bucket
+
+    redis_url = settings.get("THROTTLE_REDIS_URL") or (
+        f"redis://{app_settings.REDIS_HOST}:{app_settings.REDIS_PORT}/{app_settings.REDIS_DB}"
+    )
+    try:
+        import redis
+
+        client = redis.Redis.from_url(redis_url, socket_timeout=2, socket_connect_timeout=2)
+        client.ping()
+    except Exception as e:
+        logger.warning(f"无法连接Redis（{redis_url}），限速状态只在本进程内共享: {e}")
+        return memory_bucket
+    return RedisTokenBucket(client, ttl=settings.getint("THROTTLE_STATE_TTL", 86400))
+
+
+def parse_retry_after(value: Optional[bytes]) -> Optional[float]:
+    """
+    解析Retry-After响应头
+
+    Args:
+        value: 响应头的值，秒数或HTTP日期
+
+    Returns:
+        Optional[float]: 需要等待的秒数，无法解析时为None
+    """
+    if not value:
+        return None
+    value = value.decode("latin-1").strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class DomainThrottleMiddleware:
+    """
+    按域名自适应限速的下载中间件
+
+    需要排在RetryMiddleware之后（数字更大），这样429/503响应在被重试之前先经过
+    这里，降低速率并记录Retry-After；还需要排在HttpCacheMiddleware之后，缓存命中的
+    请求不会经过这里，不消耗令牌。
+    """
+
+    def __init__(self, crawler, bucket):
+        """
+        初始化中间件
+
+        Args:
+            crawler: 爬虫
+            bucket: 令牌桶
+        """
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.bucket = bucket
+        self.policy = ThrottlePolicy.from_settings(crawler.settings)
+        self.redis_retry_interval = crawler.settings.getfloat("THROTTLE_REDIS_RETRY_INTERVAL", 30.0)
+        # Redis出错后在此时间之前使用进程内令牌桶
+        self.redis_down_until = 0.0
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """
+        从爬虫创建中间件
+
+        Args:
+            crawler: 爬虫
+
+        Returns:
+            DomainThrottleMiddleware: 中间件实例
+        """
+        if not crawler.settings.getbool("THROTTLE_ENABLED"):
+            raise NotConfigured
+        middleware = cls(crawler, create_bucket(crawler.settings))
+        crawler.signals.connect(middleware.spider_opened, signal=signals.spider_opened)
+        return middleware
+
+    def spider_opened(self, spider):
+        """
+        爬虫开始时应用站点的覆盖参数
+
+        Args:
+            spider: 爬虫
+        """
+        site_config = getattr(spider, "site_config", None)
+        overrides = ((site_config.config or {}) if site_config else {}).get("throttle")
+        if overrides:
+            self.policy = ThrottlePolicy.from_settings(self.crawler.settings, overrides)
+            spider.logger.info(f"使用站点限速参数: {overrides}")
+
+    async def process_request(self, request, spider):
+        """
+        请求发出前等待域名的令牌
+
+        Args:
+            request: 请求
+            spider: 爬虫
+        """
+        if request.meta.get("dont_throttle"):
+            return None
+
+        from twisted.internet import reactor
+
+        key = urlparse_cached(request).hostname or ""
+        while True:
+            wait = await self._call("acquire", key, self.policy)
+            if wait <= 0:
+                return None
+            self.stats.inc_value("throttle/delayed_requests")
+            self.stats.inc_value("throttle/wait_seconds", wait)
+            await maybe_deferred_to_future(deferLater(reactor, wait, lambda: None))
+
+    async def process_response(self, request, response, spider):
+        """
+        根据响应状态和延迟调整域名的速率
+
+        Args:
+            request: 请求
+            response: 响应
+            spider: 爬虫
+
+        Returns:
+            Response: 原响应
+        """
+        # 缓存命中的响应没有访问站点，不参与调整速率
+        if request.meta.get("dont_throttle") or "cached" in response.flags:
+            return response
+
+        key = urlparse_cached(request).hostname or ""
+        latency = request.meta.get("download_latency")
+        if response.status in BACKOFF_HTTP_CODES:
+            rate = await self._call("adjust", key, self.policy, factor=self.policy.backoff_factor)
+            self.stats.inc_value("throttle/backoffs")
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after:
+                retry_after = min(retry_after, self.policy.max_retry_after)
+                await self._call("block", key, self.policy, retry_after)
+                self.stats.inc_value("throttle/retry_after")
+            spider.logger.info(
+                f"{key} 返回 {response.status}，速率降至 {rate:.2f} 请求/秒"
+                + (f"，暂停 {retry_after:.0f} 秒" if retry_after else "")
+            )
+        elif latency is not None and latency > self.policy.target_latency:
+            rate = await self._call("adjust", key, self.policy, factor=0.9)
+        else:
+            rate = await self._call("adjust", key, self.policy, step=self.policy.rate_step)
+
+        if latency is not None:
+            self._set_concurrency(request, rate, latency)
+        return response
+
+    async def process_exception(self, request, exception, spider):
+        """
+        下载异常（超时、连接失败等）时降低域名的速率
+
+        Args:
+            request: 请求
+            exception: 异常
+            spider: 爬虫
+        """
+        if not request.meta.get("dont_throttle"):
+            key = urlparse_cached(request).hostname or ""
+            await self._call("adjust", key, self.policy, factor=0.9)
+        return None
+
+    async def _call(self, method: str, *args, **kwargs) -> Any:
+        """
+        调用令牌桶的方法
+
+        进程内令牌桶直接调用；Redis令牌桶在线程池中调用，出错时记录日志并改用进程内令牌桶，
+        THROTTLE_REDIS_RETRY_INTERVAL 秒内不再访问Redis
+
+        Args:
+            method: 方法名（acquire、adjust或block）
+
+        Returns:
+            Any: 方法的返回值
+        """
+        if isinstance(self.bucket, MemoryTokenBucket):
+            return getattr(self.bucket, method)(*args, **kwargs)
+        if time.monotonic() < self.redis_down_until:
+            return getattr(memory_bucket, method)(*args, **kwargs)
+        try:
+            return await maybe_deferred_to_future(deferToThread(getattr(self.bucket, method), *args, **kwargs))
+        except RedisError as e:
+            self.redis_down_until = time.monotonic() + self.redis_retry_interval
+            self.stats.inc_value("throttle/redis_errors")
+            logger.warning(f"访问Redis令牌桶失败，{self.redis_retry_interval:.0f} 秒内只在本进程内限速: {e}")
+            return getattr(memory_bucket, method)(*args, **kwargs)
+
+    def _set_concurrency(self, request, rate: float, latency: float) -> None:
+        """
+        按 速率 × 延迟 设置下载槽的并发数，使并发刚好维持当前速率
+
+        Args:
+            request: 请求
+            rate: 当前速率（请求/秒）
+            latency: 响应延迟（秒）
+        """
+        # download_slot 由下载器在请求进入下载槽时设置
+        key = request.meta.get("download_slot")
+        slot = self.crawler.engine.downloader.slots.get(key) if key else None
+        if slot is None:
+            return
+        slot.concurrency = max(1, min(self.policy.max_concurrency, math.ceil(rate * latency)))
+        self.stats.max_value("throttle/max_concurrency", slot.concurrency)
@@ -5,4 +5,9 @@ from app.services import user
 from app.services import site
 from app.services import job
 from app.services import scraped_item
-from app.services import job_log 
\ No newline at end of file
+from app.services import job_log
+from app.services import crawl_report
+from app.services import image_match
+from app.services import normalization
+from app.services import dispatch
+from app.services import schedule
@@ -0,0 +1,220 @@
+"""
+爬取报告服务模块
+
+每次爬取运行结束后把Scrapy统计保存为一条报告，并与同一站点配置之前的运行比较
+吞吐量、错误率和每条数据的下载字节数
+"""
+import statistics
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app import models
+from app.core.config import settings
+
+# 比较的指标，值越大越好的为True
+METRICS = {
+    "items_per_minute": True,
+    "responses_per_minute": True,
+    "error_rate": False,
+    "bytes_per_item": False,
+}
+# 合并多个进程的统计时取最大值而不是求和的键：并行运行的分片耗时取最长的一个
+MAX_STATS = ("elapsed_time_seconds", "memory/rss_max_mb", "reactor/lag_max_ms")
+
+
+def _error_count(stats: Dict[str, Any]) -> int:
+    """
+    状态码4xx/5xx的响应数与下载异常数之和
+    """
+    prefix = "downloader/response_status_count/"
+    errors = stats.get("downloader/exception_count", 0)
+    for key, value in stats.items():
+        if key.startswith(prefix) and key[len(prefix):].isdigit() and int(key[len(prefix):]) >= 400:
+            errors += value
+    return errors
+
+
+def merge_stats(stats_list: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    合并多个爬取进程的统计，例如分片任务的各个分片
+
+    Args:
+        stats_list: 各进程的Scrapy统计
+
+    Returns:
+        Dict[str, Any]: 数值求和（MAX_STATS 取最大值）；结束原因全部相同时保留，否则为 mixed
+    """
+    merged: Dict[str, Any] = {}
+    reasons = set()
+    for stats in stats_list:
+        reasons.add(stats.get("finish_reason"))
+        for key, value in stats.items():
+            if isinstance(value, bool):
+                merged[key] = merged.get(key, False) or value
+            elif isinstance(value, (int, float)):
+                if key in MAX_STATS:
+                    merged[key] = max(merged.get(key, value), value)
+                else:
+                    merged[key] = merged.get(key, 0) + value
+    if reasons:
+        merged["finish_reason"] = reasons.pop() if len(reasons) == 1 else "mixed"
+    return merged
+
+
+def create(db: Session, *, job: models.Job, stats: Dict[str, Any]) -> models.CrawlReport:
+    """
+    保存一次爬取运行的报告
+
+    Args:
+        db: 数据库会话
+        job: 任务
+        stats: Scrapy统计，见 app.scrapers.crawl.run_crawl_process
+
+    Returns:
+        models.CrawlReport: 创建的报告
+    """
+    db_obj = models.CrawlReport(
+        job_id=job.id,
+        site_config_id=job.site_config_id,
+        tenant_id=job.tenant_id,
+        finish_reason=stats.get("finish_reason"),
+        resumed=bool(stats.get("checkpoint/resumed")),
+        partial=bool(stats.get("frontier/helpers")),
+        elapsed_seconds=stats.get("elapsed_time_seconds", 0),
+        requests=stats.get("downloader/request_count", 0),
+        responses=stats.get("downloader/response_count", 0),
+        response_bytes=stats.get("downloader/response_bytes", 0),
+        errors=_error_count(stats),
+        retries=stats.get("retry/count", 0),
+        items_scraped=stats.get("item_scraped_count", 0),
+        items_dropped=stats.get("item_dropped_count", 0),
+        items_saved=stats.get("database/items_saved", 0),
+        items_failed=stats.get("database/items_failed", 0),
+        stats=stats,
+    )
+    db.add(db_obj)
+    db.commit()
+    db.refresh(db_obj)
+    return db_obj
+
+
+def get_latest(db: Session, *, job_id: int) -> Optional[models.CrawlReport]:
+    """
+    获取任务最近一次运行的报告
+
+    Args:
+        db: 数据库会话
+        job_id: 任务ID
+
+    Returns:
+        Optional[models.CrawlReport]: 报告，没有时返回None
+    """
+    return (
+        db.query(models.CrawlReport)
+        .filter(models.CrawlReport.job_id == job_id)
+        .order_by(models.CrawlReport.id.desc())
+        .first()
+    )
+
+
+def get_previous(db: Session, *, report: models.CrawlReport, limit: int = 10) -> List[models.CrawlReport]:
+    """
+    获取同一站点配置在该报告之前的运行，不含从检查点恢复的运行（耗时不完整）和
+    只含部分统计的分布式爬取运行
+
+    Args:
+        db: 数据库会话
+        report: 报告
+        limit: 返回的报告数
+
+    Returns:
+        List[models.CrawlReport]: 报告列表，从新到旧
+    """
+    return (
+        db.query(models.CrawlReport)
+        .filter(
+            models.CrawlReport.site_config_id == report.site_config_id,
+            models.CrawlReport.tenant_id == report.tenant_id,
+            models.CrawlReport.id < report.id,
+            models.CrawlReport.resumed.is_(False),
+            models.CrawlReport.partial.is_(False),
+        )
+        .order_by(models.CrawlReport.id.desc())
+        .limit(limit)
+        .all()
+    )
+
+
+def compute_metrics(report: models.CrawlReport) -> Dict[str, Optional[float]]:
+    """
+    由报告的计数计算比较指标
+
+    Args:
+        report: 报告
+
+    Returns:
+        Dict[str, Optional[float]]: 指标，分母为0时为None
+    """
+    minutes = report.elapsed_seconds / 60 if report.elapsed_seconds else 0
+    return {
+        "items_per_minute": round(report.items_scraped / minutes, 3) if minutes else None,
+        "responses_per_minute": round(report.responses / minutes, 3) if minutes else None,
+        "error_rate": round(report.errors / report.requests, 4) if report.requests else None,
+        "bytes_per_item": round(report.response_bytes / report.items_scraped, 1) if report.items_scraped else None,
+    }
+
+
+def compare(db: Session, *, report: models.CrawlReport, limit: int = 10) -> Dict[str, Any]:
+    """
+    与同一站点配置之前的运行比较
+
+    基线为之前 limit 次运行各指标的中位数，单次异常的运行不会影响基线。吞吐量下降或
+    错误率、每条数据字节数上升超过 CRAWL_REPORT_REGRESSION_THRESHOLD 的指标列入 regressions
+
+    Args:
+        db: 数据库会话
+        report: 报告
+        limit: 参与比较的之前运行数
+
+    Returns:
+        Dict[str, Any]: report、baseline、change、regressions 和 previous
+    """
+    current = compute_metrics(report)
+    previous = get_previous(db, report=report, limit=limit)
+    previous_metrics = [compute_metrics(r) for r in previous]
+
+    baseline: Dict[str, Optional[float]] = {}
+    change: Dict[str, Optional[float]] = {}
+    regressions = []
+    threshold = settings.CRAWL_REPORT_REGRESSION_THRESHOLD
+    for name, higher_is_better in METRICS.items():
+        values = [m[name] for m in previous_metrics if m[name] is not None]
+        baseline[name] = round(statistics.median(values), 4) if values else None
+        if current[name] is None or not baseline[name]:
+            change[name] = None
+            # 之前的运行没有错误，这次出现错误
+            if baseline[name] == 0 and current[name] and not higher_is_better:
+                regressions.append(name)
+            continue
+        change[name] = round((current[name] - baseline[name]) / baseline[name], 4)
+        if (-change[name] if higher_is_better else change[name]) > threshold:
+            regressions.append(name)
+
+    return {
+        "report": _with_metrics(report, current),
+        "baseline": baseline,
+        "change": change,
+        "regressions": regressions,
+        "previous": [_with_metrics(r, m) for r, m in zip(previous, previous_metrics)],
+    }
+
+
+def _with_metrics(report: models.CrawlReport, metrics: Dict[str, Optional[float]]) -> Dict[str, Any]:
+    """
+    报告的列和指标，供 schemas.CrawlReport 序列化
+    """
+    data = {column.name: getattr(report, column.name) for column in models.CrawlReport.__table__.columns}
+    data.pop("stats")
+    data["metrics"] = metrics
+    return data
@@ -0,0 +1,265 @@
+"""
+任务调度服务模块
+
+启动的任务先进入调度队列（status=queued），由调度任务按以下规则投递到Celery：
+
+- 按任务类型分队列：使用Playwright的任务进入 crawl.browser，其余进入 crawl.http，
+  每类任务同时占用的名额不超过该队列的容量；分片任务按未完成的分片数、分布式爬取
+  按worker数占用名额
+- 租户之间加权公平：队列有空位时，优先投递“该类运行中任务数 / 权重”最小的租户的任务，
+  同一租户内先进先出
+- 每个租户同时运行的任务数不超过其并发上限
+"""
+from collections import defaultdict, deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, load_only
+
+from app import models
+from app.core import tracing
+from app.core.config import settings
+from app.scrapers.shards import plan_shards
+
+JOB_CLASSES = ("browser", "http")
+QUEUES = {
+    "browser": "crawl.browser",
+    "http": "crawl.http",
+    "maintenance": "maintenance",
+}
+# 已投递、运行中或等待重试的任务占用并发名额
+ACTIVE_STATUSES = ("dispatched", "running", "retrying")
+
+
+def job_class(site_config: models.SiteConfig) -> str:
+    """
+    获取任务类型
+
+    Args:
+        site_config: 站点配置
+
+    Returns:
+        str: browser 或 http
+    """
+    return "browser" if site_config.use_playwright else "http"
+
+
+def queue_for(job: models.Job) -> str:
+    """
+    获取任务投递的Celery队列
+
+    Args:
+        job: 任务对象
+
+    Returns:
+        str: 队列名
+    """
+    return QUEUES[job.queue or job_class(job.site_config)]
+
+
+def enqueue(job: models.Job) -> None:
+    """
+    重置任务的运行状态并放入调度队列，由调用方提交
+
+    Args:
+        job: 任务对象
+    """
+    job.status = "queued"
+    job.queue = job_class(job.site_config)
+    job.queued_at = datetime.now()
+    job.celery_task_id = None
+    job.progress = 0
+    job.error_message = None
+    job.items_scraped = 0
+    job.items_saved = 0
+    job.items_failed = 0
+    job.shards_total = 0
+    job.shards_completed = 0
+    job.stall_count = 0
+    job.started_at = None
+    job.completed_at = None
+    job.updated_at = datetime.now()
+    # 启用链路追踪时，本次运行的span挂在启动任务的请求之下
+    job.trace_context = tracing.current_traceparent()
+
+
+def job_slots(job: models.Job) -> int:
+    """
+    获取任务占用的并发名额
+
+    分片任务的每个分片、分布式爬取的每个worker各占一个名额。排队中的任务还没有
+    拆分，按任务配置预估分片数
+
+    Args:
+        job: 任务对象
+
+    Returns:
+        int: 名额数，至少为1
+    """
+    if job.shards_total:
+        return max(job.shards_total - (job.shards_completed or 0), 1)
+    config = job.config or {}
+    if job.status == "queued" and config.get("shard_by"):
+        try:
+            return max(len(plan_shards(job.site_config, config)), 1)
+        except (KeyError, TypeError, ValueError):
+            # 配置错误的任务运行时会失败，只占一个名额
+            return 1
+    try:
+        return max(int(config.get("workers", 1)), 1)
+    except (TypeError, ValueError):
+        return 1
+
+
+def get_capacity() -> Dict[str, int]:
+    """
+    获取每类任务同时运行的数量上限
+
+    Returns:
+        Dict[str, int]: 任务类型到容量的映射
+    """
+    return {
+        "browser": settings.CRAWL_BROWSER_CONCURRENCY,
+        "http": settings.CRAWL_HTTP_CONCURRENCY,
+    }
+
+
+def select_jobs(
+    db: Session,
+    *,
+    capacity: Optional[Dict[str, int]] = None,
+    weights: Optional[Dict[str, float]] = None,
+    limits: Optional[Dict[str, int]] = None,
+    default_limit: Optional[int] = None,
+) -> List[models.Job]:
+    """
+    选出本轮可以投递的排队任务
+
+    Args:
+        db: 数据库会话
+        capacity: 每类任务的容量，默认取配置
+        weights: 租户权重，默认取配置，未配置的租户权重为1
+        limits: 按租户覆盖的并发上限，默认取配置
+        default_limit: 租户默认并发上限，默认取配置
+
+    Returns:
+        List[models.Job]: 按投递顺序排列的任务列表
+    """
+    capacity = get_capacity() if capacity is None else capacity
+    weights = settings.TENANT_WEIGHTS if weights is None else weights
+    limits = settings.TENANT_JOB_LIMITS if limits is None else limits
+    default_limit = settings.TENANT_MAX_CONCURRENT_JOBS if default_limit is None else default_limit
+
+    # 当前占用：(租户, 任务类型) -> 名额数；租户并发上限按任务数计算
+    running: Dict[tuple, int] = defaultdict(int)
+    tenant_running: Dict[str, int] = defaultdict(int)
+    active = (
+        db.query(models.Job)
+        .options(load_only(
+            models.Job.tenant_id, models.Job.queue, models.Job.status, models.Job.config,
+            models.Job.shards_total, models.Job.shards_completed,
+        ))
+        .filter(models.Job.status.in_(ACTIVE_STATUSES))
+    )
+    for job in active:
+        running[(job.tenant_id, job.queue)] += job_slots(job)
+        tenant_running[job.tenant_id] += 1
+
+    selected = []
+    for cls in JOB_CLASSES:
+        free = capacity.get(cls, 0) - sum(n for (_, queue), n in running.items() if queue == cls)
+        if free <= 0:
+            continue
+
+        # 每个租户最多只需要取前 free 个排队任务
+        position = func.row_number().over(
+            partition_by=models.Job.tenant_id,
+            order_by=(models.Job.queued_at, models.Job.id),
+        ).label("position")
+        heads = (
+            select(models.Job.id, position)
+            .where(models.Job.status == "queued", models.Job.queue == cls)
+            .subquery()
+        )
+        waiting: Dict[str, deque] = defaultdict(deque)
+        for job in (
+            db.query(models.Job)
+            .join(heads, heads.c.id == models.Job.id)
+            .filter(heads.c.position <= free)
+            .order_by(models.Job.queued_at, models.Job.id)
+        ):
+            waiting[job.tenant_id].append(job)
+
+        # 需要的名额超过队列容量的任务只在队列空闲时投递，避免永远排不上
+        idle = free == capacity.get(cls, 0)
+        while free > 0:
+            candidates = [
+                tenant_id for tenant_id, jobs in waiting.items()
+                if jobs and tenant_running[tenant_id] < limits.get(tenant_id, default_limit)
+            ]
+            if not candidates:
+                break
+            tenant_id = min(
+                candidates,
+                key=lambda t: (running[(t, cls)] / weights.get(t, 1.0), waiting[t][0].id),
+            )
+            slots = job_slots(waiting[tenant_id][0])
+            if slots > free and not idle:
+                # 该租户的队首任务名额不够时停止本队列的投递，先进先出不被小任务插队
+                break
+            selected.append(waiting[tenant_id].popleft())
+            running[(tenant_id, cls)] += slots
+            tenant_running[tenant_id] += 1
+            free -= slots
+            idle = False
+
+    return selected
+
+
+def mark_dispatched(db: Session, *, job_id: int, celery_task_id: str) -> bool:
+    """
+    把排队任务标记为已投递
+
+    只有状态仍为queued的任务会被更新，同一任务不会被投递两次
+
+    Args:
+        db: 数据库会话
+        job_id: 任务ID
+        celery_task_id: 投递使用的Celery任务ID
+
+    Returns:
+        bool: 是否标记成功
+    """
+    updated = (
+        db.query(models.Job)
+        .filter(models.Job.id == job_id, models.Job.status == "queued")
+        .update(
+            {
+                models.Job.status: "dispatched",
+                models.Job.celery_task_id: celery_task_id,
+                # 心跳检查以投递时间判断消息是否丢失
+                models.Job.updated_at: datetime.now(),
+            },
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    return updated == 1
+
+
+def requeue(db: Session, *, job_id: int) -> None:
+    """
+    投递失败时把任务放回调度队列
+
+    Args:
+        db: 数据库会话
+        job_id: 任务ID
+    """
+    db.query(models.Job).filter(
+        models.Job.id == job_id, models.Job.status == "dispatched"
+    ).update(
+        {models.Job.status: "queued", models.Job.celery_task_id: None},
+        synchronize_session=False,
+    )
+    db.commit()
@@ -0,0 +1,285 @@
+"""
+作品图片匹配服务模块
+
+同一作品在不同站点上的URL和标题不同，通过图片的感知哈希查找：数据库Pipeline写入数据项时
+保存其图片的pHash和dHash，查询时在按租户缓存的汉明距离索引中查找距离不超过阈值的图片，
+批量聚类任务把互相匹配的数据项归为同一簇。
+"""
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app import models
+from app.core.config import settings
+from app.utils.imagehash import HammingIndex, from_hex, hamming
+
+# 每个租户的索引、已加载的最大记录ID和建立时间，查询时只加载新增的记录
+_indexes: Dict[str, Tuple[HammingIndex, int, float]] = {}
+_lock = threading.Lock()
+
+
+def set_item_hashes(
+    db: Session,
+    *,
+    item: models.ScrapedItem,
+    images: Iterable[Dict[str, Any]],
+    commit: bool = True,
+) -> List[models.ImageHash]:
+    """
+    用数据项当前的图片更新其感知哈希
+
+    图片按 sha256（没有时按URL）对应到已有记录：pHash不变的记录保留，不丢失聚类写入的
+    cluster_id；pHash变化的图片删除旧记录后新增，使进程内索引加载到新的哈希；
+    不再出现的图片删除
+
+    Args:
+        db: 数据库会话
+        item: 已flush的数据项
+        images: 图片Pipeline写入数据项的 images，没有 phash 的图片（下载失败）跳过
+        commit: 是否立即提交；为False时只flush，由调用方统一提交
+
+    Returns:
+        List[models.ImageHash]: 数据项当前的哈希记录
+    """
+    existing: Dict[Optional[str], models.ImageHash] = {}
+    for row in db.query(models.ImageHash).filter(models.ImageHash.scraped_item_id == item.id):
+        key = row.sha256 or row.image_url
+        if key in existing:
+            db.delete(row)
+        else:
+            existing[key] = row
+    objs = []
+    for image in images:
+        if not image.get("phash"):
+            continue
+        row = existing.pop(image.get("sha256") or image.get("url"), None)
+        if row is not None and row.phash == image["phash"]:
+            row.image_url = image.get("url")
+            row.dhash = image.get("dhash")
+            objs.append(row)
+            continue
+        if row is not None:
+            db.delete(row)
+        objs.append(models.ImageHash(
+            scraped_item_id=item.id,
+            site_config_id=item.site_config_id,
+            tenant_id=item.tenant_id,
+            image_url=image.get("url"),
+            sha256=image.get("sha256"),
+            phash=image["phash"],
+            dhash=image.get("dhash"),
+        ))
+    for row in existing.values():
+        db.delete(row)
+    db.add_all(objs)
+    if commit:
+        db.commit()
+    else:
+        db.flush()
+    return objs
+
+
+def _load(db: Session, tenant_id: str, after_id: int, index: HammingIndex) -> int:
+    """
+    把租户中ID大于 after_id 的哈希记录加入索引
+
+    Returns:
+        int: 已加载的最大记录ID
+    """
+    rows = (
+        db.query(models.ImageHash.id, models.ImageHash.phash)
+        .filter(models.ImageHash.tenant_id == tenant_id, models.ImageHash.id > after_id)
+        .order_by(models.ImageHash.id)
+        .yield_per(10000)
+    )
+    for row_id, phash in rows:
+        index.add(from_hex(phash), row_id)
+        after_id = row_id
+    return after_id
+
+
+def get_index(db: Session, *, tenant_id: str) -> HammingIndex:
+    """
+    获取租户的哈希索引
+
+    索引在进程内缓存，每次获取时加载新增的记录；已删除的记录留在索引中，查询结果在数据库中过滤，
+    索引每 IMAGE_MATCH_INDEX_REBUILD_INTERVAL 秒重建一次以丢弃这些记录
+
+    Args:
+        db: 数据库会话
+        tenant_id: 租户ID
+
+    Returns:
+        HammingIndex: 键为 ImageHash 记录ID的索引
+    """
+    now = time.monotonic()
+    with _lock:
+        cached = _indexes.get(tenant_id)
+        if cached is None or now - cached[2] > settings.IMAGE_MATCH_INDEX_REBUILD_INTERVAL:
+            cached = (HammingIndex(settings.IMAGE_MATCH_INDEX_CHUNKS), 0, now)
+        index, last_id, built_at = cached
+        _indexes[tenant_id] = (index, _load(db, tenant_id, last_id, index), built_at)
+        return index
+
+
+def clear_cache() -> None:
+    """
+    清空缓存的索引
+    """
+    with _lock:
+        _indexes.clear()
+
+
+def find_matches(
+    db: Session,
+    *,
+    item: models.ScrapedItem,
+    max_distance: Optional[int] = None,
+    limit: int = 20,
+) -> List[Dict[str, Any]]:
+    """
+    查找图片与数据项的图片近似的其他数据项
+
+    Args:
+        db: 数据库会话
+        item: 数据项
+        max_distance: pHash最大汉明距离，默认 IMAGE_MATCH_MAX_DISTANCE
+        limit: 返回的数据项数
+
+    Returns:
+        List[Dict[str, Any]]: 每个匹配的数据项一条，含 item、distance、dhash_distance、image_url 和
+            matched_image_url，按距离排序
+    """
+    if max_distance is None:
+        max_distance = settings.IMAGE_MATCH_MAX_DISTANCE
+    hashes = db.query(models.ImageHash).filter(models.ImageHash.scraped_item_id == item.id).all()
+    if not hashes:
+        return []
+
+    index = get_index(db, tenant_id=item.tenant_id)
+    candidates: Dict[int, Tuple[int, models.ImageHash]] = {}
+    for own in hashes:
+        for distance, row_id in index.search(from_hex(own.phash), max_distance):
+            if row_id not in candidates or distance < candidates[row_id][0]:
+                candidates[row_id] = (distance, own)
+    if not candidates:
+        return []
+
+    best: Dict[int, Dict[str, Any]] = {}
+    rows = (
+        db.query(models.ImageHash)
+        .filter(models.ImageHash.id.in_(candidates), models.ImageHash.scraped_item_id != item.id)
+        .all()
+    )
+    for row in rows:
+        distance, own = candidates[row.id]
+        match = best.get(row.scraped_item_id)
+        if match is not None and match["distance"] <= distance:
+            continue
+        best[row.scraped_item_id] = {
+            "distance": distance,
+            "dhash_distance": (
+                hamming(from_hex(own.dhash), from_hex(row.dhash)) if own.dhash and row.dhash else None
+            ),
+            "image_url": own.image_url,
+            "matched_image_url": row.image_url,
+        }
+
+    matches = sorted(best.items(), key=lambda match: (match[1]["distance"], match[0]))[:limit]
+    item_ids = [item_id for item_id, _ in matches]
+    items = {obj.id: obj for obj in db.query(models.ScrapedItem).filter(models.ScrapedItem.id.in_(item_ids))}
+    return [{"item": items[item_id], **match} for item_id, match in matches if item_id in items]
+
+
+def cluster(db: Session, *, tenant_id: str, max_distance: Optional[int] = None) -> Dict[str, int]:
+    """
+    把图片互相匹配的数据项聚为一簇，批量写入 cluster_id
+
+    匹配关系按传递性合并（并查集），簇ID为簇中最小的数据项ID，没有匹配的数据项 cluster_id 为空
+
+    Args:
+        db: 数据库会话
+        tenant_id: 租户ID
+        max_distance: pHash最大汉明距离，默认 IMAGE_MATCH_MAX_DISTANCE
+
+    Returns:
+        Dict[str, int]: 哈希数、簇数和归入簇的数据项数
+    """
+    if max_distance is None:
+        max_distance = settings.IMAGE_MATCH_MAX_DISTANCE
+    hash_table = models.ImageHash
+    rows = (
+        db.query(hash_table.id, hash_table.scraped_item_id, hash_table.phash, hash_table.cluster_id)
+        .filter(hash_table.tenant_id == tenant_id)
+        .all()
+    )
+    index = HammingIndex(settings.IMAGE_MATCH_INDEX_CHUNKS)
+    item_of = {}
+    for row_id, item_id, phash, _ in rows:
+        index.add(from_hex(phash), row_id)
+        item_of[row_id] = item_id
+
+    parent = {item_id: item_id for item_id in item_of.values()}
+
+    def find(item_id: int) -> int:
+        while parent[item_id] != item_id:
+            parent[item_id] = parent[parent[item_id]]
+            item_id = parent[item_id]
+        return item_id
+
+    searched = set()
+    for row_id, item_id, phash, _ in rows:
+        # 同一哈希的记录查询结果相同
+        if phash in searched:
+            continue
+        searched.add(phash)
+        for _, other_id in index.search(from_hex(phash), max_distance):
+            a, b = find(item_id), find(item_of[other_id])
+            if a != b:
+                parent[max(a, b)] = min(a, b)
+
+    sizes: Dict[int, int] = {}
+    for item_id in parent:
+        root = find(item_id)
+        sizes[root] = sizes.get(root, 0) + 1
+    changes = []
+    for row_id, item_id, _, cluster_id in rows:
+        root = find(item_id)
+        new_cluster_id = root if sizes[root] > 1 else None
+        if new_cluster_id != cluster_id:
+            changes.append({"id": row_id, "cluster_id": new_cluster_id})
+    if changes:
+        # 按主键批量更新
+        db.execute(update(models.ImageHash), changes)
+    db.commit()
+
+    clusters = [size for size in sizes.values() if size > 1]
+    return {"hashes": len(rows), "clusters": len(clusters), "clustered_items": sum(clusters)}
+
+
+def get_cluster(db: Session, *, tenant_id: str, cluster_id: int) -> List[models.ScrapedItem]:
+    """
+    获取簇中的数据项
+
+    Args:
+        db: 数据库会话
+        tenant_id: 租户ID
+        cluster_id: 簇ID
+
+    Returns:
+        List[models.ScrapedItem]: 数据项列表，按ID排序
+    """
+    item_ids = (
+        db.query(models.ImageHash.scraped_item_id)
+        .filter(models.ImageHash.tenant_id == tenant_id, models.ImageHash.cluster_id == cluster_id)
+        .distinct()
+    )
+    return (
+        db.query(models.ScrapedItem)
+        .filter(models.ScrapedItem.id.in_(item_ids))
+        .order_by(models.ScrapedItem.id)
+        .all()
+    )
@@ -1,13 +1,17 @@
 """
 爬虫任务服务模块
 """
+import time
 from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any, Union
 
-from sqlalchemy import and_, or_
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session, joinedload, selectinload
 
 from app import models, schemas
+from app.core.config import settings
+from app.scrapers import profiling
+from app.services import dispatch, schedule
 
 
 def get(db: Session, job_id: int) -> Optional[models.Job]:
@@ -21,7 +25,13 @@ def get(db: Session, job_id: int) -> Optional[models.Job]:
     Returns:
         Optional[models.Job]: 任务对象，如果不存在则返回None
     """
-    return db.query(models.Job).filter(models.Job.id == job_id).first()
+    # 一并加载站点配置，避免序列化 schemas.Job 时再发起一次查询
+    return (
+        db.query(models.Job)
+        .options(joinedload(models.Job.site_config))
+        .filter(models.Job.id == job_id)
+        .first()
+    )
 
 
 def get_by_celery_id(db: Session, celery_task_id: str) -> Optional[models.Job]:
@@ -39,7 +49,12 @@ def get_by_celery_id(db: Session, celery_task_id: str) -> Optional[models.Job]:
 
 
 def get_multi(
-    db: Session, *, skip: int = 0, limit: int = 100, tenant_id: Optional[str] = None
+    db: Session,
+    *,
+    skip: int = 0,
+    limit: int = 100,
+    tenant_id: Optional[str] = None,
+    with_site_config: bool = True,
 ) -> List[models.Job]:
     """
     获取多个任务
@@ -49,14 +64,21 @@ def get_multi(
         skip: 跳过的记录数
         limit: 返回的最大记录数
         tenant_id: 租户ID，如果提供则过滤特定租户的任务
+        with_site_config: 是否预加载站点配置；列表视图不需要时可跳过
         
     Returns:
         List[models.Job]: 任务对象列表
     """
     query = db.query(models.Job)
+    if with_site_config:
+        # 用一条 IN 查询批量加载站点配置，避免逐个任务懒加载 (N+1)
+        query = query.options(selectinload(models.Job.site_config))
     if tenant_id:
         query = query.filter(models.Job.tenant_id == tenant_id)
-    return query.order_by(models.Job.created_at.desc()).offset(skip).limit(limit).all()
+    # 以id作为同一时间戳下的稳定排序，与 ix_jobs_tenant_id_created_at_id 索引顺序一致
+    return query.order_by(
+        models.Job.created_at.desc(), models.Job.id.desc()
+    ).offset(skip).limit(limit).all()
 
 
 def create(db: Session, *, obj_in: schemas.JobCreate, user_id: int) -> models.Job:
@@ -70,7 +92,12 @@ def create(db: Session, *, obj_in: schemas.JobCreate, user_id: int) -> models.Jo
         
     Returns:
         models.Job: 创建的任务对象
+        
+    Raises:
+        ValueError: 周期配置或性能分析选项无效
     """
+    # 提前校验性能分析选项，不等到爬取时才失败
+    profiling.profile_modes((obj_in.config or {}).get("profile"))
     db_obj = models.Job(
         name=obj_in.name,
         site_config_id=obj_in.site_config_id,
@@ -85,6 +112,11 @@ def create(db: Session, *, obj_in: schemas.JobCreate, user_id: int) -> models.Jo
         created_by_id=user_id,
     )
     db.add(db_obj)
+    db.flush()
+    # 周期任务的运行时间按任务ID错开，需要先获得ID
+    db_obj.next_run_at = schedule.next_run_time(
+        db_obj.id, db_obj.schedule_type, db_obj.cron_expression, datetime.now()
+    )
     db.commit()
     db.refresh(db_obj)
     return db_obj
@@ -116,7 +148,7 @@ def update(
 
 
 def update_status(
-    db: Session, *, job_id: int, status_update: schemas.JobStatusUpdate
+    db: Session, *, job_id: int, status_update: schemas.JobStatusUpdate, commit: bool = True
 ) -> models.Job:
     """
     更新任务状态
@@ -125,6 +157,7 @@ def update_status(
         db: 数据库会话
         job_id: 任务ID
         status_update: 状态更新数据
+        commit: 是否立即提交；为False时只flush，由调用方统一提交
         
     Returns:
         models.Job: 更新后的任务对象
@@ -152,6 +185,9 @@ def update_status(
     if status_update.items_saved is not None:
         job.items_saved = status_update.items_saved
     
+    if status_update.items_failed is not None:
+        job.items_failed = status_update.items_failed
+    
     # 更新开始和完成时间
     if status_update.started_at:
         job.started_at = status_update.started_at
@@ -166,12 +202,139 @@ def update_status(
     # 保存更新
     job.updated_at = datetime.now()
     db.add(job)
+    if commit:
+        db.commit()
+        db.refresh(job)
+    else:
+        db.flush()
+    
+    return job
+
+
+def increment_counters(
+    db: Session,
+    *,
+    job_id: int,
+    items_scraped: int = 0,
+    items_saved: int = 0,
+    items_failed: int = 0,
+    commit: bool = True,
+) -> None:
+    """
+    累加任务的抓取、保存和失败计数
+    
+    在数据库中执行 x = x + n，多个worker或分片同时上报同一任务时计数不会互相覆盖
+    
+    Args:
+        db: 数据库会话
+        job_id: 任务ID
+        items_scraped: 新增的抓取数
+        items_saved: 新增的保存数
+        items_failed: 新增的失败数
+        commit: 是否立即提交；为False时只flush，由调用方统一提交
+    """
+    db.query(models.Job).filter(models.Job.id == job_id).update(
+        {
+            models.Job.items_scraped: func.coalesce(models.Job.items_scraped, 0) + items_scraped,
+            models.Job.items_saved: func.coalesce(models.Job.items_saved, 0) + items_saved,
+            models.Job.items_failed: func.coalesce(models.Job.items_failed, 0) + items_failed,
+            models.Job.updated_at: datetime.now(),
+        },
+        synchronize_session=False,
+    )
+    if commit:
+        db.commit()
+    else:
+        db.flush()
+
+
+def complete_shard(db: Session, *, job_id: int) -> None:
+    """
+    记录一个分片已结束，并按已结束分片数更新任务进度
+    
+    Args:
+        db: 数据库会话
+        job_id: 任务ID
+    """
+    completed = func.coalesce(models.Job.shards_completed, 0) + 1
+    db.query(models.Job).filter(models.Job.id == job_id).update(
+        {
+            models.Job.shards_completed: completed,
+            models.Job.progress: completed * 100 / models.Job.shards_total,
+            models.Job.updated_at: datetime.now(),
+        },
+        synchronize_session=False,
+    )
+    db.commit()
+
+
+def start_job(db: Session, *, job_id: int) -> models.Job:
+    """
+    启动任务：重置运行状态并放入调度队列，由调度任务按队列容量和租户公平规则投递
+
+    Args:
+        db: 数据库会话
+        job_id: 任务ID
+
+    Returns:
+        models.Job: 更新后的任务对象
+    """
+    job = get(db, job_id=job_id)
+    if not job:
+        raise ValueError(f"任务不存在: {job_id}")
+
+    dispatch.enqueue(job)
+    if job.next_run_at is None:
+        # 取消时停止了周期运行，重新启动后恢复
+        job.next_run_at = schedule.next_run_time(job.id, job.schedule_type, job.cron_expression, datetime.now())
+    db.add(job)
     db.commit()
     db.refresh(job)
-    
     return job
 
 
+def cancel_job(db: Session, *, job_id: int) -> models.Job:
+    """
+    取消任务
+
+    只修改任务状态：排队中的任务不会再被投递，运行中的爬取由 JobCancellation 扩展
+    发现状态变化后自行关闭。周期任务同时停止周期运行，重新启动时恢复
+
+    Args:
+        db: 数据库会话
+        job_id: 任务ID
+
+    Returns:
+        models.Job: 更新后的任务对象
+    """
+    job = get(db, job_id=job_id)
+    if not job:
+        raise ValueError(f"任务不存在: {job_id}")
+
+    job.status = "cancelled"
+    job.completed_at = datetime.now()
+    job.updated_at = datetime.now()
+    job.next_run_at = None
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def get_status(db: Session, *, job_id: int) -> Optional[str]:
+    """
+    获取任务当前状态，直接查询数据库，不使用会话中缓存的对象
+
+    Args:
+        db: 数据库会话
+        job_id: 任务ID
+
+    Returns:
+        Optional[str]: 任务状态，任务不存在时返回None
+    """
+    return db.query(models.Job.status).filter(models.Job.id == job_id).scalar()
+
+
 def delete(db: Session, *, job_id: int) -> models.Job:
     """
     删除任务
@@ -189,30 +352,91 @@ def delete(db: Session, *, job_id: int) -> models.Job:
     return obj
 
 
-def find_stalled_jobs(db: Session, minutes: int = 30) -> List[models.Job]:
+def find_stalled_jobs(
+    db: Session,
+    *,
+    heartbeats: Dict[int, float],
+    timeout: float,
+    shard_timeout: Optional[float] = None,
+    dispatch_timeout: Optional[float] = None,
+    now: Optional[float] = None,
+) -> List[models.Job]:
     """
-    查找卡住的任务
+    查找心跳超时的任务
+    
+    检查所有占用调度名额的任务（dispatch.ACTIVE_STATUSES）：
+    
+    - 运行中的任务只在运行时间已超过超时时间后检查，刚启动的任务可能还未写入第一次心跳
+    - 分片任务的分片在队列中等待时没有心跳，只有在 shard_timeout 内既没有心跳、
+      也没有分片结束（分片结束时更新 updated_at）时才视为已停止
+    - 已投递或等待重试的任务以最后一次状态变化（updated_at）为准，超过 dispatch_timeout
+      仍没有开始运行也没有心跳时视为丢失，不会一直占用名额
     
     Args:
         db: 数据库会话
-        minutes: 多少分钟未更新视为卡住
+        heartbeats: 任务ID到最后心跳时间戳的映射
+        timeout: 超过该时间（秒）没有心跳视为已停止
+        shard_timeout: 分片任务的超时时间（秒），默认 SHARD_STALL_TIMEOUT
+        dispatch_timeout: 已投递或等待重试的任务的超时时间（秒），默认 DISPATCH_STALL_TIMEOUT
+        now: 当前时间戳，默认取当前时间
         
     Returns:
-        List[models.Job]: 卡住的任务列表
-    """
-    # 计算截止时间
-    cutoff_time = datetime.now() - timedelta(minutes=minutes)
-    
-    # 查找状态为running但长时间未更新的任务
-    stalled_jobs = db.query(models.Job).filter(
-        and_(
-            models.Job.status == "running",
-            or_(
-                models.Job.updated_at < cutoff_time,
-                models.Job.updated_at.is_(None)
-            ),
-            models.Job.completed_at.is_(None)
+        List[models.Job]: 心跳超时的任务列表
+    """
+    now = now or time.time()
+    shard_timeout = settings.SHARD_STALL_TIMEOUT if shard_timeout is None else shard_timeout
+    dispatch_timeout = settings.DISPATCH_STALL_TIMEOUT if dispatch_timeout is None else dispatch_timeout
+    started_before = datetime.fromtimestamp(now) - timedelta(seconds=min(timeout, shard_timeout))
+    
+    active_jobs = db.query(models.Job).options(joinedload(models.Job.site_config)).filter(
+        or_(
+            and_(models.Job.status == "running", models.Job.started_at < started_before),
+            models.Job.status.in_([status for status in dispatch.ACTIVE_STATUSES if status != "running"]),
         )
     ).all()
     
-    return stalled_jobs 
\ No newline at end of file
+    stalled = []
+    for job in active_jobs:
+        last_seen = heartbeats.get(job.id, 0)
+        if job.status != "running":
+            changed_at = job.updated_at or job.queued_at or job.created_at
+            if changed_at is not None:
+                last_seen = max(last_seen, changed_at.timestamp())
+            if now - last_seen > dispatch_timeout:
+                stalled.append(job)
+        elif job.shards_total:
+            last_seen = max(last_seen, (job.updated_at or job.started_at).timestamp())
+            if now - last_seen > shard_timeout:
+                stalled.append(job)
+        elif now - job.started_at.timestamp() > timeout and now - last_seen > timeout:
+            stalled.append(job)
+    return stalled
+
+
+def requeue_stalled(db: Session, *, job: models.Job, max_requeues: int) -> bool:
+    """
+    重新排队心跳超时的任务，超过最大次数后标记为失败
+    
+    Args:
+        db: 数据库会话
+        job: 心跳超时的任务
+        max_requeues: 最多自动重新排队的次数
+        
+    Returns:
+        bool: 是否已重新排队
+    """
+    stalls = (job.stall_count or 0) + 1
+    if stalls > max_requeues:
+        job.status = "failed"
+        job.error_message = f"任务心跳超时，已自动重新排队 {max_requeues} 次"
+        job.completed_at = datetime.now()
+        job.updated_at = datetime.now()
+        requeued = False
+    else:
+        dispatch.enqueue(job)
+        job.stall_count = stalls
+        job.error_message = f"任务心跳超时，第 {stalls} 次自动重新排队"
+        requeued = True
+    db.add(job)
+    db.commit()
+    return requeued
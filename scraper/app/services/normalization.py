@@ -0,0 +1,147 @@
+"""
+数据项规范化服务模块
+
+爬取结束后把数据项 data 中的原始字符串解析为类型化字段，写入 normalized_items。
+按批处理：一批数据项的每个字段取成一列，由 app.utils.normalize 按列解析，每批一条DELETE和一条
+多行INSERT写回，而不是逐行更新。
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import delete, func, insert, or_
+from sqlalchemy.orm import Query, Session, load_only
+
+from app import models
+from app.core.config import settings
+from app.utils import normalize
+
+
+def _column(datas: Sequence[Dict[str, Any]], *keys: str) -> List[Any]:
+    """
+    从一批数据项中取出一列，依次使用第一个非空的字段
+    """
+    column = []
+    for data in datas:
+        column.append(next((data[key] for key in keys if data.get(key) not in (None, "")), None))
+    return column
+
+
+def normalize_items(db: Session, items: Sequence[models.ScrapedItem]) -> int:
+    """
+    解析一批数据项并写回规范化字段
+
+    Args:
+        db: 数据库会话
+        items: 数据项，需加载 id、tenant_id、content、data、created_at 和 updated_at
+
+    Returns:
+        int: 写入的行数
+    """
+    if not items:
+        return 0
+    datas = [item.data or {} for item in items]
+    birth = normalize.years(_column(datas, "birth_year"))
+    death = normalize.years(_column(datas, "death_year"))
+    created = normalize.years(_column(datas, "year", "date"))
+    periods = normalize.date_ranges(_column(datas, "date_range", "dates"))
+    # Saatchi的尺寸只出现在 details 文本中；Artsy的 details 是字典，解析时跳过
+    sizes = normalize.dimensions(_column(datas, "dimensions", "details"))
+    prices = normalize.prices(_column(datas, "price"))
+    texts = normalize.strip_html([
+        data.get("description") or data.get("biography") or item.content for data, item in zip(datas, items)
+    ])
+
+    now = datetime.now()
+    rows = [
+        {
+            "scraped_item_id": item.id,
+            "tenant_id": item.tenant_id,
+            "birth_year": birth[i][0],
+            "death_year": death[i][0],
+            "year_start": created[i][0],
+            "year_end": created[i][1],
+            "date_start": periods[i][0],
+            "date_end": periods[i][1],
+            "height_cm": sizes[i][0],
+            "width_cm": sizes[i][1],
+            "depth_cm": sizes[i][2],
+            "price_amount": prices[i][0],
+            "price_currency": prices[i][1],
+            "text": texts[i],
+            "source_updated_at": item.updated_at or item.created_at,
+            "normalized_at": now,
+        }
+        for i, item in enumerate(items)
+    ]
+    db.execute(
+        delete(models.NormalizedItem).where(models.NormalizedItem.scraped_item_id.in_([item.id for item in items]))
+    )
+    db.execute(insert(models.NormalizedItem), rows)
+    db.commit()
+    return len(rows)
+
+
+def get_pending_query(db: Session, *, tenant_id: Optional[str] = None, job_id: Optional[int] = None) -> Query:
+    """
+    未规范化或规范化后又更新过的数据项
+
+    Args:
+        db: 数据库会话
+        tenant_id: 租户ID，如果提供则只查询该租户
+        job_id: 任务ID，如果提供则只查询该任务写入的数据项
+
+    Returns:
+        Query: 数据项查询
+    """
+    source_updated_at = func.coalesce(models.ScrapedItem.updated_at, models.ScrapedItem.created_at)
+    query = (
+        db.query(models.ScrapedItem)
+        .outerjoin(models.NormalizedItem)
+        .filter(or_(
+            models.NormalizedItem.scraped_item_id.is_(None),
+            models.NormalizedItem.source_updated_at < source_updated_at,
+        ))
+    )
+    if tenant_id:
+        query = query.filter(models.ScrapedItem.tenant_id == tenant_id)
+    if job_id:
+        query = query.filter(models.ScrapedItem.job_id == job_id)
+    return query
+
+
+def normalize_pending(
+    db: Session,
+    *,
+    tenant_id: Optional[str] = None,
+    job_id: Optional[int] = None,
+    batch_size: Optional[int] = None,
+) -> int:
+    """
+    按ID顺序分批规范化待处理的数据项
+
+    Args:
+        db: 数据库会话
+        tenant_id: 租户ID，如果提供则只处理该租户
+        job_id: 任务ID，如果提供则只处理该任务写入的数据项
+        batch_size: 每批的数据项数，默认 NORMALIZE_BATCH_SIZE
+
+    Returns:
+        int: 规范化的数据项数
+    """
+    batch_size = batch_size or settings.NORMALIZE_BATCH_SIZE
+    columns = ("id", "tenant_id", "content", "data", "created_at", "updated_at")
+    total = 0
+    last_id = 0
+    while True:
+        batch = (
+            get_pending_query(db, tenant_id=tenant_id, job_id=job_id)
+            .options(load_only(*(getattr(models.ScrapedItem, column) for column in columns)))
+            .filter(models.ScrapedItem.id > last_id)
+            .order_by(models.ScrapedItem.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            return total
+        total += normalize_items(db, batch)
+        last_id = batch[-1].id
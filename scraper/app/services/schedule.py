@@ -0,0 +1,199 @@
+"""
+周期任务调度服务模块
+
+schedule_type 不为 once 的任务在 next_run_at 中预先记录下一次运行时间。调度任务每次
+只用一条 next_run_at 上的范围查询取出到期的任务，放入调度队列后推进到下一次运行时间。
+
+每个任务的运行时间在所属周期的前段内按任务ID均匀错开（抖动），同一时刻到期的大量
+任务（例如每天零点）不会同时启动。
+"""
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from celery.schedules import crontab
+from sqlalchemy.orm import Session, joinedload
+
+from app import models
+from app.core.config import settings
+from app.services import dispatch
+
+# 预设的周期类型对应的cron表达式
+SCHEDULE_PRESETS = {
+    "daily": "0 0 * * *",
+    "weekly": "0 0 * * 1",
+    "monthly": "0 0 1 * *",
+}
+# 上一次运行尚未结束时跳过本次运行
+BUSY_STATUSES = ("queued",) + dispatch.ACTIVE_STATUSES
+# 查找下一次运行时间时最多向后查找的天数，覆盖 2月29日 这类隔年才出现的日期
+MAX_LOOKAHEAD_DAYS = 366 * 8
+
+
+def get_cron_expression(schedule_type: Optional[str], cron_expression: Optional[str]) -> Optional[str]:
+    """
+    获取周期类型对应的cron表达式
+
+    Args:
+        schedule_type: 周期类型：once, daily, weekly, monthly, cron
+        cron_expression: schedule_type 为 cron 时使用的表达式
+
+    Returns:
+        Optional[str]: cron表达式，一次性任务返回None
+
+    Raises:
+        ValueError: 未知的周期类型或缺少cron表达式
+    """
+    if not schedule_type or schedule_type == "once":
+        return None
+    if schedule_type == "cron":
+        if not cron_expression:
+            raise ValueError("周期类型为 cron 时必须提供 cron_expression")
+        return cron_expression
+    if schedule_type not in SCHEDULE_PRESETS:
+        raise ValueError(f"未知的周期类型: {schedule_type}")
+    return SCHEDULE_PRESETS[schedule_type]
+
+
+def parse_cron(expression: str) -> crontab:
+    """
+    解析5段式cron表达式：分 时 日 月 星期，语义与 celery.schedules.crontab 相同
+
+    Args:
+        expression: cron表达式
+
+    Returns:
+        crontab: 解析后的调度对象
+
+    Raises:
+        ValueError: 表达式格式错误
+    """
+    fields = expression.split()
+    if len(fields) != 5:
+        raise ValueError(f"cron表达式应包含5段（分 时 日 月 星期）: {expression}")
+    minute, hour, day_of_month, month_of_year, day_of_week = fields
+    return crontab(
+        minute=minute,
+        hour=hour,
+        day_of_month=day_of_month,
+        month_of_year=month_of_year,
+        day_of_week=day_of_week,
+    )
+
+
+def next_cron_time(expression: str, after: datetime) -> datetime:
+    """
+    计算cron表达式在指定时间之后的下一次触发时间
+
+    Args:
+        expression: cron表达式
+        after: 起始时间（不包含）
+
+    Returns:
+        datetime: 下一次触发时间，精确到分钟
+
+    Raises:
+        ValueError: 表达式格式错误或永远不会触发
+    """
+    cron = parse_cron(expression)
+    hours = sorted(cron.hour)
+    minutes = sorted(cron.minute)
+    start = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+
+    day = start.replace(hour=0, minute=0)
+    for _ in range(MAX_LOOKAHEAD_DAYS):
+        if (
+            day.month in cron.month_of_year
+            and day.day in cron.day_of_month
+            and day.isoweekday() % 7 in cron.day_of_week
+        ):
+            for hour in hours:
+                for minute in minutes:
+                    candidate = day.replace(hour=hour, minute=minute)
+                    if candidate >= start:
+                        return candidate
+        day += timedelta(days=1)
+    raise ValueError(f"cron表达式不会触发: {expression}")
+
+
+def jitter_fraction(job_id: int) -> float:
+    """
+    按任务ID计算在周期内的错开比例，相邻ID的任务分布均匀且每次结果相同
+
+    Args:
+        job_id: 任务ID
+
+    Returns:
+        float: [0, 1) 之间的比例
+    """
+    return (job_id * 2654435761 % 2 ** 32) / 2 ** 32
+
+
+def next_run_time(
+    job_id: int,
+    schedule_type: Optional[str],
+    cron_expression: Optional[str],
+    after: datetime,
+) -> Optional[datetime]:
+    """
+    计算任务在指定时间之后的下一次运行时间（包含抖动）
+
+    抖动范围为 SCHEDULER_JITTER_WINDOW 与两次触发间隔中的较小值，保证任务仍在
+    所属的周期内运行
+
+    Args:
+        job_id: 任务ID
+        schedule_type: 周期类型
+        cron_expression: cron表达式
+        after: 起始时间
+
+    Returns:
+        Optional[datetime]: 下一次运行时间，一次性任务返回None
+    """
+    expression = get_cron_expression(schedule_type, cron_expression)
+    if expression is None:
+        return None
+    fire = next_cron_time(expression, after)
+    period = (next_cron_time(expression, fire) - fire).total_seconds()
+    window = min(settings.SCHEDULER_JITTER_WINDOW, period)
+    return fire + timedelta(seconds=int(window * jitter_fraction(job_id)))
+
+
+def enqueue_due_jobs(db: Session, *, now: Optional[datetime] = None, limit: Optional[int] = None) -> List[int]:
+    """
+    把到期的周期任务放入调度队列，并推进下一次运行时间
+
+    上一次运行尚未结束的任务跳过本次运行；错过的多次运行只补跑一次；已取消的任务不再运行，
+    清空其下一次运行时间
+
+    Args:
+        db: 数据库会话
+        now: 当前时间，默认取系统时间
+        limit: 本次最多处理的任务数，默认 SCHEDULER_BATCH_SIZE
+
+    Returns:
+        List[int]: 放入调度队列的任务ID
+    """
+    now = now or datetime.now()
+    limit = limit or settings.SCHEDULER_BATCH_SIZE
+
+    # ix_jobs_next_run_at 上的范围扫描，只读取到期的任务
+    due_jobs = (
+        db.query(models.Job)
+        .options(joinedload(models.Job.site_config))
+        .filter(models.Job.next_run_at <= now)
+        .order_by(models.Job.next_run_at)
+        .limit(limit)
+        .all()
+    )
+
+    queued = []
+    for job in due_jobs:
+        if job.status == "cancelled":
+            job.next_run_at = None
+            continue
+        if job.status not in BUSY_STATUSES:
+            dispatch.enqueue(job)
+            queued.append(job.id)
+        job.next_run_at = next_run_time(job.id, job.schedule_type, job.cron_expression, now)
+    db.commit()
+    return queued
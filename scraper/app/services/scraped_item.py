@@ -1,13 +1,22 @@
 """
 爬取数据项服务模块
 """
-from typing import List, Optional, Dict, Any
+from typing import Iterable, List, Optional, Dict, Any
 
-from sqlalchemy import and_, or_
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, func, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, load_only
 
 from app import models
 
+# 列表视图需要的列，不包含 content 和 data 大字段
+SUMMARY_FIELDS = (
+    "id", "url", "title", "page_type", "job_id", "site_config_id", "created_at", "updated_at",
+)
+
+# 支持 INSERT ... ON CONFLICT DO UPDATE 的数据库
+UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
 
 def get(db: Session, item_id: int) -> Optional[models.ScrapedItem]:
     """
@@ -51,7 +60,8 @@ def get_multi(
     tenant_id: Optional[str] = None,
     job_id: Optional[int] = None,
     site_config_id: Optional[int] = None,
-    page_type: Optional[str] = None
+    page_type: Optional[str] = None,
+    fields: Optional[Iterable[str]] = None
 ) -> List[models.ScrapedItem]:
     """
     获取多个爬取的数据项
@@ -64,11 +74,16 @@ def get_multi(
         job_id: 任务ID，如果提供则过滤特定任务的数据项
         site_config_id: 站点配置ID，如果提供则过滤特定站点的数据项
         page_type: 页面类型，如果提供则过滤特定类型的数据项
+        fields: 只加载这些列，其余列不查询且访问时抛出异常；为None时加载完整记录
         
     Returns:
         List[models.ScrapedItem]: 数据项对象列表
     """
     query = db.query(models.ScrapedItem)
+    if fields is not None:
+        columns = [getattr(models.ScrapedItem, field) for field in {"id", *fields}]
+        # raiseload防止序列化时逐行懒加载未选择的列
+        query = query.options(load_only(*columns, raiseload=True))
     
     # 应用过滤条件
     if tenant_id:
@@ -80,7 +95,10 @@ def get_multi(
     if page_type:
         query = query.filter(models.ScrapedItem.page_type == page_type)
     
-    return query.order_by(models.ScrapedItem.created_at.desc()).offset(skip).limit(limit).all()
+    # 以id作为同一时间戳下的稳定排序，与 ix_scraped_items_tenant_id_created_at_id 索引顺序一致
+    return query.order_by(
+        models.ScrapedItem.created_at.desc(), models.ScrapedItem.id.desc()
+    ).offset(skip).limit(limit).all()
 
 
 def create(
@@ -93,7 +111,8 @@ def create(
     data: Dict[str, Any] = None,
     job_id: int,
     site_config_id: int,
-    tenant_id: str
+    tenant_id: str,
+    commit: bool = True
 ) -> models.ScrapedItem:
     """
     创建爬取的数据项
@@ -108,6 +127,7 @@ def create(
         job_id: 任务ID
         site_config_id: 站点配置ID
         tenant_id: 租户ID
+        commit: 是否立即提交；为False时只flush，由调用方统一提交
         
     Returns:
         models.ScrapedItem: 创建的数据项对象
@@ -123,8 +143,7 @@ def create(
         tenant_id=tenant_id
     )
     db.add(db_obj)
-    db.commit()
-    db.refresh(db_obj)
+    _save(db, db_obj, commit)
     return db_obj
 
 
@@ -132,7 +151,8 @@ def update(
     db: Session, 
     *, 
     db_obj: models.ScrapedItem, 
-    data: Dict[str, Any]
+    data: Dict[str, Any],
+    commit: bool = True
 ) -> models.ScrapedItem:
     """
     更新爬取的数据项
@@ -141,6 +161,7 @@ def update(
         db: 数据库会话
         db_obj: 要更新的数据项对象
         data: 更新数据
+        commit: 是否立即提交；为False时只flush，由调用方统一提交
         
     Returns:
         models.ScrapedItem: 更新后的数据项对象
@@ -150,8 +171,7 @@ def update(
         setattr(db_obj, field, value)
     
     db.add(db_obj)
-    db.commit()
-    db.refresh(db_obj)
+    _save(db, db_obj, commit)
     return db_obj
 
 
@@ -182,7 +202,8 @@ def create_or_update(
     data: Dict[str, Any] = None,
     job_id: int,
     site_config_id: int,
-    tenant_id: str
+    tenant_id: str,
+    commit: bool = True
 ) -> models.ScrapedItem:
     """
     创建或更新爬取的数据项
@@ -197,34 +218,49 @@ def create_or_update(
         job_id: 任务ID
         site_config_id: 站点配置ID
         tenant_id: 租户ID
+        commit: 是否立即提交；为False时只flush，由调用方统一提交
         
     Returns:
         models.ScrapedItem: 创建或更新的数据项对象
     """
-    # 查找是否已存在
-    db_obj = get_by_url(db, url=url, tenant_id=tenant_id)
+    values = {
+        "page_type": page_type,
+        "title": title,
+        "content": content,
+        "data": data or {},
+        "job_id": job_id,
+        "site_config_id": site_config_id,
+    }
+    insert = UPSERT_INSERTS.get(db.get_bind().dialect.name)
+    if insert is None:
+        # 其他数据库先查询再写入，并发写入同一URL时由唯一索引拒绝重复行
+        db_obj = get_by_url(db, url=url, tenant_id=tenant_id)
+        if db_obj:
+            return update(db, db_obj=db_obj, data=values, commit=commit)
+        return create(db, url=url, tenant_id=tenant_id, commit=commit, **values)
+
+    # 单条语句完成插入或更新，多个会话同时写入同一URL时不会各自插入一行
+    stmt = insert(models.ScrapedItem).values(url=url, tenant_id=tenant_id, **values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["tenant_id", "url"],
+        set_={**{field: stmt.excluded[field] for field in values}, "updated_at": func.now()},
+    ).returning(models.ScrapedItem)
+    db_obj = db.execute(stmt, execution_options={"populate_existing": True}).scalar_one()
+    _save(db, db_obj, commit)
+    return db_obj
+
+
+def _save(db: Session, db_obj: models.ScrapedItem, commit: bool) -> None:
+    """
+    提交或仅flush数据项的变更
     
-    if db_obj:
-        # 更新
-        update_data = {
-            "page_type": page_type,
-            "title": title,
-            "content": content,
-            "data": data or {},
-            "job_id": job_id,
-            "site_config_id": site_config_id
-        }
-        return update(db, db_obj=db_obj, data=update_data)
+    Args:
+        db: 数据库会话
+        db_obj: 数据项对象
+        commit: 是否提交
+    """
+    if commit:
+        db.commit()
+        db.refresh(db_obj)
     else:
-        # 创建
-        return create(
-            db,
-            url=url,
-            page_type=page_type,
-            title=title,
-            content=content,
-            data=data or {},
-            job_id=job_id,
-            site_config_id=site_config_id,
-            tenant_id=tenant_id
-        ) 
\ No newline at end of file
+        db.flush()
@@ -5,8 +5,12 @@ import logging
 import os
 from datetime import datetime, timedelta
 
+from typing import Optional
+
+from app import models, services
 from app.core.celery_app import celery_app
 from app.db.database import SessionLocal
+from app.scrapers import checkpoint
 
 # 设置日志
 logger = logging.getLogger(__name__)
@@ -25,6 +29,7 @@ def daily_maintenance(self) -> dict:
     results = {
         "log_cleanup": False,
         "temp_cleanup": False,
+        "checkpoint_cleanup": False,
     }
     
     try:
@@ -34,6 +39,9 @@ def daily_maintenance(self) -> dict:
         # 清理临时文件
         results["temp_cleanup"] = cleanup_temp_files()
         
+        # 清理已结束或已删除任务的检查点
+        results["checkpoint_cleanup"] = cleanup_checkpoints()
+        
         logger.info("每日维护任务执行完成")
         return {"status": "success", "results": results}
     except Exception as e:
@@ -115,4 +123,97 @@ def cleanup_temp_files() -> bool:
         return True
     except Exception as e:
         logger.exception(f"清理临时文件失败: {e}")
-        return False 
\ No newline at end of file
+        return False 
+
+
+def cleanup_checkpoints() -> bool:
+    """
+    清理已结束或已删除任务遗留的爬取检查点
+    
+    任务结束时会删除检查点；运行中被强制终止后删除、或心跳超时后失败的任务可能遗留检查点
+    
+    Returns:
+        bool: 是否成功
+    """
+    db = SessionLocal()
+    try:
+        job_ids = checkpoint.list_checkpoints()
+        if not job_ids:
+            return True
+        
+        # 排队或运行中的任务保留检查点，重试时从检查点继续
+        unfinished = {
+            job_id for (job_id,) in db.query(models.Job.id).filter(
+                models.Job.id.in_(job_ids),
+                models.Job.status.in_(("pending", "queued", "dispatched", "running", "retrying")),
+            )
+        }
+        count = 0
+        for job_id in job_ids:
+            if job_id not in unfinished:
+                checkpoint.remove_checkpoint(job_id)
+                count += 1
+        
+        logger.info(f"清理了 {count} 个任务的爬取检查点")
+        return True
+    except Exception as e:
+        logger.exception(f"清理爬取检查点失败: {e}")
+        return False
+    finally:
+        db.close()
+
+
+@celery_app.task(bind=True, max_retries=2)
+def cluster_artwork_images(self, tenant_id: Optional[str] = None, max_distance: Optional[int] = None) -> dict:
+    """
+    按图片感知哈希把各站点的同一作品聚为一簇
+    
+    Args:
+        tenant_id: 租户ID，为空时处理所有有图片哈希的租户
+        max_distance: pHash最大汉明距离，默认 IMAGE_MATCH_MAX_DISTANCE
+        
+    Returns:
+        dict: 每个租户的哈希数、簇数和归入簇的数据项数
+    """
+    db = SessionLocal()
+    try:
+        if tenant_id:
+            tenant_ids = [tenant_id]
+        else:
+            tenant_ids = [t for (t,) in db.query(models.ImageHash.tenant_id).distinct()]
+        results = {}
+        for tenant in tenant_ids:
+            results[tenant] = services.image_match.cluster(db, tenant_id=tenant, max_distance=max_distance)
+            logger.info(f"租户 {tenant} 图片聚类完成: {results[tenant]}")
+        return {"status": "success", "results": results}
+    except Exception as e:
+        logger.exception(f"图片聚类失败: {e}")
+        raise self.retry(exc=e, countdown=300)
+    finally:
+        db.close()
+
+
+@celery_app.task(bind=True, max_retries=2)
+def normalize_scraped_items(self, job_id: Optional[int] = None, tenant_id: Optional[str] = None) -> dict:
+    """
+    把数据项的年份、日期范围、尺寸、价格和描述解析为类型化字段
+    
+    爬取任务结束后按任务触发，定时任务处理遗漏的数据项
+    
+    Args:
+        job_id: 任务ID，为空时处理所有待规范化的数据项
+        tenant_id: 租户ID
+        
+    Returns:
+        dict: 规范化的数据项数
+    """
+    db = SessionLocal()
+    try:
+        count = services.normalization.normalize_pending(db, tenant_id=tenant_id, job_id=job_id)
+        logger.info(f"规范化了 {count} 条数据项" + (f"，任务ID: {job_id}" if job_id else ""))
+        return {"status": "success", "normalized": count}
+    except Exception as e:
+        logger.exception(f"数据项规范化失败: {e}")
+        raise self.retry(exc=e, countdown=300)
+    finally:
+        db.close()
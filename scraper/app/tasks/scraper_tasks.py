@@ -3,24 +3,32 @@
 """
 import logging
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 import time
 
-from celery.exceptions import MaxRetriesExceededError
-from scrapy.crawler import CrawlerProcess
-from scrapy.utils.project import get_project_settings
+from celery import chord
+from celery.utils import uuid
+from celery.exceptions import MaxRetriesExceededError, Retry
+from opentelemetry import context as otel_context, trace
 from sqlalchemy.orm import Session
 
 from app import models, schemas, services
+from app.core import heartbeat, tracing
 from app.core.celery_app import celery_app
+from app.core.config import settings
 from app.db.database import SessionLocal
-from app.scrapers.spider_factory import SpiderFactory
+from app.scrapers import checkpoint, profiling
+from app.scrapers.crawl import CrawlCancelled, get_crawl_settings, run_crawl_process
+from app.scrapers.frontier import clear_job_frontier, frontier_settings
+from app.scrapers.shards import plan_shards
 from app.utils.logger import get_job_logger
 
 # 设置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DISPATCH_LOCK = "aida:dispatch_jobs"
+
 
 @celery_app.task(bind=True, max_retries=3, default_retry_delay=60)
 def run_spider_task(self, job_id: int) -> Dict[str, Any]:
@@ -38,6 +46,9 @@ def run_spider_task(self, job_id: int) -> Dict[str, Any]:
     db = SessionLocal()
     # 获取任务日志记录器
     job_logger = get_job_logger(job_id)
+    owns_job = False
+    distributed = False
+    span = None
     
     try:
         # 获取任务
@@ -46,6 +57,34 @@ def run_spider_task(self, job_id: int) -> Dict[str, Any]:
             logger.error(f"任务不存在: {job_id}")
             return {"status": "failed", "error": "任务不存在"}
         
+        # 任务在投递后被取消
+        if job.status == "cancelled":
+            return {"status": "cancelled", "job_id": job_id}
+        
+        # 任务已由其他Celery任务运行（例如心跳超时后重新排队），重新投递的旧消息直接跳过
+        if (
+            job.celery_task_id
+            and job.celery_task_id != self.request.id
+            and job.status in ("queued",) + services.dispatch.ACTIVE_STATUSES
+        ):
+            logger.warning(f"任务 {job_id} 已由Celery任务 {job.celery_task_id} 运行，跳过")
+            return {"status": "skipped", "job_id": job_id}
+        owns_job = True
+        
+        # 链路上下文来自调度任务的消息头；直接调用时使用启动任务的请求
+        parent = tracing.extract(self.request.get("traceparent") or job.trace_context)
+        dispatched_at = self.request.get("dispatched_at")
+        if dispatched_at and not self.request.retries:
+            tracing.get_tracer().start_span(
+                "celery.queue_wait", context=parent, start_time=int(dispatched_at * 1e9)
+            ).end()
+        span = tracing.get_tracer().start_span(
+            "job.run",
+            context=parent,
+            attributes={"job.id": job_id, "celery.task_id": self.request.id, "celery.retries": self.request.retries},
+        )
+        span_token = otel_context.attach(trace.set_span_in_context(span))
+        
         # 获取站点配置
         site_config = services.site.get(db, site_id=job.site_config_id)
         if not site_config:
@@ -59,8 +98,17 @@ def run_spider_task(self, job_id: int) -> Dict[str, Any]:
                     error_message=error_msg
                 )
             )
+            checkpoint.remove_checkpoint(job_id)
             return {"status": "failed", "error": error_msg}
         
+        # 重试或worker重启后从检查点继续爬取，计数从检查点中的累计值开始
+        restored = checkpoint.load_stats(job_id)
+        items_saved = restored.get("database/items_saved", 0)
+        items_failed = restored.get("database/items_failed", 0)
+        if not restored:
+            # 重新开始的运行不保留上一次运行的性能分析结果
+            profiling.remove_profile(job_id)
+        
         # 更新任务状态为运行中
         job = services.job.update_status(
             db, 
@@ -68,6 +116,9 @@ def run_spider_task(self, job_id: int) -> Dict[str, Any]:
             status_update=schemas.JobStatusUpdate(
                 status="running",
                 progress=0,
+                items_scraped=items_saved + items_failed,
+                items_saved=items_saved,
+                items_failed=items_failed,
                 started_at=datetime.now()
             )
         )
@@ -76,30 +127,56 @@ def run_spider_task(self, job_id: int) -> Dict[str, Any]:
         job = services.job.update(
             db,
             db_obj=job,
-            obj_in=schemas.JobUpdate(celery_task_id=self.request.id)
+            obj_in=schemas.JobUpdate(
+                celery_task_id=self.request.id,
+                shards_total=0,
+                shards_completed=0
+            )
         )
         
         # 记录任务开始日志
         job_logger.info(f"任务 {job.name} 开始执行", db)
+        if restored:
+            job_logger.info(f"从检查点恢复爬取，已保存 {items_saved} 条数据", db)
+        
+        # 分片和协助者投递到与本任务相同类型的队列
+        queue = services.dispatch.queue_for(job)
         
         try:
-            # 创建爬虫
-            job_logger.info(f"正在创建爬虫实例，站点: {site_config.name}", db)
-            spider = SpiderFactory.create_spider(site_config=site_config, job_id=job_id)
-            
-            # 创建爬虫进程
-            job_logger.info("正在配置爬虫进程", db)
-            process = CrawlerProcess(get_project_settings())
+            # 任务配置 shard_by 时拆成分片，由chord并行执行，全部结束后汇总到任务
+            shards = plan_shards(site_config, job.config or {})
+            if shards:
+                services.job.update(db, db_obj=job, obj_in=schemas.JobUpdate(shards_total=len(shards)))
+                headers = tracing.message_headers()
+                chord(
+                    run_shard_task.s(job_id, shard).set(queue=queue, headers=headers) for shard in shards
+                )(finalize_sharded_job.s(job_id))
+                job_logger.info(f"任务拆分为 {len(shards)} 个分片")
+                return {"status": "dispatched", "job_id": job_id, "shards": len(shards)}
             
-            # 配置爬虫进程
-            process.crawl(spider)
+            # 任务配置 workers > 1 时使用共享爬取队列，其余worker作为协助者加入；
+            # 共享队列本身保存在Redis中，只有单worker爬取使用检查点
+            workers = int((job.config or {}).get("workers", 1))
+            if workers > 1:
+                distributed = True
+                # 首次运行清空上次残留的共享队列，重试时保留以继续爬取
+                settings_overrides = frontier_settings(reset=not self.request.retries)
+                for _ in range(workers - 1):
+                    join_crawl_task.apply_async((job_id,), queue=queue, headers=tracing.message_headers())
+                job_logger.info(f"分布式爬取，共 {workers} 个worker")
+            else:
+                settings_overrides = checkpoint.checkpoint_settings(job_id)
             
             # 运行爬虫
-            job_logger.info("爬虫开始运行", db)
-            process.start()
+            job_logger.info(f"爬虫开始运行，站点: {site_config.name}")
+            stats = run_crawl_process(job_id, settings_overrides, should_cancel=lambda: _cancel_requested(job_id))
             
             # 记录完成日志
             job_logger.info("爬虫任务完成", db)
+            if distributed:
+                # 协助者的统计留在各自进程中，报告只含主worker的部分
+                stats["frontier/helpers"] = workers - 1
+            _save_report(db, job, stats)
             
             # 更新任务状态为完成
             job = services.job.update_status(
@@ -111,6 +188,8 @@ def run_spider_task(self, job_id: int) -> Dict[str, Any]:
                     completed_at=datetime.now()
                 )
             )
+            checkpoint.remove_checkpoint(job_id)
+            _trigger_normalization(job_id)
             
             return {
                 "status": "success",
@@ -119,31 +198,20 @@ def run_spider_task(self, job_id: int) -> Dict[str, Any]:
                 "items_scraped": job.items_scraped,
                 "items_saved": job.items_saved,
             }
+        except CrawlCancelled:
+            job_logger.info("任务已取消，爬取已停止", db)
+            checkpoint.remove_checkpoint(job_id)
+            if distributed:
+                _clear_frontier(job_id)
+            return {"status": "cancelled", "job_id": job_id}
         except Exception as e:
             # 记录异常
             error_msg = f"爬虫任务执行异常: {e}"
             job_logger.error(error_msg, db)
             
-            # 尝试重试任务
-            try:
-                # 更新任务状态为重试中
-                services.job.update_status(
-                    db, 
-                    job_id=job_id, 
-                    status_update=schemas.JobStatusUpdate(
-                        status="retrying",
-                        error_message=f"任务执行异常，准备重试: {str(e)}"
-                    )
-                )
-                
-                job_logger.warning(f"任务执行失败，准备重试: {str(e)}", db)
-                
-                # 重试任务
-                raise self.retry(exc=e, countdown=60)
-            except MaxRetriesExceededError:
-                # 超过最大重试次数
-                error_msg = f"任务 {job_id} 超过最大重试次数"
-                job_logger.error(error_msg, db)
+            if self.request.retries >= self.max_retries:
+                # 超过最大重试次数，不再从检查点继续
+                job_logger.error(f"任务 {job_id} 超过最大重试次数", db)
                 services.job.update_status(
                     db, 
                     job_id=job_id, 
@@ -152,7 +220,24 @@ def run_spider_task(self, job_id: int) -> Dict[str, Any]:
                         error_message=f"超过最大重试次数: {str(e)}"
                     )
                 )
+                checkpoint.remove_checkpoint(job_id)
+                if distributed:
+                    _clear_frontier(job_id)
                 return {"status": "failed", "error": f"超过最大重试次数: {str(e)}"}
+            
+            # 更新任务状态为重试中，重试前任务仍占用调度名额
+            services.job.update_status(
+                db, 
+                job_id=job_id, 
+                status_update=schemas.JobStatusUpdate(
+                    status="retrying",
+                    error_message=f"任务执行异常，准备重试: {str(e)}"
+                )
+            )
+            job_logger.warning(f"任务执行失败，准备重试: {str(e)}", db)
+            raise self.retry(exc=e, countdown=60)
+    except Retry:
+        raise
     except Exception as e:
         error_msg = f"爬虫任务失败: {e}"
         logger.exception(error_msg)
@@ -167,12 +252,324 @@ def run_spider_task(self, job_id: int) -> Dict[str, Any]:
                 error_message=str(e)
             )
         )
+        checkpoint.remove_checkpoint(job_id)
+        if distributed:
+            _clear_frontier(job_id)
+        
+        return {"status": "failed", "error": str(e)}
+    finally:
+        if span is not None:
+            otel_context.detach(span_token)
+            span.end()
+        db.close()
+        if owns_job:
+            heartbeat.clear(job_id)
+        _trigger_dispatch()
+
+
+@celery_app.task(bind=True)
+def join_crawl_task(self, job_id: int) -> Dict[str, Any]:
+    """
+    作为协助者加入正在运行的分布式爬取任务
+    
+    从任务的共享爬取队列中取请求处理，不修改任务状态；数据项计数由
+    DatabasePipeline累加到任务上
+    
+    Args:
+        self: Celery任务实例
+        job_id: 任务ID
+        
+    Returns:
+        Dict[str, Any]: 任务结果
+    """
+    db = SessionLocal()
+    job_logger = get_job_logger(job_id)
+    
+    try:
+        job = services.job.get(db, job_id=job_id)
+        if not job or job.status != "running":
+            return {"status": "skipped", "job_id": job_id}
+        
+        site_config = services.site.get(db, site_id=job.site_config_id)
+        job_logger.info(f"协助者worker加入任务 {job.name}")
+        with tracing.get_tracer().start_as_current_span(
+            "job.join", context=tracing.extract(self.request.get("traceparent")), attributes={"job.id": job_id}
+        ):
+            stats = run_crawl_process(
+                job_id, frontier_settings(join=True), should_cancel=lambda: _cancel_requested(job_id)
+            )
         
+        return {
+            "status": "success",
+            "job_id": job_id,
+            "items_saved": stats.get("database/items_saved", 0),
+        }
+    except CrawlCancelled:
+        return {"status": "cancelled", "job_id": job_id}
+    except Exception as e:
+        error_msg = f"协助者worker执行异常: {e}"
+        logger.exception(error_msg)
+        job_logger.error(error_msg)
         return {"status": "failed", "error": str(e)}
     finally:
         db.close()
 
 
+@celery_app.task(bind=True, max_retries=3, default_retry_delay=60)
+def run_shard_task(self, job_id: int, shard: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    运行任务的一个分片
+    
+    分片失败时只重试该分片；超过最大重试次数后返回失败结果而不是抛出异常，
+    保证chord的汇总任务一定会执行
+    
+    Args:
+        self: Celery任务实例
+        job_id: 任务ID
+        shard: 分片，见 app.scrapers.shards.plan_shards
+        
+    Returns:
+        Dict[str, Any]: 分片结果
+    """
+    job_logger = get_job_logger(job_id)
+    result = {"index": shard["index"], "label": shard["label"]}
+    
+    try:
+        if _cancel_requested(job_id):
+            raise CrawlCancelled(f"任务 {job_id} 已取消")
+        job_logger.info(f"分片 {shard['label']} 开始运行")
+        with tracing.get_tracer().start_as_current_span(
+            "job.shard",
+            context=tracing.extract(self.request.get("traceparent")),
+            attributes={"job.id": job_id, "shard.label": shard["label"], "celery.retries": self.request.retries},
+        ):
+            stats = run_crawl_process(
+                job_id,
+                checkpoint.checkpoint_settings(job_id, shard["index"]),
+                spider_kwargs=shard["spider_kwargs"],
+                should_cancel=lambda: _cancel_requested(job_id),
+            )
+        result.update(status="success", items_saved=stats.get("database/items_saved", 0), stats=stats)
+        job_logger.info(f"分片 {shard['label']} 完成，保存 {result['items_saved']} 条数据")
+    except CrawlCancelled as e:
+        result.update(status="cancelled", error=str(e))
+    except Exception as e:
+        if self.request.retries < self.max_retries:
+            job_logger.warning(f"分片 {shard['label']} 执行失败，准备重试: {e}")
+            raise self.retry(exc=e)
+        job_logger.error(f"分片 {shard['label']} 超过最大重试次数: {e}")
+        result.update(status="failed", error=str(e))
+    
+    db = SessionLocal()
+    try:
+        services.job.complete_shard(db, job_id=job_id)
+    finally:
+        db.close()
+    return result
+
+
+@celery_app.task
+def finalize_sharded_job(results: List[Dict[str, Any]], job_id: int) -> Dict[str, Any]:
+    """
+    汇总分片结果，更新任务状态
+    
+    全部分片失败时任务失败；部分失败时任务完成，失败的分片记录在错误信息中
+    
+    Args:
+        results: 各分片的结果
+        job_id: 任务ID
+        
+    Returns:
+        Dict[str, Any]: 任务结果
+    """
+    db = SessionLocal()
+    job_logger = get_job_logger(job_id)
+    
+    try:
+        # 任务已取消时保持取消状态
+        if services.job.get_status(db, job_id=job_id) == "cancelled":
+            job_logger.info("分片任务已取消")
+            return {"status": "cancelled", "job_id": job_id, "shards": len(results)}
+        
+        failed = [r for r in results if r.get("status") != "success"]
+        error_message = "; ".join(f"分片 {r['label']}: {r.get('error')}" for r in failed) or None
+        status = "failed" if results and len(failed) == len(results) else "completed"
+        
+        job = services.job.update_status(
+            db, 
+            job_id=job_id, 
+            status_update=schemas.JobStatusUpdate(
+                status=status,
+                progress=100,
+                error_message=error_message,
+                completed_at=datetime.now()
+            )
+        )
+        job_logger.info(f"分片任务结束: {len(results) - len(failed)}/{len(results)} 个分片成功")
+        succeeded = [r["stats"] for r in results if r.get("stats")]
+        if succeeded:
+            _save_report(db, job, services.crawl_report.merge_stats(succeeded))
+        if status == "completed":
+            _trigger_normalization(job_id)
+        
+        return {
+            "status": "success" if status == "completed" else "failed",
+            "job_id": job_id,
+            "shards": len(results),
+            "shards_failed": len(failed),
+            "items_scraped": job.items_scraped,
+            "items_saved": job.items_saved,
+            "items_failed": job.items_failed,
+        }
+    finally:
+        db.close()
+        heartbeat.clear(job_id)
+        checkpoint.remove_checkpoint(job_id)
+        _trigger_dispatch()
+
+
+@celery_app.task
+def dispatch_jobs() -> Dict[str, Any]:
+    """
+    按队列容量、租户权重和并发上限投递排队中的任务
+    
+    由Celery Beat定时触发，任务启动和结束时也会立即触发；多个调度同时运行时只有一个生效
+    
+    Returns:
+        Dict[str, Any]: 调度结果
+    """
+    lock = celery_app.backend.client.lock(DISPATCH_LOCK, timeout=60)
+    if not lock.acquire(blocking=False):
+        return {"status": "skipped"}
+    
+    db = SessionLocal()
+    dispatched = []
+    try:
+        for job in services.dispatch.select_jobs(db):
+            queue = services.dispatch.QUEUES[job.queue]
+            task_id = uuid()
+            if not services.dispatch.mark_dispatched(db, job_id=job.id, celery_task_id=task_id):
+                continue
+            # 在调度队列中等待的时间；Celery队列中的等待由任务根据 dispatched_at 记录
+            tracing.get_tracer().start_span(
+                "job.dispatch_wait",
+                context=tracing.extract(job.trace_context),
+                start_time=tracing.to_ns(job.queued_at),
+                attributes={"job.id": job.id, "tenant.id": job.tenant_id, "celery.queue": queue},
+            ).end()
+            try:
+                run_spider_task.apply_async(
+                    (job.id,),
+                    task_id=task_id,
+                    queue=queue,
+                    headers={"traceparent": job.trace_context, "dispatched_at": time.time()},
+                )
+            except Exception as e:
+                logger.exception(f"投递任务 {job.id} 失败: {e}")
+                services.dispatch.requeue(db, job_id=job.id)
+                continue
+            dispatched.append(job.id)
+            logger.info(f"任务 {job.id}（租户 {job.tenant_id}）已投递到 {queue}")
+        
+        return {"status": "success", "dispatched": dispatched}
+    finally:
+        db.close()
+        lock.release()
+
+
+@celery_app.task
+def schedule_due_jobs() -> Dict[str, Any]:
+    """
+    把到期的周期任务放入调度队列
+    
+    由Celery Beat定时触发，每次一条范围查询；超出 SCHEDULER_BATCH_SIZE 的到期任务留到下一次
+    
+    Returns:
+        Dict[str, Any]: 调度结果
+    """
+    db = SessionLocal()
+    try:
+        queued = services.schedule.enqueue_due_jobs(db)
+        
+        if queued:
+            logger.info(f"{len(queued)} 个周期任务到期，已放入调度队列")
+            _trigger_dispatch()
+        return {"status": "success", "queued": len(queued)}
+    finally:
+        db.close()
+
+
+def _save_report(db: Session, job: models.Job, stats: Dict[str, Any]) -> None:
+    """
+    保存爬取报告，失败时只记录日志，不影响任务状态
+    
+    Args:
+        db: 数据库会话
+        job: 任务
+        stats: Scrapy统计
+    """
+    try:
+        services.crawl_report.create(db, job=job, stats=stats)
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"保存任务 {job.id} 的爬取报告失败: {e}")
+
+
+def _trigger_normalization(job_id: int) -> None:
+    """
+    爬取结束后在维护队列中规范化任务写入的数据项，失败时由定时任务补上
+    
+    Args:
+        job_id: 任务ID
+    """
+    try:
+        celery_app.send_task(
+            "app.tasks.maintenance_tasks.normalize_scraped_items", kwargs={"job_id": job_id}, queue="maintenance"
+        )
+    except Exception as e:
+        logger.warning(f"触发任务 {job_id} 的数据项规范化失败: {e}")
+
+
+def _cancel_requested(job_id: int) -> bool:
+    """
+    检查任务是否已取消或已删除，爬取期间由 run_crawl_process 定期调用
+    
+    Args:
+        job_id: 任务ID
+        
+    Returns:
+        bool: 是否已取消
+    """
+    db = SessionLocal()
+    try:
+        return services.job.get_status(db, job_id=job_id) in (None, "cancelled")
+    finally:
+        db.close()
+
+
+def _clear_frontier(job_id: int) -> None:
+    """
+    任务取消或最终失败后清空共享爬取队列，爬取进程被强制结束时不会自行清空
+    
+    Args:
+        job_id: 任务ID
+    """
+    try:
+        clear_job_frontier(get_crawl_settings(), job_id)
+    except Exception as e:
+        logger.warning(f"清空任务 {job_id} 的共享爬取队列失败: {e}")
+
+
+def _trigger_dispatch() -> None:
+    """
+    立即触发一次调度，新排队的任务和空出的名额不必等到下一次定时调度
+    """
+    try:
+        dispatch_jobs.delay()
+    except Exception as e:
+        logger.warning(f"触发任务调度失败: {e}")
+
+
 @celery_app.task(bind=True, max_retries=3, default_retry_delay=30)
 def update_job_progress(self, job_id: int, progress: int, items_scraped: int, items_saved: int) -> None:
     """
@@ -221,34 +618,46 @@ def update_job_progress(self, job_id: int, progress: int, items_scraped: int, it
 @celery_app.task(bind=True, max_retries=3)
 def cleanup_stalled_jobs(self) -> Dict[str, Any]:
     """
-    清理卡住的任务
+    清理心跳超时的任务
+    
+    运行中的任务超过 HEARTBEAT_TIMEOUT 秒没有心跳时（分片任务为 SHARD_STALL_TIMEOUT 秒
+    没有心跳也没有分片结束），以及已投递或等待重试的任务超过 DISPATCH_STALL_TIMEOUT 秒
+    没有开始运行时，终止原Celery任务并重新排队，空出的名额立即可用；
+    超过 HEARTBEAT_MAX_REQUEUES 次后任务失败
     
     Returns:
         Dict[str, Any]: 清理结果
     """
     db = SessionLocal()
     try:
-        # 查找状态为running但长时间未更新的任务
-        stalled_jobs = services.job.find_stalled_jobs(db, minutes=30)
+        stalled_jobs = services.job.find_stalled_jobs(
+            db,
+            heartbeats=heartbeat.get_all(),
+            timeout=settings.HEARTBEAT_TIMEOUT,
+        )
         
         count = 0
         for job in stalled_jobs:
-            # 更新任务状态为失败
-            services.job.update_status(
-                db, 
-                job_id=job.id, 
-                status_update=schemas.JobStatusUpdate(
-                    status="failed",
-                    error_message="任务执行超时"
-                )
+            # 终止原任务；被撤销的任务ID会被worker记住，消息重新投递时也不会再执行
+            if job.celery_task_id:
+                celery_app.control.revoke(job.celery_task_id, terminate=True)
+            requeued = services.job.requeue_stalled(
+                db, job=job, max_requeues=settings.HEARTBEAT_MAX_REQUEUES
             )
+            heartbeat.clear(job.id)
             
             # 记录日志
             job_logger = get_job_logger(job.id)
-            job_logger.error("任务执行超时，已自动取消", db)
+            if requeued:
+                job_logger.warning(f"任务心跳超时，第 {job.stall_count} 次自动重新排队", db)
+            else:
+                job_logger.error(job.error_message, db)
+                checkpoint.remove_checkpoint(job.id)
             
             count += 1
         
+        if count:
+            _trigger_dispatch()
         return {"status": "success", "cleaned_jobs": count}
     except Exception as e:
         logger.exception(f"清理卡住任务失败: {e}")
@@ -0,0 +1,175 @@
+"""
+感知哈希和汉明距离索引
+
+pHash和dHash都是64位整数，同一作品经过缩放、重新压缩或轻微裁剪后汉明距离通常不超过10，
+不同作品一般在20以上。pHash对缩放和压缩更稳健，作为索引键；dHash计算便宜，用于复核候选。
+"""
+import math
+import statistics
+from collections import defaultdict
+from itertools import combinations
+from typing import Dict, Hashable, Iterator, List, Set, Tuple
+
+HASH_BITS = 64
+
+# 32点DCT-II中前8个频率的系数，pHash只使用左上角8x8的低频部分
+_DCT = [[math.cos((2 * x + 1) * u * math.pi / 64) for x in range(32)] for u in range(8)]
+
+
+def _grayscale(image, width: int, height: int) -> bytes:
+    """
+    缩放为灰度图，返回按行排列的像素
+    """
+    from PIL import Image
+
+    return image.convert("L").resize((width, height), Image.Resampling.LANCZOS).tobytes()
+
+
+def dhash(image) -> int:
+    """
+    差值哈希：缩放为9x8灰度图，每行相邻像素比较得到64位
+
+    Args:
+        image: PIL图片
+
+    Returns:
+        int: 64位哈希
+    """
+    pixels = _grayscale(image, 9, 8)
+    value = 0
+    for y in range(8):
+        row = pixels[y * 9:(y + 1) * 9]
+        for x in range(8):
+            value = (value << 1) | (row[x] < row[x + 1])
+    return value
+
+
+def phash(image) -> int:
+    """
+    感知哈希：32x32灰度图做二维DCT，8x8低频系数与其中位数（不含直流分量）比较得到64位
+
+    Args:
+        image: PIL图片
+
+    Returns:
+        int: 64位哈希
+    """
+    pixels = _grayscale(image, 32, 32)
+    # 先对每行求前8个频率，再对这8列求前8个频率
+    rows = [
+        [sum(p * c for p, c in zip(pixels[y * 32:(y + 1) * 32], _DCT[u])) for u in range(8)]
+        for y in range(32)
+    ]
+    coefficients = [
+        sum(rows[y][u] * _DCT[v][y] for y in range(32)) for v in range(8) for u in range(8)
+    ]
+    median = statistics.median(coefficients[1:])
+    value = 0
+    for coefficient in coefficients:
+        value = (value << 1) | (coefficient > median)
+    return value
+
+
+def to_hex(value: int) -> str:
+    """
+    64位哈希的十六进制表示，存储在数据项和数据库中
+    """
+    return format(value, "016x")
+
+
+def from_hex(value: str) -> int:
+    """
+    十六进制表示转换为64位哈希
+    """
+    return int(value, 16)
+
+
+def hamming(a: int, b: int) -> int:
+    """
+    两个哈希的汉明距离
+    """
+    return (a ^ b).bit_count()
+
+
+class HammingIndex:
+    """
+    多索引哈希（multi-index hashing）的汉明距离索引
+
+    64位哈希分成 chunks 段，每段建一个哈希表。两个哈希的距离不超过 r 时，至少有一段的距离
+    不超过 r // chunks（抽屉原理），因此只需在每段中枚举该距离以内的段值查表，再对候选计算完整距离。
+    百万级哈希、16位一段时每个桶约十几个值，一次查询只需几百次查表和几千次距离计算。
+    """
+
+    def __init__(self, chunks: int = 4):
+        """
+        初始化索引
+
+        Args:
+            chunks: 分段数，64需能被其整除；段长接近 log2(哈希数) 时候选最少
+        """
+        if HASH_BITS % chunks:
+            raise ValueError(f"{HASH_BITS}位哈希不能均分为{chunks}段")
+        self.chunks = chunks
+        self.chunk_bits = HASH_BITS // chunks
+        self.mask = (1 << self.chunk_bits) - 1
+        self.tables: List[Dict[int, List[int]]] = [defaultdict(list) for _ in range(chunks)]
+        self.hashes: Dict[int, Set[Hashable]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return sum(len(keys) for keys in self.hashes.values())
+
+    def _split(self, value: int) -> Iterator[Tuple[int, int]]:
+        """
+        哈希的各段，(段序号, 段值)
+        """
+        for i in range(self.chunks):
+            yield i, (value >> (i * self.chunk_bits)) & self.mask
+
+    def add(self, value: int, key: Hashable) -> None:
+        """
+        添加哈希
+
+        Args:
+            value: 64位哈希
+            key: 哈希对应的键，例如数据库记录ID；同一哈希可对应多个键
+        """
+        if value not in self.hashes:
+            for i, chunk in self._split(value):
+                self.tables[i][chunk].append(value)
+        self.hashes[value].add(key)
+
+    def _probes(self, chunk: int, radius: int) -> Iterator[int]:
+        """
+        与段值距离不超过 radius 的所有段值
+        """
+        for distance in range(radius + 1):
+            for bits in combinations(range(self.chunk_bits), distance):
+                probe = chunk
+                for bit in bits:
+                    probe ^= 1 << bit
+                yield probe
+
+    def search(self, value: int, max_distance: int) -> List[Tuple[int, Hashable]]:
+        """
+        查找距离不超过 max_distance 的哈希
+
+        Args:
+            value: 64位哈希
+            max_distance: 最大汉明距离
+
+        Returns:
+            List[Tuple[int, Hashable]]: (距离, 键)，按距离排序
+        """
+        radius = max_distance // self.chunks
+        candidates = set()
+        for i, chunk in self._split(value):
+            table = self.tables[i]
+            for probe in self._probes(chunk, radius):
+                candidates.update(table.get(probe, ()))
+        results = []
+        for candidate in candidates:
+            distance = hamming(value, candidate)
+            if distance <= max_distance:
+                results.extend((distance, key) for key in self.hashes[candidate])
+        results.sort(key=lambda result: result[0])
+        return results
@@ -0,0 +1,321 @@
+"""
+字段规范化
+
+各爬虫产出的年份、日期范围、尺寸、价格和描述都是原始字符串，这里按列批量解析为类型化的值。
+每个解析函数接收一列值，返回等长的结果列表：一列中的值先去重，每个不同的值只用预编译的正则解析一次，
+再按位置展开回整列（与pandas的 factorize + map 相同）。同一站点的数据项大量重复同样的年份、
+价格格式和“Price on request”，一批中只解析一次。
+"""
+import functools
+import html
+import re
+from datetime import date
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+YEAR = r"(?:1[0-9]\d{2}|20\d{2})"
+RANGE_SEPARATOR = r"\s*(?:-|–|—|~|to|至)\s*"
+
+_YEAR_RANGE = re.compile(rf"(?<!\d)({YEAR}){RANGE_SEPARATOR}(\d{{4}}|\d{{2}})(?!\d)")
+_DECADE = re.compile(r"(?<!\d)(1[0-9]\d|20\d)0'?s\b")
+# “1920s-1930s”、“1920s–30s”
+_DECADE_RANGE = re.compile(rf"(?<!\d)(1[0-9]\d|20\d)0'?s{RANGE_SEPARATOR}((?:1[0-9]|20)?\d)0'?s\b")
+_CENTURY = re.compile(r"(?<!\d)(\d{1,2})(?:st|nd|rd|th)\s+century|(?<!\d)(\d{1,2})\s*世纪", re.IGNORECASE)
+_YEAR = re.compile(rf"(?<!\d){YEAR}(?!\d)")
+
+_MONTHS = {
+    month: number
+    for number, names in enumerate(
+        (
+            ("jan", "january"), ("feb", "february"), ("mar", "march"), ("apr", "april"), ("may",),
+            ("jun", "june"), ("jul", "july"), ("aug", "august"), ("sep", "sept", "september"),
+            ("oct", "october"), ("nov", "november"), ("dec", "december"),
+        ),
+        start=1,
+    )
+    for month in names
+}
+_MONTH = r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sept?(?:ember)?" \
+         r"|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\.?"
+_ORDINAL = r"(?:st|nd|rd|th)?"
+# 一个日期的各种写法，缺少的年、月由范围的另一端补全
+_DATE = re.compile(
+    "|".join((
+        r"(?P<iso_y>\d{4})[-/.](?P<iso_m>\d{1,2})[-/.](?P<iso_d>\d{1,2})",
+        r"(?:(?P<cn_y>\d{4})\s*年\s*)?(?P<cn_m>\d{1,2})\s*月\s*(?P<cn_d>\d{1,2})\s*日",
+        rf"(?P<md_m>{_MONTH})\s+(?P<md_d>\d{{1,2}}){_ORDINAL}(?:,?\s+(?P<md_y>\d{{4}}))?",
+        rf"(?P<dm_d>\d{{1,2}}){_ORDINAL}\s+(?P<dm_m>{_MONTH})(?:,?\s+(?P<dm_y>\d{{4}}))?",
+        # “Mar 3 – 20, 2024”中只有日和年的结束日期
+        r"(?<=[-–—~]\s)(?P<d_d>\d{1,2}),?\s+(?P<d_y>\d{4})|(?<=[-–—~])(?P<d2_d>\d{1,2}),?\s+(?P<d2_y>\d{4})",
+    )),
+    re.IGNORECASE,
+)
+
+# 长度单位换算为厘米
+_UNITS = {
+    "mm": 0.1, "cm": 1.0, "m": 100.0, "in": 2.54, "inch": 2.54, "inches": 2.54, "ft": 30.48,
+    "毫米": 0.1, "厘米": 1.0, "米": 100.0, "英寸": 2.54,
+}
+_UNIT = r"(mm|cm|m|inches|inch|in|ft|毫米|厘米|米|英寸)\b"
+_NUMBER = r"(\d+(?:[.,]\d+)?)"
+_DIMENSIONS = re.compile(
+    rf"{_NUMBER}\s*(?:{_UNIT})?\s*[x×X*]\s*{_NUMBER}\s*(?:{_UNIT})?"
+    rf"(?:\s*[x×X*]\s*{_NUMBER}\s*(?:{_UNIT})?)?(?:\s*{_UNIT})?",
+    re.IGNORECASE,
+)
+# Saatchi等站点的“24 W x 36 H x 1 D in”
+_TAGGED_DIMENSION = re.compile(rf"{_NUMBER}\s*(?:{_UNIT})?\s*([WHD])\b")
+_ANY_UNIT = re.compile(rf"(?<![a-z]){_UNIT}", re.IGNORECASE)
+
+# 币种符号按从长到短匹配，“US$”优先于“$”
+_CURRENCY_SYMBOLS = {
+    "US$": "USD", "HK$": "HKD", "CA$": "CAD", "C$": "CAD", "AU$": "AUD", "A$": "AUD", "JP¥": "JPY",
+    "$": "USD", "€": "EUR", "£": "GBP", "¥": "CNY", "￥": "CNY", "元": "CNY", "RMB": "CNY",
+}
+_CURRENCY_CODES = ("USD", "EUR", "GBP", "CNY", "JPY", "HKD", "CAD", "AUD", "CHF")
+_CURRENCY = re.compile(
+    "|".join(
+        [rf"\b{code}\b" for code in _CURRENCY_CODES]
+        + [re.escape(symbol) for symbol in sorted(_CURRENCY_SYMBOLS, key=len, reverse=True)]
+    ),
+    re.IGNORECASE,
+)
+_AMOUNT = re.compile(r"\d[\d,.'\s]*\d|\d")
+_AMOUNT_BEFORE = re.compile(r"(\d[\d,.'\s]*\d|\d)\s*$")
+_NUMERIC = re.compile(r"[\d,.'\s]+")
+
+_SCRIPT = re.compile(r"<(script|style)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+_BLOCK_TAG = re.compile(r"<\s*(?:br|/?p|/?div|/?li|/?h[1-6]|/?tr)\b[^>]*>", re.IGNORECASE)
+_TAG = re.compile(r"<[^>]+>")
+_SPACES = re.compile(r"[ \t\r\f\v\xa0]+")
+_NEWLINES = re.compile(r"\s*\n\s*")
+
+
+def _column(empty: Any) -> Callable:
+    """
+    把解析单个字符串的函数变为按列解析的函数
+
+    空值和非字符串（例如字典）得到 empty，数值先转换为字符串；不同的值只解析一次
+
+    Args:
+        empty: 没有可解析的值时的结果
+    """
+    def decorator(parse: Callable[[str], Any]) -> Callable[[Sequence[Any]], List[Any]]:
+        @functools.wraps(parse)
+        def apply(values: Sequence[Any]) -> List[Any]:
+            parsed = {}
+            results = []
+            for value in values:
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    value = str(value)
+                if not isinstance(value, str) or not value.strip():
+                    results.append(empty)
+                    continue
+                if value not in parsed:
+                    parsed[value] = parse(value)
+                results.append(parsed[value])
+            return results
+
+        apply.parse = parse
+        return apply
+    return decorator
+
+
+@_column((None, None))
+def years(value: str) -> Tuple[Optional[int], Optional[int]]:
+    """
+    年份或年份范围：“1889”、“c. 1905–10”、“1880s”、“1920s-1930s”、“19th century”、“1853 - 1890”
+
+    Returns:
+        Tuple[Optional[int], Optional[int]]: 起止年份，单个年份时两者相同
+    """
+    match = _YEAR_RANGE.search(value)
+    if match:
+        start, end = match.group(1), match.group(2)
+        if len(end) == 2:
+            end = start[:2] + end
+        start, end = int(start), int(end)
+        if end >= start:
+            return start, end
+    match = _DECADE_RANGE.search(value)
+    if match:
+        start, end = match.group(1), match.group(2)
+        if len(end) == 1:
+            end = start[:2] + end
+        start, end = int(start) * 10, int(end) * 10 + 9
+        if end > start:
+            return start, end
+    match = _DECADE.search(value)
+    if match:
+        start = int(match.group(1)) * 10
+        return start, start + 9
+    match = _CENTURY.search(value)
+    if match:
+        century = int(match.group(1) or match.group(2))
+        return (century - 1) * 100 + 1, century * 100
+    found = [int(year) for year in _YEAR.findall(value)]
+    if found:
+        return min(found), max(found)
+    return None, None
+
+
+def _date_parts(match: re.Match) -> Tuple[Optional[int], Optional[int], int]:
+    """
+    日期匹配中的年、月、日，缺少的年、月为None
+    """
+    groups = match.groupdict()
+    for prefix in ("iso", "cn", "md", "dm", "d", "d2"):
+        day = groups.get(f"{prefix}_d")
+        if day is None:
+            continue
+        year = groups.get(f"{prefix}_y")
+        month = groups.get(f"{prefix}_m")
+        if month is not None and not month.isdigit():
+            month = _MONTHS[month.lower().rstrip(".")]
+        return (int(year) if year else None), (int(month) if month else None), int(day)
+    raise ValueError(match.group(0))
+
+
+def _to_date(year: Optional[int], month: Optional[int], day: int) -> Optional[date]:
+    """
+    构造日期，缺少年或月、或日期无效时返回None
+    """
+    if year is None or month is None:
+        return None
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+@_column((None, None))
+def date_ranges(value: str) -> Tuple[Optional[date], Optional[date]]:
+    """
+    日期范围：“March 3 – April 20, 2024”、“3 Mar - 20 Apr 2024”、“Mar 3 – 20, 2024”、
+    “2024-03-03 - 2024-04-20”、“2024年3月3日至4月20日”
+
+    Returns:
+        Tuple[Optional[date], Optional[date]]: 开始和结束日期，只有一个日期时结束日期为None
+    """
+    matches = list(_DATE.finditer(value))
+    if not matches:
+        return None, None
+    start_year, start_month, start_day = _date_parts(matches[0])
+    if len(matches) == 1:
+        return _to_date(start_year, start_month, start_day), None
+    end_year, end_month, end_day = _date_parts(matches[-1])
+    end_year = end_year or start_year
+    end_month = end_month or start_month
+    if start_year is None and end_year is not None:
+        # “Dec 5 – Jan 10, 2025”的开始日期在前一年
+        start_year = end_year - 1 if start_month and end_month and start_month > end_month else end_year
+    start_month = start_month or end_month
+    return _to_date(start_year, start_month, start_day), _to_date(end_year, end_month, end_day)
+
+
+def _number(text: str) -> float:
+    """
+    尺寸中的数值，逗号作为小数点
+    """
+    return float(text.replace(",", "."))
+
+
+@_column((None, None, None))
+def dimensions(value: str) -> Tuple[Optional[float], Optional[float], Optional[float]]:
+    """
+    尺寸换算为厘米：“100 × 80 cm”、“39.4 x 31.5 x 2 in”、“24 W x 36 H x 1 D in”、“65 × 81”
+
+    未标注字母时按高 × 宽 × 深的顺序。各项按自己的单位换算（“12 in x 3 ft”），未标注单位的项
+    使用其后最近的单位，其后没有时使用其前的单位；都没有单位时按厘米（WikiArt的尺寸不带单位）
+
+    Returns:
+        Tuple[Optional[float], Optional[float], Optional[float]]: 高、宽、深（厘米）
+    """
+    tagged = list(_TAGGED_DIMENSION.finditer(value))
+    if len(tagged) >= 2:
+        # 未逐项标注单位时使用最后一项之后的单位
+        unit_match = _ANY_UNIT.search(value, tagged[-1].end()) or _ANY_UNIT.search(value)
+        default = unit_match.group(1) if unit_match else "cm"
+        sizes = {
+            match.group(3).upper(): round(_number(match.group(1)) * _UNITS[(match.group(2) or default).lower()], 2)
+            for match in tagged
+        }
+        return sizes.get("H"), sizes.get("W"), sizes.get("D")
+
+    match = _DIMENSIONS.search(value)
+    if not match:
+        return None, None, None
+    h, h_unit, w, w_unit, d, d_unit, trailing_unit = match.groups()
+    units = [h_unit, w_unit, d_unit, trailing_unit]
+    sizes = []
+    for i, number in enumerate((h, w, d)):
+        if not number:
+            sizes.append(None)
+            continue
+        unit = next((u for u in units[i:] if u), None) or next((u for u in reversed(units[:i]) if u), "cm")
+        sizes.append(round(_number(number) * _UNITS[unit.lower()], 2))
+    return tuple(sizes)
+
+
+def _amount(text: str) -> Optional[float]:
+    """
+    金额，区分千位分隔符和小数点：“1,200”、“1.200,50”、“1 200”、“12.5”
+    """
+    text = re.sub(r"[\s']", "", text)
+    if "," in text and "." in text:
+        decimal = "," if text.rfind(",") > text.rfind(".") else "."
+    elif text.count(",") == 1 and len(text) - text.rfind(",") - 1 != 3:
+        decimal = ","
+    elif text.count(".") == 1 and len(text) - text.rfind(".") - 1 != 3:
+        decimal = "."
+    else:
+        decimal = None
+    thousands = {",", "."} - {decimal}
+    for separator in thousands:
+        text = text.replace(separator, "")
+    if decimal:
+        text = text.replace(decimal, ".")
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+@_column((None, None))
+def prices(value: str) -> Tuple[Optional[float], Optional[str]]:
+    """
+    价格和币种：“$1,200”、“US$ 1,200”、“€1.200,00”、“1,200 USD”、“¥8000”；范围取下限，
+    “Sold”、“Price on request”等没有金额
+
+    Returns:
+        Tuple[Optional[float], Optional[str]]: 金额和ISO 4217币种代码，没有币种符号时币种为None
+    """
+    currency = _CURRENCY.search(value)
+    if currency is None:
+        # 没有币种时只接受纯数字，避免把“Edition of 10”之类的文字当作价格
+        return (_amount(value), None) if _NUMERIC.fullmatch(value.strip()) else (None, None)
+    # 金额紧跟在币种之后或之前，其余情况取第一个数字
+    match = (
+        _AMOUNT.match(value, currency.end() + len(value[currency.end():]) - len(value[currency.end():].lstrip()))
+        or _AMOUNT_BEFORE.search(value[:currency.start()])
+        or _AMOUNT.search(value)
+    )
+    amount = _amount(match.group(0).strip()) if match else None
+    if amount is None:
+        return None, None
+    symbol = currency.group(0)
+    return amount, _CURRENCY_SYMBOLS.get(symbol.upper(), _CURRENCY_SYMBOLS.get(symbol, symbol.upper()))
+
+
+@_column(None)
+def strip_html(value: str) -> Optional[str]:
+    """
+    去除HTML标签和脚本，解码实体，块级标签换行，合并空白
+
+    Returns:
+        Optional[str]: 纯文本，为空时返回None
+    """
+    text = _SCRIPT.sub("", value)
+    text = _BLOCK_TAG.sub("\n", text)
+    text = html.unescape(_TAG.sub("", text))
+    text = _NEWLINES.sub("\n", _SPACES.sub(" ", text)).strip()
+    return text or None
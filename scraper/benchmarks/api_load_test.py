@@ -0,0 +1,609 @@
+"""
+API负载测试
+
+按给定规模向数据库批量写入多租户数据（租户、用户、站点配置、任务、抓取数据项和
+任务日志），然后以接近真实使用的比例并发请求主要的API端点，输出各端点的吞吐和
+延迟分位数::
+
+    jobs            GET /jobs                任务列表
+    job_logs        GET /jobs/{id}/logs      任务日志（随机任务，部分请求按级别过滤）
+    scraped_items   GET /scraped-items       数据项列表（部分请求按任务或类型过滤）
+    search          GET /search              全文搜索
+    login           POST /auth/login         登录
+
+用法::
+
+    # 进程内ASGI应用
+    python -m benchmarks.api_load_test --items 1000000 --logs 10000000 --duration 60 --output api.json
+    # 本地uvicorn（单个进程，对应 SYSTEM.md 中单个API节点100 rps的目标）
+    python -m benchmarks.api_load_test --mode uvicorn --concurrency 64
+
+默认使用工作目录中的临时SQLite数据库；--database-url 指定其他数据库（如PostgreSQL），
+--skip-seed 复用已写入数据的数据库。数据写入和负载测试在子进程中运行，应用按该
+数据库配置启动。
+
+除登录外的请求使用预先签发的访问令牌，与客户端登录一次后复用令牌的方式相同；
+登录请求单独按比例发送，测量密码校验的开销。
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+
+from benchmarks.crawl_benchmark import git_commit
+from benchmarks.instrumentation import percentile
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+MODES = ("asgi", "uvicorn")
+# 各端点的请求比例：列表和日志查看最常见，登录最少
+MIX = {
+    "jobs": 25,
+    "job_logs": 25,
+    "scraped_items": 30,
+    "search": 15,
+    "login": 5,
+}
+# SYSTEM.md 中单个API节点的吞吐目标
+TARGET_RPS = 100
+PASSWORD = "benchmark-password"
+BATCH_SIZE = 10000
+# 数据的时间跨度，列表按时间排序时不会都落在同一时刻
+TIME_SPAN_DAYS = 90
+PAGE_TYPES = ["artist", "artwork", "exhibition"]
+LOG_LEVELS = ["INFO", "WARNING", "ERROR", "DEBUG"]
+LOG_LEVEL_WEIGHTS = [80, 12, 5, 3]
+SEARCH_TERMS = ["山水", "肖像", "landscape", "油画", "装置", "archive", "展览", "摄影"]
+
+
+@dataclass(frozen=True)
+class SeedVolumes:
+    """
+    写入数据的规模；数据项和日志按租户权重分配，第N个租户的权重为 1/N，
+    少数大租户占据大部分数据
+    """
+    tenants: int = 5
+    users_per_tenant: int = 2
+    sites_per_tenant: int = 4
+    jobs_per_site: int = 10
+    items: int = 100000
+    logs: int = 1000000
+
+
+def _tenant_weights(tenants: int) -> List[float]:
+    """
+    获取各租户的数据量权重
+    """
+    return [1 / (index + 1) for index in range(tenants)]
+
+
+def _batches(rows: Iterator[Dict[str, Any]], size: int = BATCH_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    """
+    把行按批次分组
+    """
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def seed_database(database_url: str, volumes: SeedVolumes, seed: int = 0) -> Dict[str, Any]:
+    """
+    建表并批量写入多租户数据
+
+    数据项和日志通过Core的批量insert写入，不经过ORM，千万行级别的数据也能在可接受的
+    时间内写完。用户密码只哈希一次，所有用户共用同一个哈希。
+
+    Args:
+        database_url: 数据库连接字符串
+        volumes: 数据规模
+        seed: 随机种子
+
+    Returns:
+        Dict[str, Any]: 各表写入的行数和耗时
+    """
+    from sqlalchemy import create_engine, event
+
+    from app import models
+    from app.core import security
+    from app.db.base import Base
+
+    engine = create_engine(database_url)
+    if engine.dialect.name == "sqlite":
+        def fast_pragmas(dbapi_connection, connection_record):
+            # 只用于写入测试数据，进程崩溃时重新写入即可
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=OFF")
+            cursor.close()
+
+        event.listen(engine, "connect", fast_pragmas)
+    Base.metadata.create_all(engine)
+
+    rng = random.Random(seed)
+    now = datetime.now()
+    span = TIME_SPAN_DAYS * 86400
+
+    def created_at() -> datetime:
+        return now - timedelta(seconds=rng.random() * span)
+
+    try:
+        hashed_password = security.get_password_hash(PASSWORD)
+        login_error = None
+    except Exception as e:
+        # 密码哈希库不可用时仍写入用户，登录请求记为跳过
+        hashed_password = "!"
+        login_error = f"密码哈希不可用: {e}"
+
+    started = time.perf_counter()
+    counts = {}
+    with engine.begin() as connection:
+        tenants = [f"tenant_{index}" for index in range(volumes.tenants)]
+        users = [
+            {
+                "username": f"{tenant}_user_{index}",
+                "email": f"{tenant}_user_{index}@example.com",
+                "hashed_password": hashed_password,
+                "is_active": True,
+                "tenant_id": tenant,
+                "role": "editor",
+            }
+            for tenant in tenants
+            for index in range(volumes.users_per_tenant)
+        ]
+        connection.execute(models.User.__table__.insert(), users)
+        sites = [
+            {
+                "name": f"{tenant} 站点 {index}",
+                "url": f"https://{tenant}-site{index}.example.com",
+                "start_urls": [f"https://{tenant}-site{index}.example.com/artists"],
+                "tenant_id": tenant,
+                "is_active": True,
+            }
+            for tenant in tenants
+            for index in range(volumes.sites_per_tenant)
+        ]
+        connection.execute(models.SiteConfig.__table__.insert(), sites)
+        site_ids = connection.execute(
+            models.SiteConfig.__table__.select()
+            .with_only_columns(models.SiteConfig.id, models.SiteConfig.tenant_id)
+            .order_by(models.SiteConfig.id)
+        ).all()
+        jobs = []
+        for site_id, tenant in site_ids:
+            for index in range(volumes.jobs_per_site):
+                started_at = created_at()
+                jobs.append({
+                    "name": f"站点 {site_id} 第 {index} 次爬取",
+                    "site_config_id": site_id,
+                    "status": rng.choice(["completed", "completed", "completed", "failed", "running"]),
+                    "progress": 100,
+                    "config": {},
+                    "tenant_id": tenant,
+                    "created_at": started_at,
+                    "started_at": started_at,
+                })
+        for batch in _batches(iter(jobs)):
+            connection.execute(models.Job.__table__.insert(), batch)
+        job_rows = connection.execute(
+            models.Job.__table__.select()
+            .with_only_columns(models.Job.id, models.Job.site_config_id, models.Job.tenant_id)
+        ).all()
+    counts.update(users=len(users), site_configs=len(sites), jobs=len(job_rows))
+
+    jobs_by_tenant: Dict[str, List[Any]] = {}
+    for row in job_rows:
+        jobs_by_tenant.setdefault(row.tenant_id, []).append(row)
+    tenant_weights = _tenant_weights(volumes.tenants)
+
+    def random_job():
+        tenant = rng.choices(tenants, tenant_weights)[0]
+        return rng.choice(jobs_by_tenant[tenant])
+
+    def item_rows() -> Iterator[Dict[str, Any]]:
+        for index in range(volumes.items):
+            job = random_job()
+            page_type = rng.choice(PAGE_TYPES)
+            yield {
+                "url": f"https://site{job.site_config_id}.example.com/{page_type}/{index}",
+                "page_type": page_type,
+                "title": f"{rng.choice(SEARCH_TERMS)} {index}",
+                "content": "描述 " * rng.randint(10, 60),
+                "data": {"index": index, "year": str(rng.randint(1950, 2024))},
+                "job_id": job.id,
+                "site_config_id": job.site_config_id,
+                "tenant_id": job.tenant_id,
+                "created_at": created_at(),
+            }
+
+    def log_rows() -> Iterator[Dict[str, Any]]:
+        for index in range(volumes.logs):
+            yield {
+                "job_id": random_job().id,
+                "level": rng.choices(LOG_LEVELS, LOG_LEVEL_WEIGHTS)[0],
+                "message": f"处理页面 {index}",
+                "timestamp": created_at(),
+            }
+
+    for name, table, rows in (
+        ("scraped_items", models.ScrapedItem.__table__, item_rows()),
+        ("job_logs", models.JobLog.__table__, log_rows()),
+    ):
+        counts[name] = 0
+        for batch in _batches(rows):
+            # 每批单独提交，避免单个事务过大
+            with engine.begin() as connection:
+                connection.execute(table.insert(), batch)
+            counts[name] += len(batch)
+
+    elapsed = time.perf_counter() - started
+    engine.dispose()
+    total = sum(counts.values())
+    return {
+        "rows": counts,
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(total / elapsed, 1) if elapsed else 0.0,
+        "login_error": login_error,
+    }
+
+
+def load_plan() -> Dict[str, Any]:
+    """
+    读取负载测试使用的用户和各租户的任务ID，并为每个用户签发访问令牌
+
+    Returns:
+        Dict[str, Any]: users（用户名、租户和令牌）与 jobs（租户到任务ID列表的映射）
+    """
+    from app import models
+    from app.core import security
+    from app.db.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        users = [
+            {
+                "username": user.username,
+                "tenant_id": user.tenant_id,
+                "token": security.create_access_token(user.id),
+            }
+            for user in db.query(models.User).filter(models.User.username.like("tenant_%")).order_by(models.User.id)
+        ]
+        jobs: Dict[str, List[int]] = {}
+        for job_id, tenant_id in db.query(models.Job.id, models.Job.tenant_id):
+            jobs.setdefault(tenant_id, []).append(job_id)
+    finally:
+        db.close()
+    if not users:
+        raise RuntimeError("数据库中没有负载测试用户，请先写入数据")
+    return {"users": users, "jobs": jobs}
+
+
+def _build_request(endpoint: str, user: Dict[str, Any], plan: Dict[str, Any], rng: random.Random):
+    """
+    生成一个请求的方法、路径和参数
+
+    Returns:
+        tuple: (method, path, kwargs)
+    """
+    from app.core.config import settings
+
+    prefix = settings.API_V1_STR
+    headers = {"Authorization": f"Bearer {user['token']}"}
+    job_ids = plan["jobs"].get(user["tenant_id"]) or [0]
+    if endpoint == "login":
+        return "POST", f"{prefix}/auth/login", {"data": {"username": user["username"], "password": PASSWORD}}
+    if endpoint == "jobs":
+        params = {"skip": rng.choice([0, 0, 0, 20, 40]), "limit": 20}
+        return "GET", f"{prefix}/jobs", {"params": params, "headers": headers}
+    if endpoint == "job_logs":
+        params = {"limit": 100}
+        if rng.random() < 0.2:
+            params["level"] = "ERROR"
+        return "GET", f"{prefix}/jobs/{rng.choice(job_ids)}/logs", {"params": params, "headers": headers}
+    if endpoint == "scraped_items":
+        params = {"skip": rng.choice([0, 0, 0, 50, 100]), "limit": 50}
+        choice = rng.random()
+        if choice < 0.3:
+            params["job_id"] = rng.choice(job_ids)
+        elif choice < 0.5:
+            params["item_type"] = rng.choice(PAGE_TYPES)
+        return "GET", f"{prefix}/scraped-items", {"params": params, "headers": headers}
+    if endpoint == "search":
+        params = {"q": rng.choice(SEARCH_TERMS), "type": rng.choice(["artist", "work", None])}
+        return "GET", f"{prefix}/search", {"params": {k: v for k, v in params.items() if v}, "headers": headers}
+    raise ValueError(f"未知的端点: {endpoint}")
+
+
+async def drive(
+    client,
+    plan: Dict[str, Any],
+    duration: float,
+    concurrency: int,
+    mix: Dict[str, int],
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    以固定并发持续发送请求
+
+    Args:
+        client: httpx.AsyncClient
+        plan: load_plan() 的结果
+        duration: 持续时间（秒）
+        concurrency: 并发的虚拟用户数
+        mix: 端点到请求比例的映射
+        seed: 随机种子
+
+    Returns:
+        Dict[str, Any]: 各端点和总体的请求数、错误数、吞吐和延迟分位数
+    """
+    endpoints = list(mix)
+    weights = [mix[endpoint] for endpoint in endpoints]
+    latencies: Dict[str, List[float]] = {endpoint: [] for endpoint in endpoints}
+    errors: Dict[str, int] = {endpoint: 0 for endpoint in endpoints}
+    statuses: Dict[str, Dict[str, int]] = {endpoint: {} for endpoint in endpoints}
+
+    async def virtual_user(index: int, deadline: float):
+        rng = random.Random(seed * 100003 + index)
+        user = plan["users"][index % len(plan["users"])]
+        while time.perf_counter() < deadline:
+            endpoint = rng.choices(endpoints, weights)[0]
+            method, path, kwargs = _build_request(endpoint, user, plan, rng)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                status = str(response.status_code)
+                failed = response.status_code >= 400
+            except Exception as e:
+                status = type(e).__name__
+                failed = True
+            latencies[endpoint].append((time.perf_counter() - started) * 1000)
+            statuses[endpoint][status] = statuses[endpoint].get(status, 0) + 1
+            if failed:
+                errors[endpoint] += 1
+
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(virtual_user(index, deadline) for index in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    def summarize(values: List[float], error_count: int) -> Dict[str, Any]:
+        values = sorted(values)
+        return {
+            "requests": len(values),
+            "errors": error_count,
+            "requests_per_second": round(len(values) / elapsed, 1) if elapsed else 0.0,
+            "latency_p50_ms": round(percentile(values, 0.50), 2),
+            "latency_p95_ms": round(percentile(values, 0.95), 2),
+            "latency_p99_ms": round(percentile(values, 0.99), 2),
+            "latency_max_ms": round(values[-1], 2) if values else 0.0,
+        }
+
+    result = {
+        endpoint: dict(summarize(latencies[endpoint], errors[endpoint]), statuses=statuses[endpoint])
+        for endpoint in endpoints
+    }
+    total = summarize([value for values in latencies.values() for value in values], sum(errors.values()))
+    total["meets_target"] = total["requests_per_second"] >= TARGET_RPS
+    return {"elapsed_seconds": round(elapsed, 3), "endpoints": result, "total": total}
+
+
+def _free_port() -> int:
+    """
+    获取一个空闲的本地端口
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _wait_until_ready(client, timeout: float = 30.0) -> None:
+    """
+    等待uvicorn开始响应
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            await client.get("/health")
+            return
+        except Exception:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+
+async def run_load(mode: str, duration: float, concurrency: int, mix: Dict[str, int], seed: int = 0) -> Dict[str, Any]:
+    """
+    对进程内ASGI应用或本地uvicorn运行负载测试，数据库由 DATABASE_URL 等环境变量决定
+
+    Args:
+        mode: MODES 之一
+        duration: 持续时间（秒）
+        concurrency: 并发的虚拟用户数
+        mix: 端点到请求比例的映射
+        seed: 随机种子
+
+    Returns:
+        Dict[str, Any]: drive() 的结果
+    """
+    import httpx
+
+    plan = load_plan()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    if mode == "asgi":
+        from app.main import app
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", limits=limits) as client:
+            return await drive(client, plan, duration, concurrency, mix, seed)
+
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning", "--no-access-log"],
+        env=os.environ.copy(),
+    )
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30) as client:
+            await _wait_until_ready(client)
+            return await drive(client, plan, duration, concurrency, mix, seed)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def run_case(
+    volumes: SeedVolumes,
+    mode: str,
+    duration: float,
+    concurrency: int,
+    mix: Dict[str, int],
+    skip_seed: bool = False,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    在当前进程中写入数据并运行负载测试
+
+    Returns:
+        Dict[str, Any]: 写入数据和负载测试的结果
+    """
+    from app.core.config import settings
+
+    seeding = None
+    if not skip_seed:
+        seeding = seed_database(settings.DATABASE_URL, volumes, seed)
+        if seeding["login_error"]:
+            mix = {endpoint: weight for endpoint, weight in mix.items() if endpoint != "login"}
+    load = asyncio.run(run_load(mode, duration, concurrency, mix, seed))
+    if seeding and seeding["login_error"]:
+        load["endpoints"]["login"] = {"skipped": seeding["login_error"]}
+    return {"seeding": seeding, "load": load}
+
+
+def run_benchmark(
+    volumes: SeedVolumes,
+    mode: str = "asgi",
+    duration: float = 30.0,
+    concurrency: int = 32,
+    mix: Optional[Dict[str, int]] = None,
+    database_url: Optional[str] = None,
+    skip_seed: bool = False,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    运行负载测试
+
+    Args:
+        volumes: 数据规模
+        mode: MODES 之一
+        duration: 持续时间（秒）
+        concurrency: 并发的虚拟用户数
+        mix: 端点到请求比例的映射，默认 MIX
+        database_url: 数据库连接字符串，默认使用临时SQLite数据库
+        skip_seed: 不写入数据，复用 database_url 中已有的数据
+        seed: 随机种子
+
+    Returns:
+        Dict[str, Any]: 基准测试结果
+    """
+    mix = mix or MIX
+    with tempfile.TemporaryDirectory(prefix="bench_api_") as workdir:
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [PROJECT_DIR, env.get("PYTHONPATH")]))
+        env["DATABASE_URL"] = database_url or f"sqlite:///{os.path.join(workdir, 'benchmark.db')}"
+        # 负载进程签发的令牌需要能被uvicorn进程验证
+        env["SECRET_KEY"] = secrets.token_urlsafe(32)
+        command = [
+            sys.executable, "-m", "benchmarks.api_load_test", "--case",
+            "--mode", mode, "--duration", str(duration), "--concurrency", str(concurrency),
+            "--mix", json.dumps(mix), "--seed", str(seed),
+        ]
+        for field, value in asdict(volumes).items():
+            command += [f"--{field.replace('_', '-')}", str(value)]
+        if skip_seed:
+            command.append("--skip-seed")
+        # 应用日志（app.log）写入工作目录
+        process = subprocess.run(command, cwd=workdir, env=env, capture_output=True, text=True)
+    if process.returncode != 0:
+        result = {"error": process.stderr.strip().splitlines()[-1:]}
+    else:
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+
+    return {
+        "benchmark": "api",
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "mode": mode,
+        "duration": duration,
+        "concurrency": concurrency,
+        "mix": mix,
+        "target_rps": TARGET_RPS,
+        "volumes": asdict(volumes),
+        "seed": seed,
+        **result,
+    }
+
+
+def main(argv=None) -> None:
+    """
+    命令行入口
+    """
+    defaults = SeedVolumes()
+    parser = argparse.ArgumentParser(description="API负载测试")
+    parser.add_argument("--tenants", type=int, default=defaults.tenants)
+    parser.add_argument("--users-per-tenant", type=int, default=defaults.users_per_tenant)
+    parser.add_argument("--sites-per-tenant", type=int, default=defaults.sites_per_tenant)
+    parser.add_argument("--jobs-per-site", type=int, default=defaults.jobs_per_site)
+    parser.add_argument("--items", type=int, default=defaults.items, help="scraped_items 行数")
+    parser.add_argument("--logs", type=int, default=defaults.logs, help="job_logs 行数")
+    parser.add_argument("--mode", choices=MODES, default="asgi", help="进程内ASGI应用或本地uvicorn")
+    parser.add_argument("--duration", type=float, default=30.0, help="持续时间（秒）")
+    parser.add_argument("--concurrency", type=int, default=32, help="并发的虚拟用户数")
+    parser.add_argument("--mix", type=json.loads, default=MIX, help='请求比例，如 \'{"jobs": 1, "search": 1}\'')
+    parser.add_argument("--database-url", help="数据库连接字符串，默认使用临时SQLite数据库")
+    parser.add_argument("--skip-seed", action="store_true", help="复用数据库中已有的数据")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="结果JSON文件，默认输出到标准输出")
+    parser.add_argument("--case", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    unknown = set(args.mix) - set(MIX)
+    if unknown:
+        parser.error(f"未知的端点: {', '.join(sorted(unknown))}")
+    volumes = SeedVolumes(
+        args.tenants, args.users_per_tenant, args.sites_per_tenant, args.jobs_per_site, args.items, args.logs
+    )
+    if args.case:
+        # 子进程：结果输出到标准输出
+        result = run_case(volumes, args.mode, args.duration, args.concurrency, args.mix, args.skip_seed, args.seed)
+        print(json.dumps(result))
+        return
+
+    result = run_benchmark(
+        volumes, args.mode, args.duration, args.concurrency, args.mix, args.database_url, args.skip_seed, args.seed
+    )
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
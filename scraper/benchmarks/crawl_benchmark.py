@@ -0,0 +1,270 @@
+"""
+端到端爬取吞吐基准测试
+
+启动本地合成艺术网站（见 benchmarks.synthetic_site），用与Celery任务相同的方式
+（app.scrapers.crawl.run_crawl_process，项目设置、SpiderFactory选择的爬虫类和全部
+Pipeline）爬取整个网站，输出JSON结果，便于在不同提交之间比较::
+
+    python -m benchmarks.crawl_benchmark --artworks 2000 --output bench.json
+
+每个爬虫使用单独的临时SQLite数据库和工作目录。为了测量爬取本身，基准测试关闭
+按域名限速和HTTP缓存。ArtGallerySpider需要Playwright的Chromium浏览器，未安装时
+该项结果记为跳过。
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.synthetic_site import SiteSize, SyntheticSiteServer
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# 基准测试的爬虫：站点名称和是否使用Playwright决定 SpiderFactory 选择的爬虫类
+SPIDERS = {
+    "base": {
+        "name": "合成艺术网站",
+        "use_playwright": False,
+        # BaseSpider 从该区域内提取下一页链接
+        "next_page_xpath": "//div[@class='pagination']",
+    },
+    "art_gallery": {
+        "name": "Synthetic Gallery",
+        "use_playwright": True,
+        # PlaywrightSpider 直接读取下一页地址
+        "next_page_xpath": "//a[@class='next']/@href",
+    },
+}
+
+# 关闭限速和缓存，测量的是爬取和数据写入本身
+BENCHMARK_SETTINGS = {
+    "THROTTLE_ENABLED": False,
+    "HTTPCACHE_ENABLED": False,
+    "JOB_HEARTBEAT_ENABLED": False,
+    "LOG_LEVEL": "WARNING",
+    "SPIDER_MIDDLEWARES": {"benchmarks.instrumentation.CallbackTimingMiddleware": 1000},
+}
+
+
+def browser_available() -> bool:
+    """
+    检查Playwright的Chromium浏览器是否已安装
+
+    Returns:
+        bool: 是否可用
+    """
+    try:
+        from playwright.sync_api import sync_playwright
+
+        with sync_playwright() as playwright:
+            return os.path.exists(playwright.chromium.executable_path)
+    except Exception:
+        return False
+
+
+def git_commit() -> Optional[str]:
+    """
+    获取当前提交，不在git仓库中时返回None
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=PROJECT_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _prepare_database(database_url: str, spider: str, site_url: str) -> int:
+    """
+    建表并写入基准测试的站点配置和任务
+
+    Args:
+        database_url: 数据库连接字符串
+        spider: SPIDERS 中的名称
+        site_url: 合成网站地址
+
+    Returns:
+        int: 任务ID
+    """
+    from app import models
+    from app.db.base import Base
+
+    engine = create_engine(database_url)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        options = SPIDERS[spider]
+        site = models.SiteConfig(
+            name=options["name"],
+            url=site_url,
+            start_urls=[f"{site_url}{name}?page=1" for name in ("artists", "artworks", "exhibitions")],
+            allowed_domains=["127.0.0.1"],
+            list_page_xpath="//ul[@class='list']",
+            detail_page_xpath="//ul[@class='list']//a[@class='detail']",
+            next_page_xpath=options["next_page_xpath"],
+            field_mappings={
+                "title": "//h1/text()",
+                "description": "//div[@class='description']/text()",
+            },
+            use_playwright=options["use_playwright"],
+            config={},
+            tenant_id="benchmark",
+        )
+        db.add(site)
+        db.flush()
+        job = models.Job(
+            name=f"benchmark-{spider}",
+            site_config_id=site.id,
+            tenant_id="benchmark",
+            status="running",
+            items_scraped=0,
+            items_saved=0,
+            items_failed=0,
+        )
+        db.add(job)
+        db.commit()
+        return job.id
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def summarize(stats: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    从Scrapy统计信息中提取基准测试指标
+
+    Args:
+        stats: Scrapy统计信息
+
+    Returns:
+        Dict[str, Any]: 指标
+    """
+    elapsed = float(stats.get("elapsed_time_seconds") or 0)
+    pages = stats.get("response_received_count", 0)
+    items = stats.get("item_scraped_count", 0)
+    return {
+        "finish_reason": stats.get("finish_reason"),
+        "elapsed_seconds": round(elapsed, 3),
+        "pages": pages,
+        "items": items,
+        "items_saved": stats.get("database/items_saved", 0),
+        "pages_per_second": round(pages / elapsed, 2) if elapsed else 0.0,
+        "items_per_second": round(items / elapsed, 2) if elapsed else 0.0,
+        "callback_latency_p50_ms": stats.get("benchmark/callback_latency_p50_ms", 0.0),
+        "callback_latency_p99_ms": stats.get("benchmark/callback_latency_p99_ms", 0.0),
+        "peak_rss_mb": round(stats.get("benchmark/peak_rss_bytes", 0) / 1024 / 1024, 1),
+        "errors": stats.get("log_count/ERROR", 0),
+    }
+
+
+def run_spider_benchmark(spider: str, site_url: str, workdir: str) -> Dict[str, Any]:
+    """
+    用指定爬虫爬取合成网站一次
+
+    Args:
+        spider: SPIDERS 中的名称
+        site_url: 合成网站地址
+        workdir: 工作目录，存放数据库、日志和JSON输出
+
+    Returns:
+        Dict[str, Any]: 指标
+    """
+    from app.scrapers.crawl import run_crawl_process
+
+    database_url = f"sqlite:///{os.path.join(workdir, 'benchmark.db')}"
+    job_id = _prepare_database(database_url, spider, site_url)
+
+    # 爬取子进程从环境变量读取数据库配置，日志和输出写入当前目录
+    cwd = os.getcwd()
+    previous_url = os.environ.get("DATABASE_URL")
+    os.environ["DATABASE_URL"] = database_url
+    os.chdir(workdir)
+    try:
+        stats = run_crawl_process(job_id, BENCHMARK_SETTINGS)
+    finally:
+        os.chdir(cwd)
+        if previous_url is None:
+            os.environ.pop("DATABASE_URL", None)
+        else:
+            os.environ["DATABASE_URL"] = previous_url
+    return summarize(stats)
+
+
+def run_benchmark(size: SiteSize, spiders: List[str]) -> Dict[str, Any]:
+    """
+    运行基准测试
+
+    Args:
+        size: 合成网站规模
+        spiders: 要测试的爬虫
+
+    Returns:
+        Dict[str, Any]: 基准测试结果
+    """
+    results = {}
+    with SyntheticSiteServer(size) as server:
+        for spider in spiders:
+            if SPIDERS[spider]["use_playwright"] and not browser_available():
+                results[spider] = {"skipped": "Playwright Chromium未安装"}
+                continue
+            with tempfile.TemporaryDirectory(prefix=f"bench_{spider}_") as workdir:
+                try:
+                    results[spider] = run_spider_benchmark(spider, server.url, workdir)
+                except Exception as e:
+                    results[spider] = {"error": str(e)}
+
+    return {
+        "benchmark": "crawl",
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "site": {
+            "artists": size.artists,
+            "artworks": size.artworks,
+            "exhibitions": size.exhibitions,
+            "page_size": size.page_size,
+            "pages": size.total_pages,
+        },
+        "results": results,
+    }
+
+
+def main(argv=None) -> None:
+    """
+    命令行入口
+    """
+    parser = argparse.ArgumentParser(description="端到端爬取吞吐基准测试")
+    parser.add_argument("--artists", type=int, default=SiteSize.artists)
+    parser.add_argument("--artworks", type=int, default=SiteSize.artworks)
+    parser.add_argument("--exhibitions", type=int, default=SiteSize.exhibitions)
+    parser.add_argument("--page-size", type=int, default=SiteSize.page_size)
+    parser.add_argument("--spiders", nargs="+", choices=sorted(SPIDERS), default=list(SPIDERS))
+    parser.add_argument("--output", help="结果JSON文件，默认输出到标准输出")
+    args = parser.parse_args(argv)
+
+    result = run_benchmark(
+        SiteSize(args.artists, args.artworks, args.exhibitions, args.page_size),
+        args.spiders,
+    )
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
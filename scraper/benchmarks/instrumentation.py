@@ -0,0 +1,116 @@
+"""
+基准测试在爬取进程中使用的统计组件
+
+CallbackTimingMiddleware 作为最靠近爬虫的Spider中间件，统计每个响应的回调耗时
+（只计算迭代回调输出所花的时间，不包括在Scrapy中排队等待的时间），并在爬虫结束时
+把分位数和进程的峰值内存写入Scrapy统计。
+"""
+import resource
+import sys
+import time
+from typing import List, Sequence
+
+from scrapy import signals
+
+
+def percentile(values: Sequence[float], quantile: float) -> float:
+    """
+    计算分位数（取最近的排名）
+
+    Args:
+        values: 已排序的数值
+        quantile: 分位，0到1之间
+
+    Returns:
+        float: 分位数，没有数值时返回0
+    """
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * quantile))]
+
+
+def peak_rss_bytes() -> int:
+    """
+    获取当前进程的峰值常驻内存
+
+    Returns:
+        int: 字节数
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux上单位为KB，macOS上为字节
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class CallbackTimingMiddleware:
+    """
+    统计回调耗时的Spider中间件
+    """
+
+    def __init__(self, stats):
+        """
+        初始化中间件
+
+        Args:
+            stats: Scrapy统计收集器
+        """
+        self.stats = stats
+        self.latencies: List[float] = []
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """
+        从爬虫创建中间件
+
+        Args:
+            crawler: 爬虫
+
+        Returns:
+            CallbackTimingMiddleware: 中间件实例
+        """
+        middleware = cls(crawler.stats)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def process_spider_output(self, response, result):
+        """
+        迭代同步回调的输出并计时
+        """
+        elapsed = 0.0
+        iterator = iter(result)
+        while True:
+            started = time.perf_counter()
+            try:
+                output = next(iterator)
+            except StopIteration:
+                elapsed += time.perf_counter() - started
+                break
+            elapsed += time.perf_counter() - started
+            yield output
+        self.latencies.append(elapsed)
+
+    async def process_spider_output_async(self, response, result):
+        """
+        迭代异步回调的输出并计时，包括回调中等待浏览器的时间
+        """
+        elapsed = 0.0
+        iterator = result.__aiter__()
+        while True:
+            started = time.perf_counter()
+            try:
+                output = await iterator.__anext__()
+            except StopAsyncIteration:
+                elapsed += time.perf_counter() - started
+                break
+            elapsed += time.perf_counter() - started
+            yield output
+        self.latencies.append(elapsed)
+
+    def spider_closed(self, spider):
+        """
+        写入回调耗时分位数和峰值内存
+        """
+        latencies = sorted(self.latencies)
+        self.stats.set_value("benchmark/callbacks", len(latencies))
+        for name, quantile in (("p50", 0.5), ("p99", 0.99)):
+            self.stats.set_value(f"benchmark/callback_latency_{name}_ms", round(percentile(latencies, quantile) * 1000, 3))
+        self.stats.set_value("benchmark/peak_rss_bytes", peak_rss_bytes())
@@ -0,0 +1,430 @@
+"""
+Pipeline与数据写入微基准测试
+
+把N个合成数据项（艺术家和作品两种形状，按比例包含重复URL）分别交给以下目标处理，
+测量吞吐、提交次数和写入字节数::
+
+    create_or_update   逐条调用 services.scraped_item.create_or_update（每条提交一次）
+    database_pipeline  DatabasePipeline，与爬取时相同的并发和写入方式
+    json_writer        JsonWriterPipeline
+
+数据库后端::
+
+    sqlite             SQLite + 单写线程批量提交（爬取时的默认配置）
+    sqlite-threaded    SQLite，关闭单写线程：Pipeline在线程池中逐条提交，与PostgreSQL
+                       下的写入路径相同，没有PostgreSQL时作为替代
+    postgresql         通过 --postgres-url 指定的数据库（会在其中建表并写入数据）
+
+用法::
+
+    python -m benchmarks.pipeline_benchmark --items 5000 --dup-ratio 0.2 --output pipeline.json
+
+每个组合在单独的子进程中运行，数据库连接、单写线程和统计互不影响。写入字节数：
+SQLite和JSON为进程写入的字节数（/proc/self/io 的 wchar），PostgreSQL为产生的WAL字节数。
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event, text
+
+from benchmarks.crawl_benchmark import git_commit
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+TARGETS = ("create_or_update", "database_pipeline", "json_writer")
+BACKENDS = ("sqlite", "sqlite-threaded", "postgresql")
+# 与Scrapy默认的 CONCURRENT_ITEMS 相同
+CONCURRENT_ITEMS = 100
+SITE_URL = "https://gallery.example.com"
+MEDIUMS = ["布面油画", "纸本水墨", "丙烯", "综合材料", "青铜", "摄影"]
+CITIES = ["北京", "上海", "纽约", "伦敦", "巴黎", "柏林"]
+
+
+def make_items(count: int, dup_ratio: float = 0.0, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    生成合成数据项
+
+    Args:
+        count: 数据项数量
+        dup_ratio: 与之前的数据项URL相同（写入时走更新分支）的比例
+        seed: 随机种子
+
+    Returns:
+        List[Dict[str, Any]]: 数据项列表，与ArtGallerySpider输出的形状相同
+    """
+    rng = random.Random(seed)
+    items = []
+    for index in range(count):
+        if items and rng.random() < dup_ratio:
+            source = rng.choice(items)
+            item = dict(source, description=f"更新 {index}")
+            items.append(item)
+            continue
+        if rng.random() < 0.3:
+            item = {
+                "url": f"{SITE_URL}/artist/{index}",
+                "page_type": "artist",
+                "name": f"艺术家 {index}",
+                "biography": "简介 " * rng.randint(40, 200),
+                "social_links": [f"https://instagram.com/artist{index}"],
+                "exhibitions": [
+                    {
+                        "title": f"展览 {rng.randint(1, 500)}",
+                        "year": str(rng.randint(1980, 2024)),
+                        "location": rng.choice(CITIES),
+                    }
+                    for _ in range(rng.randint(1, 8))
+                ],
+            }
+        else:
+            item = {
+                "url": f"{SITE_URL}/artwork/{index}",
+                "page_type": "artwork",
+                "title": f"作品 {index}",
+                "description": "描述 " * rng.randint(20, 120),
+                "image_url": f"{SITE_URL}/images/{index}.jpg",
+                "dimensions": f"{rng.randint(20, 300)} x {rng.randint(20, 300)} cm",
+                "medium": rng.choice(MEDIUMS),
+                "year": str(rng.randint(1950, 2024)),
+            }
+        item.update(site_id=1, job_id=1, tenant_id="benchmark")
+        items.append(item)
+    return items
+
+
+def _process_write_bytes() -> Optional[int]:
+    """
+    读取本进程累计写入的字节数（仅Linux）
+    """
+    try:
+        with open("/proc/self/io", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+class _Counters:
+    """
+    统计数据库提交次数和写入字节数
+    """
+
+    def __init__(self, engine):
+        """
+        初始化计数，记录起始的写入字节数
+
+        Args:
+            engine: 数据库引擎
+        """
+        self.engine = engine
+        self.commits = 0
+        self.postgres = engine.dialect.name == "postgresql"
+        event.listen(engine, "commit", self._on_commit)
+        self.start_bytes = self._bytes()
+
+    def _on_commit(self, connection) -> None:
+        """
+        记录一次提交
+        """
+        self.commits += 1
+
+    def _bytes(self) -> Optional[int]:
+        """
+        读取当前累计的写入字节数
+        """
+        if not self.postgres:
+            return _process_write_bytes()
+        with self.engine.connect() as connection:
+            return int(connection.execute(
+                text("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), '0/0')")
+            ).scalar())
+
+    def bytes_written(self) -> Optional[int]:
+        """
+        获取开始计数以来写入的字节数，无法统计时返回None
+        """
+        end = self._bytes()
+        if end is None or self.start_bytes is None:
+            return None
+        return end - self.start_bytes
+
+
+def _prepare_database():
+    """
+    在子进程的数据库中建表并写入站点配置和任务
+
+    Returns:
+        SimpleNamespace: DatabasePipeline使用的爬虫替身
+    """
+    from app import models
+    from app.db.base import Base
+    from app.db.database import SessionLocal, engine
+
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    try:
+        db.query(models.ScrapedItem).filter(models.ScrapedItem.tenant_id == "benchmark").delete()
+        site = db.query(models.SiteConfig).filter(models.SiteConfig.tenant_id == "benchmark").first()
+        if site is None:
+            site = models.SiteConfig(name="benchmark", url=SITE_URL, tenant_id="benchmark")
+            db.add(site)
+            db.flush()
+        job = models.Job(
+            name="pipeline-benchmark",
+            site_config_id=site.id,
+            tenant_id="benchmark",
+            status="running",
+            items_scraped=0,
+            items_saved=0,
+            items_failed=0,
+        )
+        db.add(job)
+        db.commit()
+        return SimpleNamespace(
+            name="pipeline_benchmark",
+            job_id=job.id,
+            site_config=SimpleNamespace(id=site.id, tenant_id="benchmark"),
+        )
+    finally:
+        db.close()
+
+
+def _run_create_or_update(spider, items: List[Dict[str, Any]]) -> None:
+    """
+    逐条调用 create_or_update，每条提交一次
+    """
+    from app import services
+    from app.db.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        for item in items:
+            services.scraped_item.create_or_update(
+                db,
+                url=item["url"],
+                page_type=item["page_type"],
+                title=item.get("title") or item.get("name"),
+                content=item.get("description") or item.get("biography"),
+                data=item,
+                job_id=spider.job_id,
+                site_config_id=spider.site_config.id,
+                tenant_id=spider.site_config.tenant_id,
+            )
+    finally:
+        db.close()
+
+
+def _run_database_pipeline(spider, items: List[Dict[str, Any]]) -> None:
+    """
+    在Twisted reactor中以 CONCURRENT_ITEMS 的并发把数据项交给DatabasePipeline
+    """
+    from scrapy.settings import Settings
+    from scrapy.statscollectors import MemoryStatsCollector
+    from twisted.internet import defer, reactor
+
+    from app.scrapers.pipelines import DatabasePipeline
+
+    pipeline = DatabasePipeline(stats=MemoryStatsCollector(SimpleNamespace(settings=Settings())))
+    failures = []
+
+    async def feed():
+        pipeline.open_spider(spider)
+        semaphore = defer.DeferredSemaphore(CONCURRENT_ITEMS)
+        await defer.DeferredList(
+            [semaphore.run(lambda item=item: defer.ensureDeferred(pipeline.process_item(item, spider))) for item in items],
+            consumeErrors=True,
+        )
+        await pipeline.close_spider(spider)
+
+    def done(result):
+        if isinstance(result, Exception) or hasattr(result, "value"):
+            failures.append(result)
+        reactor.stop()
+
+    reactor.callWhenRunning(lambda: defer.ensureDeferred(feed()).addBoth(done))
+    reactor.run(installSignalHandlers=False)
+    if failures:
+        raise RuntimeError(str(failures[0]))
+    if pipeline.writer is not None:
+        # 等待单写线程提交剩余的写操作
+        pipeline.writer.close()
+
+
+def _run_json_writer(spider, items: List[Dict[str, Any]], output_dir: str) -> None:
+    """
+    把数据项交给JsonWriterPipeline并写出文件
+    """
+    from app.scrapers.pipelines import JsonWriterPipeline
+
+    pipeline = JsonWriterPipeline(output_dir=output_dir)
+    pipeline.open_spider(spider)
+    for item in items:
+        pipeline.process_item(item, spider)
+    pipeline.close_spider(spider)
+
+
+def run_case(target: str, count: int, dup_ratio: float, seed: int) -> Dict[str, Any]:
+    """
+    在当前进程中运行一个测试组合，数据库由 DATABASE_URL 等环境变量决定
+
+    Args:
+        target: TARGETS 之一
+        count: 数据项数量
+        dup_ratio: 重复URL比例
+        seed: 随机种子
+
+    Returns:
+        Dict[str, Any]: 指标
+    """
+    from app import models
+    from app.db.database import SessionLocal, engine
+
+    items = make_items(count, dup_ratio, seed)
+    spider = _prepare_database()
+    counters = _Counters(engine)
+    commits_before = counters.commits
+
+    started = time.perf_counter()
+    if target == "create_or_update":
+        _run_create_or_update(spider, items)
+    elif target == "database_pipeline":
+        _run_database_pipeline(spider, items)
+    elif target == "json_writer":
+        _run_json_writer(spider, items, os.path.join(os.getcwd(), "output"))
+    else:
+        raise ValueError(f"未知的测试目标: {target}")
+    elapsed = time.perf_counter() - started
+
+    result = {
+        "items": count,
+        "elapsed_seconds": round(elapsed, 3),
+        "items_per_second": round(count / elapsed, 1) if elapsed else 0.0,
+        "commits": counters.commits - commits_before,
+        "bytes_written": counters.bytes_written(),
+    }
+    if target != "json_writer":
+        db = SessionLocal()
+        try:
+            result["rows"] = db.query(models.ScrapedItem).filter(models.ScrapedItem.tenant_id == "benchmark").count()
+        finally:
+            db.close()
+    return result
+
+
+def _case_env(backend: str, workdir: str, postgres_url: Optional[str]) -> Dict[str, str]:
+    """
+    获取运行某个后端的子进程环境变量
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [PROJECT_DIR, env.get("PYTHONPATH")]))
+    if backend == "postgresql":
+        env["DATABASE_URL"] = postgres_url
+    else:
+        env["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'benchmark.db')}"
+        env["SQLITE_SINGLE_WRITER"] = "false" if backend == "sqlite-threaded" else "true"
+    return env
+
+
+def run_benchmark(
+    count: int,
+    dup_ratio: float,
+    targets: List[str],
+    backends: List[str],
+    postgres_url: Optional[str] = None,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    运行基准测试
+
+    Args:
+        count: 数据项数量
+        dup_ratio: 重复URL比例
+        targets: 测试目标
+        backends: 数据库后端
+        postgres_url: PostgreSQL连接字符串
+        seed: 随机种子
+
+    Returns:
+        Dict[str, Any]: 基准测试结果
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+    for backend in backends:
+        results[backend] = {}
+        for target in targets:
+            if target == "json_writer" and backend != backends[0]:
+                # JSON输出与数据库无关，只运行一次
+                continue
+            if backend == "postgresql" and not postgres_url:
+                results[backend][target] = {"skipped": "未指定 --postgres-url"}
+                continue
+            with tempfile.TemporaryDirectory(prefix="bench_pipeline_") as workdir:
+                process = subprocess.run(
+                    [
+                        sys.executable, "-m", "benchmarks.pipeline_benchmark", "--case", target,
+                        "--items", str(count), "--dup-ratio", str(dup_ratio), "--seed", str(seed),
+                    ],
+                    cwd=workdir,
+                    env=_case_env(backend, workdir, postgres_url),
+                    capture_output=True,
+                    text=True,
+                )
+            if process.returncode != 0:
+                results[backend][target] = {"error": process.stderr.strip().splitlines()[-1:]}
+            else:
+                results[backend][target] = json.loads(process.stdout.strip().splitlines()[-1])
+
+    return {
+        "benchmark": "pipeline",
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "items": count,
+        "dup_ratio": dup_ratio,
+        "seed": seed,
+        "results": results,
+    }
+
+
+def main(argv=None) -> None:
+    """
+    命令行入口
+    """
+    parser = argparse.ArgumentParser(description="Pipeline与数据写入微基准测试")
+    parser.add_argument("--items", type=int, default=2000, help="数据项数量")
+    parser.add_argument("--dup-ratio", type=float, default=0.1, help="重复URL比例")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--targets", nargs="+", choices=TARGETS, default=list(TARGETS))
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=["sqlite", "sqlite-threaded"])
+    parser.add_argument("--postgres-url", default=os.getenv("BENCHMARK_POSTGRES_URL"), help="PostgreSQL连接字符串")
+    parser.add_argument("--output", help="结果JSON文件，默认输出到标准输出")
+    parser.add_argument("--case", choices=TARGETS, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.case:
+        # 子进程：运行单个组合，结果输出到标准输出
+        print(json.dumps(run_case(args.case, args.items, args.dup_ratio, args.seed)))
+        return
+
+    result = run_benchmark(args.items, args.dup_ratio, args.targets, args.backends, args.postgres_url, args.seed)
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+"""
+本地合成艺术网站
+
+按给定规模生成确定性的画廊网站：艺术家、作品和展览三个分页列表，以及对应的
+详情页。同一规模下每次生成的页面完全相同，基准测试的结果可以在不同提交之间比较，
+且不依赖外部网站。
+
+页面结构::
+
+    /                       三个列表的入口
+    /artists?page=N         艺术家列表（/artworks、/exhibitions 相同）
+    /artist/<id>            艺术家详情：简介、社交链接、展览历史
+    /artwork/<id>           作品详情：图片、尺寸、材质、年份、描述
+    /exhibition/<id>        展览详情：参展艺术家、日期、策展人
+
+单独运行时启动服务器直到被中断::
+
+    python -m benchmarks.synthetic_site --artists 500 --artworks 5000 --port 8765
+"""
+import argparse
+import html
+import random
+import threading
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+MEDIUMS = ["布面油画", "纸本水墨", "丙烯", "综合材料", "青铜", "摄影", "版画", "装置"]
+CITIES = ["北京", "上海", "香港", "纽约", "伦敦", "巴黎", "柏林", "东京"]
+WORDS = [
+    "光", "城市", "记忆", "山水", "身体", "时间", "风景", "肖像", "沉默", "边界",
+    "色彩", "重复", "痕迹", "梦境", "archive", "surface", "landscape", "echo", "field", "drift",
+]
+
+
+@dataclass(frozen=True)
+class SiteSize:
+    """
+    合成网站的规模
+    """
+    artists: int = 200
+    artworks: int = 1000
+    exhibitions: int = 50
+    page_size: int = 20
+
+    @property
+    def total_pages(self) -> int:
+        """
+        列表页和详情页的总数，即从三个列表的第一页开始爬取的页面数
+        """
+        lists = sum(
+            max(1, -(-count // self.page_size))
+            for count in (self.artists, self.artworks, self.exhibitions)
+        )
+        return lists + self.artists + self.artworks + self.exhibitions
+
+
+def _rng(kind: str, item_id: int) -> random.Random:
+    """
+    获取页面的随机数生成器，同一页面每次生成的内容相同
+    """
+    return random.Random(f"{kind}-{item_id}")
+
+
+def _words(rng: random.Random, count: int) -> str:
+    """
+    生成由随机词组成的文本
+    """
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def _page(title: str, body: str) -> str:
+    """
+    生成完整的HTML页面
+    """
+    return (
+        "<!DOCTYPE html><html><head><meta charset=\"utf-8\">"
+        f"<title>{html.escape(title)}</title></head>"
+        f"<body><nav><a href=\"/\">首页</a></nav><main>{body}</main></body></html>"
+    )
+
+
+class SyntheticSite:
+    """
+    按规模生成页面内容
+    """
+
+    LISTS = {"artists": "artist", "artworks": "artwork", "exhibitions": "exhibition"}
+
+    def __init__(self, size: SiteSize):
+        """
+        初始化网站
+
+        Args:
+            size: 网站规模
+        """
+        self.size = size
+
+    def count(self, kind: str) -> int:
+        """
+        获取某类详情页的数量
+
+        Args:
+            kind: artist、artwork 或 exhibition
+
+        Returns:
+            int: 数量
+        """
+        return {
+            "artist": self.size.artists,
+            "artwork": self.size.artworks,
+            "exhibition": self.size.exhibitions,
+        }[kind]
+
+    def render(self, path: str, query: Dict[str, list]) -> Optional[str]:
+        """
+        生成路径对应的页面
+
+        Args:
+            path: 请求路径
+            query: 查询参数
+
+        Returns:
+            Optional[str]: 页面HTML，路径不存在时返回None
+        """
+        parts = [part for part in path.split("/") if part]
+        if not parts:
+            return self.index()
+        if len(parts) == 1 and parts[0] in self.LISTS:
+            try:
+                page = int(query.get("page", ["1"])[0])
+            except ValueError:
+                return None
+            return self.list_page(parts[0], page)
+        if len(parts) == 2 and parts[0] in self.LISTS.values() and parts[1].isdigit():
+            item_id = int(parts[1])
+            if not 0 <= item_id < self.count(parts[0]):
+                return None
+            return getattr(self, f"{parts[0]}_page")(item_id)
+        return None
+
+    def index(self) -> str:
+        """
+        入口页
+        """
+        links = "".join(f"<li><a href=\"/{name}?page=1\">{name}</a></li>" for name in self.LISTS)
+        return _page("合成画廊", f"<h1>合成画廊</h1><ul class=\"sections\">{links}</ul>")
+
+    def list_page(self, name: str, page: int) -> Optional[str]:
+        """
+        分页列表页
+
+        Args:
+            name: 列表名称
+            page: 页码，从1开始
+
+        Returns:
+            Optional[str]: 页面HTML，页码超出范围时返回None
+        """
+        kind = self.LISTS[name]
+        total = self.count(kind)
+        pages = max(1, -(-total // self.size.page_size))
+        if not 1 <= page <= pages:
+            return None
+        start = (page - 1) * self.size.page_size
+        links = "".join(
+            f"<li><a class=\"detail\" href=\"/{kind}/{item_id}\">{kind} {item_id}</a></li>"
+            for item_id in range(start, min(start + self.size.page_size, total))
+        )
+        pagination = f"<a class=\"next\" href=\"/{name}?page={page + 1}\">下一页</a>" if page < pages else ""
+        return _page(
+            f"{name} 第{page}页",
+            f"<h1>{name}</h1><ul class=\"list\">{links}</ul><div class=\"pagination\">{pagination}</div>",
+        )
+
+    def artist_page(self, artist_id: int) -> str:
+        """
+        艺术家详情页
+        """
+        rng = _rng("artist", artist_id)
+        history = "".join(
+            "<li>"
+            f"<a href=\"/exhibition/{rng.randrange(max(1, self.size.exhibitions))}\">{_words(rng, 3)}</a>"
+            f"<span class=\"year\">{rng.randint(1980, 2024)}</span>"
+            f"<span class=\"location\">{rng.choice(CITIES)}</span>"
+            "</li>"
+            for _ in range(rng.randint(1, 8))
+        )
+        body = (
+            f"<h1>艺术家 {artist_id}</h1>"
+            f"<div class=\"description\">{_words(rng, rng.randint(40, 120))}</div>"
+            f"<a href=\"https://instagram.com/artist{artist_id}\">Instagram</a>"
+            f"<div class=\"exhibition-history\"><ul>{history}</ul></div>"
+        )
+        return _page(f"艺术家 {artist_id}", body)
+
+    def artwork_page(self, artwork_id: int) -> str:
+        """
+        作品详情页
+        """
+        rng = _rng("artwork", artwork_id)
+        artist_id = rng.randrange(max(1, self.size.artists))
+        body = (
+            f"<h1>{_words(rng, 3)}</h1>"
+            f"<div class=\"artist\"><a href=\"/artist/{artist_id}\">艺术家 {artist_id}</a></div>"
+            f"<div class=\"artwork-image\"><img src=\"/images/{artwork_id}.jpg\"></div>"
+            f"<div class=\"dimensions\">{rng.randint(20, 300)} x {rng.randint(20, 300)} cm</div>"
+            f"<div class=\"medium\">{rng.choice(MEDIUMS)}</div>"
+            f"<div class=\"year\">{rng.randint(1950, 2024)}</div>"
+            f"<div class=\"description\">{_words(rng, rng.randint(20, 80))}</div>"
+        )
+        return _page(f"作品 {artwork_id}", body)
+
+    def exhibition_page(self, exhibition_id: int) -> str:
+        """
+        展览详情页
+        """
+        rng = _rng("exhibition", exhibition_id)
+        artists = "".join(
+            f"<a href=\"/artist/{artist_id}\">艺术家 {artist_id}</a>"
+            for artist_id in sorted(rng.sample(range(max(1, self.size.artists)), min(self.size.artists, rng.randint(2, 12))))
+        )
+        year = rng.randint(2000, 2024)
+        body = (
+            f"<h1>{_words(rng, 4)}</h1>"
+            f"<div class=\"artists-list\">{artists}</div>"
+            f"<div class=\"exhibition-dates\">{year}-03-01 至 {year}-05-31</div>"
+            f"<div class=\"curator\">策展人 {rng.randint(1, 99)}</div>"
+            f"<div class=\"description\">{_words(rng, rng.randint(30, 100))}</div>"
+        )
+        return _page(f"展览 {exhibition_id}", body)
+
+
+def _handler(site: SyntheticSite):
+    """
+    创建使用给定网站的请求处理类
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            page = site.render(url.path, parse_qs(url.query))
+            body = (page or _page("Not Found", "<h1>404</h1>")).encode("utf-8")
+            self.send_response(200 if page is not None else 404)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # 基准测试期间不输出访问日志
+            pass
+
+    return Handler
+
+
+class SyntheticSiteServer:
+    """
+    在后台线程中运行的合成网站服务器
+
+    用法::
+
+        with SyntheticSiteServer(SiteSize(artists=100)) as server:
+            print(server.url)
+    """
+
+    def __init__(self, size: SiteSize, host: str = "127.0.0.1", port: int = 0):
+        """
+        初始化服务器
+
+        Args:
+            size: 网站规模
+            host: 监听地址
+            port: 监听端口，0表示随机端口
+        """
+        self.site = SyntheticSite(size)
+        self.server = ThreadingHTTPServer((host, port), _handler(self.site))
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        """
+        服务器监听的地址和端口
+        """
+        return self.server.server_address[:2]
+
+    @property
+    def url(self) -> str:
+        """
+        网站首页地址
+        """
+        host, port = self.address
+        return f"http://{host}:{port}/"
+
+    def start(self) -> "SyntheticSiteServer":
+        """
+        在后台线程中启动服务器
+        """
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        停止服务器
+        """
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "SyntheticSiteServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main(argv=None) -> None:
+    """
+    命令行入口：启动合成网站直到被中断
+    """
+    parser = argparse.ArgumentParser(description="启动本地合成艺术网站")
+    parser.add_argument("--artists", type=int, default=SiteSize.artists)
+    parser.add_argument("--artworks", type=int, default=SiteSize.artworks)
+    parser.add_argument("--exhibitions", type=int, default=SiteSize.exhibitions)
+    parser.add_argument("--page-size", type=int, default=SiteSize.page_size)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    size = SiteSize(args.artists, args.artworks, args.exhibitions, args.page_size)
+    server = SyntheticSiteServer(size, args.host, args.port)
+    print(f"合成网站已启动: {server.url}（共 {size.total_pages} 个页面）")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+基准测试工具测试
+"""
+from urllib.request import urlopen
+from urllib.error import HTTPError
+
+import pytest
+
+from benchmarks.crawl_benchmark import run_benchmark
+from benchmarks import api_load_test, pipeline_benchmark
+from benchmarks.instrumentation import percentile
+from benchmarks.synthetic_site import SiteSize, SyntheticSite, SyntheticSiteServer
+
+
+def test_synthetic_site_is_deterministic():
+    """测试同一规模下生成的页面相同，列表分页覆盖全部详情页"""
+    size = SiteSize(artists=5, artworks=45, exhibitions=3, page_size=20)
+    site, other = SyntheticSite(size), SyntheticSite(size)
+
+    assert site.render("/artwork/7", {}) == other.render("/artwork/7", {})
+    assert site.render("/artwork/7", {}) != site.render("/artwork/8", {})
+    assert 'class="next" href="/artworks?page=2"' in site.render("/artworks", {"page": ["1"]})
+    last = site.render("/artworks", {"page": ["3"]})
+    assert 'class="next"' not in last
+    assert last.count('class="detail"') == 5
+    assert site.render("/artworks", {"page": ["4"]}) is None
+    assert site.render("/artwork/45", {}) is None
+    assert size.total_pages == 3 + 1 + 1 + 5 + 45 + 3
+
+
+def test_synthetic_site_server():
+    """测试合成网站服务器返回页面和404"""
+    with SyntheticSiteServer(SiteSize(artists=2, artworks=2, exhibitions=1)) as server:
+        with urlopen(f"{server.url}artist/1") as response:
+            assert response.status == 200
+            assert "艺术家 1" in response.read().decode("utf-8")
+        with pytest.raises(HTTPError) as exc_info:
+            urlopen(f"{server.url}artist/2")
+        assert exc_info.value.code == 404
+
+
+def test_percentile():
+    """测试分位数计算"""
+    values = list(range(1, 101))
+    assert percentile(values, 0.5) == 51
+    assert percentile(values, 0.99) == 100
+    assert percentile([], 0.5) == 0.0
+
+
+def test_crawl_benchmark_reports_metrics():
+    """测试基准测试爬取整个合成网站并输出指标"""
+    size = SiteSize(artists=10, artworks=30, exhibitions=5, page_size=10)
+    result = run_benchmark(size, ["base"])
+
+    metrics = result["results"]["base"]
+    assert metrics["finish_reason"] == "finished"
+    assert metrics["pages"] == size.total_pages
+    assert metrics["items"] == metrics["items_saved"] == 45
+    assert metrics["pages_per_second"] > 0
+    assert metrics["callback_latency_p99_ms"] >= metrics["callback_latency_p50_ms"] > 0
+    assert metrics["peak_rss_mb"] > 0
+
+
+def test_make_items_dup_ratio():
+    """测试合成数据项可重复生成，重复URL比例接近设定值"""
+    items = pipeline_benchmark.make_items(2000, dup_ratio=0.25, seed=1)
+
+    assert items == pipeline_benchmark.make_items(2000, dup_ratio=0.25, seed=1)
+    assert {item["page_type"] for item in items} == {"artist", "artwork"}
+    duplicates = len(items) - len({item["url"] for item in items})
+    assert 0.2 < duplicates / len(items) < 0.3
+
+
+def test_pipeline_benchmark_reports_metrics():
+    """测试各测试目标输出吞吐、提交次数和写入字节数"""
+    result = pipeline_benchmark.run_benchmark(
+        60, 0.2, list(pipeline_benchmark.TARGETS), ["sqlite", "postgresql"], seed=3
+    )
+
+    sqlite = result["results"]["sqlite"]
+    rows = len({item["url"] for item in pipeline_benchmark.make_items(60, 0.2, seed=3)})
+    assert sqlite["create_or_update"]["commits"] == 60
+    assert sqlite["create_or_update"]["rows"] == rows
+    # 单写线程把多条写操作合并到一次提交中
+    assert sqlite["database_pipeline"]["rows"] == rows
+    assert sqlite["database_pipeline"]["commits"] < 60
+    assert sqlite["json_writer"]["bytes_written"] > 0
+    assert all(metrics["items_per_second"] > 0 for metrics in sqlite.values())
+    assert "skipped" in result["results"]["postgresql"]["create_or_update"]
+
+
+def test_pipeline_benchmark_threaded_writes_do_not_duplicate():
+    """测试关闭单写线程、在线程池中并发写入重复URL时不产生重复行"""
+    result = pipeline_benchmark.run_benchmark(200, 0.5, ["database_pipeline"], ["sqlite-threaded"], seed=5)
+
+    rows = len({item["url"] for item in pipeline_benchmark.make_items(200, 0.5, seed=5)})
+    assert result["results"]["sqlite-threaded"]["database_pipeline"]["rows"] == rows
+
+
+def test_api_load_test_reports_endpoints():
+    """测试负载测试写入多租户数据，并输出各端点的吞吐和延迟分位数"""
+    volumes = api_load_test.SeedVolumes(
+        tenants=2, users_per_tenant=1, sites_per_tenant=1, jobs_per_site=3, items=500, logs=2000
+    )
+    result = api_load_test.run_benchmark(volumes, duration=1, concurrency=4, seed=2)
+
+    assert "error" not in result
+    assert result["seeding"]["rows"] == {
+        "users": 2, "site_configs": 2, "jobs": 6, "scraped_items": 500, "job_logs": 2000,
+    }
+    endpoints = result["load"]["endpoints"]
+    for name in ("jobs", "job_logs", "scraped_items", "search"):
+        assert endpoints[name]["requests"] > 0
+        assert endpoints[name]["errors"] == 0
+        assert endpoints[name]["latency_p99_ms"] >= endpoints[name]["latency_p50_ms"] > 0
+    # 密码哈希不可用时登录记为跳过
+    assert "requests" in endpoints["login"] or "skipped" in endpoints["login"]
+    assert result["load"]["total"]["requests_per_second"] > 0
@@ -0,0 +1,117 @@
+"""
+任务取消测试
+"""
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import models, services
+from app.db.base import Base
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# 爬虫不断产生新请求，在第5个页面时模拟API取消任务
+CRAWL_SCRIPT = textwrap.dedent("""
+    import json
+    import time
+
+    import scrapy
+    from scrapy.crawler import CrawlerProcess
+
+    from app import models, services
+    from app.db.base import Base
+    from app.db.database import SessionLocal, engine
+
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    db.add(models.Job(id=1, name="job", site_config_id=1, tenant_id="test_tenant", status="running"))
+    db.commit()
+    db.close()
+
+
+    class EndlessSpider(scrapy.Spider):
+        name = "endless"
+        start_urls = ["data:,page-0"]
+
+        def parse(self, response):
+            page = int(response.text.split("-")[1])
+            if page == 5:
+                db = SessionLocal()
+                services.job.cancel_job(db, job_id=1)
+                db.close()
+            yield scrapy.Request(f"data:,page-{page + 1}")
+
+
+    process = CrawlerProcess({
+        "EXTENSIONS": {"app.scrapers.extensions.JobCancellation": 500},
+        "JOB_CANCEL_ENABLED": True,
+        "JOB_CANCEL_POLL_INTERVAL": 0.2,
+        # 取消时通过下载处理器关闭浏览器上下文（没有打开页面时应直接跳过）
+        "DOWNLOAD_HANDLERS": {"https": "app.scrapers.handlers.PlaywrightDownloadHandler"},
+        "DOWNLOAD_DELAY": 0.05,
+        "LOG_LEVEL": "ERROR",
+    })
+    crawler = process.create_crawler(EndlessSpider)
+    process.crawl(crawler, job_id=1)
+    started = time.monotonic()
+    process.start()
+
+    print(json.dumps({
+        "finish_reason": crawler.stats.get_value("finish_reason"),
+        "cancelled": crawler.stats.get_value("job/cancelled"),
+        "pages": crawler.stats.get_value("response_received_count"),
+        "elapsed": time.monotonic() - started,
+    }))
+""")
+
+
+def test_cancel_job_service():
+    """测试取消任务后状态可直接从数据库读取"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        db.add(models.Job(id=1, name="job", site_config_id=1, tenant_id="test_tenant", status="running"))
+        db.commit()
+
+        job = services.job.cancel_job(db, job_id=1)
+
+        assert job.status == "cancelled"
+        assert job.completed_at is not None
+        assert services.job.get_status(db, job_id=1) == "cancelled"
+        assert services.job.get_status(db, job_id=2) is None
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def test_cancelled_job_closes_spider(tmp_path):
+    """测试任务取消后爬虫在检查间隔内关闭"""
+    env = dict(
+        os.environ,
+        PYTHONPATH=PROJECT_DIR,
+        DATABASE_URL=f"sqlite:///{tmp_path / 'cancel.db'}",
+    )
+    script = tmp_path / "crawl.py"
+    script.write_text(CRAWL_SCRIPT, encoding="utf-8")
+    result = subprocess.run(
+        [sys.executable, str(script)],
+        cwd=tmp_path,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+
+    output = json.loads(result.stdout.strip().splitlines()[-1])
+    assert output["finish_reason"] == "cancelled"
+    assert output["cancelled"] is True
+    assert output["pages"] < 50
+    assert output["elapsed"] < 10
@@ -0,0 +1,258 @@
+"""
+爬取检查点测试
+"""
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+from celery.exceptions import Retry
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import models
+from app.db.base import Base
+from app.scrapers import checkpoint
+from app.tasks import scraper_tasks
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# 起始页产生 TOTAL 个详情页请求；CRASH_AFTER 不为空时处理到第N个详情页后模拟进程崩溃
+CRAWL_SCRIPT = textwrap.dedent("""
+    import json
+    import os
+    import sys
+
+    import scrapy
+    from scrapy.crawler import CrawlerProcess
+
+    from app.scrapers.checkpoint import checkpoint_settings
+
+    TOTAL = 40
+    CRASH_AFTER = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    log = open("fetched.log", "a", encoding="utf-8")
+
+
+    class ListSpider(scrapy.Spider):
+        name = "list"
+        start_urls = ["data:,index"]
+        handled = 0
+
+        def parse(self, response):
+            for i in range(TOTAL):
+                yield scrapy.Request(f"data:,item-{i}", callback=self.parse_item)
+
+        def parse_item(self, response):
+            log.write(response.text + "\\n")
+            log.flush()
+            ListSpider.handled += 1
+            if CRASH_AFTER is not None and ListSpider.handled >= CRASH_AFTER:
+                os._exit(1)
+            yield {"id": response.text}
+
+
+    settings = {
+        "EXTENSIONS": {"app.scrapers.extensions.CrawlCheckpoint": 500},
+        "CHECKPOINT_INTERVAL": 0.1,
+        "CONCURRENT_REQUESTS": 1,
+        "DOWNLOAD_DELAY": 0.02,
+        "LOG_LEVEL": "ERROR",
+    }
+    settings.update(checkpoint_settings(1))
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler(ListSpider)
+    process.crawl(crawler)
+    process.start()
+
+    print(json.dumps({
+        "finish_reason": crawler.stats.get_value("finish_reason"),
+        "resumed": crawler.stats.get_value("checkpoint/resumed", False),
+        "items": crawler.stats.get_value("item_scraped_count", 0),
+        "handled": ListSpider.handled,
+    }))
+""")
+
+
+def _run(tmp_path, *args):
+    """
+    在子进程中运行爬取脚本
+    """
+    env = dict(
+        os.environ,
+        PYTHONPATH=PROJECT_DIR,
+        CRAWL_CHECKPOINT_DIR=str(tmp_path / "checkpoints"),
+    )
+    return subprocess.run(
+        [sys.executable, str(tmp_path / "crawl.py"), *args],
+        cwd=tmp_path,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+
+
+def test_snapshot_roundtrip(tmp_path):
+    """测试快照保存后，JOBDIR中未保存的修改在恢复时被丢弃"""
+    jobdir = tmp_path / "job_1" / "live"
+    jobdir.mkdir(parents=True)
+    (jobdir / "requests.seen").write_text("a")
+
+    checkpoint.save_snapshot(str(jobdir))
+    (jobdir / "requests.seen").write_text("ab")
+    (jobdir / "partial").write_text("x")
+
+    assert checkpoint.restore_snapshot(str(jobdir)) is True
+    assert (jobdir / "requests.seen").read_text() == "a"
+    assert not (jobdir / "partial").exists()
+
+
+def test_snapshot_links_append_only_files(tmp_path):
+    """测试只追加的文件以硬链接保存：之后的追加在恢复时丢弃，已删除的队列数据块仍可恢复"""
+    jobdir = tmp_path / "job_1" / "live"
+    chunks = jobdir / "requests.queue" / "0"
+    chunks.mkdir(parents=True)
+    (jobdir / "requests.seen").write_text("a\n")
+    (chunks / "q00000").write_bytes(b"first")
+    (chunks / "info.json").write_text('{"size": 1}')
+
+    checkpoint.prepare_snapshot(str(jobdir))
+    snapshot_tmp = tmp_path / "job_1" / "snapshot.tmp"
+    assert os.path.samefile(snapshot_tmp / "requests.seen", jobdir / "requests.seen")
+    assert not os.path.samefile(snapshot_tmp / "requests.queue" / "0" / "info.json", chunks / "info.json")
+
+    # 快照替换期间爬取继续：追加指纹，数据块读完后删除
+    with open(jobdir / "requests.seen", "a") as f:
+        f.write("b\n")
+    os.unlink(chunks / "q00000")
+    checkpoint.commit_snapshot(str(jobdir))
+
+    assert checkpoint.restore_snapshot(str(jobdir)) is True
+    assert (jobdir / "requests.seen").read_text() == "a\n"
+    assert (jobdir / "requests.queue" / "0" / "q00000").read_bytes() == b"first"
+    assert not (jobdir / checkpoint.MANIFEST_FILE).exists()
+
+
+def test_restore_interrupted_snapshot(tmp_path):
+    """测试替换快照过程中中断时使用旧快照，没有快照时从头开始"""
+    jobdir = tmp_path / "job_1" / "live"
+    jobdir.mkdir(parents=True)
+    (jobdir / "requests.seen").write_text("a")
+    assert checkpoint.restore_snapshot(str(jobdir)) is False
+    assert os.listdir(jobdir) == []
+
+    (jobdir / "requests.seen").write_text("a")
+    checkpoint.save_snapshot(str(jobdir))
+    os.rename(tmp_path / "job_1" / "snapshot", tmp_path / "job_1" / "snapshot.old")
+
+    assert checkpoint.restore_snapshot(str(jobdir)) is True
+    assert (jobdir / "requests.seen").read_text() == "a"
+
+
+def test_list_and_remove_checkpoints(tmp_path, monkeypatch):
+    """测试列出和删除任务检查点"""
+    monkeypatch.setattr(checkpoint.app_settings, "CRAWL_CHECKPOINT_DIR", str(tmp_path))
+    for job_id in (3, 7):
+        os.makedirs(os.path.join(checkpoint.checkpoint_dir(job_id), "snapshot"))
+    with open(os.path.join(checkpoint.checkpoint_dir(7), "snapshot", checkpoint.STATS_FILE), "w") as f:
+        json.dump({"database/items_saved": 12}, f)
+
+    assert sorted(checkpoint.list_checkpoints()) == [3, 7]
+    assert checkpoint.load_stats(7) == {"database/items_saved": 12}
+    assert checkpoint.load_stats(3) == {}
+
+    checkpoint.remove_checkpoint(7)
+    assert checkpoint.list_checkpoints() == [3]
+
+
+def test_crawl_resumes_after_crash(tmp_path):
+    """测试爬取进程崩溃后从检查点继续，不重新抓取已处理的页面"""
+    (tmp_path / "crawl.py").write_text(CRAWL_SCRIPT, encoding="utf-8")
+
+    crashed = _run(tmp_path, "25")
+    assert crashed.returncode == 1, crashed.stderr
+    assert (tmp_path / "checkpoints" / "job_1" / "snapshot").exists()
+
+    resumed = _run(tmp_path)
+    assert resumed.returncode == 0, resumed.stderr
+    output = json.loads(resumed.stdout.strip().splitlines()[-1])
+    assert output["finish_reason"] == "finished"
+    assert output["resumed"] is True
+    # 只重新下载最近一次快照之后处理的页面
+    assert output["handled"] < 40 - 10
+
+    fetched = (tmp_path / "fetched.log").read_text(encoding="utf-8").split()
+    assert set(fetched) == {f"item-{i}" for i in range(40)}
+    # 累计的数据项计数从检查点恢复
+    assert output["items"] >= 40
+
+
+class NullJobLogger:
+    """丢弃所有日志的任务日志记录器"""
+
+    def log(self, *args, **kwargs):
+        pass
+
+    debug = info = warning = error = exception = log
+
+
+@pytest.fixture
+def failing_task(tmp_path, monkeypatch):
+    """
+    爬取总是失败的 run_spider_task：数据库为内存数据库，任务1已有检查点
+    """
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    db.add(models.SiteConfig(id=1, name="site", url="https://example.com", tenant_id="test_tenant"))
+    db.add(models.Job(id=1, name="job", site_config_id=1, tenant_id="test_tenant", status="dispatched"))
+    db.commit()
+    db.close()
+
+    monkeypatch.setattr(checkpoint.app_settings, "CRAWL_CHECKPOINT_DIR", str(tmp_path))
+    os.makedirs(os.path.join(checkpoint.checkpoint_dir(1), "snapshot"))
+    monkeypatch.setattr(scraper_tasks, "SessionLocal", Session)
+    monkeypatch.setattr(scraper_tasks, "_trigger_dispatch", lambda: None)
+    monkeypatch.setattr(scraper_tasks.heartbeat, "clear", lambda job_id: None)
+    # 任务日志不写入 logs/ 目录
+    monkeypatch.setattr(scraper_tasks, "get_job_logger", lambda job_id: NullJobLogger())
+
+    def crash(*args, **kwargs):
+        raise RuntimeError("爬取进程被中断")
+
+    monkeypatch.setattr(scraper_tasks, "run_crawl_process", crash)
+    try:
+        yield Session
+    finally:
+        engine.dispose()
+
+
+def test_retry_keeps_job_active_and_checkpoint(failing_task, monkeypatch):
+    """测试爬取失败等待重试时任务为 retrying（仍占用调度名额），检查点保留供重试继续"""
+    # worker中 self.retry 发布重试消息后返回 Retry 异常
+    monkeypatch.setattr(scraper_tasks.run_spider_task, "retry", lambda exc=None, countdown=None: Retry(exc=exc))
+
+    result = scraper_tasks.run_spider_task.apply(args=(1,))
+
+    assert result.state == "RETRY"
+    db = failing_task()
+    assert db.get(models.Job, 1).status == "retrying"
+    db.close()
+    assert checkpoint.list_checkpoints() == [1]
+
+
+def test_last_retry_fails_job_and_removes_checkpoint(failing_task):
+    """测试最后一次重试失败后任务失败，检查点删除，下一次启动重新开始"""
+    result = scraper_tasks.run_spider_task.apply(args=(1,), retries=scraper_tasks.run_spider_task.max_retries)
+
+    assert result.get()["status"] == "failed"
+    db = failing_task()
+    job = db.get(models.Job, 1)
+    assert job.status == "failed"
+    assert job.error_message.startswith("超过最大重试次数")
+    db.close()
+    assert checkpoint.list_checkpoints() == []
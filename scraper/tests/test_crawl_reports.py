@@ -0,0 +1,141 @@
+"""
+爬取报告测试
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import models, services
+from app.api import deps
+from app.api.routes import jobs
+from app.db.base import Base
+from app.db.database import get_db
+
+
+def _stats(items: int, elapsed: float, errors: int = 0, resumed: bool = False) -> dict:
+    """构造Scrapy统计：每条数据一个200响应，每个响应10KB"""
+    stats = {
+        "finish_reason": "finished",
+        "elapsed_time_seconds": elapsed,
+        "downloader/request_count": items + errors,
+        "downloader/response_count": items + errors,
+        "downloader/response_bytes": items * 10240,
+        "downloader/response_status_count/200": items,
+        "item_scraped_count": items,
+        "database/items_saved": items,
+        "start_time": "2026-10-19 00:00:00",
+    }
+    if errors:
+        stats["downloader/response_status_count/503"] = errors
+    if resumed:
+        stats["checkpoint/resumed"] = True
+    return stats
+
+
+@pytest.fixture
+def session():
+    """创建测试数据库会话"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    try:
+        yield db
+    finally:
+        db.close()
+        engine.dispose()
+
+
+@pytest.fixture
+def job(session):
+    """同一站点配置下的周期任务"""
+    job = models.Job(id=1, name="job", site_config_id=1, tenant_id="test_tenant")
+    session.add(job)
+    session.commit()
+    return job
+
+
+def test_merge_stats():
+    """测试合并分片统计：计数求和，耗时取最长"""
+    merged = services.crawl_report.merge_stats([_stats(10, 60), _stats(30, 90, resumed=True)])
+
+    assert merged["item_scraped_count"] == 40
+    assert merged["downloader/response_bytes"] == 40 * 10240
+    assert merged["elapsed_time_seconds"] == 90
+    assert merged["checkpoint/resumed"] is True
+    assert merged["finish_reason"] == "finished"
+    assert "start_time" not in merged
+
+
+def test_create_report_from_stats(session, job):
+    """测试从Scrapy统计提取报告计数和指标"""
+    report = services.crawl_report.create(session, job=job, stats=_stats(120, 60, errors=30))
+
+    assert (report.requests, report.responses, report.errors) == (150, 150, 30)
+    assert report.site_config_id == 1 and report.tenant_id == "test_tenant"
+    assert report.stats["downloader/response_status_count/503"] == 30
+    assert services.crawl_report.compute_metrics(report) == {
+        "items_per_minute": 120.0,
+        "responses_per_minute": 150.0,
+        "error_rate": 0.2,
+        "bytes_per_item": 10240.0,
+    }
+
+
+def test_compare_detects_regression(session, job):
+    """测试与同一站点之前运行的中位数比较，标记吞吐量和错误率退化"""
+    other_site = models.Job(id=2, name="other", site_config_id=2, tenant_id="test_tenant")
+    session.add(other_site)
+    session.commit()
+    for items in (100, 120, 110):
+        services.crawl_report.create(session, job=job, stats=_stats(items, 60))
+    # 从检查点恢复的运行和其他站点的运行不参与比较
+    services.crawl_report.create(session, job=job, stats=_stats(10, 60, resumed=True))
+    services.crawl_report.create(session, job=other_site, stats=_stats(1000, 60))
+    # 只含主worker统计的分布式爬取也不参与比较
+    partial = services.crawl_report.create(session, job=job, stats={**_stats(20, 60), "frontier/helpers": 2})
+    assert partial.partial is True
+    report = services.crawl_report.create(session, job=job, stats=_stats(55, 60, errors=5))
+
+    comparison = services.crawl_report.compare(session, report=report, limit=10)
+
+    assert [r["items_scraped"] for r in comparison["previous"]] == [110, 120, 100]
+    assert comparison["baseline"]["items_per_minute"] == 110
+    assert comparison["change"]["items_per_minute"] == -0.5
+    assert comparison["baseline"]["error_rate"] == 0
+    assert comparison["change"]["bytes_per_item"] == 0
+    assert comparison["regressions"] == ["items_per_minute", "responses_per_minute", "error_rate"]
+
+
+def test_report_endpoint(session, job):
+    """测试通过API读取任务最近一次运行的报告"""
+    user = models.User(
+        email="test@example.com", username="testuser", hashed_password="hashed_password", tenant_id="test_tenant"
+    )
+    session.add(user)
+    session.add(models.Job(id=3, name="job", site_config_id=1, tenant_id="other_tenant"))
+    session.commit()
+
+    app = FastAPI()
+    app.include_router(jobs.router)
+    app.dependency_overrides[get_db] = lambda: session
+    app.dependency_overrides[deps.get_current_active_user] = lambda: user
+    client = TestClient(app)
+
+    assert client.get("/jobs/1/report").status_code == 404
+    services.crawl_report.create(session, job=job, stats=_stats(100, 60))
+    services.crawl_report.create(session, job=job, stats=_stats(100, 30))
+
+    response = client.get("/jobs/1/report", params={"include_stats": True})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["report"]["metrics"]["items_per_minute"] == 200
+    assert body["change"]["items_per_minute"] == 1
+    assert body["regressions"] == []
+    assert body["stats"]["item_scraped_count"] == 100
+    assert "stats" not in body["report"]
+
+    assert client.get("/jobs/3/report").status_code == 403
@@ -0,0 +1,135 @@
+"""
+单写线程批量写入测试
+"""
+import threading
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app import models, services
+from app.db.base import Base
+from app.db.database import _set_sqlite_pragmas
+from app.db.writer import BatchWriter
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """创建使用WAL模式的SQLite文件数据库"""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'writer.db'}",
+        connect_args={"check_same_thread": False},
+    )
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    Base.metadata.create_all(engine)
+    try:
+        yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    finally:
+        engine.dispose()
+
+
+def create_item(url):
+    """生成创建数据项的写操作"""
+    return lambda db: services.scraped_item.create_or_update(
+        db,
+        url=url,
+        page_type="artwork",
+        title=url,
+        data={"url": url},
+        job_id=1,
+        site_config_id=1,
+        tenant_id="test_tenant",
+        commit=False,
+    )
+
+
+def test_journal_mode_is_wal(session_factory):
+    """测试SQLite连接使用WAL模式"""
+    db = session_factory()
+    try:
+        mode = db.connection().exec_driver_sql("PRAGMA journal_mode").scalar()
+    finally:
+        db.close()
+
+    assert mode == "wal"
+
+
+def test_concurrent_writes_are_batched(session_factory):
+    """测试多个线程的并发写入全部保存，且合并为较少的事务"""
+    writer = BatchWriter(session_factory, max_batch_size=50, max_batch_delay=0.05)
+
+    def crawl(worker):
+        futures = [writer.submit(create_item(f"https://example.com/{worker}/{i}")) for i in range(50)]
+        for future in futures:
+            future.result(timeout=10)
+
+    threads = [threading.Thread(target=crawl, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.close(timeout=10)
+
+    db = session_factory()
+    try:
+        assert db.query(models.ScrapedItem).count() == 200
+    finally:
+        db.close()
+    assert writer.operations == 200
+    assert writer.commits < 200
+
+
+def test_failed_operation_does_not_discard_batch(session_factory):
+    """测试批次中单个操作失败时其余操作仍然提交"""
+    writer = BatchWriter(session_factory, max_batch_size=10, max_batch_delay=0.2)
+
+    def broken(db):
+        raise ValueError("broken")
+
+    first = writer.submit(create_item("https://example.com/1"))
+    failed = writer.submit(broken)
+    second = writer.submit(create_item("https://example.com/2"))
+
+    assert first.result(timeout=10).url == "https://example.com/1"
+    assert second.result(timeout=10).url == "https://example.com/2"
+    with pytest.raises(ValueError):
+        failed.result(timeout=10)
+    writer.close(timeout=10)
+
+    db = session_factory()
+    try:
+        assert db.query(models.ScrapedItem).count() == 2
+    finally:
+        db.close()
+
+
+def test_concurrent_same_url_writes_do_not_duplicate(session_factory):
+    """测试多个会话同时写入同一URL时只保存一行（关闭单写线程、在线程池中逐条提交时的情况）"""
+    urls = [f"https://example.com/{i}" for i in range(20)]
+    barrier = threading.Barrier(8)
+    errors = []
+
+    def crawl():
+        barrier.wait()
+        for url in urls:
+            db = session_factory()
+            try:
+                create_item(url)(db)
+                db.commit()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                db.close()
+
+    threads = [threading.Thread(target=crawl) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    db = session_factory()
+    try:
+        assert errors == []
+        assert db.query(models.ScrapedItem).count() == len(urls)
+    finally:
+        db.close()
@@ -0,0 +1,145 @@
+"""
+任务调度测试
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import models, services
+from app.db.base import Base
+
+BASE_TIME = datetime(2026, 1, 1)
+
+
+@pytest.fixture
+def db():
+    """创建内存数据库会话"""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def add_jobs(db, tenant_id, count, queue="http", status="queued", **fields):
+    """添加同一租户的一批任务，排队时间按添加顺序递增"""
+    offset = db.query(models.Job).count()
+    for i in range(count):
+        db.add(models.Job(
+            name=f"{tenant_id}-{i}",
+            site_config_id=1,
+            tenant_id=tenant_id,
+            status=status,
+            queue=queue,
+            queued_at=BASE_TIME + timedelta(seconds=offset + i),
+            **fields,
+        ))
+    db.commit()
+
+
+def tenants(jobs):
+    """返回任务所属的租户列表"""
+    return [job.tenant_id for job in jobs]
+
+
+def test_large_tenant_does_not_starve_others(db):
+    """测试先提交大量任务的租户不会占满队列，其他租户轮流获得名额"""
+    add_jobs(db, "big", 50)
+    add_jobs(db, "small", 2)
+
+    jobs = services.dispatch.select_jobs(
+        db, capacity={"browser": 0, "http": 4}, weights={}, limits={}, default_limit=10
+    )
+
+    assert sorted(tenants(jobs)) == ["big", "big", "small", "small"]
+
+
+def test_weights_and_running_jobs(db):
+    """测试按权重分配名额，并计入已运行的任务"""
+    add_jobs(db, "a", 1, status="running")
+    add_jobs(db, "a", 10)
+    add_jobs(db, "b", 10)
+
+    jobs = services.dispatch.select_jobs(
+        db, capacity={"browser": 0, "http": 7}, weights={"a": 2.0}, limits={}, default_limit=10
+    )
+
+    # 共7个名额，a已占1个；按 2:1 分配后 a 共5个、b 共2个
+    assert tenants(jobs).count("a") == 4
+    assert tenants(jobs).count("b") == 2
+
+
+def test_tenant_limit_and_fifo(db):
+    """测试租户并发上限，以及同一租户内先进先出"""
+    add_jobs(db, "a", 1, status="dispatched")
+    add_jobs(db, "a", 5)
+
+    jobs = services.dispatch.select_jobs(
+        db, capacity={"browser": 0, "http": 10}, weights={}, limits={"a": 3}, default_limit=10
+    )
+
+    assert [job.name for job in jobs] == ["a-0", "a-1"]
+
+
+def test_queues_have_separate_capacity(db):
+    """测试浏览器任务占满容量时HTTP任务仍可投递"""
+    add_jobs(db, "a", 2, queue="browser", status="running")
+    add_jobs(db, "a", 3, queue="browser")
+    add_jobs(db, "a", 3, queue="http")
+
+    jobs = services.dispatch.select_jobs(
+        db, capacity={"browser": 2, "http": 2}, weights={}, limits={}, default_limit=10
+    )
+
+    assert [job.queue for job in jobs] == ["http", "http"]
+
+
+def test_shards_and_workers_use_slots(db):
+    """测试分片任务按未完成的分片数、分布式爬取按worker数占用名额"""
+    add_jobs(db, "a", 1, status="running", shards_total=4, shards_completed=1)
+    add_jobs(db, "b", 3)
+
+    jobs = services.dispatch.select_jobs(
+        db, capacity={"browser": 0, "http": 4}, weights={}, limits={}, default_limit=10
+    )
+    assert [job.name for job in jobs] == ["b-0"]
+
+    # 队首任务名额不够时不被后面的小任务插队；超过容量的任务在队列空闲时单独投递
+    add_jobs(db, "c", 1, config={"workers": 3})
+    add_jobs(db, "c", 1)
+    jobs = services.dispatch.select_jobs(
+        db, capacity={"browser": 0, "http": 2}, weights={}, limits={}, default_limit=10
+    )
+    assert jobs == []
+
+    db.query(models.Job).filter(models.Job.status == "running").update({models.Job.status: "completed"})
+    db.query(models.Job).filter(models.Job.tenant_id == "b").delete()
+    db.commit()
+    jobs = services.dispatch.select_jobs(
+        db, capacity={"browser": 0, "http": 2}, weights={}, limits={}, default_limit=10
+    )
+    assert [job.name for job in jobs] == ["c-0"]
+
+
+def test_mark_dispatched_only_once(db):
+    """测试同一任务只会被标记投递一次，投递失败可放回队列"""
+    add_jobs(db, "a", 1)
+    job_id = db.query(models.Job.id).scalar()
+
+    assert services.dispatch.mark_dispatched(db, job_id=job_id, celery_task_id="t1") is True
+    assert services.dispatch.mark_dispatched(db, job_id=job_id, celery_task_id="t2") is False
+
+    services.dispatch.requeue(db, job_id=job_id)
+    job = db.get(models.Job, job_id)
+    db.refresh(job)
+    assert (job.status, job.celery_task_id) == ("queued", None)
@@ -0,0 +1,197 @@
+"""
+分布式爬取队列测试
+"""
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+from scrapy import Spider
+from scrapy.utils.test import get_crawler
+
+from app.scrapers.frontier import FrontierScheduler, MemoryFrontier, frontier_settings, get_memory_frontier
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# 同一进程中的两个爬虫作为同一任务的两个worker，通过进程内队列共享请求
+CRAWL_SCRIPT = textwrap.dedent("""
+    import json
+    from types import SimpleNamespace
+
+    import scrapy
+    from scrapy.crawler import CrawlerProcess
+
+    from app import models
+    from app.db.base import Base
+    from app.db.database import SessionLocal, engine
+    from app.scrapers.frontier import frontier_settings
+
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    db.add(models.Job(id=1, name="job", site_config_id=1, tenant_id="test_tenant", items_saved=0, items_scraped=0))
+    db.commit()
+    db.close()
+
+
+    class PagesSpider(scrapy.Spider):
+        name = "pages"
+        start_urls = ["data:,index"]
+
+        def parse(self, response):
+            for i in range(20):
+                yield scrapy.Request(f"data:,page-{i}", callback=self.parse_page)
+
+        def parse_page(self, response):
+            yield {"url": response.url, "page_type": "artwork", "title": response.text}
+            # 重复的请求应被共享指纹集合过滤
+            yield scrapy.Request("data:,page-0", callback=self.parse_page)
+
+
+    settings = {
+        "ITEM_PIPELINES": {"app.scrapers.pipelines.DatabasePipeline": 400},
+        "FRONTIER_BACKEND": "memory",
+        "FRONTIER_IDLE_TIMEOUT": 1,
+        "FRONTIER_HEARTBEAT_INTERVAL": 0.2,
+        "FRONTIER_SYNC_INTERVAL": 0.1,
+        "CONCURRENT_REQUESTS": 1,
+        "DOWNLOAD_DELAY": 0.05,
+        "DOWNLOAD_DELAY_JITTER": 0,
+        "LOG_LEVEL": "ERROR",
+    }
+    process = CrawlerProcess()
+    crawlers = []
+    for join in (False, True):
+        crawler = process.create_crawler(PagesSpider)
+        crawler.settings.setdict({**settings, **frontier_settings(join=join)}, priority="cmdline")
+        crawlers.append(crawler)
+        process.crawl(crawler, job_id=1, site_config=SimpleNamespace(id=1, tenant_id="test_tenant"))
+    process.start()
+
+    db = SessionLocal()
+    print(json.dumps({
+        "items": db.query(models.ScrapedItem).count(),
+        "items_saved": db.get(models.Job, 1).items_saved,
+        "dequeued": [c.stats.get_value("scheduler/dequeued", 0) for c in crawlers],
+        "filtered": sum(c.stats.get_value("dupefilter/filtered", 0) for c in crawlers),
+    }))
+""")
+
+
+def test_memory_frontier_priority_and_fingerprints():
+    """测试按优先级出队、同优先级先进先出，以及指纹去重"""
+    frontier = MemoryFrontier()
+    filtered = frontier.push([("a", b"low", 0), ("b", b"high", 10), ("a", b"dup", 0), (None, b"low-2", 0)])
+
+    assert filtered == 1
+    assert len(frontier) == 3
+    assert frontier.pop("w", count=2) == [b"high", b"low"]
+    assert frontier.pop("w", count=2) == [b"low-2"]
+    assert frontier.pop("w") == []
+
+
+def test_memory_frontier_active_workers():
+    """测试只统计忙碌心跳未过期或持有租约的其他worker"""
+    frontier = MemoryFrontier()
+    frontier.heartbeat("a")
+    frontier.heartbeat("b")
+    frontier.heartbeat("c", busy=False)
+
+    assert frontier.active_workers(timeout=60) == 2
+    assert frontier.active_workers(timeout=60, exclude="a") == 1
+    frontier.leave("b")
+    assert frontier.active_workers(timeout=60, exclude="a") == 0
+
+    frontier.push([(None, b"page", 0)])
+    frontier.pop("c")
+    assert frontier.active_workers(timeout=60, exclude="a") == 1
+    frontier.ack("c", [b"page"])
+    assert frontier.active_workers(timeout=60, exclude="a") == 0
+
+
+def test_memory_frontier_requeues_leases_of_lost_workers():
+    """测试失联worker租用的请求被放回队列，已确认的请求不会放回"""
+    frontier = MemoryFrontier()
+    frontier.heartbeat("a")
+    frontier.heartbeat("b")
+    frontier.push([(None, b"p1", 5), (None, b"p2", 0), (None, b"p3", 0)])
+
+    assert frontier.pop("a", count=3) == [b"p1", b"p2", b"p3"]
+    frontier.ack("a", [b"p3"])
+    assert frontier.requeue_expired(timeout=60, exclude="b") == 0
+
+    frontier._alive["a"] -= 120
+    assert frontier.requeue_expired(timeout=60, exclude="b") == 2
+    assert frontier.active_workers(timeout=60, exclude="b") == 0
+    assert frontier.pop("b", count=3) == [b"p1", b"p2"]
+
+    assert frontier.release("b", [b"p2"]) == 1
+    assert frontier.pop("b") == [b"p2"]
+
+
+def test_two_workers_share_one_job(tmp_path):
+    """测试两个worker分担同一任务的请求，每个请求只处理一次，计数累加到同一任务"""
+    env = dict(
+        os.environ,
+        PYTHONPATH=PROJECT_DIR,
+        DATABASE_URL=f"sqlite:///{tmp_path / 'frontier.db'}",
+    )
+    # 写入文件运行：Scrapy检查回调时需要读取源码，-c 方式无法读取
+    script = tmp_path / "crawl.py"
+    script.write_text(CRAWL_SCRIPT, encoding="utf-8")
+    result = subprocess.run(
+        [sys.executable, str(script)],
+        cwd=tmp_path,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+
+    output = json.loads(result.stdout.strip().splitlines()[-1])
+    assert output["items"] == 20
+    assert output["items_saved"] == 20
+    assert sum(output["dequeued"]) == 21
+    assert all(dequeued > 0 for dequeued in output["dequeued"])
+    assert output["filtered"] == 20
+
+
+def _open_scheduler(job_id, **kwargs):
+    crawler = get_crawler(Spider, {"FRONTIER_BACKEND": "memory", **frontier_settings(**kwargs)})
+    crawler._apply_settings()
+    scheduler = FrontierScheduler.from_crawler(crawler)
+    scheduler.open(Spider("pages", job_id=job_id))
+    return scheduler
+
+
+def test_scheduler_resets_and_clears_frontier():
+    """测试首次运行清空残留的共享队列，重试时保留；完成或取消时清空，中断时放回租用的请求"""
+    frontier = get_memory_frontier("job:9001")
+    frontier.push([("fp", b"stale", 0)])
+
+    scheduler = _open_scheduler(9001)
+    assert len(frontier) == 1
+    scheduler.close("shutdown")
+    assert len(frontier) == 1
+
+    scheduler = _open_scheduler(9001, reset=True)
+    assert len(frontier) == 0
+    assert frontier.push([("fp", b"stale", 0)]) == 0
+    frontier.push([(None, b"pending", 0)])
+    scheduler.close("cancelled")
+    assert len(frontier) == 0
+
+    # 中断时放回本worker租用的请求，由重试或其他worker继续
+    frontier.push([(None, b"pending", 0)])
+    scheduler = _open_scheduler(9001)
+    scheduler.frontier.pop(scheduler.worker_id)
+    assert len(frontier) == 0
+    scheduler.close("shutdown")
+    assert len(frontier) == 1
+
+    # 协助者不清空
+    scheduler = _open_scheduler(9001, join=True, reset=True)
+    scheduler.close("finished")
+    assert len(frontier) == 1
+    frontier.clear()
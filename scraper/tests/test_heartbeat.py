@@ -0,0 +1,102 @@
+"""
+任务心跳测试
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import models, services
+from app.db.base import Base
+
+NOW = datetime(2026, 3, 2, 12, 0)
+TIMEOUT = 30
+
+
+@pytest.fixture
+def db():
+    """创建内存数据库会话，包含一个HTTP站点配置"""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(models.SiteConfig(id=1, name="site", url="https://example.com", tenant_id="test_tenant"))
+    session.commit()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def add_job(db, job_id, started_seconds_ago, **kwargs):
+    """添加一个运行中的任务"""
+    db.add(models.Job(
+        id=job_id,
+        name=f"job-{job_id}",
+        site_config_id=1,
+        tenant_id="test_tenant",
+        status=kwargs.pop("status", "running"),
+        started_at=NOW - timedelta(seconds=started_seconds_ago),
+        **kwargs,
+    ))
+    db.commit()
+
+
+def test_find_stalled_jobs(db):
+    """测试只有心跳超时的任务被判定为停止，分片任务按心跳和分片进展判断"""
+    now = NOW.timestamp()
+    add_job(db, 1, 3600)                    # 心跳正常的长任务
+    add_job(db, 2, 3600)                    # 心跳超时
+    add_job(db, 3, 3600)                    # 从未写入心跳
+    add_job(db, 4, 5)                       # 刚启动，尚未写入心跳
+    add_job(db, 5, 3600, shards_total=4, updated_at=NOW - timedelta(seconds=600))  # 分片在队列中等待
+    add_job(db, 6, 3600, status="completed")
+    add_job(db, 7, 3600, shards_total=4, updated_at=NOW - timedelta(seconds=3000))  # 分片长时间没有进展
+    add_job(db, 8, 3600, shards_total=4)    # 分片仍在写入心跳
+
+    stalled = services.job.find_stalled_jobs(
+        db,
+        heartbeats={1: now - 3, 2: now - 120, 8: now - 10},
+        timeout=TIMEOUT,
+        shard_timeout=1800,
+        now=now,
+    )
+
+    assert sorted(job.id for job in stalled) == [2, 3, 7]
+
+
+def test_find_lost_dispatched_jobs(db):
+    """测试已投递或等待重试、但一直没有开始运行的任务超时后视为丢失，不再占用名额"""
+    now = NOW.timestamp()
+    add_job(db, 1, 0, status="dispatched", updated_at=NOW - timedelta(seconds=600))  # 消息丢失，从未写入心跳
+    add_job(db, 2, 0, status="dispatched", updated_at=NOW - timedelta(seconds=10))   # 刚投递
+    add_job(db, 3, 0, status="retrying", updated_at=NOW - timedelta(seconds=90))     # 等待重试
+    add_job(db, 4, 0, status="retrying", updated_at=NOW - timedelta(seconds=900))
+    add_job(db, 5, 0, status="queued", updated_at=NOW - timedelta(seconds=900))      # 排队中不占名额
+
+    stalled = services.job.find_stalled_jobs(
+        db, heartbeats={}, timeout=TIMEOUT, dispatch_timeout=300, now=now
+    )
+
+    assert sorted(job.id for job in stalled) == [1, 4]
+
+
+def test_requeue_stalled_until_limit(db):
+    """测试心跳超时的任务重新排队，超过最大次数后失败"""
+    add_job(db, 1, 3600, items_saved=10)
+    job = db.get(models.Job, 1)
+
+    assert services.job.requeue_stalled(db, job=job, max_requeues=1) is True
+    assert (job.status, job.queue, job.stall_count, job.items_saved) == ("queued", "http", 1, 0)
+
+    job.status = "running"
+    db.commit()
+    assert services.job.requeue_stalled(db, job=job, max_requeues=1) is False
+    assert job.status == "failed"
+    assert job.completed_at is not None
@@ -0,0 +1,238 @@
+"""
+作品图片匹配测试
+"""
+import io
+import random
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image, ImageDraw
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import models, services
+from app.api import deps
+from app.api.routes import scraped_items
+from app.db.base import Base
+from app.db.database import get_db
+from app.scrapers.pipelines import DatabasePipeline
+from app.utils import imagehash
+
+
+def _artwork(seed: int, size=(400, 300)) -> Image.Image:
+    """生成由随机色块组成的图片"""
+    rng = random.Random(seed)
+    image = Image.new("RGB", size, (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(12):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        draw.rectangle(
+            (x, y, x + rng.randrange(40, 200), y + rng.randrange(40, 150)),
+            fill=(rng.randrange(256), rng.randrange(256), rng.randrange(256)),
+        )
+    return image
+
+
+def _flip(value: int, bits) -> int:
+    """翻转哈希的指定位"""
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+
+@pytest.fixture
+def session():
+    """创建测试数据库会话"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    services.image_match.clear_cache()
+    try:
+        yield db
+    finally:
+        services.image_match.clear_cache()
+        db.close()
+        engine.dispose()
+
+
+@pytest.fixture
+def artworks(session):
+    """四个站点上的数据项：1和2、2和4的图片近似，1和4、3与其他的图片不近似"""
+    base = random.Random(7).getrandbits(64)
+    hashes = {
+        1: base,
+        2: _flip(base, range(5)),
+        3: ~base & (2 ** 64 - 1),
+        4: _flip(base, range(10)),
+    }
+    for item_id, value in hashes.items():
+        item = services.scraped_item.create(
+            session,
+            url=f"http://site{item_id}.example.com/artwork",
+            page_type="artwork",
+            title=f"artwork {item_id}",
+            job_id=1,
+            site_config_id=item_id,
+            tenant_id="test_tenant",
+        )
+        services.image_match.set_item_hashes(
+            session,
+            item=item,
+            images=[{"url": f"http://site{item_id}.example.com/a.jpg", "phash": imagehash.to_hex(value)}],
+        )
+    return hashes
+
+
+def test_perceptual_hashes_survive_resizing():
+    """测试缩放和JPEG压缩后的同一图片哈希距离小，不同图片距离大"""
+    original = _artwork(1)
+    buffer = io.BytesIO()
+    original.resize((200, 150)).save(buffer, "JPEG", quality=60)
+    copy = Image.open(buffer)
+    other = _artwork(2)
+
+    for hash_function in (imagehash.phash, imagehash.dhash):
+        assert imagehash.hamming(hash_function(original), hash_function(copy)) <= 8
+        assert imagehash.hamming(hash_function(original), hash_function(other)) > 16
+    assert imagehash.from_hex(imagehash.to_hex(imagehash.phash(original))) == imagehash.phash(original)
+
+
+@pytest.mark.parametrize("max_distance", [0, 3, 8, 12])
+def test_hamming_index_matches_brute_force(max_distance):
+    """测试多索引哈希的结果与逐个比较相同"""
+    rng = random.Random(max_distance)
+    values = [rng.getrandbits(64) for _ in range(2000)]
+    # 在随机哈希附近放置距离1到12的哈希
+    values += [_flip(values[i], rng.sample(range(64), i % 12 + 1)) for i in range(200)]
+    index = imagehash.HammingIndex()
+    for key, value in enumerate(values):
+        index.add(value, key)
+    assert len(index) == len(values)
+
+    for query in values[:50]:
+        expected = sorted(
+            (imagehash.hamming(query, value), key)
+            for key, value in enumerate(values)
+            if imagehash.hamming(query, value) <= max_distance
+        )
+        assert sorted(index.search(query, max_distance)) == expected
+
+
+def test_find_matches(session, artworks):
+    """测试按图片查找其他站点的同一作品，新写入的哈希在下一次查询时可见"""
+    matches = services.image_match.find_matches(session, item=session.get(models.ScrapedItem, 1), max_distance=8)
+
+    assert [(m["item"].id, m["distance"]) for m in matches] == [(2, 5)]
+    assert matches[0]["matched_image_url"] == "http://site2.example.com/a.jpg"
+
+    item = services.scraped_item.create(
+        session, url="http://site5.example.com/a", page_type="artwork", job_id=1, site_config_id=5,
+        tenant_id="test_tenant",
+    )
+    services.image_match.set_item_hashes(
+        session, item=item, images=[{"phash": imagehash.to_hex(artworks[1]), "dhash": "00"}, {"error": "HTTP 404"}]
+    )
+    matches = services.image_match.find_matches(session, item=session.get(models.ScrapedItem, 1), max_distance=8)
+    assert [(m["item"].id, m["distance"]) for m in matches] == [(5, 0), (2, 5)]
+
+
+def test_cluster(session, artworks):
+    """测试批量聚类按传递性合并匹配的数据项，簇ID为最小的数据项ID"""
+    result = services.image_match.cluster(session, tenant_id="test_tenant", max_distance=8)
+
+    assert result == {"hashes": 4, "clusters": 1, "clustered_items": 3}
+    clusters = {h.scraped_item_id: h.cluster_id for h in session.query(models.ImageHash)}
+    assert clusters == {1: 1, 2: 1, 3: None, 4: 1}
+    cluster = services.image_match.get_cluster(session, tenant_id="test_tenant", cluster_id=1)
+    assert [item.id for item in cluster] == [1, 2, 4]
+
+    # 阈值变小后簇被拆开
+    services.image_match.cluster(session, tenant_id="test_tenant", max_distance=4)
+    assert {h.cluster_id for h in session.query(models.ImageHash)} == {None}
+
+
+def test_rewrite_keeps_unchanged_hashes(session, artworks):
+    """测试再次写入数据项时pHash不变的记录保留 cluster_id，变化和消失的图片被替换或删除"""
+    services.image_match.cluster(session, tenant_id="test_tenant", max_distance=8)
+    item = session.get(models.ScrapedItem, 2)
+    kept = session.query(models.ImageHash).filter_by(scraped_item_id=2).one()
+
+    services.image_match.set_item_hashes(session, item=item, images=[
+        {"url": "http://site2.example.com/a.jpg", "phash": imagehash.to_hex(artworks[2]), "dhash": "00" * 8},
+        {"url": "http://site2.example.com/b.jpg", "phash": imagehash.to_hex(artworks[3])},
+    ])
+    rows = session.query(models.ImageHash).filter_by(scraped_item_id=2).order_by(models.ImageHash.id).all()
+    assert [(row.id, row.cluster_id, row.dhash) for row in rows] == [(kept.id, 1, "00" * 8), (rows[1].id, None, None)]
+
+    services.image_match.set_item_hashes(session, item=item, images=[
+        {"url": "http://site2.example.com/b.jpg", "phash": imagehash.to_hex(artworks[1])},
+    ])
+    rows = session.query(models.ImageHash).filter_by(scraped_item_id=2).all()
+    assert [(row.image_url, row.phash) for row in rows] == [
+        ("http://site2.example.com/b.jpg", imagehash.to_hex(artworks[1]))
+    ]
+
+
+def test_index_rebuilt_periodically(session, artworks, monkeypatch):
+    """测试缓存的索引超过重建间隔后重建，丢弃已删除的记录"""
+    assert len(services.image_match.get_index(session, tenant_id="test_tenant")) == 4
+    services.image_match.set_item_hashes(session, item=session.get(models.ScrapedItem, 3), images=[])
+    assert len(services.image_match.get_index(session, tenant_id="test_tenant")) == 4
+
+    monkeypatch.setattr(services.image_match.settings, "IMAGE_MATCH_INDEX_REBUILD_INTERVAL", 0)
+    assert len(services.image_match.get_index(session, tenant_id="test_tenant")) == 3
+
+
+def test_database_pipeline_saves_hashes(session):
+    """测试数据库Pipeline写入数据项时保存图片哈希，再次写入时替换"""
+    pipeline = DatabasePipeline()
+    pipeline.job_id, pipeline.site_config_id, pipeline.tenant_id = 1, 1, "test_tenant"
+    item = {
+        "url": "http://example.com/artwork/1",
+        "page_type": "artwork",
+        "images": [
+            {"url": "http://example.com/a.jpg", "sha256": "ab" * 32, "phash": "0f" * 8, "dhash": "f0" * 8},
+            {"url": "http://example.com/b.jpg", "error": "HTTP 404"},
+        ],
+    }
+    pipeline._item_operation(item)(session)
+    item["images"][0]["phash"] = "ff" * 8
+    db_obj = pipeline._item_operation(item)(session)
+    session.commit()
+
+    hashes = session.query(models.ImageHash).all()
+    assert [(h.scraped_item_id, h.phash, h.image_url) for h in hashes] == [
+        (db_obj.id, "ff" * 8, "http://example.com/a.jpg")
+    ]
+
+
+def test_matches_endpoint(session, artworks):
+    """测试通过API查询匹配的作品和所在的簇"""
+    user = models.User(
+        email="test@example.com", username="testuser", hashed_password="hashed_password", tenant_id="test_tenant"
+    )
+    session.add(user)
+    session.commit()
+    services.image_match.cluster(session, tenant_id="test_tenant", max_distance=8)
+
+    app = FastAPI()
+    app.include_router(scraped_items.router)
+    app.dependency_overrides[get_db] = lambda: session
+    app.dependency_overrides[deps.get_current_active_user] = lambda: user
+    client = TestClient(app)
+
+    response = client.get("/scraped-items/2/matches", params={"max_distance": 8})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["cluster_id"] == 1
+    assert [(m["item"]["id"], m["distance"]) for m in body["matches"]] == [(1, 5), (4, 5)]
+
+    response = client.get("/scraped-items/clusters/1")
+    assert [item["id"] for item in response.json()] == [1, 2, 4]
+    assert client.get("/scraped-items/clusters/3").status_code == 404
+
+    user.tenant_id = "other_tenant"
+    assert client.get("/scraped-items/2/matches").status_code == 403
@@ -0,0 +1,250 @@
+"""
+图片Pipeline测试
+"""
+import asyncio
+import io
+import json
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from PIL import Image
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.test import get_crawler
+
+from app.scrapers import images
+from app.scrapers.pipelines import ImagePipeline
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+CRAWL_SCRIPT = textwrap.dedent("""
+    import json
+    import sys
+
+    import scrapy
+    from scrapy.crawler import CrawlerProcess
+
+    SERVER = sys.argv[1]
+    ITEMS = []
+
+
+    class ImageSpider(scrapy.Spider):
+        name = "images"
+        start_urls = ["data:,"]
+
+        def parse(self, response):
+            # 相对URL按数据项的url解析；a.png和b.png内容相同
+            yield {"url": SERVER + "/artists/1", "image_url": "/a.png"}
+            yield {"url": SERVER + "/artists/2", "image_url": SERVER + "/b.png"}
+            yield {"image_urls": [SERVER + "/c.jpg", SERVER + "/broken.png", SERVER + "/missing.png"]}
+            for i in range(6):
+                yield {"image_url": SERVER + f"/slow/{i}.png"}
+            yield {"title": "no image"}
+
+
+    def collect(item):
+        ITEMS.append(item)
+
+
+    # 生成缩略图的进程池使用spawn，子进程会导入主模块
+    if __name__ == "__main__":
+        process = CrawlerProcess({
+            "ITEM_PIPELINES": {"app.scrapers.pipelines.ImagePipeline": 250},
+            "IMAGES_ENABLED": True,
+            "IMAGES_STORE": sys.argv[2],
+            "IMAGES_THUMBS": {"small": 32, "medium": 64},
+            "IMAGES_MAX_PER_DOMAIN": 2,
+            "IMAGES_THUMBNAIL_WORKERS": 1,
+            "LOG_LEVEL": "ERROR",
+        })
+        crawler = process.create_crawler(ImageSpider)
+        crawler.signals.connect(collect, signal=scrapy.signals.item_scraped)
+        process.crawl(crawler)
+        process.start()
+        stats = crawler.stats.get_stats()
+        print(json.dumps({
+            "items": ITEMS,
+            "stats": {key: value for key, value in stats.items() if key.startswith("images/")},
+        }))
+""")
+
+
+def _image_bytes(size=(200, 100), color=(200, 30, 30), fmt="PNG") -> bytes:
+    """生成图片内容"""
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, fmt)
+    return buffer.getvalue()
+
+
+class _ImageHandler(BaseHTTPRequestHandler):
+    """提供图片的处理器，记录 /slow/ 下同时进行的最大请求数"""
+
+    red = _image_bytes()
+    blue = _image_bytes((120, 240), (30, 30, 200), "JPEG")
+    lock = threading.Lock()
+    active = 0
+    max_active = 0
+
+    def do_GET(self):
+        if self.path in ("/a.png", "/b.png"):
+            self._send(self.red, "image/png")
+        elif self.path == "/c.jpg":
+            self._send(self.blue, "image/jpeg")
+        elif self.path == "/broken.png":
+            self._send(b"not an image", "image/png")
+        elif self.path.startswith("/slow/"):
+            cls = type(self)
+            with cls.lock:
+                cls.active += 1
+                cls.max_active = max(cls.max_active, cls.active)
+            time.sleep(0.2)
+            with cls.lock:
+                cls.active -= 1
+            self._send(_image_bytes(color=(int(self.path[6]), 0, 0)), "image/png")
+        else:
+            self.send_error(404)
+
+    def _send(self, body: bytes, content_type: str):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def image_server():
+    """本地图片服务器"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ImageHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _crawl(tmp_path, server: str, store: str) -> dict:
+    """在子进程中运行爬取，返回数据项和图片统计"""
+    script = tmp_path / "crawl.py"
+    script.write_text(CRAWL_SCRIPT, encoding="utf-8")
+    result = subprocess.run(
+        [sys.executable, str(script), server, store],
+        cwd=tmp_path,
+        env=dict(os.environ, PYTHONPATH=PROJECT_DIR),
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_process_image_thumbnails():
+    """测试读取图片尺寸并按最长边生成JPEG缩略图"""
+    processed = images.process_image(_image_bytes((800, 400)), {"small": 128, "large": 1000})
+
+    assert (processed["format"], processed["content_type"]) == ("PNG", "image/png")
+    assert (processed["width"], processed["height"]) == (800, 400)
+    assert len(processed["phash"]) == len(processed["dhash"]) == 16
+    small = Image.open(io.BytesIO(processed["thumbnails"]["small"]))
+    assert small.format == "JPEG" and small.size == (128, 64)
+    # 不放大小于缩略图尺寸的图片
+    assert Image.open(io.BytesIO(processed["thumbnails"]["large"])).size == (800, 400)
+
+
+def test_local_store_content_addressed(tmp_path):
+    """测试原图、缩略图和图片信息按内容哈希存储，写入后可读取图片信息"""
+    store = images.get_store(f"file://{tmp_path}")
+    data = _image_bytes()
+    checksum = "ab" * 32
+    assert images.load_manifest(store, checksum) is None
+
+    manifest = images.save_image(store, checksum, data, images.process_image(data, {"small": 32}))
+
+    assert manifest["path"] == f"full/ab/ab/{checksum}.png"
+    assert manifest["thumbnails"] == {"small": f"thumbs/small/ab/ab/{checksum}.jpg"}
+    assert store.get(manifest["path"]) == data
+    assert images.load_manifest(store, checksum) == manifest
+    assert not [name for _, _, files in os.walk(tmp_path) for name in files if name.startswith(".tmp-")]
+
+
+def test_get_store():
+    """测试根据URI选择存储"""
+    store = images.get_store("s3://artworks/images/")
+    assert isinstance(store, images.S3ImageStore)
+    assert (store.bucket, store.prefix) == ("artworks", "images/")
+    assert isinstance(images.get_store("/tmp/images"), images.LocalImageStore)
+
+
+def test_image_pipeline_disabled():
+    """测试关闭后Pipeline不加载"""
+    with pytest.raises(NotConfigured):
+        ImagePipeline.from_crawler(get_crawler(settings_dict={"IMAGES_ENABLED": False}))
+
+
+def test_only_in_flight_images_are_kept(tmp_path):
+    """测试同时下载到的相同图片共用一次存储，存储结束后不再保留在内存中"""
+    pipeline = ImagePipeline(
+        get_crawler(), images.LocalImageStore(str(tmp_path)), url_fields=[], thumbs={}
+    )
+    saves = []
+
+    async def save(checksum, data):
+        saves.append(checksum)
+        await asyncio.sleep(0.01)
+        return {"sha256": checksum}
+
+    pipeline._save = save
+
+    async def run():
+        first, second = await asyncio.gather(pipeline._store(b"image"), pipeline._store(b"image"))
+        assert first == second
+        assert pipeline.in_flight == {}
+        await pipeline._store(b"image")
+
+    asyncio.run(run())
+    assert len(saves) == 2
+    assert pipeline.stats.get_value("images/duplicate") == 1
+
+
+def test_images_downloaded_and_deduplicated(tmp_path, image_server):
+    """测试下载数据项中的图片，相同内容只存储一次，再次爬取时不重复存储"""
+    store = tmp_path / "store"
+    result = _crawl(tmp_path, image_server, str(store))
+
+    items = {item.get("url", item.get("image_url") or item.get("title")): item for item in result["items"]}
+    first = items[f"{image_server}/artists/1"]["images"]
+    second = items[f"{image_server}/artists/2"]["images"]
+    assert first[0]["url"] == f"{image_server}/a.png"
+    assert first[0]["sha256"] == second[0]["sha256"]
+    assert (first[0]["width"], first[0]["height"]) == (200, 100)
+    assert set(first[0]["thumbnails"]) == {"small", "medium"}
+
+    jpeg, broken, missing = [i for i in result["items"] if "image_urls" in i][0]["images"]
+    assert jpeg["path"].endswith(".jpg") and jpeg["format"] == "JPEG"
+    assert "error" in broken and "error" in missing
+    assert "images" not in items["no image"]
+    # 每个域名同时下载的图片数受限制
+    assert _ImageHandler.max_active <= 2
+
+    assert result["stats"]["images/stored"] == 8
+    assert result["stats"]["images/duplicate"] == 1
+    assert result["stats"]["images/failed"] == 2
+    originals = [name for _, _, files in os.walk(store / "full") for name in files]
+    assert len(originals) == 8
+
+    # 再次爬取：所有图片都已存储
+    again = _crawl(tmp_path, image_server, str(store))
+    assert "images/stored" not in again["stats"]
+    assert again["stats"]["images/duplicate"] == 9
+    assert [name for _, _, files in os.walk(store / "full") for name in files] == originals
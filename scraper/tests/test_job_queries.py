@@ -0,0 +1,129 @@
+"""
+任务接口SQL语句数测试
+
+每个请求发出的SQL语句数应与返回的任务数量无关，防止N+1查询回归
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import models
+from app.api import deps
+from app.api.routes import jobs
+from app.db.base import Base
+from app.db.database import get_db
+
+JOB_COUNT = 20
+
+
+@pytest.fixture
+def engine():
+    """创建测试数据库引擎"""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    try:
+        yield engine
+    finally:
+        Base.metadata.drop_all(engine)
+
+
+@pytest.fixture
+def client(engine):
+    """创建带有测试数据的客户端，每个任务对应一个独立的站点配置"""
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    user = models.User(
+        email="test@example.com",
+        username="testuser",
+        hashed_password="hashed_password",
+        tenant_id="test_tenant",
+    )
+    session.add(user)
+    for i in range(JOB_COUNT):
+        site_config = models.SiteConfig(
+            name=f"Site {i}", url=f"https://site{i}.example.com", config={}, tenant_id="test_tenant"
+        )
+        session.add(site_config)
+        session.flush()
+        session.add(models.Job(
+            name=f"Job {i}", site_config_id=site_config.id, config={}, tenant_id="test_tenant"
+        ))
+    session.commit()
+    session.refresh(user)
+    session.expunge_all()
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(jobs.router)
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[deps.get_current_active_user] = lambda: user
+
+    try:
+        yield TestClient(app)
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def statements(engine):
+    """记录执行的SELECT语句"""
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append(statement)
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        yield captured
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+
+def test_list_jobs_loads_site_configs_in_one_query(client, statements):
+    """测试任务列表通过一次批量查询加载站点配置"""
+    response = client.get("/jobs")
+
+    assert response.status_code == 200
+    assert len(response.json()) == JOB_COUNT
+    assert all(job["site_config"] is not None for job in response.json())
+    # 任务查询 + 站点配置的 IN 查询
+    assert len(statements) == 2
+
+
+def test_list_jobs_with_fields_skips_site_config(client, statements):
+    """测试指定fields时不加载站点配置"""
+    response = client.get("/jobs", params={"fields": "name,status"})
+
+    assert response.status_code == 200
+    assert response.json()[0].keys() == {"id", "name", "status"}
+    assert len(statements) == 1
+
+
+def test_list_jobs_with_unknown_field(client):
+    """测试未知字段返回400"""
+    response = client.get("/jobs", params={"fields": "name,secret"})
+
+    assert response.status_code == 400
+
+
+def test_read_job_single_query(client, statements):
+    """测试读取单个任务时站点配置随任务一并加载"""
+    response = client.get("/jobs/1")
+
+    assert response.status_code == 200
+    assert response.json()["site_config"]["name"] == "Site 0"
+    assert len(statements) == 1
@@ -0,0 +1,113 @@
+"""
+内存监控测试
+"""
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.test import get_crawler
+
+from app.scrapers import profiling
+from app.scrapers.extensions import MemoryWatch
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# 每个页面的回调泄漏约4MB，内存超过开始时200MB后应被关闭；创建爬虫时加载组件也会占用
+# 几十MB，上限留出余量，保证爬虫开始后先越过两个增长阈值
+CRAWL_SCRIPT = textwrap.dedent("""
+    import json
+
+    import scrapy
+    from scrapy.crawler import CrawlerProcess
+
+    from app.scrapers import profiling
+
+    LEAKED = []
+
+
+    def leak():
+        LEAKED.append(b"x" * 4 * 1048576)
+
+
+    class LeakingSpider(scrapy.Spider):
+        name = "leaking"
+        start_urls = ["data:,page-0"]
+
+        def parse(self, response):
+            page = int(response.text.split("-")[1])
+            leak()
+            if page < 500:
+                yield scrapy.Request(f"data:,page-{page + 1}")
+
+
+    HARD_LIMIT_MB = profiling.current_rss_bytes() / 1048576 + 200
+    process = CrawlerProcess({
+        "EXTENSIONS": {"app.scrapers.extensions.MemoryWatch": 500},
+        "MEMWATCH_ENABLED": True,
+        "MEMWATCH_INTERVAL": 0.05,
+        "MEMWATCH_GROWTH_THRESHOLDS_MB": [5, 15],
+        "MEMWATCH_TRACEMALLOC": True,
+        "MEMWATCH_TOP_N": 5,
+        "MEMWATCH_TRACEMALLOC_FRAMES": 25,
+        "MEMWATCH_HARD_LIMIT_MB": HARD_LIMIT_MB,
+        "DOWNLOAD_DELAY": 0.02,
+        "LOG_LEVEL": "WARNING",
+    })
+    crawler = process.create_crawler(LeakingSpider)
+    process.crawl(crawler, job_id=5)
+    process.start()
+    stats = crawler.stats.get_stats()
+    print(json.dumps({
+        "finish_reason": stats["finish_reason"],
+        "pages": stats.get("response_received_count"),
+        "hard_limit_mb": HARD_LIMIT_MB,
+        **{key: value for key, value in stats.items() if key.startswith("memory/")},
+    }))
+""")
+
+
+@pytest.mark.skipif(profiling.current_rss_bytes() is None, reason="需要 /proc/self/statm")
+def test_memory_growth_recorded_and_spider_closed(tmp_path):
+    """测试内存增长越过阈值时记录带调用栈的快照，超过上限时关闭爬虫"""
+    script = tmp_path / "crawl.py"
+    script.write_text(CRAWL_SCRIPT, encoding="utf-8")
+    profiles = tmp_path / "profiles"
+    result = subprocess.run(
+        [sys.executable, str(script)],
+        cwd=tmp_path,
+        env=dict(os.environ, PYTHONPATH=PROJECT_DIR, CRAWL_PROFILE_DIR=str(profiles)),
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+
+    stats = json.loads(result.stdout.strip().splitlines()[-1])
+    assert stats["finish_reason"] == "memory_limit"
+    assert stats["pages"] < 500
+    assert stats["memory/rss_max_mb"] >= stats["hard_limit_mb"] - 0.1
+    # 每越过一个阈值记录一次，超过上限时再记录一次
+    assert 2 <= stats["memory/snapshots"] <= 3
+
+    files = os.listdir(profiles / "job_5")
+    assert len(files) == 1 and files[0].endswith(profiling.MEMORY_SUFFIX)
+    with open(profiles / "job_5" / files[0], encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) == stats["memory/snapshots"]
+    assert [record["reason"] for record in records][-1] == "hard_limit"
+    assert records[0]["growth_mb"] >= 5
+    for record in records:
+        assert len(record["top"]) == 5
+        # 泄漏的分配在增长最多的几处之中，不要求排在第一（Scrapy内部的分配可能在某次快照中更多）
+        leaks = [top for top in record["top"] if "LEAKED.append" in "\n".join(top["traceback"])]
+        assert leaks and leaks[0]["size_diff_kb"] > 0
+
+
+def test_memory_watch_disabled():
+    """测试关闭后扩展不加载"""
+    with pytest.raises(NotConfigured):
+        MemoryWatch.from_crawler(get_crawler(settings_dict={"MEMWATCH_ENABLED": False}))
@@ -0,0 +1,134 @@
+"""
+Prometheus指标测试
+"""
+import json
+import os
+import socket
+import subprocess
+import sys
+import textwrap
+from urllib.parse import urlparse
+from urllib.request import urlopen
+
+import pytest
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.test import get_crawler
+
+from app.scrapers.extensions import CrawlMetrics
+from benchmarks.synthetic_site import SiteSize, SyntheticSiteServer
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# 爬取合成网站的艺术家列表和详情页，数据项经由DatabasePipeline写入数据库
+CRAWL_SCRIPT = textwrap.dedent("""
+    import json
+    import sys
+    from types import SimpleNamespace
+
+    import scrapy
+    from scrapy.crawler import CrawlerProcess
+
+    from app import models
+    from app.db.base import Base
+    from app.db.database import SessionLocal, engine
+
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    db.add(models.SiteConfig(id=1, name="site", url=sys.argv[1], tenant_id="test_tenant"))
+    db.add(models.Job(id=7, name="job", site_config_id=1, tenant_id="test_tenant", status="running"))
+    db.commit()
+    db.close()
+
+
+    class ArtistSpider(scrapy.Spider):
+        name = "artists"
+        site_config = SimpleNamespace(id=1, tenant_id="test_tenant")
+
+        async def start(self):
+            yield scrapy.Request(sys.argv[1].rstrip("/") + "/artists?page=1")
+
+        def parse(self, response):
+            for href in response.css("a.detail::attr(href)").getall():
+                yield response.follow(href, self.parse_artist)
+
+        def parse_artist(self, response):
+            yield {"url": response.url, "page_type": "artist", "name": response.css("h1::text").get()}
+
+
+    process = CrawlerProcess({
+        "EXTENSIONS": {"app.scrapers.extensions.CrawlMetrics": 500},
+        "ITEM_PIPELINES": {"app.scrapers.pipelines.DatabasePipeline": 400},
+        "METRICS_QUEUE_INTERVAL": 0.1,
+        "LOG_LEVEL": "ERROR",
+    })
+    crawler = process.create_crawler(ArtistSpider)
+    process.crawl(crawler, job_id=7)
+    process.start()
+    print(json.dumps({"items": crawler.stats.get_value("item_scraped_count")}))
+""")
+
+
+def _free_port() -> int:
+    """获取空闲端口"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _sample(text: str, name: str, **labels) -> float:
+    """从Prometheus文本格式中读取一个样本的值"""
+    for line in text.splitlines():
+        if not line.startswith(name + "{"):
+            continue
+        if all(f'{key}="{value}"' in line for key, value in labels.items()):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"缺少指标 {name} {labels}")
+
+
+def test_crawl_metrics_exported_by_worker(tmp_path, monkeypatch):
+    """测试爬取子进程记录的指标由worker的 /metrics 汇总导出"""
+    from app.core import metrics
+
+    metrics_dir = tmp_path / "metrics"
+    metrics_dir.mkdir()
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(metrics_dir))
+    port = _free_port()
+    metrics.start_server(port)
+
+    env = dict(
+        os.environ,
+        PYTHONPATH=PROJECT_DIR,
+        DATABASE_URL=f"sqlite:///{tmp_path / 'metrics.db'}",
+        METRICS_ENABLED="true",
+        METRICS_DIR=str(metrics_dir),
+    )
+    script = tmp_path / "crawl.py"
+    script.write_text(CRAWL_SCRIPT, encoding="utf-8")
+    with SyntheticSiteServer(SiteSize(artists=5, artworks=0, exhibitions=0)) as server:
+        result = subprocess.run(
+            [sys.executable, str(script), server.url],
+            cwd=tmp_path,
+            env=env,
+            capture_output=True,
+            text=True,
+            timeout=120,
+        )
+        domain = urlparse(server.url).netloc
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout.strip().splitlines()[-1])["items"] == 5
+
+    text = urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5).read().decode()
+
+    assert _sample(text, "aida_crawl_requests_total", job_id="7", domain=domain) == 6
+    assert _sample(text, "aida_crawl_responses_total", job_id="7", domain=domain, status="200") == 6
+    assert _sample(text, "aida_crawl_response_bytes_total", job_id="7", domain=domain) > 0
+    assert _sample(text, "aida_crawl_download_latency_seconds_count", job_id="7", domain=domain) == 6
+    assert _sample(text, "aida_crawl_items_total", job_id="7", page_type="artist", outcome="scraped") == 5
+    assert _sample(text, "aida_crawl_pipeline_latency_seconds_count", job_id="7", pipeline="database") == 5
+    assert "aida_crawl_scheduler_queue_depth" in text
+
+
+def test_metrics_disabled_by_default():
+    """测试未启用指标时扩展不加载"""
+    with pytest.raises(NotConfigured):
+        CrawlMetrics.from_crawler(get_crawler())
@@ -0,0 +1,154 @@
+"""
+数据项规范化测试
+"""
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import models, services
+from app.db.base import Base
+from app.utils import normalize
+
+
+@pytest.fixture
+def session():
+    """创建测试数据库会话"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    try:
+        yield db
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def _create(db, data, page_type="artwork", job_id=1, tenant_id="test_tenant", **kwargs):
+    """创建数据项"""
+    return services.scraped_item.create(
+        db,
+        url=f"http://example.com/{page_type}/{len(db.query(models.ScrapedItem).all())}",
+        page_type=page_type,
+        data=data,
+        job_id=job_id,
+        site_config_id=1,
+        tenant_id=tenant_id,
+        **kwargs,
+    )
+
+
+def test_years():
+    """测试年份、年份范围、年代、年代范围和世纪"""
+    assert normalize.years([
+        "1889", "c. 1905–10", "1880s", "1920s-1930s", "1920s–30s", "19th century", "19世纪", "1853 - 1890", 1920,
+        "undated", None, {"a": 1},
+    ]) == [
+        (1889, 1889), (1905, 1910), (1880, 1889), (1920, 1939), (1920, 1939), (1801, 1900), (1801, 1900),
+        (1853, 1890), (1920, 1920), (None, None), (None, None), (None, None),
+    ]
+
+
+def test_date_ranges():
+    """测试展览日期范围，结束日期缺少的年份和月份从另一端补全"""
+    assert normalize.date_ranges([
+        "2024-03-01 - 2024-04-20",
+        "March 3 – April 20, 2024",
+        "3 March - 20 April 2024",
+        "2024年3月1日至4月20日",
+        "May 5–18, 2023",
+        "on view",
+    ]) == [
+        (date(2024, 3, 1), date(2024, 4, 20)),
+        (date(2024, 3, 3), date(2024, 4, 20)),
+        (date(2024, 3, 3), date(2024, 4, 20)),
+        (date(2024, 3, 1), date(2024, 4, 20)),
+        (date(2023, 5, 5), date(2023, 5, 18)),
+        (None, None),
+    ]
+
+
+def test_dimensions():
+    """测试尺寸换算为厘米，各项按自己的单位换算"""
+    assert normalize.dimensions([
+        "100 x 80 cm", "40 x 30 in", "24 W x 36 H x 1 D in", "100 × 80 × 5", "1.2 x 0.8 m", "60x50厘米", "large",
+        "12 in x 3 ft", "50 cm x 20 x 2 in",
+    ]) == [
+        (100.0, 80.0, None), (101.6, 76.2, None), (91.44, 60.96, 2.54), (100.0, 80.0, 5.0), (120.0, 80.0, None),
+        (60.0, 50.0, None), (None, None, None), (30.48, 91.44, None), (50.0, 50.8, 5.08),
+    ]
+
+
+def test_prices():
+    """测试价格和币种，没有币种时只接受纯数字"""
+    assert normalize.prices(
+        ["$1,200", "€ 3.500,00", "USD 5,000", "1200", "¥8000", "£2,400 - £3,000", "Price on request"]
+    ) == [
+        (1200.0, "USD"), (3500.0, "EUR"), (5000.0, "USD"), (1200.0, None), (8000.0, "CNY"), (2400.0, "GBP"),
+        (None, None),
+    ]
+
+
+def test_strip_html():
+    """测试去除HTML标签、脚本和实体"""
+    assert normalize.strip_html(["<p>Hello&nbsp;<b>world</b></p><p>Two</p>", "<script>x()</script>plain", ""]) == [
+        "Hello world\nTwo", "plain", None,
+    ]
+
+
+def test_column_parses_each_value_once():
+    """测试一列中重复的值只解析一次"""
+    calls = []
+    parse = normalize.years.parse
+    decorated = normalize._column((None, None))(lambda value: calls.append(value) or parse(value))
+
+    assert decorated(["1889", "1889", "1900", "1889"]) == [(1889, 1889), (1889, 1889), (1900, 1900), (1889, 1889)]
+    assert calls == ["1889", "1900"]
+
+
+def test_normalize_pending(session):
+    """测试批量写入规范化字段，只处理新的和更新过的数据项"""
+    artwork = _create(
+        session,
+        {"year": "c. 1905–10", "dimensions": "100 x 80 cm", "price": "$1,200", "description": "<p>Oil</p>"},
+    )
+    artist = _create(session, {"birth_year": "1853", "death_year": "1890", "biography": "<b>Dutch</b>"}, "artist")
+    exhibition = _create(session, {"date_range": "March 3 – April 20, 2024"}, "exhibition", job_id=2)
+    _create(session, {"year": "1920"}, tenant_id="other_tenant")
+
+    assert services.normalization.normalize_pending(session, tenant_id="test_tenant", batch_size=2) == 3
+    rows = {row.scraped_item_id: row for row in session.query(models.NormalizedItem)}
+    assert set(rows) == {artwork.id, artist.id, exhibition.id}
+    row = rows[artwork.id]
+    assert (row.year_start, row.year_end, row.height_cm, row.width_cm) == (1905, 1910, 100.0, 80.0)
+    assert (row.price_amount, row.price_currency, row.text) == (1200.0, "USD", "Oil")
+    assert (rows[artist.id].birth_year, rows[artist.id].death_year, rows[artist.id].text) == (1853, 1890, "Dutch")
+    assert (rows[exhibition.id].date_start, rows[exhibition.id].date_end) == (date(2024, 3, 3), date(2024, 4, 20))
+
+    # 没有变化时不再处理
+    assert services.normalization.normalize_pending(session, tenant_id="test_tenant") == 0
+
+    # 数据项更新后重新解析
+    session.execute(
+        update(models.ScrapedItem)
+        .where(models.ScrapedItem.id == artwork.id)
+        .values(data={"year": "1880s"}, updated_at=datetime(2100, 1, 1))
+    )
+    session.commit()
+    assert services.normalization.normalize_pending(session, job_id=1, tenant_id="test_tenant") == 1
+    row = session.get(models.NormalizedItem, artwork.id)
+    assert (row.year_start, row.year_end, row.height_cm, row.price_amount) == (1880, 1889, None, None)
+    assert session.query(models.NormalizedItem).count() == 3
+
+
+def test_deleting_item_removes_normalized_row(session):
+    """测试删除数据项时同时删除规范化字段"""
+    item = _create(session, {"year": "1889"})
+    services.normalization.normalize_pending(session)
+
+    session.delete(session.get(models.ScrapedItem, item.id))
+    session.commit()
+    assert session.query(models.NormalizedItem).count() == 0
@@ -0,0 +1,93 @@
+"""
+数据库Pipeline测试
+
+在子进程中运行一次不访问网络的爬取（data: URI），避免在测试进程中安装reactor
+"""
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+CRAWL_SCRIPT = textwrap.dedent("""
+    import json
+    import sys
+    from types import SimpleNamespace
+
+    import scrapy
+    from scrapy.crawler import CrawlerProcess
+
+    from app import models
+    from app.db.base import Base
+    from app.db.database import SessionLocal, engine
+
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    db.add(models.Job(id=1, name="job", site_config_id=1, tenant_id="test_tenant"))
+    db.commit()
+    db.close()
+
+
+    class ItemSpider(scrapy.Spider):
+        name = "items"
+        start_urls = ["data:,ok"]
+
+        def parse(self, response):
+            for i in range(int(sys.argv[1])):
+                yield {"url": f"https://example.com/{i}", "page_type": "artwork", "title": f"Artwork {i}"}
+
+
+    process = CrawlerProcess({
+        "ITEM_PIPELINES": {"app.scrapers.pipelines.DatabasePipeline": 400},
+        "DB_PIPELINE_MAX_IN_FLIGHT": 4,
+        "LOG_LEVEL": "ERROR",
+    })
+    crawler = process.create_crawler(ItemSpider)
+    process.crawl(
+        crawler,
+        job_id=1,
+        site_config=SimpleNamespace(id=1, tenant_id="test_tenant"),
+    )
+    process.start()
+
+    db = SessionLocal()
+    job = db.get(models.Job, 1)
+    print(json.dumps({
+        "items": db.query(models.ScrapedItem).count(),
+        "items_saved": job.items_saved,
+        "stats": {k: v for k, v in crawler.stats.get_stats().items() if k.startswith("database/")},
+    }))
+""")
+
+
+@pytest.mark.parametrize("single_writer", ["true", "false"])
+def test_database_pipeline_writes_off_reactor(tmp_path, single_writer):
+    """测试数据项全部写入数据库，并记录进行中写操作数和写入耗时统计"""
+    env = dict(
+        os.environ,
+        PYTHONPATH=PROJECT_DIR,
+        DATABASE_URL=f"sqlite:///{tmp_path / 'pipeline.db'}",
+        SQLITE_SINGLE_WRITER=single_writer,
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", CRAWL_SCRIPT, "50"],
+        cwd=tmp_path,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+
+    output = json.loads(result.stdout.strip().splitlines()[-1])
+    stats = output["stats"]
+    assert output["items"] == 50
+    assert output["items_saved"] == 50
+    assert stats["database/items_saved"] == 50
+    assert "database/items_failed" not in stats
+    assert 1 <= stats["database/in_flight_max"] <= 4
+    assert stats["database/write_latency_p50_ms"] <= stats["database/write_latency_p99_ms"]
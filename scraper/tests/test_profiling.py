@@ -0,0 +1,143 @@
+"""
+爬取性能分析测试
+"""
+import marshal
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import models, schemas, services
+from app.api import deps
+from app.api.routes import jobs
+from app.core.config import settings as app_settings
+from app.db.base import Base
+from app.db.database import get_db
+from app.scrapers import profiling
+
+
+def _busy_loop(seconds: float) -> int:
+    """占用CPU一段时间"""
+    deadline = time.perf_counter() + seconds
+    count = 0
+    while time.perf_counter() < deadline:
+        count += sum(range(100))
+    return count
+
+
+@pytest.fixture(autouse=True)
+def profile_dir(tmp_path, monkeypatch):
+    """分析结果写入临时目录"""
+    monkeypatch.setattr(app_settings, "CRAWL_PROFILE_DIR", str(tmp_path / "profiles"))
+    monkeypatch.setattr(app_settings, "PROFILE_SAMPLE_INTERVAL", 0.001)
+    return tmp_path / "profiles"
+
+
+@pytest.fixture
+def session():
+    """创建测试数据库会话"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    try:
+        yield db
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def test_profile_modes():
+    """测试 profile 选项的解析"""
+    assert profiling.profile_modes(None) == ()
+    assert profiling.profile_modes(False) == ()
+    assert profiling.profile_modes(True) == profiling.PROFILE_MODES
+    assert profiling.profile_modes("sampling") == ("sampling",)
+    assert profiling.profile_modes(["cprofile"]) == ("cprofile",)
+    assert profiling.profile_modes([]) == ()
+    with pytest.raises(ValueError):
+        profiling.profile_modes("perf")
+    for value in (1, 0, {"sampling": True}, ["sampling", 1], ("cprofile",)):
+        with pytest.raises(ValueError):
+            profiling.profile_modes(value)
+
+
+def test_run_profiled_writes_artifacts():
+    """测试两种分析器的结果写入任务目录，并可合并汇总"""
+    result = profiling.run_profiled(3, profiling.PROFILE_MODES, lambda: _busy_loop(0.3))
+
+    assert result > 0
+    summary = profiling.summarize(3)
+    assert summary["modes"] == ["cprofile", "sampling"]
+    assert "_busy_loop" in [row["function"] for row in summary["cprofile"]["functions"]]
+    assert summary["sampling"]["samples"] > 10
+    top = summary["sampling"]["functions"][0]
+    assert top["function"] in ("test_profiling.py:_busy_loop", "test_profiling.py:<genexpr>")
+
+    collapsed = profiling.load_collapsed(3)
+    assert "MainThread;" in collapsed
+    assert "test_profiling.py:_busy_loop" in collapsed
+    stats = marshal.loads(profiling.dump_pstats(profiling.load_pstats(3)))
+    assert any(function == "_busy_loop" for (_, _, function) in stats)
+
+    profiling.remove_profile(3)
+    assert profiling.summarize(3) is None
+
+
+def test_create_job_rejects_unknown_profile_mode(session):
+    """测试创建任务时校验性能分析选项的模式名和类型"""
+    for profile in ("perf", 1, {"sampling": True}):
+        with pytest.raises(ValueError):
+            services.job.create(
+                session,
+                obj_in=schemas.JobCreate(
+                    name="job", site_config_id=1, tenant_id="test_tenant", config={"profile": profile}
+                ),
+                user_id=1,
+            )
+
+
+def test_profile_endpoint(session):
+    """测试通过API读取分析结果，其他租户的任务不可读取"""
+    user = models.User(
+        email="test@example.com", username="testuser", hashed_password="hashed_password", tenant_id="test_tenant"
+    )
+    session.add(user)
+    session.add(models.Job(id=1, name="job", site_config_id=1, config={"profile": True}, tenant_id="test_tenant"))
+    session.add(models.Job(id=2, name="job", site_config_id=1, config={}, tenant_id="test_tenant"))
+    session.add(models.Job(id=3, name="job", site_config_id=1, config={}, tenant_id="other_tenant"))
+    session.commit()
+    profiling.run_profiled(1, profiling.PROFILE_MODES, lambda: _busy_loop(0.1))
+
+    app = FastAPI()
+    app.include_router(jobs.router)
+    app.dependency_overrides[get_db] = lambda: session
+    app.dependency_overrides[deps.get_current_active_user] = lambda: user
+    client = TestClient(app)
+
+    response = client.get("/jobs/1/profile", params={"limit": 5})
+    assert response.status_code == 200
+    assert len(response.json()["cprofile"]["functions"]) == 5
+
+    response = client.get("/jobs/1/profile", params={"format": "collapsed"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "_busy_loop" in response.text
+
+    response = client.get("/jobs/1/profile", params={"format": "pstats"})
+    assert response.status_code == 200
+    assert marshal.loads(response.content)
+
+    assert client.get("/jobs/1/profile", params={"format": "memory"}).status_code == 404
+    profiling.append_memory_record(1, {"timestamp": 2, "rss_mb": 300})
+    profiling.append_memory_record(1, {"timestamp": 1, "rss_mb": 200})
+    response = client.get("/jobs/1/profile", params={"format": "memory"})
+    assert [record["rss_mb"] for record in response.json()] == [200, 300]
+
+    assert client.get("/jobs/2/profile").status_code == 404
+    assert client.get("/jobs/3/profile").status_code == 403
+    assert client.get("/jobs/1/profile", params={"format": "svg"}).status_code == 422
@@ -0,0 +1,98 @@
+"""
+查询计划回归测试
+
+确认列表与日志查询命中复合索引，而不是退化为全表扫描或临时排序
+"""
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app import services
+from app.db.base import Base
+
+
+@pytest.fixture
+def db_session():
+    """创建测试数据库会话"""
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    session = Session()
+
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(engine)
+
+
+def explain(session, call):
+    """
+    执行查询并返回其最后一条SELECT语句的 EXPLAIN QUERY PLAN 结果
+
+    Args:
+        session: 数据库会话
+        call: 执行查询的函数
+
+    Returns:
+        str: 查询计划文本
+    """
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        call()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    statement, parameters = captured[-1]
+    rows = session.connection().exec_driver_sql(
+        f"EXPLAIN QUERY PLAN {statement}", parameters
+    ).fetchall()
+    return "\n".join(row[-1] for row in rows)
+
+
+def test_job_logs_use_job_timestamp_index(db_session):
+    """测试任务日志查询使用 (job_id, timestamp) 索引"""
+    plan = explain(db_session, lambda: services.job_log.get_multi(db_session, job_id=1))
+
+    assert "ix_job_logs_job_id_timestamp" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_scraped_items_use_tenant_created_index(db_session):
+    """测试数据项列表查询使用 (tenant_id, created_at, id) 索引"""
+    plan = explain(
+        db_session,
+        lambda: services.scraped_item.get_multi(db_session, tenant_id="test_tenant"),
+    )
+
+    assert "ix_scraped_items_tenant_id_created_at_id" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_scraped_items_by_job_use_tenant_job_index(db_session):
+    """测试按任务过滤的数据项查询使用 (tenant_id, job_id, created_at) 索引"""
+    plan = explain(
+        db_session,
+        lambda: services.scraped_item.get_multi(db_session, tenant_id="test_tenant", job_id=1),
+    )
+
+    assert "ix_scraped_items_tenant_id_job_id_created_at" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_jobs_use_tenant_created_index(db_session):
+    """测试任务列表查询使用 (tenant_id, created_at, id) 索引"""
+    plan = explain(
+        db_session,
+        lambda: services.job.get_multi(db_session, tenant_id="test_tenant"),
+    )
+
+    assert "ix_jobs_tenant_id_created_at_id" in plan
+    assert "TEMP B-TREE" not in plan
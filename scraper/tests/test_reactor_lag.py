@@ -0,0 +1,75 @@
+"""
+reactor延迟监控测试
+"""
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# 第3个页面的回调同步阻塞reactor 0.6秒
+CRAWL_SCRIPT = textwrap.dedent("""
+    import json
+    import time
+
+    import scrapy
+    from scrapy.crawler import CrawlerProcess
+
+
+    def block_reactor():
+        time.sleep(0.6)
+
+
+    class BlockingSpider(scrapy.Spider):
+        name = "blocking"
+        start_urls = ["data:,page-0"]
+
+        def parse(self, response):
+            page = int(response.text.split("-")[1])
+            if page == 3:
+                block_reactor()
+            if page < 10:
+                yield scrapy.Request(f"data:,page-{page + 1}")
+
+
+    process = CrawlerProcess({
+        "EXTENSIONS": {"app.scrapers.extensions.ReactorLagMonitor": 500},
+        "REACTOR_LAG_ENABLED": True,
+        "REACTOR_LAG_INTERVAL": 0.02,
+        "REACTOR_LAG_THRESHOLD": 0.3,
+        "DOWNLOAD_DELAY": 0.05,
+        "LOG_LEVEL": "WARNING",
+    })
+    crawler = process.create_crawler(BlockingSpider)
+    process.crawl(crawler)
+    process.start()
+    stats = crawler.stats.get_stats()
+    print(json.dumps({key: value for key, value in stats.items() if key.startswith("reactor/")}))
+""")
+
+
+def test_blocking_callback_is_reported(tmp_path):
+    """测试阻塞reactor的回调被记录调用栈，延迟分位数写入统计"""
+    script = tmp_path / "crawl.py"
+    script.write_text(CRAWL_SCRIPT, encoding="utf-8")
+    result = subprocess.run(
+        [sys.executable, str(script)],
+        cwd=tmp_path,
+        env=dict(os.environ, PYTHONPATH=PROJECT_DIR),
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+
+    stats = json.loads(result.stdout.strip().splitlines()[-1])
+    assert stats["reactor/stalls"] == 1
+    assert stats["reactor/lag_max_ms"] >= 500
+    assert stats["reactor/lag_p50_ms"] < 100
+    assert stats["reactor/lag_p99_ms"] <= stats["reactor/lag_max_ms"]
+    # 调用栈只记录一次，包含阻塞的函数
+    assert result.stderr.count("reactor已被阻塞") == 1
+    assert "in block_reactor" in result.stderr
+    assert "in parse" in result.stderr
@@ -0,0 +1,122 @@
+"""
+周期任务调度测试
+"""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import models, services
+from app.core.config import settings
+from app.db.base import Base
+from app.services.schedule import next_cron_time, next_run_time
+
+NOW = datetime(2026, 3, 2, 12, 0, 30)  # 星期一
+
+
+@pytest.fixture
+def db():
+    """创建内存数据库会话，包含一个HTTP站点配置"""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(models.SiteConfig(id=1, name="site", url="https://example.com", tenant_id="test_tenant"))
+    session.commit()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+@pytest.mark.parametrize("expression, expected", [
+    ("*/15 * * * *", datetime(2026, 3, 2, 12, 15)),
+    ("0 9 * * 1-5", datetime(2026, 3, 3, 9, 0)),
+    ("30 2 1 * *", datetime(2026, 4, 1, 2, 30)),
+    ("0 0 29 2 *", datetime(2028, 2, 29, 0, 0)),
+])
+def test_next_cron_time(expression, expected):
+    """测试cron表达式的下一次触发时间"""
+    assert next_cron_time(expression, NOW) == expected
+
+
+def test_invalid_schedule():
+    """测试无效的周期配置"""
+    with pytest.raises(ValueError):
+        next_run_time(1, "cron", "* * *", NOW)
+    with pytest.raises(ValueError):
+        next_run_time(1, "hourly", None, NOW)
+    assert next_run_time(1, "once", None, NOW) is None
+
+
+def test_jitter_spreads_jobs_within_window():
+    """测试同一时刻到期的任务在抖动窗口内错开，且不超出周期"""
+    midnight = datetime(2026, 3, 3)
+    times = [next_run_time(job_id, "daily", None, NOW) for job_id in range(1, 201)]
+
+    offsets = sorted((t - midnight).total_seconds() for t in times)
+    assert offsets[0] >= 0
+    assert offsets[-1] < settings.SCHEDULER_JITTER_WINDOW
+    # 200个任务分布在整个窗口内，没有大量集中在同一分钟
+    assert len({int(offset // 60) for offset in offsets}) > 50
+
+    every_minute = [next_run_time(job_id, "cron", "* * * * *", NOW) for job_id in range(1, 20)]
+    assert all(datetime(2026, 3, 2, 12, 1) <= t < datetime(2026, 3, 2, 12, 2) for t in every_minute)
+
+
+def test_enqueue_due_jobs(db):
+    """测试到期任务进入调度队列并推进运行时间，运行中的任务跳过本次运行"""
+    db.add_all([
+        models.Job(id=1, name="due", site_config_id=1, tenant_id="test_tenant",
+                   schedule_type="daily", status="completed", next_run_at=datetime(2026, 3, 2, 0, 10)),
+        models.Job(id=2, name="busy", site_config_id=1, tenant_id="test_tenant",
+                   schedule_type="daily", status="running", next_run_at=datetime(2026, 3, 2, 0, 20)),
+        models.Job(id=3, name="later", site_config_id=1, tenant_id="test_tenant",
+                   schedule_type="daily", status="completed", next_run_at=datetime(2026, 3, 3, 0, 10)),
+    ])
+    db.commit()
+
+    assert services.schedule.enqueue_due_jobs(db, now=NOW) == [1]
+
+    jobs = {job.id: job for job in db.query(models.Job)}
+    assert (jobs[1].status, jobs[1].queue) == ("queued", "http")
+    assert jobs[2].status == "running"
+    assert jobs[1].next_run_at.date() == jobs[2].next_run_at.date() == datetime(2026, 3, 3).date()
+    assert jobs[3].next_run_at == datetime(2026, 3, 3, 0, 10)
+
+
+def test_cancelled_job_is_not_rescheduled(db):
+    """测试取消的周期任务不再放入调度队列，重新启动后恢复周期运行"""
+    db.add_all([
+        models.Job(id=1, name="cancelled", site_config_id=1, tenant_id="test_tenant",
+                   schedule_type="daily", status="cancelled", next_run_at=datetime(2026, 3, 2, 0, 10)),
+        models.Job(id=2, name="daily", site_config_id=1, tenant_id="test_tenant",
+                   schedule_type="daily", status="completed", next_run_at=datetime(2026, 3, 3, 0, 10)),
+    ])
+    db.commit()
+
+    assert services.schedule.enqueue_due_jobs(db, now=NOW) == []
+    assert db.get(models.Job, 1).next_run_at is None
+
+    job = services.job.cancel_job(db, job_id=2)
+    assert job.next_run_at is None
+
+    job = services.job.start_job(db, job_id=2)
+    assert job.status == "queued"
+    assert job.next_run_at is not None
+
+
+def test_due_query_uses_index(db):
+    """测试到期查询使用 next_run_at 索引"""
+    assert "ix_jobs_next_run_at" in {index["name"] for index in inspect(db.get_bind()).get_indexes("jobs")}
+    plan = db.connection().exec_driver_sql(
+        "EXPLAIN QUERY PLAN SELECT id FROM jobs WHERE next_run_at <= ? ORDER BY next_run_at LIMIT 100",
+        (NOW,),
+    ).all()
+    assert any("ix_jobs_next_run_at" in row[-1] for row in plan)
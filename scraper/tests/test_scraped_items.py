@@ -0,0 +1,122 @@
+"""
+数据项接口测试
+
+列表接口默认不加载 content/data 大字段，详情接口返回完整数据
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import models
+from app.api import deps
+from app.api.routes import scraped_items
+from app.db.base import Base
+from app.db.database import get_db
+
+
+@pytest.fixture
+def engine():
+    """创建测试数据库引擎"""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    try:
+        yield engine
+    finally:
+        Base.metadata.drop_all(engine)
+
+
+@pytest.fixture
+def client(engine):
+    """创建带有测试数据的客户端"""
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    user = models.User(
+        email="test@example.com",
+        username="testuser",
+        hashed_password="hashed_password",
+        tenant_id="test_tenant",
+    )
+    session.add(user)
+    for i in range(5):
+        session.add(models.ScrapedItem(
+            url=f"https://example.com/artist/{i}",
+            page_type="artist",
+            title=f"Artist {i}",
+            content="biography " * 100,
+            data={"name": f"Artist {i}", "artworks": list(range(50))},
+            tenant_id="test_tenant",
+        ))
+    session.commit()
+    session.refresh(user)
+    session.expunge_all()
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(scraped_items.router)
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[deps.get_current_active_user] = lambda: user
+
+    try:
+        yield TestClient(app)
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def statements(engine):
+    """记录执行的SELECT语句"""
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append(statement)
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        yield captured
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+
+def test_list_items_skips_heavy_columns(client, statements):
+    """测试列表接口不查询 content 和 data 列"""
+    response = client.get("/scraped-items")
+
+    assert response.status_code == 200
+    assert len(response.json()) == 5
+    assert "data" not in response.json()[0]
+    assert len(statements) == 1
+    assert "scraped_items.data" not in statements[0]
+    assert "scraped_items.content" not in statements[0]
+
+
+def test_list_items_with_fields(client, statements):
+    """测试fields参数只查询并返回所选列"""
+    response = client.get("/scraped-items", params={"fields": "title,data"})
+
+    assert response.status_code == 200
+    assert response.json()[0].keys() == {"id", "title", "data"}
+    assert "scraped_items.data" in statements[0]
+    assert "scraped_items.content" not in statements[0]
+
+
+def test_read_item_returns_full_payload(client):
+    """测试详情接口返回完整数据"""
+    response = client.get("/scraped-items/1")
+
+    assert response.status_code == 200
+    assert response.json()["data"]["name"] == "Artist 0"
+    assert response.json()["content"].startswith("biography")
@@ -0,0 +1,100 @@
+"""
+任务分片测试
+"""
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import models, services
+from app.db.base import Base
+from app.scrapers.shards import plan_shards
+
+SITE_CONFIG = SimpleNamespace(
+    start_urls=["https://example.com/a", "https://example.com/b"],
+    config={"categories": {"油画": "https://example.com/oil", "雕塑": ["https://example.com/s1", "https://example.com/s2"]}},
+)
+
+
+@pytest.fixture
+def db():
+    """创建内存数据库会话"""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def test_no_shards_without_shard_by():
+    """测试未配置分片方式时不分片"""
+    assert plan_shards(SITE_CONFIG, {}) == []
+
+
+def test_shard_by_start_url():
+    """测试每个起始URL一个分片"""
+    shards = plan_shards(SITE_CONFIG, {"shard_by": "start_url"})
+
+    assert [shard["index"] for shard in shards] == [0, 1]
+    assert [shard["spider_kwargs"]["start_urls"] for shard in shards] == [
+        ["https://example.com/a"],
+        ["https://example.com/b"],
+    ]
+
+
+def test_shard_by_category():
+    """测试每个分类一个分片，任务配置的分类优先"""
+    shards = plan_shards(SITE_CONFIG, {"shard_by": "category"})
+    assert [shard["label"] for shard in shards] == ["油画", "雕塑"]
+    assert shards[1]["spider_kwargs"]["start_urls"] == ["https://example.com/s1", "https://example.com/s2"]
+
+    shards = plan_shards(SITE_CONFIG, {"shard_by": "category", "categories": {"版画": "https://example.com/p"}})
+    assert [shard["label"] for shard in shards] == ["版画"]
+
+
+def test_shard_by_page_range():
+    """测试按页码范围分片，分片内不跟随下一页"""
+    shards = plan_shards(SITE_CONFIG, {
+        "shard_by": "page_range",
+        "page_url": "https://example.com/list?page={page}",
+        "last_page": 25,
+        "pages_per_shard": 10,
+    })
+
+    assert len(shards) == 3
+    assert len(shards[0]["spider_kwargs"]["start_urls"]) == 10
+    assert shards[2]["spider_kwargs"]["start_urls"] == [
+        f"https://example.com/list?page={page}" for page in range(21, 26)
+    ]
+    assert all(shard["spider_kwargs"]["next_page_xpath"] == "" for shard in shards)
+
+
+def test_unknown_shard_mode():
+    """测试未知的分片方式"""
+    with pytest.raises(ValueError):
+        plan_shards(SITE_CONFIG, {"shard_by": "unknown"})
+
+
+def test_shard_counters_aggregate_on_job(db):
+    """测试各分片的计数累加到同一任务，进度按完成的分片计算"""
+    db.add(models.Job(id=1, name="job", site_config_id=1, tenant_id="test_tenant", shards_total=4))
+    db.commit()
+
+    services.job.increment_counters(db, job_id=1, items_scraped=5, items_saved=4, items_failed=1)
+    services.job.increment_counters(db, job_id=1, items_scraped=3, items_saved=3)
+    services.job.complete_shard(db, job_id=1)
+
+    job = db.get(models.Job, 1)
+    db.refresh(job)
+    assert (job.items_scraped, job.items_saved, job.items_failed) == (8, 7, 1)
+    assert job.shards_completed == 1
+    assert job.progress == 25
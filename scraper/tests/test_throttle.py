@@ -0,0 +1,191 @@
+"""
+按域名自适应限速测试
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+from scrapy import Spider
+from scrapy.http import Request, Response
+from scrapy.utils.test import get_crawler
+from twisted.internet import defer
+
+from app.scrapers import throttle
+from app.scrapers.throttle import (
+    DomainThrottleMiddleware,
+    MemoryTokenBucket,
+    ThrottlePolicy,
+    parse_retry_after,
+)
+
+
+class FakeClock:
+    """可手动推进的时钟"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def bucket(clock):
+    return MemoryTokenBucket(clock=clock)
+
+
+@pytest.fixture
+def middleware(bucket):
+    """创建使用进程内令牌桶的中间件"""
+    crawler = get_crawler(Spider, {"THROTTLE_ENABLED": True, "THROTTLE_START_RATE": 2.0})
+    crawler.stats.open_spider()
+    return DomainThrottleMiddleware(crawler, bucket)
+
+
+def test_bucket_allows_burst_then_waits(bucket, clock):
+    """测试令牌用完后按速率计算等待时间"""
+    policy = ThrottlePolicy(start_rate=2.0, burst=2)
+
+    assert bucket.acquire("example.com", policy) == 0
+    assert bucket.acquire("example.com", policy) == 0
+    assert bucket.acquire("example.com", policy) == pytest.approx(0.5)
+
+    clock.now += 0.5
+    assert bucket.acquire("example.com", policy) == 0
+    # 其他域名不受影响
+    assert bucket.acquire("other.com", policy) == 0
+
+
+def test_bucket_adjust_is_clamped(bucket):
+    """测试速率调整限制在最低和最高速率之间"""
+    policy = ThrottlePolicy(start_rate=1.0, min_rate=0.2, max_rate=3.0)
+
+    assert bucket.adjust("example.com", policy, factor=0.1) == pytest.approx(0.2)
+    assert bucket.adjust("example.com", policy, step=10) == pytest.approx(3.0)
+
+
+def test_bucket_block(bucket, clock):
+    """测试暂停期间取令牌返回剩余暂停时间"""
+    policy = ThrottlePolicy()
+    bucket.block("example.com", policy, 30)
+
+    assert bucket.acquire("example.com", policy) == pytest.approx(30)
+    clock.now += 30
+    assert bucket.acquire("example.com", policy) == 0
+
+
+def test_policy_site_overrides():
+    """测试站点配置覆盖默认参数"""
+    crawler = get_crawler(Spider, {"THROTTLE_MAX_RATE": 5})
+    policy = ThrottlePolicy.from_settings(crawler.settings, {"max_rate": 1, "unknown": 3})
+
+    assert policy.max_rate == 1
+    assert policy.start_rate == 1.0
+
+
+def test_parse_retry_after():
+    """测试解析秒数和HTTP日期格式的Retry-After"""
+    assert parse_retry_after(b"120") == 120
+    assert parse_retry_after(b"Wed, 21 Oct 2015 07:28:00 GMT") == 0
+    assert parse_retry_after(b"soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_middleware_backs_off_on_429(middleware, bucket):
+    """测试429响应降低共享速率并遵守Retry-After"""
+    spider = Spider(name="test")
+    request = Request("https://example.com/page", meta={"download_latency": 0.5})
+    response = Response(request.url, status=429, headers={"Retry-After": "60"}, request=request)
+
+    assert asyncio.run(middleware.process_request(request, spider)) is None
+    assert asyncio.run(middleware.process_response(request, response, spider)) is response
+
+    assert bucket.adjust("example.com", middleware.policy) == pytest.approx(1.0)
+    assert bucket.acquire("example.com", middleware.policy) == pytest.approx(60)
+    assert middleware.stats.get_value("throttle/backoffs") == 1
+
+
+def test_middleware_speeds_up_on_fast_responses(middleware, bucket):
+    """测试响应正常时逐步提高速率，延迟超过目标时降低速率"""
+    spider = Spider(name="test")
+    fast = Request("https://example.com/fast", meta={"download_latency": 0.2})
+    slow = Request("https://example.com/slow", meta={"download_latency": 10})
+
+    asyncio.run(middleware.process_response(fast, Response(fast.url, request=fast), spider))
+    assert bucket.adjust("example.com", middleware.policy) == pytest.approx(2.1)
+
+    asyncio.run(middleware.process_response(slow, Response(slow.url, request=slow), spider))
+    assert bucket.adjust("example.com", middleware.policy) == pytest.approx(1.89)
+
+
+def test_cache_hits_skip_throttle(middleware, bucket):
+    """测试限速中间件排在缓存中间件之后，缓存命中的响应不调整速率"""
+    from scrapy.settings.default_settings import DOWNLOADER_MIDDLEWARES_BASE
+
+    from app.scrapers import settings as crawl_settings
+
+    cache_priority = DOWNLOADER_MIDDLEWARES_BASE["scrapy.downloadermiddlewares.httpcache.HttpCacheMiddleware"]
+    assert crawl_settings.DOWNLOADER_MIDDLEWARES["app.scrapers.throttle.DomainThrottleMiddleware"] > cache_priority
+
+    spider = Spider(name="test")
+    request = Request("https://example.com/page")
+    response = Response(request.url, status=429, flags=["cached"], request=request)
+    assert asyncio.run(middleware.process_response(request, response, spider)) is response
+    assert bucket.adjust("example.com", middleware.policy) == pytest.approx(2.0)
+    assert middleware.stats.get_value("throttle/backoffs") is None
+
+
+def test_middleware_uses_site_config_overrides(middleware):
+    """测试爬虫打开时应用 SiteConfig.config 中的限速参数"""
+    spider = Spider(name="test")
+    spider.site_config = SimpleNamespace(config={"throttle": {"max_concurrency": 2}})
+
+    middleware.spider_opened(spider)
+
+    assert middleware.policy.max_concurrency == 2
+    assert middleware.policy.start_rate == 2.0
+
+
+class BrokenRedisBucket:
+    """每次调用都抛出Redis连接错误的令牌桶"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def acquire(self, key, policy, *args, **kwargs):
+        self.calls += 1
+        raise RedisConnectionError("connection refused")
+
+    adjust = block = acquire
+
+
+def test_middleware_falls_back_to_memory_bucket_on_redis_error(monkeypatch, clock):
+    """测试爬取中途Redis出错时改用进程内令牌桶，重试间隔内不再访问Redis"""
+    # 线程池调用直接在当前线程执行，测试不需要运行reactor
+    monkeypatch.setattr(throttle, "deferToThread", defer.maybeDeferred)
+    monkeypatch.setattr(throttle, "memory_bucket", MemoryTokenBucket(clock=clock))
+    broken = BrokenRedisBucket()
+    crawler = get_crawler(Spider, {"THROTTLE_ENABLED": True, "THROTTLE_REDIS_RETRY_INTERVAL": 30})
+    crawler.stats.open_spider()
+    middleware = DomainThrottleMiddleware(crawler, broken)
+    spider = Spider(name="test")
+    request = Request("https://example.com/page", meta={"download_latency": 0.5})
+
+    assert asyncio.run(middleware.process_request(request, spider)) is None
+    response = Response(request.url, status=429, headers={"Retry-After": "60"}, request=request)
+    assert asyncio.run(middleware.process_response(request, response, spider)) is response
+    assert asyncio.run(middleware.process_exception(request, TimeoutError(), spider)) is None
+
+    assert broken.calls == 1
+    assert middleware.stats.get_value("throttle/redis_errors") == 1
+    assert throttle.memory_bucket.acquire("example.com", middleware.policy) == pytest.approx(60)
+
+    middleware.redis_down_until = 0
+    asyncio.run(middleware.process_exception(request, TimeoutError(), spider))
+    assert broken.calls == 2
@@ -0,0 +1,192 @@
+"""
+链路追踪测试
+"""
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+from fastapi import FastAPI
+from opentelemetry import trace
+from scrapy import Request, Spider
+from scrapy.http import Response
+from scrapy.utils.test import get_crawler
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import models
+from app.api import deps
+from app.api.routes import jobs
+from app.core import tracing
+from app.core.config import settings as app_settings
+from app.db.base import Base
+from app.db.database import get_db
+from app.scrapers.extensions import CrawlTracing
+from benchmarks.synthetic_site import SiteSize, SyntheticSiteServer
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+TRACEPARENT = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+
+# 模拟worker中的 run_spider_task：在 job.run span 中通过 run_crawl_process 运行爬取子进程
+CRAWL_SCRIPT = textwrap.dedent("""
+    import sys
+
+    from app import models
+    from app.core import tracing
+    from app.db.base import Base
+    from app.db.database import SessionLocal, engine
+    from app.scrapers.crawl import run_crawl_process
+
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    db.add(models.SiteConfig(
+        id=1,
+        name="synthetic",
+        url=sys.argv[1],
+        start_urls=[sys.argv[1] + "artists?page=1"],
+        detail_page_xpath="//a[@class='detail']",
+        tenant_id="test_tenant",
+    ))
+    db.add(models.Job(id=1, name="job", site_config_id=1, tenant_id="test_tenant", status="running"))
+    db.commit()
+    db.close()
+
+    tracing.setup("aida-worker")
+    with tracing.get_tracer().start_as_current_span("job.run", context=tracing.extract(sys.argv[2])):
+        run_crawl_process(1, {"LOG_LEVEL": "ERROR", "EXTENSIONS": {"app.scrapers.extensions.CrawlTracing": 500}})
+    tracing.flush()
+""")
+
+
+def _read_spans(path) -> list:
+    """读取span文件"""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.fixture
+def traces(tmp_path, monkeypatch):
+    """启用链路追踪；全局TracerProvider只能设置一次，本进程中的span都写入第一次设置的文件"""
+    monkeypatch.setattr(app_settings, "TRACING_ENABLED", True)
+    monkeypatch.setattr(app_settings, "TRACING_FILE", str(tmp_path / "spans.jsonl"))
+    tracing.setup("aida-api")
+    return tracing._provider
+
+
+@pytest.fixture
+def session():
+    """创建测试数据库会话"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    try:
+        yield db
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def test_start_job_records_trace_context(traces, session, monkeypatch):
+    """测试启动任务的请求延续调用方的链路，链路上下文保存在任务上供调度和worker使用"""
+    user = models.User(
+        email="test@example.com", username="testuser", hashed_password="hashed_password", tenant_id="test_tenant"
+    )
+    session.add(user)
+    session.add(models.SiteConfig(id=1, name="site", url="http://example.com", tenant_id="test_tenant"))
+    session.add(models.Job(id=1, name="job", site_config_id=1, tenant_id="test_tenant"))
+    session.commit()
+    monkeypatch.setattr(jobs.celery_app, "send_task", lambda *args, **kwargs: None)
+
+    app = FastAPI()
+    app.include_router(jobs.router)
+    app.dependency_overrides[get_db] = lambda: session
+    app.dependency_overrides[deps.get_current_active_user] = lambda: user
+    client = TestClient(app)
+
+    response = client.post("/jobs/1/start", headers={"traceparent": TRACEPARENT})
+    assert response.status_code == 200
+    job = session.get(models.Job, 1)
+    assert job.status == "queued"
+
+    traces.force_flush()
+    _, trace_id, parent_id, _ = TRACEPARENT.split("-")
+    spans = {span["span_id"]: span for span in _read_spans(app_settings.TRACING_FILE) if span["trace_id"] == trace_id}
+    server, = [span for span in spans.values() if span["kind"] == "SERVER"]
+    assert server["name"] == "POST /jobs/{job_id}/start"
+    assert server["parent_span_id"] == parent_id
+    assert server["attributes"]["http.response.status_code"] == 200
+    # 任务的链路上下文指向该请求中的span，调度和worker的span挂在同一条链路上
+    _, context_trace_id, context_span_id, _ = job.trace_context.split("-")
+    assert context_trace_id == trace_id
+    span = spans[context_span_id]
+    while span["kind"] != "SERVER":
+        span = spans[span["parent_span_id"]]
+    assert span is server
+
+
+def test_crawl_process_continues_trace(tmp_path):
+    """测试爬取子进程的span挂在worker的span之下，请求和数据库写入按比例采样"""
+    spans_file = tmp_path / "spans.jsonl"
+    env = dict(
+        os.environ,
+        PYTHONPATH=PROJECT_DIR,
+        DATABASE_URL=f"sqlite:///{tmp_path / 'tracing.db'}",
+        TRACING_ENABLED="true",
+        TRACING_FILE=str(spans_file),
+        TRACING_REQUEST_SAMPLE_RATE="1",
+    )
+    script = tmp_path / "crawl.py"
+    script.write_text(CRAWL_SCRIPT, encoding="utf-8")
+    with SyntheticSiteServer(SiteSize(artists=3, artworks=0, exhibitions=0)) as server:
+        result = subprocess.run(
+            [sys.executable, str(script), server.url, TRACEPARENT],
+            cwd=tmp_path,
+            env=env,
+            capture_output=True,
+            text=True,
+            timeout=120,
+        )
+    assert result.returncode == 0, result.stderr
+
+    spans = _read_spans(spans_file)
+    assert {span["trace_id"] for span in spans} == {TRACEPARENT.split("-")[1]}
+    by_name = {}
+    for span in spans:
+        by_name.setdefault(span["name"], []).append(span)
+    job_run, = by_name["job.run"]
+    process, = by_name["crawl.process"]
+    create, = by_name["spider.create"]
+    crawl, = by_name["spider.crawl"]
+
+    assert process["parent_span_id"] == job_run["span_id"]
+    assert process["service"] == "aida-crawl"
+    assert create["parent_span_id"] == process["span_id"]
+    assert crawl["parent_span_id"] == process["span_id"]
+    assert create["attributes"]["spider.class"] == "BaseSpider"
+    # 列表页和3个详情页
+    requests = by_name["http.request"]
+    assert len(requests) == 4
+    assert all(span["parent_span_id"] == process["span_id"] for span in requests)
+    assert {span["attributes"]["http.response.status_code"] for span in requests} == {200}
+    assert by_name["db.write"]
+
+
+def test_crawl_tracing_with_non_recording_spans():
+    """测试span未被记录（NonRecordingSpan）时请求离开下载器不会出错"""
+    extension = CrawlTracing(get_crawler(Spider), sample_rate=1.0)
+    extension.tracer = trace.NoOpTracer()
+    spider = Spider("pages")
+
+    for url, status in (("data:,ok", 200), ("data:,timeout", None)):
+        request = Request(url)
+        extension.request_reached_downloader(request, spider)
+        if status is not None:
+            extension.response_downloaded(Response(url, status=status), request, spider)
+        extension.request_left_downloader(request, spider)
+
+    assert extension.requests == {}